@@ -4,7 +4,7 @@
     "category": "Base",
     "summary": "Smart Address Lookup and Validation for Vietnam",
     "description": "Verify and auto-fill Vietnam addresses with offline Province/District/Ward data and online search.",
-    "version": "15.0.5.0.0",
+    "version": "15.0.5.4.0",
     "author": "NTP",
     "website": "",
     "depends": ["base", "contacts", "account", "sale", "ntp_einvoice"],
@@ -16,6 +16,7 @@
         "views/sale_order.xml",
         "views/res_config_settings.xml",
         "data/server_actions.xml",
+        "data/address_backfill_cron.xml",
         "views/address_log.xml",
     ],
     "external_dependencies": {"python": ["openai"]},
@@ -1,12 +1,48 @@
 # -*- coding: utf-8 -*-
+"""
+Vietnamese administrative division data loader
+==============================================
+Loads data/tinh_tp.json, quan_huyen.json and xa_phuong.json into
+vn.province / vn.district / vn.ward:
 
+- the JSON files are streamed (one entry at a time), not loaded whole
+- each level is COPY'd into a temporary table, then upserted by code with
+  one INSERT ... ON CONFLICT (code) DO UPDATE; unchanged rows are not
+  rewritten, so re-running on the same data changes nothing
+- records missing from the dataset are kept (partners may reference them)
+
+Run on install (post_init_hook) and again whenever the dataset files are
+updated, e.g. after an administrative merger:
+    env["res.config.settings"].action_reload_vn_address_data()
+The address matcher cache version is bumped when anything changed.
+"""
+
+import csv
+import io
 import json
 import logging
 import os
 import time
 
+from .utils.normalize import normalize_string
+
 logger = logging.getLogger(__name__)
 
+JSON_CHUNK_SIZE = 1 << 16
+
+# (table, JSON file, parent table or None, data columns)
+_LEVELS = [
+    ("vn_province", "tinh_tp.json", None,
+     ["code", "name", "name_with_type", "slug", "type"]),
+    ("vn_district", "quan_huyen.json", "vn_province",
+     ["code", "name", "name_with_type", "slug", "type"]),
+    ("vn_ward", "xa_phuong.json", "vn_district",
+     ["code", "name", "name_with_type", "slug", "type", "path_with_type",
+      "path_search"]),
+]
+
+_REQUIRED_KEYS = ("code", "name")
+
 
 def post_init_hook(cr, registry):
     """Load Vietnamese administrative division data from JSON files into the database."""
@@ -14,7 +50,7 @@ def post_init_hook(cr, registry):
 
     env = api.Environment(cr, SUPERUSER_ID, {})
     try:
-        _load_vn_address_data(env)
+        load_vn_address_data(env)
     except Exception as e:
         logger.error(
             "Failed to load Vietnamese address data during module install: %s",
@@ -23,164 +59,209 @@ def post_init_hook(cr, registry):
         raise
 
 
-def _load_vn_address_data(env):
-    """Load province, district, ward data from bundled JSON files."""
-    data_dir = os.path.join(os.path.dirname(__file__), "data")
+def load_vn_address_data(env, data_dir=None):
+    """Upsert the province, district and ward datasets by code.
+
+    Returns:
+        dict: level table -> {"inserted", "updated", "skipped"} counts
+    """
+    data_dir = data_dir or os.path.join(os.path.dirname(__file__), "data")
     start_time = time.time()
+    logger.info("Loading Vietnamese administrative division data...")
 
-    # Check if data already loaded
-    try:
-        existing_count = env["vn.province"].search_count([])
-        if existing_count > 0:
-            logger.info("VN address data already loaded (%d provinces). Skipping.", existing_count)
+    # pending ORM changes must not be overwritten by / hide the upsert
+    env["base"].flush()
+    stats = {}
+    for table, filename, parent_table, columns in _LEVELS:
+        path = os.path.join(data_dir, filename)
+        if not os.path.exists(path):
+            logger.error("Address data file not found: %s", path)
+            raise FileNotFoundError(path)
+        stats[table] = _upsert_level(env, table, path, parent_table, columns)
+        logger.info(
+            "%s: %d inserted, %d updated, %d skipped.",
+            table, stats[table]["inserted"], stats[table]["updated"],
+            stats[table]["skipped"],
+        )
+
+    env.invalidate_all()
+    if any(level["inserted"] or level["updated"] for level in stats.values()):
+        env["vn.gazetteer.mixin"]._bump_gazetteer_version()
+
+    logger.info(
+        "Vietnamese administrative data loading complete (%.1f seconds)",
+        time.time() - start_time,
+    )
+    return stats
+
+
+def _iter_json_object(path, chunk_size=JSON_CHUNK_SIZE):
+    """Yield the (key, value) pairs of the top-level JSON object in path,
+    reading the file chunk by chunk."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as fh:
+        buf, pos, eof = "", 0, False
+
+        def fill():
+            nonlocal buf, pos, eof
+            chunk = fh.read(chunk_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+
+        def skip_whitespace():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                fill()
+
+        def read_char(expected):
+            nonlocal pos
+            skip_whitespace()
+            if pos >= len(buf) or buf[pos] not in expected:
+                raise json.JSONDecodeError(
+                    "Expecting one of %r" % expected, buf, pos,
+                )
+            pos += 1
+            return buf[pos - 1]
+
+        def read_value():
+            nonlocal pos
+            skip_whitespace()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()
+                    continue
+                # a value ending with the buffer may be cut (numbers)
+                if end == len(buf) and not eof:
+                    fill()
+                    continue
+                pos = end
+                return value
+
+        read_char("{")
+        skip_whitespace()
+        if pos < len(buf) and buf[pos] == "}":
             return
-    except Exception as e:
-        logger.error("Error checking existing VN address data: %s", e)
-        raise
+        while True:
+            key = read_value()
+            read_char(":")
+            yield key, read_value()
+            if read_char(",}") == "}":
+                return
 
-    logger.info("Loading Vietnamese administrative division data...")
 
-    # --- Load provinces ---
-    provinces_file = os.path.join(data_dir, "tinh_tp.json")
-    try:
-        with open(provinces_file, "r", encoding="utf-8") as f:
-            provinces_data = json.load(f)
-    except FileNotFoundError:
-        logger.error("Province data file not found: %s", provinces_file)
-        raise
-    except json.JSONDecodeError as e:
-        logger.error("Invalid JSON in province data file %s: %s", provinces_file, e)
-        raise
+class _CsvStream:
+    """File-like object feeding rows to COPY ... FROM STDIN (FORMAT csv).
 
-    province_map = {}  # code -> record id
-    province_vals_list = []
-    skipped_provinces = 0
-    for code, prov in provinces_data.items():
-        try:
-            province_vals_list.append({
-                "code": prov["code"],
-                "name": prov["name"],
-                "name_with_type": prov["name_with_type"],
-                "slug": prov.get("slug", ""),
-                "type": prov.get("type", ""),
-            })
-        except KeyError as e:
-            logger.warning("Province %s missing required field %s, skipping", code, e)
-            skipped_provinces += 1
+    Strings are quoted, so "" stays an empty string; None is sent as NULL.
+    """
 
-    try:
-        provinces = env["vn.province"].create(province_vals_list)
-        for prov in provinces:
-            province_map[prov.code] = prov.id
-        logger.info(
-            "Loaded %d provinces (skipped %d).",
-            len(provinces), skipped_provinces,
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._out = io.StringIO()
+        self._writer = csv.writer(
+            self._out, lineterminator="\n", quoting=csv.QUOTE_NONNUMERIC,
         )
-    except Exception as e:
-        logger.error("Error creating province records: %s", e, exc_info=True)
-        raise
 
-    # --- Load districts ---
-    districts_file = os.path.join(data_dir, "quan_huyen.json")
-    try:
-        with open(districts_file, "r", encoding="utf-8") as f:
-            districts_data = json.load(f)
-    except FileNotFoundError:
-        logger.error("District data file not found: %s", districts_file)
-        raise
-    except json.JSONDecodeError as e:
-        logger.error("Invalid JSON in district data file %s: %s", districts_file, e)
-        raise
+    def read(self, size=-1):
+        size = size if size and size > 0 else JSON_CHUNK_SIZE
+        while self._out.tell() < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+        data = self._out.getvalue()
+        self._out.seek(0)
+        self._out.truncate()
+        return data
+
 
-    district_map = {}  # code -> record id
-    district_vals_list = []
-    skipped_districts = 0
-    for code, dist in districts_data.items():
-        province_id = province_map.get(dist.get("parent_code"))
-        if not province_id:
-            logger.warning("District %s has unknown parent_code %s", code, dist.get("parent_code"))
-            skipped_districts += 1
+def _iter_rows(path, columns, with_parent, counter):
+    for code, entry in _iter_json_object(path):
+        if any(not entry.get(key) for key in _REQUIRED_KEYS):
+            logger.warning("Entry %s of %s misses code or name, skipping", code, path)
+            counter["skipped"] += 1
             continue
-        try:
-            district_vals_list.append({
-                "code": dist["code"],
-                "name": dist["name"],
-                "name_with_type": dist["name_with_type"],
-                "slug": dist.get("slug", ""),
-                "type": dist.get("type", ""),
-                "province_id": province_id,
-            })
-        except KeyError as e:
-            logger.warning("District %s missing required field %s, skipping", code, e)
-            skipped_districts += 1
-
-    # Create in batches for performance
-    batch_size = 200
-    districts = env["vn.district"]
-    try:
-        for i in range(0, len(district_vals_list), batch_size):
-            batch = district_vals_list[i:i + batch_size]
-            districts |= env["vn.district"].create(batch)
-        for dist in districts:
-            district_map[dist.code] = dist.id
-        logger.info(
-            "Loaded %d districts (skipped %d).",
-            len(districts), skipped_districts,
-        )
-    except Exception as e:
-        logger.error("Error creating district records at batch offset %d: %s", i, e, exc_info=True)
-        raise
+        # optional values default to "" as the former ORM loader stored them
+        values = dict(entry)
+        if "path_search" in columns:
+            values["path_search"] = normalize_string(
+                entry.get("path_with_type") or ""
+            ).lower()
+        row = [values.get(column) or "" for column in columns]
+        if with_parent:
+            row.append(entry.get("parent_code"))
+        yield row
 
-    # --- Load wards ---
-    wards_file = os.path.join(data_dir, "xa_phuong.json")
-    try:
-        with open(wards_file, "r", encoding="utf-8") as f:
-            wards_data = json.load(f)
-    except FileNotFoundError:
-        logger.error("Ward data file not found: %s", wards_file)
-        raise
-    except json.JSONDecodeError as e:
-        logger.error("Invalid JSON in ward data file %s: %s", wards_file, e)
-        raise
 
-    ward_vals_list = []
-    skipped_wards = 0
-    for code, ward in wards_data.items():
-        district_id = district_map.get(ward.get("parent_code"))
-        if not district_id:
-            logger.warning("Ward %s has unknown parent_code %s", code, ward.get("parent_code"))
-            skipped_wards += 1
-            continue
-        try:
-            ward_vals_list.append({
-                "code": ward["code"],
-                "name": ward["name"],
-                "name_with_type": ward["name_with_type"],
-                "slug": ward.get("slug", ""),
-                "type": ward.get("type", ""),
-                "path_with_type": ward.get("path_with_type", ""),
-                "district_id": district_id,
-            })
-        except KeyError as e:
-            logger.warning("Ward %s missing required field %s, skipping", code, e)
-            skipped_wards += 1
-
-    wards = env["vn.ward"]
-    try:
-        for i in range(0, len(ward_vals_list), batch_size):
-            batch = ward_vals_list[i:i + batch_size]
-            wards |= env["vn.ward"].create(batch)
-        logger.info(
-            "Loaded %d wards (skipped %d).",
-            len(wards), skipped_wards,
+def _upsert_level(env, table, path, parent_table, columns):
+    cr = env.cr
+    counter = {"inserted": 0, "updated": 0, "skipped": 0}
+    import_table = "%s_import" % table
+    import_columns = columns + (["parent_code"] if parent_table else [])
+
+    cr.execute("DROP TABLE IF EXISTS %s" % import_table)
+    cr.execute(
+        "CREATE TEMP TABLE %s (%s) ON COMMIT DROP"
+        % (import_table, ", ".join("%s varchar" % col for col in import_columns))
+    )
+    cr.copy_expert(
+        "COPY %s (%s) FROM STDIN WITH (FORMAT csv)"
+        % (import_table, ", ".join(import_columns)),
+        _CsvStream(_iter_rows(path, columns, bool(parent_table), counter)),
+    )
+
+    target_columns = list(columns)
+    select_columns = ["i.%s" % col for col in columns]
+    joins = ""
+    if parent_table == "vn_province":
+        target_columns.append("province_id")
+        select_columns.append("parent.id")
+    elif parent_table == "vn_district":
+        # vn.ward.province_id is stored related to district_id.province_id
+        target_columns += ["district_id", "province_id"]
+        select_columns += ["parent.id", "parent.province_id"]
+    if parent_table:
+        joins = "JOIN %s parent ON parent.code = i.parent_code" % parent_table
+        cr.execute(
+            "SELECT count(*) FROM %s i LEFT JOIN %s parent ON parent.code = i.parent_code "
+            "WHERE parent.id IS NULL" % (import_table, parent_table)
         )
-    except Exception as e:
-        logger.error("Error creating ward records at batch offset %d: %s", i, e, exc_info=True)
-        raise
+        orphans = cr.fetchone()[0]
+        if orphans:
+            logger.warning("%s: %d entries with unknown parent_code skipped", table, orphans)
+            counter["skipped"] += orphans
 
-    elapsed = time.time() - start_time
-    logger.info(
-        "Vietnamese administrative data loading complete! "
-        "Provinces: %d, Districts: %d, Wards: %d (%.1f seconds)",
-        len(provinces), len(districts), len(wards), elapsed,
+    updated_columns = [col for col in target_columns if col != "code"]
+    cr.execute(
+        """
+        INSERT INTO {table} ({target}, create_uid, create_date, write_uid, write_date)
+        SELECT {select}, %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+          FROM {import_table} i {joins}
+        ON CONFLICT (code) DO UPDATE
+           SET {assign}, write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+         WHERE ({current}) IS DISTINCT FROM ({excluded})
+        RETURNING (xmax = 0)
+        """.format(
+            table=table,
+            target=", ".join(target_columns),
+            select=", ".join(select_columns),
+            import_table=import_table,
+            joins=joins,
+            assign=", ".join("%s = EXCLUDED.%s" % (col, col) for col in updated_columns),
+            current=", ".join("%s.%s" % (table, col) for col in updated_columns),
+            excluded=", ".join("EXCLUDED.%s" % col for col in updated_columns),
+        ),
+        {"uid": env.uid},
     )
+    for (inserted,) in cr.fetchall():
+        counter["inserted" if inserted else "updated"] += 1
+    cr.execute("DROP TABLE %s" % import_table)
+    return counter
@@ -4,3 +4,4 @@ from . import res_config_settings
 from . import sale_order
 from . import ntp_einvoice
 from . import address_log
+from . import address_backfill
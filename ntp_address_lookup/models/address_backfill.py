@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Partner Address Backfill
+========================
+Matches the free-text address of many partners (street, street2, city)
+to Province/District/Ward and writes the confident matches.
+
+- partners are read in id order, chunk by chunk, with search_read
+- in the background (cron, or a shell/CLI run with background=True) the
+  matcher runs in a process pool (utils/address_backfill.py) while the
+  next chunk is read, and each chunk is committed; from the UI (wizard)
+  everything runs in-process and in the request transaction
+- accepted matches are written grouped by identical values, one write
+  per (province, district, ward) of the chunk
+- a resumable run saves the last processed partner id after each chunk
+  and starts after it the next time
+- dry_run matches and counts without writing anything
+
+Used by the batch auto-detect wizard and the backfill cron.
+"""
+
+import json
+import logging
+import os
+import time
+
+from odoo import api, fields, models
+
+from ..utils.address_backfill import MatchPool
+from ..utils import address_matcher
+from ..utils.address_matcher import HIGH_CONFIDENCE
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE_PARAM = "ntp_address_lookup.backfill_chunk_size"
+PROCESSES_PARAM = "ntp_address_lookup.backfill_processes"
+TIME_LIMIT_PARAM = "ntp_address_lookup.backfill_time_limit"
+LAST_ID_PARAM = "ntp_address_lookup.backfill_last_id"
+LAST_RUN_PARAM = "ntp_address_lookup.backfill_last_run"
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_TIME_LIMIT = 900  # seconds, for the cron
+
+PARTNER_FIELDS = [
+    "name", "street", "street2", "city", "x_province_id", "x_address_verified",
+]
+
+
+class AddressBackfill(models.AbstractModel):
+    _name = "address.backfill"
+    _description = "Partner Address Backfill"
+
+    def _get_int_param(self, key, default):
+        try:
+            return int(self.env["ir.config_parameter"].sudo().get_param(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def _default_processes(self):
+        return self._get_int_param(
+            PROCESSES_PARAM, max(1, min(4, (os.cpu_count() or 1) - 1)),
+        )
+
+    @api.model
+    def _iter_matches(self, domain=None, start_id=0, chunk_size=None,
+                      processes=1):
+        """Read partners in id order and match their address.
+
+        processes > 1 forks matcher processes: only from the cron or CLI,
+        never from an HTTP request.
+
+        Yields, per chunk:
+            (rows, matches) - the search_read rows of the chunk and a dict
+            partner id -> (best result or None, error or None) for the rows
+            needing a match. Rows without address text or already verified
+            are not matched.
+        """
+        domain = list(domain or [])
+        chunk_size = chunk_size or self._get_int_param(CHUNK_SIZE_PARAM, DEFAULT_CHUNK_SIZE)
+        Partner = self.env["res.partner"]
+
+        def read_chunk(after_id):
+            return Partner.search_read(
+                domain + [("id", ">", after_id)], PARTNER_FIELDS,
+                order="id", limit=chunk_size,
+            )
+
+        def to_match(rows):
+            return [
+                (row["id"], row["street"], row["street2"], row["city"])
+                for row in rows
+                if not (row["x_province_id"] and row["x_address_verified"])
+                and any((row["street"], row["street2"], row["city"]))
+            ]
+
+        rows = read_chunk(start_id)
+        if not rows:
+            return
+        address_matcher._ensure_cache(self.env)
+        version = address_matcher._CACHE["version"]
+        snapshot_path = address_matcher._snapshot_path(self.env.cr.dbname, version)
+        with MatchPool(snapshot_path, version, processes) as pool:
+            pending = pool.submit(to_match(rows))
+            while rows:
+                next_rows = read_chunk(rows[-1]["id"]) if len(rows) == chunk_size else []
+                next_pending = pool.submit(to_match(next_rows)) if next_rows else None
+                matches = {
+                    partner_id: (best, error)
+                    for partner_id, best, error in pool.collect(pending)
+                }
+                yield rows, matches
+                rows, pending = next_rows, next_pending
+
+    @api.model
+    def run_backfill(self, domain=None, dry_run=False, resume=False,
+                     min_confidence=HIGH_CONFIDENCE, chunk_size=None,
+                     processes=None, time_limit=None, background=False):
+        """Match the partners of domain and write the confident matches.
+
+        Args:
+            domain (list): Partners to process (default: all).
+            dry_run (bool): Match and count only, write nothing.
+            resume (bool): Start after the last partner id saved by the
+                previous resumable run and save progress after each chunk.
+            min_confidence (float): Best result confidence (0-1) required
+                to write a match.
+            chunk_size (int): Partners read, matched and written per chunk.
+            processes (int): Matcher processes in the background (default:
+                the configured number); always 1 (in-process) otherwise.
+            time_limit (float): Stop after the chunk exceeding this many
+                seconds (resume continues from there).
+            background (bool): Run from the cron or CLI: match in a process
+                pool and commit after each chunk. Otherwise the whole run
+                stays in the current transaction.
+
+        Returns:
+            dict: processed, matched, uncertain, unmatched, skipped, errors,
+            written, last_id, elapsed (s), rate (partners/s), done, dry_run
+        """
+        set_param = self.env["ir.config_parameter"].sudo().set_param
+        start_id = self._get_int_param(LAST_ID_PARAM, 0) if resume else 0
+        Partner = self.env["res.partner"]
+        state_cache = {}
+        stats = {
+            "processed": 0, "matched": 0, "uncertain": 0, "unmatched": 0,
+            "skipped": 0, "errors": 0, "written": 0, "last_id": start_id,
+            "done": True, "dry_run": dry_run,
+        }
+        processes = (processes or self._default_processes()) if background else 1
+        started = time.monotonic()
+        logger.info(
+            "Address backfill started after partner id %d (dry_run=%s, "
+            "processes=%d)", start_id, dry_run, processes,
+        )
+
+        for rows, matches in self._iter_matches(domain, start_id, chunk_size, processes):
+            groups = {}
+            for row in rows:
+                stats["processed"] += 1
+                if row["id"] not in matches:
+                    stats["skipped"] += 1
+                    continue
+                best, error = matches[row["id"]]
+                if error:
+                    stats["errors"] += 1
+                    logger.error(
+                        "Address backfill error for partner [%s] %s: %s",
+                        row["id"], row["name"], error,
+                    )
+                elif not best or not best["province_id"]:
+                    stats["unmatched"] += 1
+                elif best["confidence"] < min_confidence:
+                    stats["uncertain"] += 1
+                else:
+                    stats["matched"] += 1
+                    key = (best["province_id"], best["district_id"], best["ward_id"])
+                    groups.setdefault(key, []).append(row["id"])
+
+            if not dry_run:
+                for (province_id, district_id, ward_id), partner_ids in groups.items():
+                    vals = Partner._prepare_vn_address_vals(
+                        self.env["vn.province"].browse(province_id),
+                        self.env["vn.district"].browse(district_id or []),
+                        self.env["vn.ward"].browse(ward_id or []),
+                        state_cache=state_cache,
+                    )
+                    Partner.browse(partner_ids).write(vals)
+                    stats["written"] += len(partner_ids)
+                if resume:
+                    set_param(LAST_ID_PARAM, rows[-1]["id"])
+                if background and not self.env.registry.in_test_mode():
+                    self.env.cr.commit()  # pylint: disable=invalid-commit
+            stats["last_id"] = rows[-1]["id"]
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                "Address backfill: %d partners up to id %d, %d matched, "
+                "%.1f partners/s",
+                stats["processed"], stats["last_id"], stats["matched"],
+                stats["processed"] / elapsed if elapsed else 0.0,
+            )
+            if time_limit and elapsed > time_limit:
+                stats["done"] = False
+                break
+
+        stats["elapsed"] = round(time.monotonic() - started, 2)
+        stats["rate"] = round(
+            stats["processed"] / stats["elapsed"] if stats["elapsed"] else 0.0, 1,
+        )
+        if resume and not dry_run:
+            set_param(LAST_RUN_PARAM, json.dumps(
+                dict(stats, date=fields.Datetime.to_string(fields.Datetime.now())),
+            ))
+        logger.info("Address backfill finished: %s", stats)
+        return stats
+
+    @api.model
+    def cron_backfill_addresses(self):
+        """Resume the backfill for at most the configured time."""
+        return self.run_backfill(
+            resume=True,
+            time_limit=self._get_int_param(TIME_LIMIT_PARAM, DEFAULT_TIME_LIMIT),
+            background=True,
+        )
+
+    @api.model
+    def reset_backfill_progress(self):
+        """Make the next resumable run start again from the first partner."""
+        self.env["ir.config_parameter"].sudo().set_param(LAST_ID_PARAM, 0)
@@ -4,6 +4,8 @@ import logging
 
 from odoo import models, fields, api
 
+from ..hooks import load_vn_address_data
+
 logger = logging.getLogger(__name__)
 
 
@@ -80,3 +82,22 @@ class ResConfigSettings(models.TransientModel):
         except Exception as e:
             logger.error("Error saving address lookup config: %s", e)
             raise
+
+    def action_reload_vn_address_data(self):
+        """Upsert the bundled Province/District/Ward dataset (data refresh)."""
+        stats = load_vn_address_data(self.env)
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": "Address Data",
+                "message": "; ".join(
+                    "%s: %d inserted, %d updated, %d skipped" % (
+                        table, counts["inserted"], counts["updated"], counts["skipped"],
+                    )
+                    for table, counts in stats.items()
+                ),
+                "type": "success",
+                "sticky": False,
+            },
+        }
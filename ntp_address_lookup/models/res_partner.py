@@ -42,6 +42,39 @@ class ResPartner(models.Model):
             logger.error("Unexpected error fetching VN country ID: %s", e)
             return 241
 
+    @api.model
+    def _prepare_vn_address_vals(self, province, district=False, ward=False,
+                                 state_cache=None):
+        """Values applying a matched province/district/ward to a partner.
+
+        The address is marked verified and city/state follow the province.
+        state_cache (dict province id -> state id) spares the state search
+        when applying many matches of the same province.
+        """
+        vals = {
+            "x_province_id": province.id,
+            "x_district_id": district.id if district else False,
+            "x_ward_id": ward.id if ward else False,
+            "x_address_verified": True,
+            "city": province.name,
+        }
+        if state_cache is None or province.id not in state_cache:
+            # Match province to state
+            state = self.env["res.country.state"].search(
+                [("country_id", "=", self._get_vn_country_id()),
+                 ("name", "ilike", province.name)],
+                limit=1,
+            )
+            if state_cache is not None:
+                state_cache[province.id] = state.id
+            state_id = state.id
+        else:
+            state_id = state_cache[province.id]
+        if state_id:
+            vals["state_id"] = state_id
+            vals["country_id"] = self._get_vn_country_id()
+        return vals
+
     @api.onchange("x_province_id")
     def _onchange_province_id(self):
         """Clear district and ward when province changes, auto-fill city."""
@@ -1,14 +1,58 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import uuid
 
-from odoo import models, fields, api
+import psycopg2
+
+from odoo import models, fields, api, tools
+
+from ..utils import address_autocomplete, address_matcher
+from ..utils.address_matcher import GAZETTEER_VERSION_PARAM
+from ..utils.normalize import normalize_string
 
 logger = logging.getLogger(__name__)
 
+WARD_PATH_TRGM_INDEX = "vn_ward_path_search_trgm_idx"
+
+
+class VnGazetteerMixin(models.AbstractModel):
+    """Stamps a new address data version on every change of the inheriting
+    model, so every worker reloads the address matcher cache."""
+
+    _name = "vn.gazetteer.mixin"
+    _description = "Vietnam Address Data Version"
+
+    @api.model
+    def _bump_gazetteer_version(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            GAZETTEER_VERSION_PARAM, uuid.uuid4().hex,
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records:
+            self._bump_gazetteer_version()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if self:
+            self._bump_gazetteer_version()
+        return res
+
+    def unlink(self):
+        if not self:
+            return super().unlink()
+        res = super().unlink()
+        self._bump_gazetteer_version()
+        return res
+
 
 class VnProvince(models.Model):
     _name = "vn.province"
+    _inherit = "vn.gazetteer.mixin"
     _description = "Vietnam Province / City"
     _order = "name"
 
@@ -30,6 +74,7 @@ class VnProvince(models.Model):
 
 class VnDistrict(models.Model):
     _name = "vn.district"
+    _inherit = "vn.gazetteer.mixin"
     _description = "Vietnam District"
     _order = "name"
 
@@ -52,6 +97,7 @@ class VnDistrict(models.Model):
 
 class VnWard(models.Model):
     _name = "vn.ward"
+    _inherit = "vn.gazetteer.mixin"
     _description = "Vietnam Ward / Commune"
     _order = "name"
 
@@ -65,6 +111,10 @@ class VnWard(models.Model):
         "vn.province", "Province", related="district_id.province_id", store=True
     )
     path_with_type = fields.Char("Full Path")
+    path_search = fields.Char(
+        "Search Path", compute="_compute_path_search", store=True,
+        help="path_with_type without accents, lowercase (autocomplete)",
+    )
 
     _sql_constraints = [
         ("code_uniq", "unique(code)", "Ward code must be unique!"),
@@ -73,33 +123,79 @@ class VnWard(models.Model):
     def name_get(self):
         return [(rec.id, rec.name_with_type or rec.name) for rec in self]
 
+    @api.depends("path_with_type")
+    def _compute_path_search(self):
+        for rec in self:
+            rec.path_search = normalize_string(rec.path_with_type or "").lower()
+
+    def init(self):
+        """Trigram index of path_search for the SQL autocomplete fallback.
+
+        Needs the pg_trgm extension; without the right to create it, the
+        fallback works unindexed.
+        """
+        cr = self.env.cr
+        if tools.index_exists(cr, WARD_PATH_TRGM_INDEX):
+            return
+        try:
+            with cr.savepoint(flush=False), tools.mute_logger("odoo.sql_db"):
+                cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error as e:
+            logger.warning(
+                "pg_trgm extension unavailable, %s not created: %s",
+                WARD_PATH_TRGM_INDEX, e,
+            )
+            return
+        cr.execute(
+            "CREATE INDEX %s ON %s USING gin (path_search gin_trgm_ops)"
+            % (WARD_PATH_TRGM_INDEX, self._table)
+        )
+
     @api.model
-    def search_address_autocomplete(self, query):
-        """Search wards by path_with_type for address lookup.
+    def search_address_autocomplete(self, query, limit=10):
+        """Search wards by path for address lookup (autocomplete widget).
+
+        Served from the in-memory token index of the address matcher cache
+        (utils/address_autocomplete.py): accents are ignored, each word is a
+        token prefix and results are ranked by the number of words matched.
+        If the cache cannot be loaded, falls back to SQL on path_search.
 
         Args:
             query (str): User search text, e.g. "Ba Dinh Ha Noi"
+            limit (int): Maximum number of results.
 
         Returns:
-            list[dict]: Up to 10 results with ward/district/province info.
+            list[dict]: Up to limit results with ward/district/province info.
         """
         if not query or len(query.strip()) < 2:
             return []
 
         try:
-            words = query.strip().lower().split()
-            domain = []
-            for word in words:
-                if len(word) >= 2:
-                    domain.append(("path_with_type", "ilike", word))
+            address_matcher._ensure_cache(self.env)
+            results = address_autocomplete.search(query, limit)
+            logger.debug(
+                "Address autocomplete search '%s': found %d results",
+                query, len(results),
+            )
+            return results
+        except Exception as e:
+            logger.error(
+                "Address autocomplete index unavailable, searching the database "
+                "for '%s': %s", query, e, exc_info=True,
+            )
+        return self._search_address_autocomplete_sql(query, limit)
 
-            if not domain:
+    @api.model
+    def _search_address_autocomplete_sql(self, query, limit=10):
+        """Database fallback of search_address_autocomplete: wards whose
+        normalized path contains every query word (trigram index)."""
+        try:
+            words = address_autocomplete.query_words(query)
+            if not words:
                 return []
 
-            wards = self.search(domain, limit=10)
-            logger.debug(
-                "Address autocomplete search '%s': found %d results",
-                query, len(wards),
+            wards = self.search(
+                [("path_search", "ilike", word) for word in words], limit=limit,
             )
             return [{
                 "ward_id": w.id,
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ward address autocomplete latency
+============================================
+Replays typing sessions against ``utils/address_autocomplete.py``: every
+prefix of each query is one keystroke request, as sent by the autocomplete
+widget. Reports index build time and per-request latency (mean / p50 /
+p95 / max) for accented and unaccented input, plus how often the intended
+ward is in the results once the whole query is typed.
+
+Queries are "ward, district, province" paths of random wards from the
+bundled ``data/*.json`` files, typed with or without accents, with or
+without the type words (Phuong/Quan/...). No database is needed.
+
+Usage:
+    BENCH_QUERIES=500 python3 bench_address_autocomplete.py
+"""
+
+import importlib.util
+import os
+import random
+import sys
+import time
+
+from bench_address_matcher import ADDON_DIR, _load_address_matcher, _load_gazetteer
+
+QUERIES = int(os.environ.get("BENCH_QUERIES", "500"))
+
+
+def _load_autocomplete():
+    spec = importlib.util.spec_from_file_location(
+        "address_utils.address_autocomplete",
+        os.path.join(ADDON_DIR, "utils", "address_autocomplete.py"),
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def _replay(autocomplete, sessions):
+    durations = []
+    found = 0
+    for ward_id, query in sessions:
+        results = []
+        for end in range(2, len(query) + 1):
+            start = time.perf_counter()
+            results = autocomplete.search(query[:end])
+            durations.append(time.perf_counter() - start)
+        found += any(result["ward_id"] == ward_id for result in results)
+    return durations, found
+
+
+def _report(label, durations, found, total):
+    print("%-11s %6d requests  mean %.2fms  p50 %.2fms  p95 %.2fms  max %.2fms"
+          "  ward found %d/%d" % (
+              label, len(durations),
+              1000 * sum(durations) / len(durations),
+              1000 * _percentile(durations, 50),
+              1000 * _percentile(durations, 95),
+              1000 * max(durations),
+              found, total,
+          ))
+
+
+def main():
+    matcher = _load_address_matcher()
+    autocomplete = _load_autocomplete()
+    provinces, districts, wards = _load_gazetteer()
+    matcher._build_cache(provinces, districts, wards)
+
+    start = time.perf_counter()
+    autocomplete.get_index()
+    print("index build: %.0fms" % ((time.perf_counter() - start) * 1000))
+
+    rng = random.Random(7)
+    sample = rng.sample(wards, min(QUERIES, len(wards)))
+    accented = [
+        (ward["id"], ward["path_with_type"] if rng.random() < 0.5 else ward["path"])
+        for ward in sample
+    ]
+    unaccented = [
+        (ward_id, matcher.normalize_string(query).lower())
+        for ward_id, query in accented
+    ]
+    for label, sessions in (("accented", accented), ("unaccented", unaccented)):
+        durations, found = _replay(autocomplete, sessions)
+        _report(label, durations, found, len(sessions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: address matcher, trigram candidate index vs full scan
+=================================================================
+Matches a corpus of shipping addresses with ``_rank_matches`` twice: once
+scanning every Province/District/Ward entry (``use_index=False``) and once
+through the trigram candidate index, then reports addresses/sec for each
+path and every address whose top-1 result differs.
+
+The gazetteer is built from the bundled ``data/*.json`` files, so no
+database is needed.
+
+Corpus (``BENCH_CORPUS``):
+    *.txt   one address per line
+    *.json  Shopee get_order_detail responses (a response or a list of
+            them); ``recipient_address.full_address`` of each order is used
+
+Without ``BENCH_CORPUS`` a synthetic corpus is generated from the
+gazetteer: Shopee-like "street, ward, district, province" strings with
+and without diacritics, abbreviated prefixes and typos.
+
+The time to write and load the gazetteer snapshot shared by the workers
+is reported as well.
+
+Usage:
+    BENCH_CORPUS=/path/to/addresses.txt BENCH_ROUNDS=3 \\
+        python3 bench_address_matcher.py
+"""
+
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+
+CORPUS = os.environ.get("BENCH_CORPUS", "")
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", "3"))
+SYNTHETIC_SIZE = int(os.environ.get("BENCH_SIZE", "2000"))
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+def _load_address_matcher():
+    """Load utils/address_matcher.py without importing Odoo."""
+    package = types.ModuleType("address_utils")
+    package.__path__ = [os.path.join(ADDON_DIR, "utils")]
+    sys.modules["address_utils"] = package
+    for name in ("normalize", "address_matcher"):
+        spec = importlib.util.spec_from_file_location(
+            "address_utils.%s" % name, os.path.join(ADDON_DIR, "utils", "%s.py" % name),
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+    return sys.modules["address_utils.address_matcher"]
+
+
+def _load_gazetteer():
+    """Return vn.province/district/ward search_read-like rows from data/*.json."""
+    def load(name):
+        with open(os.path.join(ADDON_DIR, "data", name), encoding="utf-8") as fh:
+            return json.load(fh)
+
+    provinces = [
+        dict(row, id=int(code)) for code, row in load("tinh_tp.json").items()
+    ]
+    districts = [
+        dict(row, id=int(code), province_id=(int(row["parent_code"]), ""))
+        for code, row in load("quan_huyen.json").items()
+    ]
+    district_province = {d["id"]: d["province_id"] for d in districts}
+    wards = [
+        dict(
+            row, id=int(code),
+            district_id=(int(row["parent_code"]), ""),
+            province_id=district_province.get(int(row["parent_code"])),
+        )
+        for code, row in load("xa_phuong.json").items()
+    ]
+    return provinces, districts, wards
+
+
+def _load_corpus(matcher, wards):
+    if CORPUS.endswith(".json"):
+        with open(CORPUS, encoding="utf-8") as fh:
+            payload = json.load(fh)
+        addresses = []
+        for response in payload if isinstance(payload, list) else [payload]:
+            for order in response.get("response", {}).get("order_list", []):
+                full_address = (order.get("recipient_address") or {}).get("full_address")
+                if full_address:
+                    addresses.append(full_address)
+        return addresses
+    if CORPUS:
+        with open(CORPUS, encoding="utf-8") as fh:
+            return [line.strip() for line in fh if line.strip()]
+
+    rng = random.Random(42)
+    prefixes = {"Phường ": "P. ", "Xã ": "X. ", "Thị trấn ": "TT. ", "Quận ": "Q. ",
+                "Huyện ": "H. ", "Thị xã ": "TX. ", "Thành phố ": "TP. ", "Tỉnh ": ""}
+    addresses = []
+    for ward in rng.sample(wards, min(SYNTHETIC_SIZE, len(wards))):
+        parts = ["%d Đường số %d" % (rng.randint(1, 999), rng.randint(1, 30))]
+        parts += [part.strip() for part in ward["path_with_type"].split(",")]
+        style = rng.randint(0, 3)
+        if style >= 1:
+            for long_prefix, short_prefix in prefixes.items():
+                parts = [p.replace(long_prefix, short_prefix, 1) for p in parts]
+        if style >= 2:
+            parts = [matcher.normalize_string(p) for p in parts]
+        if style == 3:
+            # one typo in the ward name
+            name = parts[1]
+            pos = rng.randint(len(name) // 2, len(name) - 1)
+            parts[1] = name[:pos] + name[pos + 1:]
+        addresses.append(", ".join(parts))
+    return addresses
+
+
+def _run(matcher, parsed_list, use_index):
+    best = []
+    start = time.perf_counter()
+    for _round in range(ROUNDS):
+        best = []
+        for parsed in parsed_list:
+            results = matcher._rank_matches(parsed, use_index=use_index) if parsed else []
+            best.append(
+                (results[0]["province_id"], results[0]["district_id"],
+                 results[0]["ward_id"], results[0]["confidence"])
+                if results else None
+            )
+    elapsed = time.perf_counter() - start
+    return best, len(parsed_list) * ROUNDS / elapsed if elapsed else 0.0
+
+
+def main():
+    matcher = _load_address_matcher()
+    provinces, districts, wards = _load_gazetteer()
+
+    start = time.perf_counter()
+    matcher._build_cache(provinces, districts, wards)
+    print("cache build:  %.2fs (%d provinces, %d districts, %d wards)" % (
+        time.perf_counter() - start, len(provinces), len(districts), len(wards),
+    ))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "gazetteer-bench.pickle")
+        matcher._CACHE["version"] = "bench"
+        matcher._dump_snapshot(path)
+        start = time.perf_counter()
+        matcher._load_snapshot(path, "bench")
+        print("snapshot:     %.0fms load, %d KiB" % (
+            (time.perf_counter() - start) * 1000, os.path.getsize(path) // 1024,
+        ))
+
+    addresses = _load_corpus(matcher, wards)
+    parsed_list = [matcher._parse_address(address, "", "") for address in addresses]
+    print("corpus:       %d addresses x %d rounds" % (len(addresses), ROUNDS))
+
+    scan_best, scan_rate = _run(matcher, parsed_list, use_index=False)
+    index_best, index_rate = _run(matcher, parsed_list, use_index=True)
+    print("full scan:    %8.1f addresses/s" % scan_rate)
+    print("trigram index:%8.1f addresses/s (x%.1f)" % (
+        index_rate, index_rate / scan_rate if scan_rate else 0.0,
+    ))
+
+    mismatches = [
+        (address, scan, indexed)
+        for address, scan, indexed in zip(addresses, scan_best, index_best)
+        if scan != indexed
+    ]
+    print("top-1 identical: %d/%d" % (len(addresses) - len(mismatches), len(addresses)))
+    for address, scan, indexed in mismatches[:20]:
+        print("  MISMATCH %r: scan=%s index=%s" % (address, scan, indexed))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from . import test_address_backfill
+from . import test_address_data
+from . import test_gazetteer_cache
+from . import test_address_autocomplete
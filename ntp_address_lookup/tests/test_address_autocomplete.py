@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+from ..utils import address_autocomplete, address_matcher
+
+PROVINCE = "Thành phố Hồ Chí Minh"
+
+
+def _district(district_id, name):
+    return {"id": district_id, "name": name, "name_with_type": name, "slug": "",
+            "type": "quan", "province_id": (1, PROVINCE)}
+
+
+def _ward(ward_id, name, district_id, district_name):
+    return {"id": ward_id, "name": name, "name_with_type": name, "slug": "",
+            "type": "phuong", "district_id": (district_id, district_name),
+            "province_id": (1, PROVINCE),
+            "path_with_type": "%s, %s, %s" % (name, district_name, PROVINCE)}
+
+
+# every ward but the fillers has a path token starting with "ben"
+WARDS = [
+    _ward(1, "Phường Bến Nghé", 10, "Quận 1"),
+    _ward(2, "Phường Tân Định", 20, "Quận Bến Nghé"),
+    _ward(3, "Phường Bến Nghéo", 10, "Quận 1"),
+    _ward(4, "Phường Bến Thành", 10, "Quận 1"),
+    _ward(5, "Phường Bến Nghé", 30, "Huyện Xa Xôi Hẻo Lánh"),
+] + [
+    # enough other wards for "ben" and "nghe" to be selective words
+    _ward(100 + i, "Xã Số %d" % i, 40, "Huyện Khác") for i in range(120)
+]
+DISTRICTS = [
+    _district(10, "Quận 1"), _district(20, "Quận Bến Nghé"),
+    _district(30, "Huyện Xa Xôi Hẻo Lánh"), _district(40, "Huyện Khác"),
+]
+
+
+@tagged("post_install", "-at_install")
+class TestAddressAutocomplete(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAddressAutocomplete, self).setUp()
+        address_matcher._build_cache(
+            [{"id": 1, "name": PROVINCE, "name_with_type": PROVINCE,
+              "slug": "ho-chi-minh", "type": "thanh-pho"}],
+            DISTRICTS, WARDS, version="test",
+        )
+        # the next user of the cache rebuilds it from the real data
+        self.addCleanup(address_matcher.clear_cache)
+
+    def _ward_ids(self, query, limit=10):
+        return [result["ward_id"] for result in address_autocomplete.search(query, limit)]
+
+    def test_words_are_accent_insensitive_prefixes(self):
+        self.assertEqual(address_autocomplete.query_words("Bến  Nghé, Q 1"), ["ben", "nghe", "1"])
+        for query in ("ben nghe", "BẾN NGHÉ", "bến ngh"):
+            self.assertEqual(self._ward_ids(query, limit=1), [1], query)
+        self.assertEqual(self._ward_ids("so 17"), [117])
+        self.assertEqual(self._ward_ids("x"), [])
+
+        result = address_autocomplete.search("ben nghe quan 1", 1)[0]
+        self.assertEqual(result, {
+            "ward_id": 1,
+            "district_id": 10,
+            "province_id": 1,
+            "display": "Phường Bến Nghé, Quận 1, Thành phố Hồ Chí Minh",
+            "ward_name": "Phường Bến Nghé",
+            "district_name": "Quận 1",
+            "province_name": PROVINCE,
+        })
+
+    def test_ranking_by_coverage_then_name_then_whole_word_then_length(self):
+        self.assertEqual(self._ward_ids("ben nghe"), [
+            1,  # every word in the name, as whole tokens, shortest path
+            5,  # same, longer path
+            3,  # "nghe" is only a prefix of "ngheo"
+            2,  # the words are in the district, not in the ward name
+            4,  # matches "ben" only: completes the result
+        ])
+        self.assertEqual(self._ward_ids("ben nghe", limit=2), [1, 5])
+        # a single word has no partial tier
+        self.assertEqual(len(self._ward_ids("nghe")), 4)
+
+    def test_large_tier_is_ranked_among_its_shortest_paths(self):
+        with patch.object(address_autocomplete, "RANK_SORT_MAX", 2):
+            # ward 5 ranks above 3 but its path is not among the 2 shortest
+            self.assertEqual(self._ward_ids("ben nghe"), [1, 3, 4])
+
+    def test_index_follows_the_cache(self):
+        index = address_autocomplete.get_index()
+        self.assertIs(address_autocomplete.get_index(), index)
+        address_matcher._build_cache([], [], [], version="other")
+        self.assertIsNot(address_autocomplete.get_index(), index)
+        self.assertEqual(self._ward_ids("ben nghe"), [])
+
+
+@tagged("post_install", "-at_install")
+class TestAddressAutocompleteSql(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAddressAutocompleteSql, self).setUp()
+        province = self.env["vn.province"].create({
+            "name": "Zêta", "name_with_type": "Tỉnh Zêta", "code": "Z01",
+        })
+        district = self.env["vn.district"].create({
+            "name": "Zêta", "name_with_type": "Huyện Zêta", "code": "Z0101",
+            "province_id": province.id,
+        })
+        self.ward = self.env["vn.ward"].create({
+            "name": "Thử", "name_with_type": "Xã Thử", "code": "Z010101",
+            "district_id": district.id,
+            "path_with_type": "Xã Thử, Huyện Zêta, Tỉnh Zêta",
+        })
+        self.ward_model = self.env["vn.ward"]
+        self.addCleanup(address_matcher.clear_cache)
+
+    def test_sql_fallback_matches_every_word_on_path_search(self):
+        self.assertEqual(self.ward.path_search, "xa thu, huyen zeta, tinh zeta")
+        results = self.ward_model._search_address_autocomplete_sql("ZÊTA thu")
+        self.assertEqual([result["ward_id"] for result in results], [self.ward.id])
+        self.assertEqual(results[0]["district_name"], "Huyện Zêta")
+        self.assertEqual(results[0]["province_name"], "Tỉnh Zêta")
+        self.assertFalse(self.ward_model._search_address_autocomplete_sql("zeta khong"))
+
+    @mute_logger("odoo.addons.ntp_address_lookup.models.vn_address")
+    def test_search_falls_back_to_sql_without_the_cache(self):
+        with patch.object(address_matcher, "_ensure_cache", side_effect=MemoryError):
+            results = self.ward_model.search_address_autocomplete("zeta thu")
+        self.assertEqual([result["ward_id"] for result in results], [self.ward.id])
+        self.assertEqual(self.ward_model.search_address_autocomplete("z"), [])
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.tests import common, tagged
+
+from ..models import address_backfill as backfill_model
+from ..utils import address_backfill as backfill_pool
+
+
+@tagged("post_install", "-at_install")
+class TestAddressBackfill(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAddressBackfill, self).setUp()
+        self.backfill = self.env["address.backfill"]
+        self.ward = self.env["vn.ward"].search([("code", "=", "26740")])
+        if not self.ward:
+            self.skipTest("Vietnamese address data not loaded")
+        self.partners = self.env["res.partner"].create([
+            {"name": "Backfill %d" % i, "street": street}
+            for i, street in enumerate([
+                "1 Le Loi, Ben Nghe, Quan 1, HCM",  # confident
+                "somewhere near Ben Nghe",  # uncertain
+                "no address we know",  # unmatched
+                False,  # nothing to match
+                "2 Le Loi, Ben Nghe, Quan 1, HCM",  # confident
+            ])
+        ])
+        self.domain = [("id", "in", self.partners.ids)]
+        self.backfill.reset_backfill_progress()
+
+    def _fake_match_rows(self, rows):
+        best = {
+            "province_id": self.ward.province_id.id,
+            "district_id": self.ward.district_id.id,
+            "ward_id": self.ward.id,
+        }
+        confidence = {"1": 0.95, "2": 0.95, "s": 0.5}
+        return [
+            (partner_id, dict(best, confidence=confidence[street[0]])
+             if street[0] in confidence else None, None)
+            for partner_id, street, _street2, _city in rows
+        ]
+
+    def _run(self, **kwargs):
+        with patch.object(backfill_pool, "match_rows", side_effect=self._fake_match_rows), \
+                patch.object(backfill_model, "MatchPool", wraps=backfill_model.MatchPool) as pool, \
+                patch.object(self.env.registry, "in_test_mode", return_value=False), \
+                patch.object(self.env.cr, "commit") as commit:
+            stats = self.backfill.run_backfill(self.domain, **kwargs)
+        return stats, pool, commit
+
+    def test_dry_run_counts_without_writing(self):
+        stats, pool, commit = self._run(dry_run=True, resume=True)
+
+        self.assertEqual(
+            {key: stats[key] for key in ("processed", "matched", "uncertain",
+                                          "unmatched", "skipped", "written")},
+            {"processed": 5, "matched": 2, "uncertain": 1, "unmatched": 1,
+             "skipped": 1, "written": 0},
+        )
+        self.assertTrue(stats["dry_run"])
+        self.assertFalse(any(self.partners.mapped("x_province_id")))
+        self.assertFalse(any(self.partners.mapped("x_address_verified")))
+        # no progress saved: the next resumable run starts from the beginning
+        self.assertEqual(self.backfill._get_int_param(backfill_model.LAST_ID_PARAM, 0), 0)
+        commit.assert_not_called()
+
+    def test_interactive_run_stays_in_process_and_in_one_transaction(self):
+        stats, pool, commit = self._run(chunk_size=2, processes=4)
+
+        self.assertEqual(stats["written"], 2)
+        # processes=1: matched in the calling process, no fork
+        self.assertEqual(pool.call_args[0][2], 1)
+        commit.assert_not_called()
+        matched = self.partners[0] | self.partners[4]
+        self.assertEqual(matched.mapped("x_ward_id"), self.ward | self.ward)
+        self.assertTrue(all(matched.mapped("x_address_verified")))
+
+    def test_resume_continues_after_the_last_chunk(self):
+        # stops after the first chunk, as the cron does at its time limit
+        stats, pool, commit = self._run(
+            resume=True, chunk_size=2, time_limit=1e-9, background=True, processes=1,
+        )
+        self.assertFalse(stats["done"])
+        self.assertEqual((stats["processed"], stats["last_id"]), (2, self.partners[1].id))
+        self.assertEqual(
+            self.backfill._get_int_param(backfill_model.LAST_ID_PARAM, 0),
+            self.partners[1].id,
+        )
+        self.assertEqual(commit.call_count, 1)
+        self.assertEqual(self.partners[0].x_ward_id, self.ward)
+        self.assertFalse(self.partners[4].x_ward_id)
+
+        stats, pool, commit = self._run(
+            resume=True, chunk_size=2, background=True, processes=1,
+        )
+        self.assertTrue(stats["done"])
+        self.assertEqual((stats["processed"], stats["written"]), (3, 1))
+        self.assertEqual(stats["last_id"], self.partners[4].id)
+        self.assertEqual(self.partners[4].x_ward_id, self.ward)
+        self.assertEqual(commit.call_count, 2)
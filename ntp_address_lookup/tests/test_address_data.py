@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+from .. import hooks
+
+
+def _entry(code, name, parent_code=None, **extra):
+    entry = {
+        "code": code, "name": name, "name_with_type": name,
+        "slug": name.lower().replace(" ", "-"), "type": "test",
+    }
+    if parent_code:
+        entry["parent_code"] = parent_code
+    entry.update(extra)
+    return entry
+
+
+@tagged("post_install", "-at_install")
+class TestAddressData(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAddressData, self).setUp()
+        self.data_dir = tempfile.mkdtemp(prefix="vn_address_test_")
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        self.provinces = {
+            "T01": _entry("T01", "Tinh Mot"),
+            "T02": _entry("T02", "Tinh Hai"),
+        }
+        self.districts = {
+            "T101": _entry("T101", "Huyen Mot", "T01"),
+            "T201": _entry("T201", "Huyen Hai", "T02"),
+        }
+        self.wards = {
+            "T10101": _entry(
+                "T10101", "Xa Mot", "T101",
+                path_with_type="Xã Một, Huyện Một, Tỉnh Một",
+            ),
+            "T10102": _entry("T10102", "Xa Hai", "T101", path_with_type="Xã Hai"),
+        }
+
+    def _write_data(self):
+        for filename, data in (
+            ("tinh_tp.json", self.provinces),
+            ("quan_huyen.json", self.districts),
+            ("xa_phuong.json", self.wards),
+        ):
+            with open(os.path.join(self.data_dir, filename), "w", encoding="utf-8") as fh:
+                json.dump(data, fh, ensure_ascii=False, indent=1)
+
+    def _load(self):
+        self._write_data()
+        with mute_logger("odoo.addons.ntp_address_lookup.hooks"):
+            return hooks.load_vn_address_data(self.env, self.data_dir)
+
+    def test_reload_is_idempotent_and_applies_changes(self):
+        stats = self._load()
+        self.assertEqual(stats["vn_province"]["inserted"], 2)
+        self.assertEqual(stats["vn_district"]["inserted"], 2)
+        self.assertEqual(stats["vn_ward"]["inserted"], 2)
+        ward = self.env["vn.ward"].search([("code", "=", "T10101")])
+        self.assertEqual(ward.district_id.code, "T101")
+        self.assertEqual(ward.province_id.code, "T01")
+        self.assertEqual(ward.path_search, "xa mot, huyen mot, tinh mot")
+
+        # the same dataset again changes nothing
+        stats = self._load()
+        for level in stats.values():
+            self.assertEqual((level["inserted"], level["updated"]), (0, 0))
+
+        # an administrative change moves the ward to another district
+        self.wards["T10101"]["parent_code"] = "T201"
+        stats = self._load()
+        self.assertEqual(
+            (stats["vn_ward"]["inserted"], stats["vn_ward"]["updated"]), (0, 1),
+        )
+        ward.invalidate_cache()
+        self.assertEqual(ward.district_id.code, "T201")
+        self.assertEqual(ward.province_id.code, "T02")
+
+    def test_orphans_and_incomplete_entries_are_skipped(self):
+        self.wards["T99901"] = _entry("T99901", "Xa Mo Coi", "T999")
+        self.wards["T10103"] = {"code": "T10103", "parent_code": "T101"}
+        stats = self._load()
+        self.assertEqual(stats["vn_ward"]["inserted"], 2)
+        self.assertEqual(stats["vn_ward"]["skipped"], 2)
+        self.assertFalse(self.env["vn.ward"].search([("code", "in", ["T99901", "T10103"])]))
+
+    def test_iter_json_object_reads_across_chunks(self):
+        data = {
+            "a": 12345678,
+            "b": [1, 2.5, {"c": "dấu , : } chuỗi"}],
+            "d": None,
+            "e": "x" * 50,
+        }
+        path = os.path.join(self.data_dir, "object.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False, indent=2)
+        for chunk_size in (1, 3, 7, 1 << 16):
+            self.assertEqual(
+                list(hooks._iter_json_object(path, chunk_size=chunk_size)),
+                list(data.items()),
+            )
+
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(" { } ")
+        self.assertEqual(list(hooks._iter_json_object(path, chunk_size=2)), [])
+
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write('["not", "an object"]')
+        with self.assertRaises(json.JSONDecodeError):
+            list(hooks._iter_json_object(path))
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import os
+import pickle
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+from ..utils import address_matcher
+
+PROVINCES = [
+    {"id": 1, "name": "Hà Nội", "name_with_type": "Thành phố Hà Nội",
+     "slug": "ha-noi", "type": "thanh-pho"},
+]
+DISTRICTS = [
+    {"id": 10, "name": "Ba Đình", "name_with_type": "Quận Ba Đình",
+     "slug": "ba-dinh", "type": "quan", "province_id": (1, "Thành phố Hà Nội")},
+]
+WARDS = [
+    {"id": 100, "name": "Phúc Xá", "name_with_type": "Phường Phúc Xá",
+     "slug": "phuc-xa", "type": "phuong",
+     "district_id": (10, "Quận Ba Đình"), "province_id": (1, "Thành phố Hà Nội"),
+     "path_with_type": "Phường Phúc Xá, Quận Ba Đình, Thành phố Hà Nội"},
+]
+
+
+@tagged("post_install", "-at_install")
+class TestGazetteerCache(common.TransactionCase):
+
+    def setUp(self):
+        super(TestGazetteerCache, self).setUp()
+        self.snapshot_dir = tempfile.mkdtemp(prefix="vn_gazetteer_test_")
+        self.addCleanup(shutil.rmtree, self.snapshot_dir, ignore_errors=True)
+        # the next user of the cache rebuilds it from the real data
+        address_matcher.clear_cache()
+        self.addCleanup(address_matcher.clear_cache)
+        patcher = patch.object(
+            address_matcher, "_snapshot_path",
+            side_effect=lambda dbname, version: self._path(version),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.set_param = self.env["ir.config_parameter"].sudo().set_param
+
+    def _path(self, version):
+        return os.path.join(self.snapshot_dir, "gazetteer-%s.pickle" % version)
+
+    def _version(self):
+        return self.env["ir.config_parameter"].sudo().get_param(
+            address_matcher.GAZETTEER_VERSION_PARAM,
+        )
+
+    def _ensure_cache(self):
+        """Load the cache; returns the number of reads of the address tables."""
+        with patch.object(
+            address_matcher, "_load_gazetteer_rows",
+            return_value=(PROVINCES, DISTRICTS, WARDS),
+        ) as load_rows:
+            address_matcher._ensure_cache(self.env)
+        return load_rows.call_count
+
+    def _write_snapshot(self, version, **payload):
+        payload = dict({
+            "format": address_matcher.SNAPSHOT_FORMAT,
+            "version": version,
+            "provinces": [], "districts": [], "wards": [],
+        }, **payload)
+        with open(self._path(version), "wb") as fh:
+            pickle.dump(payload, fh)
+
+    def test_data_changes_stamp_a_new_version(self):
+        province = self.env["vn.province"].create({"name": "Tỉnh Thử", "code": "T99"})
+        created = self._version()
+        self.assertTrue(created)
+
+        province.write({"slug": "tinh-thu"})
+        written = self._version()
+        self.assertNotEqual(written, created)
+
+        self.env["vn.province"].browse().write({"slug": "none"})
+        self.assertEqual(self._version(), written)
+
+        province.unlink()
+        self.assertNotIn(self._version(), (created, written))
+
+    def test_snapshot_is_shared_and_follows_the_version(self):
+        self.set_param(address_matcher.GAZETTEER_VERSION_PARAM, "v1")
+        self.assertEqual(self._ensure_cache(), 1)
+        self.assertEqual(address_matcher._CACHE["version"], "v1")
+        self.assertTrue(os.path.exists(self._path("v1")))
+        wards = address_matcher._CACHE["wards"]
+        self.assertEqual(wards[0].path_normalized, "phuong phuc xa, quan ba dinh, thanh pho ha noi")
+
+        # same version: the cache in memory is kept
+        self.assertEqual(self._ensure_cache(), 0)
+
+        # another worker (empty cache) loads the snapshot instead of the tables
+        address_matcher.clear_cache()
+        self.assertEqual(self._ensure_cache(), 0)
+        self.assertEqual(address_matcher._CACHE["wards"], wards)
+        self.assertEqual(
+            address_matcher._CACHE["districts_by_province"][1][0].name, "Quận Ba Đình",
+        )
+
+        # a data change: rebuilt once, the old snapshot is removed
+        self.set_param(address_matcher.GAZETTEER_VERSION_PARAM, "v2")
+        self.assertEqual(self._ensure_cache(), 1)
+        self.assertEqual(address_matcher._CACHE["version"], "v2")
+        self.assertEqual(os.listdir(self.snapshot_dir), ["gazetteer-v2.pickle"])
+
+    @mute_logger("odoo.addons.ntp_address_lookup.utils.address_matcher")
+    def test_stale_or_unreadable_snapshots_are_rebuilt(self):
+        self._write_snapshot("v3", format=address_matcher.SNAPSHOT_FORMAT + 1)
+        self.assertFalse(address_matcher._load_snapshot(self._path("v3"), "v3"))
+
+        self._write_snapshot("v3", version="v2")
+        self.assertFalse(address_matcher._load_snapshot(self._path("v3"), "v3"))
+
+        with open(self._path("v3"), "wb") as fh:
+            fh.write(b"not a pickle")
+        self.assertFalse(address_matcher._load_snapshot(self._path("v3"), "v3"))
+        self.assertFalse(address_matcher._load_snapshot(self._path("missing"), "missing"))
+        self.assertFalse(address_matcher._CACHE["built"])
+
+        # the unusable snapshot is replaced by a good one
+        self.set_param(address_matcher.GAZETTEER_VERSION_PARAM, "v3")
+        self.assertEqual(self._ensure_cache(), 1)
+        address_matcher.clear_cache()
+        self.assertTrue(address_matcher._load_snapshot(self._path("v3"), "v3"))
+        self.assertEqual(len(address_matcher._CACHE["wards"]), 1)
@@ -2,4 +2,6 @@
 
 from . import normalize
 from . import address_matcher
+from . import address_backfill
+from . import address_autocomplete
 from . import ai_address_suggest
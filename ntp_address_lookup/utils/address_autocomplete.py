@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Ward Address Autocomplete
+=========================
+Serves vn.ward.search_address_autocomplete from an in-memory token index
+over the diacritic-normalized ward paths of the address matcher cache
+("phuong phuc xa, quan ba dinh, thanh pho ha noi"), so unaccented input
+matches and a keystroke costs a few set operations instead of SQL ILIKEs.
+
+- every query word is a prefix: it matches the wards having a path token
+  starting with it (sorted vocabulary + bisect)
+- wards are ranked by token coverage (query words matched), then by words
+  found in the ward name itself, then by words matching a whole token, then
+  by shorter path
+- the index is built on first use from the cached wards and dropped with
+  the cache, so it follows the address data version
+
+No Odoo import; the index is built from address_matcher._CACHE.
+"""
+
+import bisect
+import heapq
+import re
+from collections import Counter
+from itertools import islice
+
+from . import address_matcher
+from .normalize import normalize_string
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Prefix -> matching ward positions, cached per index (repeated keystrokes)
+PREFIX_CACHE_SIZE = 2048
+# Words matching more than 1/SELECTIVE_RATIO of the wards do not bring in
+# partial matches on their own
+SELECTIVE_RATIO = 20
+# Only the RANK_SORT_MAX shortest paths of a larger coverage tier are ranked
+RANK_SORT_MAX = 300
+
+
+def query_words(query):
+    """Normalized query words worth matching (2+ chars, or digits as in "quan 1")."""
+    return [
+        word for word in _TOKEN_RE.findall(normalize_string(query or "").lower())
+        if len(word) >= 2 or word.isdigit()
+    ]
+
+
+class _TokenPostings:
+    """Token -> positions, with prefix lookup over the sorted vocabulary."""
+
+    def __init__(self, texts):
+        postings = {}
+        for pos, text in enumerate(texts):
+            for token in set(_TOKEN_RE.findall(text)):
+                postings.setdefault(token, []).append(pos)
+        self.vocabulary = sorted(postings)
+        self.postings = {token: frozenset(ids) for token, ids in postings.items()}
+        self._prefix_cache = {}
+
+    def exact(self, token):
+        return self.postings.get(token, frozenset())
+
+    def prefix(self, prefix):
+        positions = self._prefix_cache.get(prefix)
+        if positions is None:
+            start = bisect.bisect_left(self.vocabulary, prefix)
+            end = bisect.bisect_left(self.vocabulary, prefix + "\uffff", start)
+            positions = frozenset().union(
+                *(self.postings[token] for token in self.vocabulary[start:end])
+            )
+            if len(self._prefix_cache) >= PREFIX_CACHE_SIZE:
+                self._prefix_cache.clear()
+            self._prefix_cache[prefix] = positions
+        return positions
+
+
+class AutocompleteIndex:
+    """Token index over a list of WardEntry."""
+
+    def __init__(self, wards, districts, provinces):
+        self.wards = wards
+        self.district_by_id = {entry.id: entry for entry in districts}
+        self.province_by_id = {entry.id: entry for entry in provinces}
+        self.paths = _TokenPostings(ward.path_normalized for ward in wards)
+        self.names = _TokenPostings(ward.name_normalized for ward in wards)
+        # positions in (path length, position) order, and the rank of each
+        self.by_length = sorted(
+            range(len(wards)), key=lambda pos: (len(wards[pos].path_normalized), pos),
+        )
+        self.length_rank = [0] * len(wards)
+        for rank, pos in enumerate(self.by_length):
+            self.length_rank[pos] = rank
+
+    def search(self, words, limit=10):
+        """Positions of the best wards for the normalized query words."""
+        if not words:
+            return []
+        matched = [self.paths.prefix(word) for word in words]
+
+        # Coverage tiers: wards matching every word first; wards matching
+        # only some words complete the result when there are too few. Those
+        # are taken from the selective words only: a word such as "phuong"
+        # or "ha" alone is no useful suggestion.
+        full = frozenset.intersection(*sorted(matched, key=len))
+        result = self._rank_tier(full, words, limit)
+        if len(result) >= limit or len(words) == 1:
+            return result
+
+        candidates = frozenset().union(*(
+            positions for positions in matched
+            if len(positions) <= len(self.wards) // SELECTIVE_RATIO
+        )) - full
+        coverage = Counter()
+        for positions in matched:
+            coverage.update(candidates & positions)
+        for count in sorted(set(coverage.values()), reverse=True):
+            tier = [pos for pos, pos_count in coverage.items() if pos_count == count]
+            result += self._rank_tier(tier, words, limit - len(result))
+            if len(result) >= limit:
+                break
+        return result
+
+    def _rank_tier(self, positions, words, limit):
+        """Best positions of one coverage tier: most words found in the ward
+        name, then most words matching a whole token, then shortest path.
+
+        Only the RANK_SORT_MAX shortest paths of a larger tier are ranked.
+        """
+        if len(positions) > RANK_SORT_MAX:
+            # shortest paths of a large tier (C-level filter, early exit)
+            positions = frozenset(positions)
+            positions = list(islice(
+                filter(positions.__contains__, self.by_length), RANK_SORT_MAX,
+            ))
+        tier = frozenset(positions)
+        name_hits = Counter()
+        exact_hits = Counter()
+        for word in words:
+            name_hits.update(tier & self.names.prefix(word))
+            exact_hits.update(tier & self.paths.exact(word))
+        return heapq.nsmallest(limit, tier, key=lambda pos: (
+            -name_hits[pos], -exact_hits[pos], self.length_rank[pos],
+        ))
+
+    def result(self, pos):
+        """Result dict of a ward position (format of search_address_autocomplete)."""
+        ward = self.wards[pos]
+        district = self.district_by_id.get(ward.district_id)
+        province = self.province_by_id.get(ward.province_id)
+        return {
+            "ward_id": ward.id,
+            "district_id": ward.district_id or False,
+            "province_id": ward.province_id or False,
+            "display": ward.path_with_type,
+            "ward_name": ward.name,
+            "district_name": district.name if district else "",
+            "province_name": province.name if province else "",
+        }
+
+
+def get_index():
+    """Autocomplete index of the current address matcher cache (built once)."""
+    cache = address_matcher._CACHE
+    index = cache["autocomplete_index"]
+    if index is None:
+        index = AutocompleteIndex(cache["wards"], cache["districts"], cache["provinces"])
+        cache["autocomplete_index"] = index
+    return index
+
+
+def search(query, limit=10):
+    """Autocomplete results for query from the cached gazetteer.
+
+    The address matcher cache must be loaded (address_matcher._ensure_cache).
+    """
+    index = get_index()
+    return [index.result(pos) for pos in index.search(query_words(query), limit)]
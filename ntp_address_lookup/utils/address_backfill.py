@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Batch Address Matching Pool
+===========================
+Runs the address matcher over many partner address rows, spread across a
+pool of worker processes. The matcher is pure Python (CPU bound), so
+threads would serialize on the GIL.
+
+Workers are forked from the Odoo process and start with its gazetteer
+cache; a worker holding another data version loads the gazetteer snapshot
+of the pool version instead (see address_matcher._ensure_cache). Workers
+never touch the database: they receive (partner_id, street, street2, city)
+tuples and return the best match of each.
+
+With processes <= 1, without fork support or for small batches, rows are
+matched in the calling process.
+"""
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from . import address_matcher
+
+logger = logging.getLogger(__name__)
+
+# Below this many rows a batch is matched in-process (pool overhead)
+POOL_MIN_ROWS = 200
+
+
+def _init_worker(snapshot_path, version):
+    cache = address_matcher._CACHE
+    if not (cache["built"] and cache["version"] == version):
+        if not address_matcher._load_snapshot(snapshot_path, version):
+            raise RuntimeError(
+                "Address matcher snapshot %s unavailable" % snapshot_path
+            )
+
+
+def match_rows(rows):
+    """Match address rows against the cached gazetteer.
+
+    Args:
+        rows: list of (partner_id, street, street2, city) tuples.
+
+    Returns:
+        list of (partner_id, best result dict or None, error message or None)
+    """
+    matches = []
+    for partner_id, street, street2, city in rows:
+        try:
+            parsed = address_matcher._parse_address(
+                street or "", street2 or "", city or "",
+            )
+            results = address_matcher._rank_matches(parsed) if parsed else []
+            matches.append((partner_id, results[0] if results else None, None))
+        except Exception as e:
+            matches.append((partner_id, None, str(e)[:200]))
+    return matches
+
+
+class MatchPool:
+    """Process pool matching batches of address rows.
+
+    Usage:
+        address_matcher._ensure_cache(env)
+        with MatchPool(snapshot_path, version, processes=4) as pool:
+            pending = pool.submit(rows)
+            ...  # read the next batch meanwhile
+            matches = pool.collect(pending)
+    """
+
+    def __init__(self, snapshot_path, version, processes):
+        self.processes = processes
+        self._executor = None
+        if processes > 1 and "fork" in multiprocessing.get_all_start_methods():
+            self._executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(snapshot_path, version),
+            )
+        _init_worker(snapshot_path, version)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def submit(self, rows):
+        """Start matching rows; returns a handle for collect()."""
+        if not self._executor or len(rows) < POOL_MIN_ROWS:
+            return [match_rows(rows)]
+        size = -(-len(rows) // self.processes)
+        return [
+            self._executor.submit(match_rows, rows[start:start + size])
+            for start in range(0, len(rows), size)
+        ]
+
+    def collect(self, pending):
+        """Wait for a submitted batch; returns match_rows() results in row order."""
+        matches = []
+        for part in pending:
+            matches.extend(part if isinstance(part, list) else part.result())
+        return matches
@@ -15,9 +15,20 @@ class AddressBatchWizard(models.TransientModel):
     state = fields.Selection([
         ("draft", "Ready"),
         ("done", "Review Results"),
+        ("applied", "Applied"),
     ], default="draft")
 
     partner_count = fields.Integer("Partners to Process", readonly=True)
+    apply_directly = fields.Boolean(
+        "Apply Matches Directly",
+        help="Write the confident matches (>= 85%) right away without review "
+             "lines. Use for large selections.",
+    )
+    dry_run = fields.Boolean(
+        "Dry Run",
+        help="Only count what would be applied, write nothing.",
+    )
+    result_summary = fields.Text("Summary", readonly=True)
     line_ids = fields.One2many(
         "address.batch.wizard.line", "wizard_id", "Results",
     )
@@ -44,100 +55,47 @@ class AddressBatchWizard(models.TransientModel):
         if not partner_ids:
             raise UserError(_("No partners selected."))
 
-        partners = self.env["res.partner"].browse(partner_ids)
         logger.info(
             "Batch address auto-detect started for %d partners",
-            len(partners),
+            len(partner_ids),
         )
+        if self.apply_directly:
+            return self._process_apply_directly(partner_ids)
 
-        from ..utils.address_matcher import auto_detect_address
-
-        lines = []
+        Line = self.env["address.batch.wizard.line"]
         processed = 0
-        for partner in partners:
-            processed += 1
-
-            # Skip partners that already have verified addresses
-            if partner.x_province_id and partner.x_address_verified:
-                lines.append((0, 0, {
-                    "partner_id": partner.id,
-                    "status": "skipped",
-                    "current_address": self._build_current_address(partner),
-                    "suggested_display": _("Already verified"),
-                }))
-                continue
-
-            # Skip partners with no address data
-            raw = " ".join(filter(None, [
-                partner.street, partner.street2, partner.city,
-            ])).strip()
-            if not raw:
-                lines.append((0, 0, {
-                    "partner_id": partner.id,
-                    "status": "unmatched",
-                    "current_address": "",
-                    "suggested_display": _("No address data"),
-                }))
-                continue
-
-            try:
-                results = auto_detect_address(
-                    partner.street or "",
-                    partner.street2 or "",
-                    partner.city or "",
-                    self.env,
-                )
-            except Exception as e:
-                logger.error(
-                    "Batch auto-detect error for partner [%s] %s: %s",
-                    partner.id, partner.name, e,
-                )
-                lines.append((0, 0, {
-                    "partner_id": partner.id,
-                    "status": "unmatched",
-                    "current_address": self._build_current_address(partner),
-                    "suggested_display": _("Error: %s") % str(e)[:100],
-                }))
-                continue
-
-            if results and results[0]["confidence"] >= 0.85:
-                best = results[0]
-                lines.append((0, 0, {
-                    "partner_id": partner.id,
-                    "status": "matched",
-                    "province_id": best["province_id"] or False,
-                    "district_id": best["district_id"] or False,
-                    "ward_id": best["ward_id"] or False,
-                    "confidence": round(best["confidence"] * 100, 1),
-                    "current_address": self._build_current_address(partner),
-                    "suggested_display": best["display"],
-                    "apply": True,
-                }))
-            elif results:
-                best = results[0]
-                lines.append((0, 0, {
-                    "partner_id": partner.id,
-                    "status": "uncertain",
-                    "province_id": best["province_id"] or False,
-                    "district_id": best["district_id"] or False,
-                    "ward_id": best["ward_id"] or False,
-                    "confidence": round(best["confidence"] * 100, 1),
-                    "current_address": self._build_current_address(partner),
-                    "suggested_display": best["display"],
-                    "apply": False,
-                }))
-            else:
-                lines.append((0, 0, {
-                    "partner_id": partner.id,
-                    "status": "unmatched",
-                    "current_address": self._build_current_address(partner),
-                }))
-
-        self.write({"line_ids": lines, "state": "done"})
+        for rows, matches in self.env["address.backfill"]._iter_matches(
+            [("id", "in", partner_ids)],
+        ):
+            Line.create([
+                self._prepare_line_vals(row, matches.get(row["id"]))
+                for row in rows
+            ])
+            processed += len(rows)
+
+        self.state = "done"
         logger.info(
             "Batch auto-detect completed: %d processed", processed,
         )
+        return self._reopen()
 
+    def _process_apply_directly(self, partner_ids):
+        """Write the confident matches without review lines (large selections)."""
+        stats = self.env["address.backfill"].run_backfill(
+            [("id", "in", partner_ids)], dry_run=self.dry_run,
+        )
+        self.write({
+            "state": "applied",
+            "result_summary": _(
+                "%(processed)d partners processed in %(elapsed)ss "
+                "(%(rate)s partners/s): %(matched)d matched, "
+                "%(uncertain)d need review, %(unmatched)d no match, "
+                "%(skipped)d skipped, %(errors)d errors, %(written)d written."
+            ) % stats,
+        })
+        return self._reopen()
+
+    def _reopen(self):
         return {
             "type": "ir.actions.act_window",
             "name": _("Batch Address Auto-detect"),
@@ -147,10 +105,49 @@ class AddressBatchWizard(models.TransientModel):
             "target": "new",
         }
 
-    def _build_current_address(self, partner):
-        """Build current address string for display."""
+    def _prepare_line_vals(self, row, match):
+        """Result line values of a partner row (see address.backfill._iter_matches).
+
+        match is (best result, error), None when the row was not matched.
+        """
+        vals = {
+            "wizard_id": self.id,
+            "partner_id": row["id"],
+            "current_address": self._build_current_address(row),
+        }
+        if match is None:
+            if row["x_province_id"] and row["x_address_verified"]:
+                # Skip partners that already have verified addresses
+                vals.update(status="skipped", suggested_display=_("Already verified"))
+            else:
+                vals.update(status="unmatched", suggested_display=_("No address data"))
+            return vals
+
+        best, error = match
+        if error:
+            logger.error(
+                "Batch auto-detect error for partner [%s] %s: %s",
+                row["id"], row["name"], error,
+            )
+            vals.update(status="unmatched", suggested_display=_("Error: %s") % error[:100])
+        elif best:
+            vals.update({
+                "status": "matched" if best["confidence"] >= 0.85 else "uncertain",
+                "province_id": best["province_id"] or False,
+                "district_id": best["district_id"] or False,
+                "ward_id": best["ward_id"] or False,
+                "confidence": round(best["confidence"] * 100, 1),
+                "suggested_display": best["display"],
+                "apply": best["confidence"] >= 0.85,
+            })
+        else:
+            vals["status"] = "unmatched"
+        return vals
+
+    def _build_current_address(self, row):
+        """Build current address string for display from a partner row."""
         parts = filter(None, [
-            partner.street, partner.street2, partner.city,
+            row["street"], row["street2"], row["city"],
         ])
         return ", ".join(parts)[:200]
 
@@ -164,27 +161,14 @@ class AddressBatchWizard(models.TransientModel):
 
         applied = 0
         errors = 0
-        vn_id = self.env["res.partner"]._get_vn_country_id()
+        state_cache = {}
 
         for line in to_apply:
             try:
-                vals = {
-                    "x_province_id": line.province_id.id,
-                    "x_district_id": line.district_id.id if line.district_id else False,
-                    "x_ward_id": line.ward_id.id if line.ward_id else False,
-                    "x_address_verified": True,
-                    "city": line.province_id.name,
-                }
-                # Match province to state
-                state = self.env["res.country.state"].search(
-                    [("country_id", "=", vn_id),
-                     ("name", "ilike", line.province_id.name)],
-                    limit=1,
+                vals = self.env["res.partner"]._prepare_vn_address_vals(
+                    line.province_id, line.district_id, line.ward_id,
+                    state_cache=state_cache,
                 )
-                if state:
-                    vals["state_id"] = state.id
-                    vals["country_id"] = vn_id
-
                 line.partner_id.write(vals)
                 applied += 1
             except Exception as e:
@@ -52,20 +52,21 @@
 
         - fix string display
 
-        TO DO
-        =====
+        Version 1.8
+        ===========
 
-        - currently cron task get all invoice data from beginning so it is not optimal get, can cause server
-          be slow when many invoices come
-        - need to add 1 more setting to keep track of last date we get invoice,
-          so we only synce from that data only
+        - incremental Bizzi sync: keep the last synchronized updated_at per invoice direction
+          and stop reading pages once invoices are already up to date
+        - full resync button in Settings > Accounting > Tax Invoice, last sync statistics
+        - vendor/company/tax lookups cached per run (ResolutionCache, shared with
+          ntp_invoice_collector through ntp_einvoice_bizzi)
 
     """,
-    "version": "1.7",
+    "version": "1.8",
     "author": "Duy Chu",
     "website": "",
     "description": "",
-    "depends": ["base", "account", "onnet_customer_groups"],
+    "depends": ["base", "account", "onnet_customer_groups", "ntp_einvoice_bizzi"],
     "data": [
         "security/ir.model.access.csv",
         "data/default_config.xml",
@@ -5,3 +5,4 @@ from . import res_config_settings
 from . import res_company
 from . import account_tax
 from . import product_label_in_tax_invoice
+from . import tax_invoice_attachment_download
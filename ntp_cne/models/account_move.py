@@ -37,11 +37,12 @@ class AccountMove(models.Model):
                         rec.is_product_missing = True
                         break
 
-    def button_find_product_from_label(self):
+    def button_find_product_from_label(self, active_labels=None):
         self.ensure_one()
-        active_labels = self.env["product.label.in.tax.invoice"].search(
-            [("status", "=", True)], order="priority desc"
-        )
+        if active_labels is None:
+            active_labels = self.env["product.label.in.tax.invoice"].search(
+                [("status", "=", True)], order="priority desc"
+            )
         for line in self.invoice_line_ids:
             if line.product_id:
                 continue
@@ -1,5 +1,9 @@
+import json
+
 from odoo import models, fields, api
 
+from .tax_invoice import SYNC_INVOICE_IOS, SYNC_LAST_RUN_PARAM
+
 
 class TaxInvoiceConfig(models.TransientModel):
     _inherit = "res.config.settings"
@@ -7,6 +11,7 @@ class TaxInvoiceConfig(models.TransientModel):
     tax_invoice_bizzi_api_url = fields.Char("Bizzi API URL")
     tax_invoice_bizzi_api_key = fields.Char("Bizzi X-API-KEY")
     tax_invoice_bizzi_view_url = fields.Char("Bizzi View URL")
+    tax_invoice_bizzi_last_sync = fields.Text("Bizzi Last Sync", readonly=True)
 
     @api.model
     def get_values(self):
@@ -22,9 +27,45 @@ class TaxInvoiceConfig(models.TransientModel):
             tax_invoice_bizzi_view_url=get_param(
                 "tax_invoice.tax_invoice_bizzi_view_url"
             ),
+            tax_invoice_bizzi_last_sync=self._format_bizzi_last_sync(
+                get_param(SYNC_LAST_RUN_PARAM)
+            ),
         )
         return res
 
+    @api.model
+    def _format_bizzi_last_sync(self, last_run):
+        if not last_run:
+            return False
+        run_stats = json.loads(last_run)
+        lines = [
+            "%s (%s sync, %ss, %s queries)"
+            % (
+                run_stats["date"],
+                run_stats["mode"],
+                run_stats["duration"],
+                run_stats.get("queries", "-"),
+            )
+        ]
+        for invoice_io in SYNC_INVOICE_IOS:
+            stats = run_stats.get(invoice_io)
+            if stats:
+                lines.append(
+                    "%s: %d page(s), %d created, %d updated, %d skipped"
+                    % (
+                        invoice_io,
+                        stats["pages"],
+                        stats["created"],
+                        stats["updated"],
+                        stats["skipped"],
+                    )
+                )
+        return "\n".join(lines)
+
+    def action_tax_invoice_full_resync(self):
+        self.env["tax.invoice"].action_full_resync_tax_invoice()
+        return {"type": "ir.actions.client", "tag": "reload"}
+
     def set_values(self):
         super(TaxInvoiceConfig, self).set_values()
         set_param = self.env["ir.config_parameter"].sudo().set_param
@@ -1,12 +1,95 @@
-import base64
+import hashlib
 import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import pytz
 from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
+from odoo.tools import split_every
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urljoin
 import dateutil.parser
 
+from odoo.addons.ntp_einvoice_bizzi.models.resolution_cache import ResolutionCache
+
+_logger = logging.getLogger(__name__)
+
+# invoice directions synchronized from Bizzi
+SYNC_INVOICE_IOS = ("IN", "UNIDENTIFIED")
+SYNC_PAGE_SIZE = 100
+# highest Bizzi updated_at already synchronized, per invoice direction
+SYNC_WATERMARK_PARAM = "tax_invoice.bizzi_sync_watermark_%s"
+SYNC_LAST_RUN_PARAM = "tax_invoice.bizzi_sync_last_run"
+
+ATTACHMENT_DOWNLOAD_CONCURRENCY = 4
+ATTACHMENT_DOWNLOAD_TIMEOUT = (10, 60)  # connect, read (seconds)
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+
+# auto bill/receipt creation: invoices refreshed from Bizzi and turned into
+# account.move per chunk, committed every AUTO_BILL_COMMIT_CHUNKS chunks
+AUTO_BILL_CHUNK_SIZE = 50
+AUTO_BILL_COMMIT_CHUNKS = 1
+BIZZI_REFRESH_CONCURRENCY = 8
+BIZZI_REQUEST_TIMEOUT = (10, 30)  # connect, read (seconds)
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def _get_http_session():
+    """Shared session (keep-alive, connection pool) for Bizzi requests and downloads"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=max(
+                        ATTACHMENT_DOWNLOAD_CONCURRENCY, BIZZI_REFRESH_CONCURRENCY
+                    ),
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def _fetch_bizzi_invoice(session, url, headers):
+    """
+    GET one Bizzi invoice, returns its data
+
+    Runs in worker threads: no ORM access here.
+    """
+    response = session.get(url, headers=headers, timeout=BIZZI_REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["data"]
+
+
+def _download_to_file(session, url, path):
+    """
+    Stream url into path, returns (path, sha1 checksum, size)
+
+    Runs in worker threads: no ORM access here.
+    """
+    sha = hashlib.sha1()
+    size = 0
+    with session.get(url, stream=True, timeout=ATTACHMENT_DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        with open(path, "wb") as fh:
+            for chunk in response.iter_content(ATTACHMENT_CHUNK_SIZE):
+                sha.update(chunk)
+                fh.write(chunk)
+                size += len(chunk)
+    return path, sha.hexdigest(), size
+
 
 def parse_to_odoo_date(date_hdr):
     parsed_date = dateutil.parser.parse(date_hdr, fuzzy=True)
@@ -58,6 +141,11 @@ class TaxInvoice(models.Model):
     approved_at = fields.Datetime("Approval At")
     approved_by = fields.Char("Approval By")
     is_voided = fields.Boolean("Is Voided")
+    x_updated_at = fields.Datetime(
+        "Bizzi Updated At",
+        copy=False,
+        help="Last update time of the invoice in Bizzi, used by the incremental sync",
+    )
 
     # general info
     invoice_name = fields.Char("Invoice Name")
@@ -78,6 +166,7 @@ class TaxInvoice(models.Model):
         copy=False,
         store=True,
         compute="_compute_state",
+        index=True,
     )
     is_validated = fields.Boolean("Admin Validated", copy=False, default=False)
     #
@@ -122,6 +211,11 @@ class TaxInvoice(models.Model):
 
     name = fields.Char("Invoice Full Name", compute="_compute_invoice_name", store=True)
     tax_invoice_lines = fields.One2many("tax.invoice.line", "tax_invoice_id")
+    attachment_download_ids = fields.One2many(
+        "tax.invoice.attachment.download",
+        "tax_invoice_id",
+        string="Failed Attachment Downloads",
+    )
     is_match_amount_invoice = fields.Boolean(
         "Is Match Amount", compute="_compute_is_match_amount_invoice", store=False
     )
@@ -233,9 +327,11 @@ class TaxInvoice(models.Model):
         return result
 
     def _compute_match_cnt(self):
+        cache = self._new_resolution_cache()
+        cache.preload_partners(self.mapped("seller_tax_code"))
         for rec in self:
-            vendor_match_cnt, _ = rec.get_res_partner(rec.seller_tax_code)
-            company_match_cnt, _ = rec.get_company(rec.buyer_tax_code)
+            vendor_match_cnt, _ = rec.get_res_partner(rec.seller_tax_code, cache)
+            company_match_cnt, _ = rec.get_company(rec.buyer_tax_code, cache)
             rec.vendor_match_cnt = vendor_match_cnt
             rec.company_match_cnt = company_match_cnt
 
@@ -332,7 +428,7 @@ class TaxInvoice(models.Model):
         self.ensure_one()
         return self.env["ir.config_parameter"].sudo().get_param("web.base.url")
 
-    @api.depends("is_validated", "account_move_id")
+    @api.depends("is_validated", "account_move_id", "approval_status")
     def _compute_state(self):
         is_rejected = lambda x: x.approval_status == "REJECTED"
         is_draft = (
@@ -441,25 +537,45 @@ class TaxInvoice(models.Model):
         )
         return date_with_tz
 
-    def _get_vat_ids(self, vat_percentage, raise_exc=True):
-        try:
+    def _get_vat_ids(self, vat_percentage, raise_exc=True, cache=None):
+        """
+        cache: optional ResolutionCache of the current run, so the purchase
+        taxes are loaded once for the whole run
+        """
+        if cache is not None:
+            vat_ids = cache.purchase_tax(vat_percentage)
+        else:
             # TODO: this must be consider to choose correct tax configuration, since it will be affected to accounting system
-            vat_ids = self.env["account.tax"].search(
-                [
-                    ("amount", "=", vat_percentage),
-                    ("price_include", "=", False),
-                    ("type_tax_use", "=", "purchase"),
-                ]
-            )[0]
-            return vat_ids
-        except Exception as e:
-            if raise_exc:
-                raise UserError(
-                    f"Cannot find vat = {vat_percentage} Exclude Price in 'account.tax' configuration"
+            vat_ids = (
+                self.env["account.tax"].search(
+                    [
+                        ("amount", "=", vat_percentage),
+                        ("price_include", "=", False),
+                        ("type_tax_use", "=", "purchase"),
+                    ],
+                    limit=1,
                 )
-            return None
+                or None
+            )
+        if vat_ids is None and raise_exc:
+            raise UserError(
+                f"Cannot find vat = {vat_percentage} Exclude Price in 'account.tax' configuration"
+            )
+        return vat_ids
 
     def _create_bill_or_receipt(self, type):
+        self.ensure_one()
+        move = (
+            self.env["account.move"]
+            .sudo()
+            .create(self._prepare_bill_or_receipt_vals(type))
+            .with_user(self.env.uid)
+        )
+        # auto find product line base on its label which are predefined
+        move.button_find_product_from_label()
+        return move
+
+    def _prepare_bill_or_receipt_vals(self, type, cache=None):
         self.ensure_one()
         default_invoice_date = self.get_strftime_with_user_tz(self.signed_date)
         data_to_create = {
@@ -498,13 +614,13 @@ class TaxInvoice(models.Model):
                 # fmt: off
                 if vat_percentage != vat_percentage_compute:
                     self.insert_log(f"Vat Percentage For {line.item_name} ({vat_percentage}) and  Actual one computed ({vat_percentage_compute}) is different")
-                    if self._get_vat_ids(vat_percentage_compute, False):
+                    if self._get_vat_ids(vat_percentage_compute, False, cache):
                         # re adjust vat to correct compute vat
                         self.insert_log(
                             f"Adjusted Vat When Create Invoice For {line.item_name} to ({vat_percentage_compute})"
                         )
                         vat_percentage = vat_percentage_compute
-                vat_ids = self._get_vat_ids(vat_percentage)
+                vat_ids = self._get_vat_ids(vat_percentage, cache=cache)
                 data_to_create["invoice_line_ids"].append(
                     (0, 0, {
                         "product_id": False, # cannot guess it
@@ -527,13 +643,13 @@ class TaxInvoice(models.Model):
                 self.insert_log(
                     f"Vat Percentage In Invoice ({vat_percentage}) and  Actual one computed ({vat_percentage_compute}) is different"
                 )
-                if self._get_vat_ids(vat_percentage_compute, False):
+                if self._get_vat_ids(vat_percentage_compute, False, cache):
                     # re adjust vat to correct compute vat
                     self.insert_log(
                         f"Adjusted Vat When Create Invoice to ({vat_percentage_compute})"
                     )
                     vat_percentage = vat_percentage_compute
-            vat_ids = self._get_vat_ids(vat_percentage)
+            vat_ids = self._get_vat_ids(vat_percentage, cache=cache)
             total_amount_without_vat = self.total_amount_without_vat
             total_amount_with_vat = self.total_amount_with_vat
             product_id = self.vendor_id.aggregate_product.id
@@ -553,16 +669,7 @@ class TaxInvoice(models.Model):
                     })]
             # fmt: on
             data_to_create["invoice_line_ids"] = invoice_line_ids
-
-        move = (
-            self.env["account.move"]
-            .sudo()
-            .create(data_to_create)
-            .with_user(self.env.uid)
-        )
-        # auto find product line base on its label which are predefined
-        move.button_find_product_from_label()
-        return move
+        return data_to_create
 
     def action_create_bill_or_receipt(self):
         for rec in self:
@@ -649,78 +756,330 @@ class TaxInvoice(models.Model):
         else:
             raise UserError(f"Cannot set '{status}'. Already in this state")
 
-    def sync_tax_invoice_type(self, api_url, api_key, invoice_io="IN"):
+    def sync_tax_invoice_type(
+        self, api_url, api_key, invoice_io="IN", full_resync=False, cache=None
+    ):
+        """
+        Synchronize one invoice direction from Bizzi, most recently updated first
+
+        Incremental mode (default) stops at the first invoice updated before the
+        watermark of the previous run, or after a page where every invoice is
+        already in db with the same updated_at, not after the watermark. Full
+        resync walks every page and processes every invoice again.
+
+        The watermark only moves forward when the run reaches its end, so an
+        interrupted run is picked up again by the next one: the pages it already
+        synchronized are newer than the watermark and are walked through again.
+
+        cache: ResolutionCache shared by the run; the vendors of each page are
+        preloaded in it with one query
+
+        Returns run statistics: pages, fetched, created, updated, skipped.
+        """
+        cache = self._new_resolution_cache() if cache is None else cache
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        watermark_key = SYNC_WATERMARK_PARAM % invoice_io.lower()
+        watermark = None if full_resync else get_param(watermark_key)
+        stats = {"pages": 0, "fetched": 0, "created": 0, "updated": 0, "skipped": 0}
+        max_updated_at = watermark
+
         url = urljoin(api_url, "v1/invoices")
         query_url = {
             "page": 1,
-            "size": 20,
+            "size": SYNC_PAGE_SIZE,
             "invoice_io": invoice_io,  # only get invoice we buy
-            "order_by": "issued_date",
+            "order_by": "updated_at",
             "order_direction": "desc",
             "includes": "items,attachments,validations",
         }
         headers = {"accept": "application/json", "X-API-KEY": api_key}
-        has_next_data = True
-        while has_next_data:
+        completed = False
+        while url:
             response = requests.get(url, params=query_url, headers=headers)
-            if response.status_code == 200:
-                tax_invoices_data = response.json()
-                for tax_invoice in tax_invoices_data["data"]:
-                    self.create_from_dict(tax_invoice)
-                if tax_invoices_data["pagination"]["next"]:
-                    url = urljoin(api_url, tax_invoices_data["pagination"]["next"])
-                    query_url = {}
-                else:
-                    has_next_data = False
+            if response.status_code != 200:
+                _logger.warning(
+                    "Bizzi sync %s: page %s returned HTTP %s, watermark kept at %s",
+                    invoice_io, stats["pages"] + 1, response.status_code, watermark,
+                )
+                break
+            tax_invoices_data = response.json()
+            page = tax_invoices_data["data"]
+            stats["pages"] += 1
+            stats["fetched"] += len(page)
+
+            # one query for the known invoices of the page
+            known = {
+                (ti["invoice_id"], ti["x_company_id"]): ti["x_updated_at"]
+                for ti in self.with_context(active_test=False).search_read(
+                    [("invoice_id", "in", [data["invoice_id"] for data in page])],
+                    ["invoice_id", "x_company_id", "x_updated_at"],
+                )
+            }
+            # vendors are only looked up for new invoices
+            cache.preload_partners(
+                [
+                    data["seller_tax_code"]
+                    for data in page
+                    if (data["invoice_id"], data["company_id"]) not in known
+                ]
+            )
+            reached_watermark = False
+            page_skipped = 0
+            # a page newer than the watermark may be left from an interrupted run
+            page_after_watermark = False
+            attachment_jobs = []
+            for tax_invoice in page:
+                updated_at = (
+                    parse_to_odoo_date(tax_invoice["updated_at"])
+                    if tax_invoice.get("updated_at")
+                    else None
+                )
+                if watermark and updated_at and updated_at < watermark:
+                    reached_watermark = True
+                    break
+                if not (watermark and updated_at and updated_at <= watermark):
+                    page_after_watermark = True
+                if updated_at and (not max_updated_at or updated_at > max_updated_at):
+                    max_updated_at = updated_at
+                key = (tax_invoice["invoice_id"], tax_invoice["company_id"])
+                if (
+                    not full_resync
+                    and updated_at
+                    and key in known
+                    and fields.Datetime.to_string(known[key]) == updated_at
+                ):
+                    page_skipped += 1
+                    continue
+                rec = self.create_from_dict(
+                    tax_invoice, fetch_attachments=False, cache=cache
+                )
+                attachment_jobs.append((rec, tax_invoice["attachments"]))
+                stats["updated" if key in known else "created"] += 1
+            stats["skipped"] += page_skipped
+            self._fetch_attachments(attachment_jobs)
+
+            next_page = tax_invoices_data["pagination"]["next"]
+            if (
+                reached_watermark
+                or not next_page
+                or (
+                    not full_resync
+                    and page
+                    and page_skipped == len(page)
+                    and not page_after_watermark
+                )
+            ):
+                completed = True
+                break
+            url = urljoin(api_url, next_page)
+            query_url = {}
+
+        if completed and max_updated_at and max_updated_at != watermark:
+            self.env["ir.config_parameter"].sudo().set_param(watermark_key, max_updated_at)
+        return stats
 
     def auto_create_bill_receipt(self):
         self.ensure_one()
         if not self.auto_created_account_move_id:
-            vendor = self.vendor_id
-            created_id = False
-            if vendor.auto_create_invoice_type == "bill":
-                move = self._create_bill_or_receipt("in_invoice")
-                created_id = move.id
-            elif vendor.auto_create_invoice_type == "receipt":
-                move = self._create_bill_or_receipt("in_receipt")
-                created_id = move.id
-            else:
-                raise ValueError(
-                    f"Not support create {vendor.auto_create_invoice_type}"
-                )
-            self.auto_created_account_move_id = created_id
-        else:
-            try:
-                self.env["account.move"].browse(self.auto_created_account_move_id).state
-            except Exception as e:
-                # schedule it for next run
-                self.auto_created_account_move_id = False
+            self._auto_create_moves()
+        elif not self.env["account.move"].browse(self.auto_created_account_move_id).exists():
+            # schedule it for next run
+            self.auto_created_account_move_id = False
+
+    def _get_auto_create_move_type(self):
+        self.ensure_one()
+        vendor = self.vendor_id
+        if vendor.auto_create_invoice_type == "bill":
+            return "in_invoice"
+        elif vendor.auto_create_invoice_type == "receipt":
+            return "in_receipt"
+        raise ValueError(f"Not support create {vendor.auto_create_invoice_type}")
+
+    def _auto_create_moves(self, cache=None, active_labels=None):
+        """
+        Create the bill/receipt of every tax invoice of self in one create
+
+        If the batch fails, the invoices are created one by one under their own
+        savepoint so one bad invoice (e.g. missing tax configuration) does not
+        block the others. Returns the number of bills/receipts created.
+        """
+        cache = self._new_resolution_cache() if cache is None else cache
+        if active_labels is None:
+            active_labels = self.env["product.label.in.tax.invoice"].search(
+                [("status", "=", True)], order="priority desc"
+            )
+        AccountMove = self.env["account.move"].sudo()
+        try:
+            with self.env.cr.savepoint():
+                vals_list = [
+                    rec._prepare_bill_or_receipt_vals(
+                        rec._get_auto_create_move_type(), cache
+                    )
+                    for rec in self
+                ]
+                moves = AccountMove.create(vals_list)
+        except Exception:
+            if len(self) == 1:
+                raise
+            created = 0
+            for rec in self:
+                try:
+                    with self.env.cr.savepoint():
+                        created += rec._auto_create_moves(cache, active_labels)
+                except Exception as e:
+                    _logger.warning(
+                        "Cannot auto create bill/receipt for tax invoice %s: %s",
+                        rec.name, e,
+                    )
+            return created
+        for rec, move in zip(self, moves):
+            rec.auto_created_account_move_id = move.id
+            # auto find product line base on its label which are predefined
+            move.with_user(self.env.uid).button_find_product_from_label(active_labels)
+        return len(moves)
 
     @api.model
-    def _auto_create_bill_receipts(self):
-        tax_invoices = self.search([("vendor_id", "!=", False)]).filtered(
-            lambda x: x.state == "draft" and x.vendor_id.auto_create_invoice_enable
+    def _auto_create_bill_receipt_domain(self):
+        return [
+            ("state", "=", "draft"),
+            # never set (NULL) or reset to 0 after its move was deleted
+            ("auto_created_account_move_id", "in", [0, False]),
+            ("vendor_id.auto_create_invoice_enable", "=", True),
+        ]
+
+    @api.model
+    def _reset_missing_auto_created_moves(self):
+        """Forget the auto created bills/receipts deleted since, to create them again"""
+        self.env.cr.execute(
+            """
+            SELECT ti.id
+              FROM tax_invoice ti
+         LEFT JOIN account_move am ON am.id = ti.auto_created_account_move_id
+             WHERE ti.state = 'draft'
+               AND ti.auto_created_account_move_id != 0
+               AND am.id IS NULL
+            """
+        )
+        missing = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if missing:
+            missing.write({"auto_created_account_move_id": False})
+
+    def _refresh_from_bizzi(self, cache=None):
+        """
+        Refresh self from Bizzi before creating their bills/receipts
+
+        The GET requests run in parallel, the records are updated afterwards
+        in the current thread.
+        """
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        api_url = get_param("tax_invoice.tax_invoice_bizzi_api_url")
+        api_key = get_param("tax_invoice.tax_invoice_bizzi_api_key")
+        headers = {"accept": "application/json", "X-API-KEY": api_key}
+        session = _get_http_session()
+        attachment_jobs = []
+        with ThreadPoolExecutor(
+            max_workers=BIZZI_REFRESH_CONCURRENCY,
+            thread_name_prefix="tax_invoice_refresh",
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _fetch_bizzi_invoice,
+                    session,
+                    urljoin(api_url, f"v1/invoices/{rec.invoice_id}"),
+                    headers,
+                ): rec
+                for rec in self
+            }
+            for future in as_completed(futures):
+                rec = futures[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    _logger.warning(
+                        "Cannot refresh tax invoice %s from Bizzi: %s", rec.name, e
+                    )
+                    continue
+                rec.create_from_dict(data, fetch_attachments=False, cache=cache)
+                attachment_jobs.append((rec, data["attachments"]))
+        self._fetch_attachments(attachment_jobs)
+
+    @api.model
+    def _auto_create_bill_receipts(
+        self, chunk_size=AUTO_BILL_CHUNK_SIZE, commit_chunks=AUTO_BILL_COMMIT_CHUNKS
+    ):
+        """
+        Auto create the bills/receipts of draft tax invoices, chunk by chunk
+
+        Each chunk is refreshed from Bizzi in parallel, then the invoices still
+        in draft get their bills/receipts in one batch. The work is committed
+        every commit_chunks chunks, so a long run does not hold one big
+        transaction and a crash only loses the chunks since the last commit.
+        """
+        self._reset_missing_auto_created_moves()
+        candidates = self.search(self._auto_create_bill_receipt_domain(), order="id")
+        cache = self._new_resolution_cache()
+        active_labels = self.env["product.label.in.tax.invoice"].search(
+            [("status", "=", True)], order="priority desc"
+        )
+        created = 0
+        for index, chunk in enumerate(split_every(chunk_size, candidates.ids, self.browse)):
+            chunk._refresh_from_bizzi(cache)
+            # the refresh may have rejected or linked some of them
+            chunk = chunk.filtered(lambda x: x.state == "draft")
+            if chunk:
+                created += chunk._auto_create_moves(cache, active_labels)
+            if (index + 1) % commit_chunks == 0 and not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+        _logger.info(
+            "Auto created %d bill/receipt(s) for %d tax invoice(s), lookup cache %s",
+            created, len(candidates), cache.stats,
         )
-        for ti in tax_invoices:
-            ti.action_sync_single()
-            ti.auto_create_bill_receipt()
         return True
 
     @api.model
-    def sync_tax_invoice(self, *arg):
+    def sync_tax_invoice(self, *arg, full_resync=False):
         get_param = self.env["ir.config_parameter"].sudo().get_param
         api_url = get_param("tax_invoice.tax_invoice_bizzi_api_url")
         api_key = get_param("tax_invoice.tax_invoice_bizzi_api_key")
+        run_stats = {"mode": "full" if full_resync else "incremental"}
+        start = time.time()
+        start_queries = self.env.cr.sql_log_count
         # use odoobot when sync up
-        self.with_user(1).sync_tax_invoice_type(
-            api_url=api_url, api_key=api_key, invoice_io="IN"
+        sync_model = self.with_user(1)
+        cache = sync_model._new_resolution_cache()
+        for invoice_io in SYNC_INVOICE_IOS:
+            stats = sync_model.sync_tax_invoice_type(
+                api_url=api_url,
+                api_key=api_key,
+                invoice_io=invoice_io,
+                full_resync=full_resync,
+                cache=cache,
+            )
+            run_stats[invoice_io] = stats
+            _logger.info(
+                "Bizzi %s sync %s: %d page(s), %d fetched, %d created, %d updated, %d skipped",
+                run_stats["mode"], invoice_io, stats["pages"], stats["fetched"],
+                stats["created"], stats["updated"], stats["skipped"],
+            )
+        run_stats["duration"] = round(time.time() - start, 2)
+        run_stats["queries"] = self.env.cr.sql_log_count - start_queries
+        run_stats["lookups"] = cache.stats
+        _logger.info(
+            "Bizzi %s sync: %d SQL queries, lookup cache %s",
+            run_stats["mode"], run_stats["queries"], cache.stats,
         )
-        self.with_user(1).sync_tax_invoice_type(
-            api_url=api_url, api_key=api_key, invoice_io="UNIDENTIFIED"
+        run_stats["date"] = fields.Datetime.to_string(fields.Datetime.now())
+        self.env["ir.config_parameter"].sudo().set_param(
+            SYNC_LAST_RUN_PARAM, json.dumps(run_stats)
         )
         res = {"type": "ir.actions.client", "tag": "reload"}
         return res
 
+    @api.model
+    def action_full_resync_tax_invoice(self):
+        """Re-read every invoice from Bizzi, ignoring the incremental watermark"""
+        return self.sync_tax_invoice(full_resync=True)
+
 #     def action_request_verify_invoice(self):
 #         get_param = self.env["ir.config_parameter"].sudo().get_param
 #         api_url = get_param("tax_invoice.tax_invoice_bizzi_api_url")
@@ -750,7 +1109,19 @@ class TaxInvoice(models.Model):
             invoice_data = response.json()["data"]
             self.create_from_dict(invoice_data)
 
-    def get_res_partner(self, vat):
+    @api.model
+    def _new_resolution_cache(self):
+        """Partner/company/tax lookups shared by one sync or creation run"""
+        return ResolutionCache(
+            self.env,
+            partner_domain=["|", ("is_company", "=", True), ("company_group", "=", True)],
+            match_sub_vat=True,
+        )
+
+    def get_res_partner(self, vat, cache=None):
+        if cache is not None:
+            partner = cache.partners(vat)
+            return (len(partner), partner) if partner else (0, None)
         # exact vat number
         partner = self.env["res.partner"].search(
             [
@@ -779,7 +1150,10 @@ class TaxInvoice(models.Model):
         # need to add new ?
         raise ValueError(f"vat number {vat} has no record in db")
 
-    def get_company(self, vat):
+    def get_company(self, vat, cache=None):
+        if cache is not None:
+            company = cache.companies(vat)
+            return (len(company), company) if company else (0, None)
         # exact vat number
         company = self.env["res.company"].search([("vat", "=", vat)])
         if company:
@@ -792,7 +1166,7 @@ class TaxInvoice(models.Model):
         # need to add new ?
         raise ValueError(f"vat number {vat} has no record in db")
 
-    def create_from_dict(self, data):
+    def create_from_dict(self, data, fetch_attachments=True, cache=None):
         """
         Step by step
 
@@ -804,6 +1178,11 @@ class TaxInvoice(models.Model):
 
         Note that we will only process IN invoice which mean invoice we pay to vendors
         not invoice we sale
+
+        With fetch_attachments=False, the caller downloads the attachments itself
+        (see _fetch_attachments) so a whole page is downloaded in one go
+
+        cache: ResolutionCache of the sync run for the vendor/company lookups
         """
 
         invoice_id = data["invoice_id"]
@@ -853,8 +1232,8 @@ class TaxInvoice(models.Model):
             rec = tax_invoices_in_db[0]
         else:
             # check seller and buyer existed
-            vendor_match_cnt, vendor_id = self.get_res_partner(vat=seller_tax_code)
-            company_match_cnt, company_id = self.get_company(vat=buyer_tax_code)
+            vendor_match_cnt, vendor_id = self.get_res_partner(seller_tax_code, cache)
+            company_match_cnt, company_id = self.get_company(buyer_tax_code, cache)
             # currency should always available
             currency_id = None
             try:
@@ -919,6 +1298,9 @@ class TaxInvoice(models.Model):
                 "approved_by": approved_by,
                 "issued_date": issued_date,
                 "name": name,
+                "x_updated_at": parse_to_odoo_date(data["updated_at"])
+                if data.get("updated_at")
+                else False,
             }
         )
 
@@ -926,8 +1308,9 @@ class TaxInvoice(models.Model):
             rec.process_invoice_lines(invoice_items)
         if invoice_validations:
             rec.process_validation_info(invoice_validations)
-        rec.process_attachments(attachments)
-        print(data)
+        if fetch_attachments:
+            rec.process_attachments(attachments)
+        return rec
 
     def process_validation_info(self, validations):
         self.ensure_one()
@@ -962,46 +1345,134 @@ class TaxInvoice(models.Model):
 
     def process_attachments(self, attachments):
         self.ensure_one()
+        return self._fetch_attachments([(self, attachments)])
 
-        records_in_db = self.env["ir.attachment"].search(
-            [
-                "&",
-                ["res_id", "=", self.id],
-                ["res_model", "=", self._name],
-            ]
-        )
-        attached_attachments = [attach.name for attach in records_in_db]
-
-        for attachment in attachments:
-            name = attachment["name"]
-            url = attachment["url"]
-            filename = "{}_{}".format(self.id, name)
-            if filename in attached_attachments:
-                continue
+    @api.model
+    def _fetch_attachments(self, jobs):
+        """
+        Download the Bizzi attachments of several tax invoices
+
+        jobs: list of (tax_invoice, [{"name": ..., "url": ...}])
+
+        Files already attached (same file name) are not downloaded again. The
+        downloads run in parallel, each one streamed to a temporary file while
+        its sha1 is computed, then the files are stored in the main thread:
+        a file whose checksum is already attached to this or another tax
+        invoice is attached under its own name by copying that attachment, so
+        the same document is never stored twice and is not downloaded again.
+        Failed downloads are kept in tax.invoice.attachment.download to be
+        retried.
+        """
+        Attachment = self.env["ir.attachment"].sudo()
+        tax_invoice_ids = [tax_invoice.id for tax_invoice, _attachments in jobs]
+        attached = {}  # tax_invoice_id -> (file names, {checksum: attachment id})
+        for attach in Attachment.search_read(
+            [("res_model", "=", self._name), ("res_id", "in", tax_invoice_ids)],
+            ["res_id", "name", "checksum"],
+            order="id",
+        ):
+            names, checksums = attached.setdefault(attach["res_id"], (set(), {}))
+            names.add(attach["name"])
+            checksums.setdefault(attach["checksum"], attach["id"])
+
+        to_download = []
+        already_attached = set()
+        for tax_invoice, attachments in jobs:
+            names = attached.get(tax_invoice.id, (set(), {}))[0]
+            for attachment in attachments:
+                key = (tax_invoice.id, attachment["name"])
+                if "{}_{}".format(tax_invoice.id, attachment["name"]) in names:
+                    already_attached.add(key)
+                else:
+                    to_download.append((key, attachment["url"]))
 
+        stats = {"downloaded": 0, "reused": 0, "duplicate": 0, "failed": 0}
+        failures = []
+        done = set(already_attached)
+        if to_download:
+            tmp_dir = tempfile.mkdtemp(prefix="tax_invoice_attachments_")
             try:
-                # if filename.lower().endswith(".pdf"):
-                #     mimetype = "application/x-pdf"
-                # elif filename.lower().endswith(".png"):
-                #     mimetype = "image/png"
-                # elif filename.lower().endswith(".xml"):
-                #     mimetype = "application/xml"
-                # else:
-                #     mimetype = False
-                response = requests.get(url)
-                if response.status_code == 200:
-                    self.env["ir.attachment"].create(
-                        {
-                            "name": filename,
-                            "type": "binary",
-                            "res_id": self.id,
-                            "res_model": "tax.invoice",
-                            "datas": base64.b64encode(response.content),
-                            # "mimetype": mimetype,
-                        }
-                    )
-            except Exception as e:
-                pass
+                session = _get_http_session()
+                downloaded = []
+                with ThreadPoolExecutor(
+                    max_workers=ATTACHMENT_DOWNLOAD_CONCURRENCY,
+                    thread_name_prefix="tax_invoice_attachment",
+                ) as executor:
+                    futures = {
+                        executor.submit(
+                            _download_to_file,
+                            session,
+                            url,
+                            os.path.join(tmp_dir, str(index)),
+                        ): (key, url)
+                        for index, (key, url) in enumerate(to_download)
+                    }
+                    for future in as_completed(futures):
+                        (tax_invoice_id, name), url = futures[future]
+                        try:
+                            path, checksum, _size = future.result()
+                        except Exception as e:
+                            _logger.warning(
+                                "Cannot download attachment %s of tax invoice %s: %s",
+                                name, tax_invoice_id, e,
+                            )
+                            failures.append((tax_invoice_id, name, url, str(e)))
+                            stats["failed"] += 1
+                            continue
+                        done.add((tax_invoice_id, name))
+                        downloaded.append((tax_invoice_id, name, path, checksum))
+
+                # one query for the downloaded files already stored on any tax invoice
+                stored = {}  # checksum -> ir.attachment id
+                if downloaded:
+                    for attach in Attachment.search_read(
+                        [
+                            ("res_model", "=", self._name),
+                            ("checksum", "in", list({d[3] for d in downloaded})),
+                        ],
+                        ["checksum"],
+                        order="id",
+                    ):
+                        stored.setdefault(attach["checksum"], attach["id"])
+                for tax_invoice_id, name, path, checksum in downloaded:
+                    checksums = attached.setdefault(tax_invoice_id, (set(), {}))[1]
+                    vals = {
+                        "name": "{}_{}".format(tax_invoice_id, name),
+                        "res_id": tax_invoice_id,
+                        "res_model": self._name,
+                    }
+                    if checksum in checksums:
+                        # same file under another name: the copy shares its
+                        # storage and records the name for the next runs
+                        Attachment.browse(checksums[checksum]).copy(vals)
+                        stats["duplicate"] += 1
+                        continue
+                    if checksum in stored:
+                        checksums[checksum] = Attachment.browse(stored[checksum]).copy(vals).id
+                        stats["reused"] += 1
+                        continue
+                    vals.update(self._prepare_downloaded_attachment(path))
+                    checksums[checksum] = stored[checksum] = Attachment.create(vals).id
+                    stats["downloaded"] += 1
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        Download = self.env["tax.invoice.attachment.download"].sudo()
+        Download._clear_failures(done)
+        Download._record_failures(failures)
+        return stats
+
+    @api.model
+    def _prepare_downloaded_attachment(self, path):
+        """
+        ir.attachment values storing the downloaded file at path
+
+        The content goes through ``raw`` so the attachment storage (filestore
+        or database, checksum, mimetype, index_content) and its overrides
+        apply. Override to store the file differently.
+        """
+        with open(path, "rb") as fh:
+            return {"type": "binary", "raw": fh.read()}
 
     def process_invoice_lines(self, invoice_items):
         self.ensure_one()
@@ -1036,10 +1507,12 @@ class TaxInvoice(models.Model):
                 matched_items[0].update(vals_to_set)
 
     def auto_match_vendor(self):
+        cache = self._new_resolution_cache()
+        cache.preload_partners(self.filtered(lambda x: not x.vendor_id).mapped("seller_tax_code"))
         for rec in self:
             if not rec.vendor_id:
                 vendor_match_cnt, vendor_id = rec.get_res_partner(
-                    vat=rec.seller_tax_code
+                    rec.seller_tax_code, cache
                 )
                 if vendor_match_cnt == 1:
                     rec.vendor_id = vendor_id[0]
@@ -0,0 +1,100 @@
+from odoo import models, fields, api
+
+# a failed attachment is retried by cron until this many attempts
+MAX_DOWNLOAD_ATTEMPTS = 5
+
+
+class TaxInvoiceAttachmentDownload(models.Model):
+    """Bizzi attachment which could not be downloaded, kept to be retried"""
+
+    _name = "tax.invoice.attachment.download"
+    _description = "Tax Invoice Failed Attachment Download"
+    _order = "last_attempt_date desc"
+
+    _sql_constraints = [
+        (
+            "tax_invoice_name_uniq",
+            "UNIQUE (tax_invoice_id, name)",
+            "An attachment download is tracked once per tax invoice!",
+        )
+    ]
+
+    tax_invoice_id = fields.Many2one(
+        "tax.invoice", "Tax Invoice", required=True, index=True, ondelete="cascade"
+    )
+    name = fields.Char("File Name", required=True)
+    url = fields.Char("URL", required=True)
+    error = fields.Text("Last Error")
+    attempt_count = fields.Integer("Attempts", default=0)
+    last_attempt_date = fields.Datetime("Last Attempt")
+
+    @api.model
+    def _record_failures(self, failures):
+        """Create or update the failed downloads
+
+        failures: list of (tax_invoice_id, name, url, error)
+        """
+        if not failures:
+            return
+        existing = {
+            (rec.tax_invoice_id.id, rec.name): rec
+            for rec in self.search(
+                [("tax_invoice_id", "in", list({f[0] for f in failures}))]
+            )
+        }
+        now = fields.Datetime.now()
+        to_create = []
+        for tax_invoice_id, name, url, error in failures:
+            rec = existing.get((tax_invoice_id, name))
+            if rec:
+                rec.write(
+                    {
+                        "url": url,
+                        "error": error,
+                        "attempt_count": rec.attempt_count + 1,
+                        "last_attempt_date": now,
+                    }
+                )
+            else:
+                to_create.append(
+                    {
+                        "tax_invoice_id": tax_invoice_id,
+                        "name": name,
+                        "url": url,
+                        "error": error,
+                        "attempt_count": 1,
+                        "last_attempt_date": now,
+                    }
+                )
+        self.create(to_create)
+
+    @api.model
+    def _clear_failures(self, keys):
+        """Forget the failures of attachments now downloaded (or already attached)
+
+        keys: set of (tax_invoice_id, name)
+        """
+        if not keys:
+            return
+        self.search(
+            [("tax_invoice_id", "in", list({key[0] for key in keys}))]
+        ).filtered(lambda rec: (rec.tax_invoice_id.id, rec.name) in keys).unlink()
+
+    @api.model
+    def cron_retry_downloads(self):
+        pending = self.search([("attempt_count", "<", MAX_DOWNLOAD_ATTEMPTS)])
+        jobs = {}
+        for rec in pending:
+            jobs.setdefault(rec.tax_invoice_id, []).append(
+                {"name": rec.name, "url": rec.url}
+            )
+        return self.env["tax.invoice"]._fetch_attachments(list(jobs.items()))
+
+    def action_retry(self):
+        jobs = {}
+        for rec in self:
+            jobs.setdefault(rec.tax_invoice_id, []).append(
+                {"name": rec.name, "url": rec.url}
+            )
+        self.env["tax.invoice"]._fetch_attachments(list(jobs.items()))
+        return True
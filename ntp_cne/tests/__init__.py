@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+from . import test_bizzi_sync
+from . import test_attachment_download
+from . import test_auto_bill
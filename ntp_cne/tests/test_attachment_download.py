@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import hashlib
+from unittest.mock import patch
+
+import requests
+
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+from ..models import tax_invoice
+
+FILES = {
+    "https://files.example.com/a.pdf": b"%PDF-1.4 invoice A",
+    "https://files.example.com/a-copy.pdf": b"%PDF-1.4 invoice A",
+    "https://files.example.com/b.xml": b"<HDon>B</HDon>",
+}
+
+
+def _fake_download(session, url, path):
+    if url not in FILES:
+        raise requests.HTTPError("404 Client Error: Not Found for url: %s" % url)
+    content = FILES[url]
+    with open(path, "wb") as fh:
+        fh.write(content)
+    return path, hashlib.sha1(content).hexdigest(), len(content)
+
+
+@tagged("post_install", "-at_install")
+class TestAttachmentDownload(common.TransactionCase):
+
+    def setUp(self):
+        super(TestAttachmentDownload, self).setUp()
+        self.tax_invoice_model = self.env["tax.invoice"]
+        self.download_model = self.env["tax.invoice.attachment.download"]
+        self.invoices = self.tax_invoice_model.create([
+            {"invoice_id": "ATT-1", "x_company_id": "C1"},
+            {"invoice_id": "ATT-2", "x_company_id": "C1"},
+        ])
+
+    def _attachments(self, invoice):
+        return self.env["ir.attachment"].search([
+            ("res_model", "=", "tax.invoice"), ("res_id", "=", invoice.id),
+        ])
+
+    def _fetch(self, jobs):
+        with patch.object(tax_invoice, "_download_to_file", side_effect=_fake_download) as download:
+            stats = self.tax_invoice_model._fetch_attachments(jobs)
+        return stats, download
+
+    def test_files_are_stored_once_by_checksum(self):
+        invoice_1, invoice_2 = self.invoices
+        stats, _download = self._fetch([
+            (invoice_1, [
+                {"name": "a.pdf", "url": "https://files.example.com/a.pdf"},
+                {"name": "a-copy.pdf", "url": "https://files.example.com/a-copy.pdf"},
+                {"name": "b.xml", "url": "https://files.example.com/b.xml"},
+            ]),
+        ])
+        self.assertEqual(stats, {"downloaded": 2, "reused": 0, "duplicate": 1, "failed": 0})
+        attachments = self._attachments(invoice_1)
+        self.assertEqual(len(attachments), 3)
+        pdfs = attachments.filtered(lambda a: a.raw == FILES["https://files.example.com/a.pdf"])
+        # the duplicate is kept under its own name, sharing the stored file
+        self.assertEqual(
+            sorted(pdfs.mapped("name")),
+            ["{}_a-copy.pdf".format(invoice_1.id), "{}_a.pdf".format(invoice_1.id)],
+        )
+        self.assertEqual(len(set(pdfs.mapped("store_fname"))), 1)
+        pdf = pdfs[0]
+        self.assertEqual(pdf.mimetype, "application/pdf")
+        self.assertEqual(pdf.checksum, hashlib.sha1(pdf.raw).hexdigest())
+
+        # the same document on another tax invoice reuses the stored file
+        stats, _download = self._fetch([
+            (invoice_2, [{"name": "a.pdf", "url": "https://files.example.com/a.pdf"}]),
+        ])
+        self.assertEqual(stats["reused"], 1)
+        copy = self._attachments(invoice_2)
+        self.assertEqual(copy.name, "{}_a.pdf".format(invoice_2.id))
+        self.assertEqual(copy.raw, pdf.raw)
+        self.assertEqual(copy.store_fname, pdf.store_fname)
+
+        # already attached by file name, duplicate included: not downloaded again
+        stats, download = self._fetch([
+            (invoice_1, [
+                {"name": "a.pdf", "url": "https://files.example.com/a.pdf"},
+                {"name": "a-copy.pdf", "url": "https://files.example.com/a-copy.pdf"},
+            ]),
+        ])
+        download.assert_not_called()
+        self.assertEqual(stats["downloaded"] + stats["reused"], 0)
+
+    @mute_logger("odoo.addons.ntp_cne.models.tax_invoice")
+    def test_failures_are_recorded_and_cleared(self):
+        invoice = self.invoices[0]
+        missing = {"name": "c.pdf", "url": "https://files.example.com/c.pdf"}
+        stats, _download = self._fetch([
+            (invoice, [missing, {"name": "b.xml", "url": "https://files.example.com/b.xml"}]),
+        ])
+        self.assertEqual((stats["downloaded"], stats["failed"]), (1, 1))
+        failure = self.download_model.search([("tax_invoice_id", "=", invoice.id)])
+        self.assertEqual((failure.name, failure.attempt_count), ("c.pdf", 1))
+        self.assertIn("404", failure.error)
+
+        # retried by the cron: still failing, the attempt is counted
+        with patch.object(tax_invoice, "_download_to_file", side_effect=_fake_download):
+            self.download_model.cron_retry_downloads()
+        self.assertEqual(failure.attempt_count, 2)
+
+        # once downloaded, the failure is forgotten
+        with patch.dict(FILES, {missing["url"]: b"%PDF-1.4 invoice C"}), \
+                patch.object(tax_invoice, "_download_to_file", side_effect=_fake_download):
+            failure.action_retry()
+        self.assertFalse(failure.exists())
+        self.assertEqual(len(self._attachments(invoice)), 2)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tools import mute_logger
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+# purchase tax created by the test / rate no purchase tax is configured for
+TAX_RATE = 8
+MISSING_TAX_RATE = 3
+
+
+@tagged("post_install", "-at_install")
+class TestAutoBill(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.env["account.tax"].create({
+            "name": "Purchase %d%%" % TAX_RATE,
+            "amount": TAX_RATE,
+            "type_tax_use": "purchase",
+            "price_include": False,
+            "company_id": cls.company_data["company"].id,
+        })
+        cls.vendor = cls.env["res.partner"].create({
+            "name": "Auto Bill Vendor",
+            "vat": "0109999999",
+            "is_company": True,
+            "auto_create_invoice_enable": True,
+            "auto_create_invoice_type": "bill",
+            "is_cost_aggregation": True,
+            "aggregate_product": cls.product_a.id,
+            "aggregate_expense_account": cls.company_data["default_account_expense"].id,
+        })
+
+    def setUp(self):
+        super().setUp()
+        if self.env["account.tax"].search_count([
+            ("amount", "=", MISSING_TAX_RATE), ("type_tax_use", "=", "purchase"),
+            ("price_include", "=", False),
+        ]):
+            self.skipTest("a %d%% purchase tax is configured" % MISSING_TAX_RATE)
+        self.tax_invoice_model = self.env["tax.invoice"]
+        self.invoices = self.tax_invoice_model.create([
+            {
+                "invoice_id": "AB-%d" % i,
+                "x_company_id": "C1",
+                "invoice_number": "AB%04d" % i,
+                "vendor_id": self.vendor.id,
+                "company_id": self.company_data["company"].id,
+                "currency_id": self.company_data["currency"].id,
+                "signed_date": fields.Datetime.now(),
+                "approval_status": "PENDING",
+                "vat_percent": rate,
+                "total_amount_without_vat": 100.0,
+                "total_amount_with_vat": 100.0 + rate,
+            }
+            # the third invoice has no tax configured for its rate
+            for i, rate in enumerate([TAX_RATE, TAX_RATE, MISSING_TAX_RATE, TAX_RATE, TAX_RATE])
+        ])
+        # like the synchronized invoices, no bill id is ever stored: NULL
+        self.invoices.flush()
+        self.env.cr.execute(
+            "SELECT COUNT(*) FROM tax_invoice WHERE id IN %s"
+            " AND auto_created_account_move_id IS NULL",
+            (tuple(self.invoices.ids),),
+        )
+        self.assertEqual(self.env.cr.fetchone()[0], len(self.invoices))
+
+    def _run(self, refresh=None, **kwargs):
+        model_class = type(self.tax_invoice_model)
+        with patch.object(model_class, "_refresh_from_bizzi", autospec=True,
+                          side_effect=refresh) as refresh_mock, \
+                patch.object(self.env.registry, "in_test_mode", return_value=False), \
+                patch.object(self.env.cr, "commit") as commit:
+            self.tax_invoice_model._auto_create_bill_receipts(**kwargs)
+        return refresh_mock, commit
+
+    @mute_logger("odoo.addons.ntp_cne.models.tax_invoice")
+    def test_chunks_fall_back_per_invoice_and_commit(self):
+        refresh, commit = self._run(chunk_size=2, commit_chunks=2)
+
+        self.assertEqual(refresh.call_count, 3)
+        # committed after every second chunk
+        self.assertEqual(commit.call_count, 1)
+        without_tax = self.invoices[2]
+        self.assertEqual(without_tax.auto_created_account_move_id, 0)
+        self.assertEqual(without_tax.state, "draft")
+        created = self.invoices - without_tax
+        moves = self.env["account.move"].browse(created.mapped("auto_created_account_move_id"))
+        self.assertEqual(len(moves.exists()), 4)
+        self.assertEqual(set(moves.mapped("move_type")), {"in_invoice"})
+        # the invoice sharing the failing chunk got its bill from the fallback
+        self.assertEqual(moves[2].tax_invoice_ids, self.invoices[3])
+        self.assertEqual(moves[2].invoice_line_ids.tax_ids.amount, TAX_RATE)
+
+        # the next run only retries the invoice still without a bill
+        refresh, commit = self._run(chunk_size=2, commit_chunks=2)
+        self.assertEqual(refresh.call_args[0][0], without_tax)
+        self.assertEqual(without_tax.auto_created_account_move_id, 0)
+
+        # a deleted bill is created again
+        moves[0].unlink()
+        refresh, commit = self._run(chunk_size=2, commit_chunks=2)
+        self.assertEqual(refresh.call_args[0][0], self.invoices[0] | without_tax)
+        self.assertTrue(self.env["account.move"].browse(
+            self.invoices[0].auto_created_account_move_id).exists())
+
+    @mute_logger("odoo.addons.ntp_cne.models.tax_invoice")
+    def test_invoice_rejected_by_the_refresh_is_skipped(self):
+        rejected = self.invoices[4]
+
+        def refresh(chunk, cache=None):
+            # the stored state is recomputed from approval_status
+            chunk.filtered(lambda rec: rec == rejected).approval_status = "REJECTED"
+
+        self._run(refresh=refresh, chunk_size=5)
+        self.assertEqual(rejected.state, "rejected")
+        self.assertEqual(rejected.auto_created_account_move_id, 0)
+        self.assertTrue(all(self.invoices[:2].mapped("auto_created_account_move_id")))
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+from ..models import tax_invoice
+
+API_URL = "https://bizzi.example.com/"
+WATERMARK_KEY = tax_invoice.SYNC_WATERMARK_PARAM % "in"
+
+
+class _FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data or {}
+
+    def json(self):
+        return self.data
+
+
+def _invoice(invoice_id, updated_at):
+    return {
+        "invoice_id": invoice_id,
+        "company_id": "C1",
+        "seller_tax_code": "0101234567",
+        "updated_at": updated_at,
+        "attachments": [],
+    }
+
+
+def _page(invoices, next_page=None):
+    return _FakeResponse(200, {"data": invoices, "pagination": {"next": next_page}})
+
+
+@tagged("post_install", "-at_install")
+class TestBizziSync(common.TransactionCase):
+
+    def setUp(self):
+        super(TestBizziSync, self).setUp()
+        self.tax_invoice_model = self.env["tax.invoice"]
+        self.get_param = self.env["ir.config_parameter"].sudo().get_param
+        self.set_param = self.env["ir.config_parameter"].sudo().set_param
+
+    def _create_from_dict(self, data, fetch_attachments=True, cache=None):
+        vals = {
+            "invoice_id": data["invoice_id"],
+            "x_company_id": data["company_id"],
+            "x_updated_at": tax_invoice.parse_to_odoo_date(data["updated_at"]),
+        }
+        record = self.tax_invoice_model.search([("invoice_id", "=", data["invoice_id"])])
+        if record:
+            record.write(vals)
+            return record
+        return self.tax_invoice_model.create(vals)
+
+    def _sync(self, responses, **kwargs):
+        model_class = type(self.tax_invoice_model)
+        with patch.object(tax_invoice.requests, "get", side_effect=responses) as get, \
+                patch.object(model_class, "create_from_dict",
+                             side_effect=self._create_from_dict) as create, \
+                patch.object(model_class, "_fetch_attachments"):
+            stats = self.tax_invoice_model.sync_tax_invoice_type(
+                API_URL, "key", invoice_io="IN", **kwargs
+            )
+        return stats, get, create
+
+    def test_stops_at_watermark(self):
+        self.set_param(WATERMARK_KEY, "2025-01-10 00:00:00")
+        stats, get, create = self._sync([
+            _page(
+                [
+                    _invoice("INV-3", "2025-01-12T00:00:00Z"),
+                    _invoice("INV-2", "2025-01-11T00:00:00Z"),
+                    _invoice("INV-1", "2025-01-09T00:00:00Z"),
+                ],
+                next_page="v1/invoices?page=2",
+            ),
+        ])
+
+        # page 2 is not requested: INV-1 is older than the watermark
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(create.call_count, 2)
+        self.assertEqual((stats["pages"], stats["created"]), (1, 2))
+        self.assertEqual(self.get_param(WATERMARK_KEY), "2025-01-12 00:00:00")
+
+    def test_stops_after_page_already_synchronized(self):
+        # the last completed run ended on invoices sharing the watermark
+        self.set_param(WATERMARK_KEY, "2025-01-11 00:00:00")
+        invoices = [
+            _invoice("INV-2", "2025-01-11T00:00:00Z"),
+            _invoice("INV-1", "2025-01-11T00:00:00Z"),
+        ]
+        for invoice in invoices:
+            self._create_from_dict(invoice)
+
+        stats, get, create = self._sync([_page(invoices, next_page="v1/invoices?page=2")])
+        self.assertEqual(get.call_count, 1)
+        create.assert_not_called()
+        self.assertEqual((stats["pages"], stats["skipped"]), (1, 2))
+
+        # a full resync walks every page and processes every invoice again
+        stats, get, create = self._sync(
+            [_page(invoices, next_page="v1/invoices?page=2"), _page([])],
+            full_resync=True,
+        )
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(get.call_args[0][0], API_URL + "v1/invoices?page=2")
+        self.assertEqual((stats["pages"], stats["updated"]), (2, 2))
+
+    @mute_logger("odoo.addons.ntp_cne.models.tax_invoice")
+    def test_http_error_keeps_watermark(self):
+        self.set_param(WATERMARK_KEY, "2025-01-01 00:00:00")
+        stats, get, create = self._sync([
+            _page(
+                [_invoice("INV-2", "2025-01-11T00:00:00Z")],
+                next_page="v1/invoices?page=2",
+            ),
+            _FakeResponse(502),
+        ])
+
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(stats["created"], 1)
+        # the interrupted run is picked up again from the old watermark
+        self.assertEqual(self.get_param(WATERMARK_KEY), "2025-01-01 00:00:00")
+
+        stats, get, create = self._sync([_FakeResponse(500)])
+        self.assertEqual(stats["pages"], 0)
+        self.assertEqual(self.get_param(WATERMARK_KEY), "2025-01-01 00:00:00")
+
+        # page 1 is already synchronized but newer than the watermark: the
+        # next run walks on to the page the interrupted run never got
+        stats, get, create = self._sync([
+            _page(
+                [_invoice("INV-2", "2025-01-11T00:00:00Z")],
+                next_page="v1/invoices?page=2",
+            ),
+            _page([_invoice("INV-1", "2025-01-05T00:00:00Z")]),
+        ])
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(get.call_args[0][0], API_URL + "v1/invoices?page=2")
+        self.assertEqual(
+            (stats["pages"], stats["skipped"], stats["created"]), (2, 1, 1),
+        )
+        self.assertEqual(create.call_args[0][0]["invoice_id"], "INV-1")
+        self.assertEqual(self.get_param(WATERMARK_KEY), "2025-01-11 00:00:00")
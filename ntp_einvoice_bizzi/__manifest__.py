@@ -16,7 +16,7 @@
         - Giao diện quản lý staging với filter, search, action buttons
         - Phân quyền theo nhóm người dùng
     """,
-    "version": "15.0.1.0.0",
+    "version": "15.0.1.1.0",
     "author": "NTP",
     "website": "",
     "depends": ["account", "mail", "base_setup"],
@@ -14,12 +14,13 @@ import logging
 import traceback
 
 from odoo import http
+from odoo.exceptions import ValidationError
 from odoo.http import request
 
 _logger = logging.getLogger(__name__)
 
 MAX_PAYLOAD_SIZE = 50 * 1024 * 1024
-MAX_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 500
 
 
 def _validate_token():
@@ -129,6 +130,14 @@ class EInvoiceBizziController(http.Controller):
             "version": "1.3.0",
             "token_valid": token_valid if token else None,
         }
+        if token_valid:
+            # Chỉ số hàng đợi poll trạng thái Bizzi (chỉ khi token hợp lệ)
+            try:
+                data["poll_queue"] = request.env[
+                    "invoice.staging.queue"
+                ].sudo().get_poll_queue_metrics()
+            except Exception as e:
+                _logger.warning("Health check: không lấy được chỉ số poll: %s", e)
         return http.Response(
             json.dumps(data, ensure_ascii=False),
             headers=headers,
@@ -270,21 +279,10 @@ class EInvoiceBizziController(http.Controller):
                 }
 
             StagingModel = request.env["invoice.staging.queue"].sudo()
-            results = []
-            created_count = 0
-            duplicate_count = 0
-            error_count = 0
-
-            for invoice_data in invoices:
-                result = StagingModel.create_from_extension(invoice_data, session_id)
-                results.append(result)
-
-                if result.get("success"):
-                    created_count += 1
-                elif result.get("duplicate"):
-                    duplicate_count += 1
-                else:
-                    error_count += 1
+            results = StagingModel.create_batch_from_extension(invoices, session_id)
+            created_count = len([r for r in results if r.get("success")])
+            duplicate_count = len([r for r in results if r.get("duplicate")])
+            error_count = len(results) - created_count - duplicate_count
 
             _logger.info(
                 "Extension API batch result: created=%d, duplicates=%d, errors=%d",
@@ -333,40 +331,38 @@ class EInvoiceBizziController(http.Controller):
 
             params = request.httprequest.args
             limit = min(int(params.get("limit", 50)), 200)
-            offset = int(params.get("offset", 0))
+            cursor = params.get("cursor")
+            offset = int(params.get("offset", 0)) if not cursor else None
             status_filter = params.get("status")
+            # count: "estimate" (mặc định, theo thống kê PostgreSQL), "exact" hoặc "none"
+            count_mode = params.get("count", "estimate")
 
             domain = []
             if status_filter:
                 domain.append(("bizzi_status", "=", status_filter))
 
             StagingModel = request.env["invoice.staging.queue"].sudo()
-            total = StagingModel.search_count(domain)
-            records = StagingModel.search(domain, limit=limit, offset=offset, order="create_date desc")
-
+            rows, next_cursor = StagingModel.list_page(
+                domain, limit=limit, cursor=cursor, offset=offset,
+            )
+            if count_mode == "exact":
+                total = StagingModel.search_count(domain)
+            elif count_mode == "none":
+                total = None
+            else:
+                total = StagingModel.estimate_count(domain)
+
+            for row in rows:
+                row["invoice_date"] = str(row["invoice_date"]) if row["invoice_date"] else None
+                row["create_date"] = str(row["create_date"])
             data = {
                 "success": True,
                 "total": total,
+                "total_is_estimate": count_mode not in ("exact", "none"),
                 "limit": limit,
                 "offset": offset,
-                "records": [
-                    {
-                        "id": rec.id,
-                        "invoice_number": rec.invoice_number,
-                        "invoice_code": rec.invoice_code,
-                        "invoice_symbol": rec.invoice_symbol,
-                        "invoice_date": str(rec.invoice_date) if rec.invoice_date else None,
-                        "source": rec.source,
-                        "seller_tax_code": rec.seller_tax_code,
-                        "seller_name": rec.seller_name,
-                        "amount_total": rec.amount_total,
-                        "bizzi_status": rec.bizzi_status,
-                        "has_pdf": rec.has_pdf,
-                        "has_xml": rec.has_xml,
-                        "create_date": str(rec.create_date),
-                    }
-                    for rec in records
-                ],
+                "next_cursor": next_cursor,
+                "records": rows,
             }
 
             return http.Response(
@@ -374,6 +370,13 @@ class EInvoiceBizziController(http.Controller):
                 headers=headers,
             )
 
+        except ValidationError as e:
+            # tham số không hợp lệ (VD: cursor hỏng) là lỗi phía client
+            return http.Response(
+                json.dumps({"success": False, "error": str(e)}, ensure_ascii=False),
+                status=400,
+                headers=headers,
+            )
         except Exception as e:
             _logger.error("Extension API list exception: %s\n%s", str(e), traceback.format_exc())
             return http.Response(
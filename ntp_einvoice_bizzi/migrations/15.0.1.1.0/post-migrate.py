@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Migration 15.0.1.1.0 - Poll Bizzi statuses with cron_poll_bizzi_status().
+
+The cron record is declared noupdate, so existing databases keep the old
+inline loop polling 50 pushed records every hour.
+
+Changes:
+  - Replace the code of cron_poll_bizzi_status by model.cron_poll_bizzi_status()
+  - Run it every 5 minutes, unless its interval was changed from the old
+    default (1 hour); its active flag is left as configured
+"""
+import logging
+
+from odoo import SUPERUSER_ID, api
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Point the existing Bizzi status polling cron at the new poller."""
+    if not version:
+        return
+
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    cron = env.ref("ntp_einvoice_bizzi.cron_poll_bizzi_status", raise_if_not_found=False)
+    if not cron:
+        return
+
+    vals = {"code": "model.cron_poll_bizzi_status()"}
+    if (cron.interval_number, cron.interval_type) == (1, "hours"):
+        vals.update(interval_number=5, interval_type="minutes")
+    cron.write(vals)
+    _logger.info("Migration 15.0.1.1.0: Bizzi status polling cron updated: %s", vals)
@@ -2,3 +2,4 @@
 from . import invoice_staging
 from . import bizzi_connector
 from . import res_config_settings
+from . import res_partner
@@ -3,9 +3,9 @@
 Model: bizzi.api.connector
 Xử lý tích hợp với Bizzi API - upload hóa đơn PDF/XML.
 """
-import base64
 import json
 import logging
+import os
 import time
 
 import requests
@@ -13,6 +13,11 @@ import requests
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 
+from .bizzi_polling import (
+    POLL_CONCURRENCY, fetch_bizzi_statuses, next_poll_delay, poll_outcome,
+)
+from .multipart_upload import FilePart, MultipartStream
+
 _logger = logging.getLogger(__name__)
 
 # Timeout settings
@@ -20,6 +25,15 @@ REQUEST_TIMEOUT = 30
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
 
+# Kết quả poll_outcome() -> khóa trong số liệu trả về của poll_bizzi_statuses
+OUTCOME_COUNTS = {"done": "processed", "failed": "failed", "pending": "pending"}
+
+# Binary field của staging -> (loại file, MIME type) khi upload multipart
+STAGING_FILE_FIELDS = {
+    "pdf_file": ("pdf", "application/pdf"),
+    "xml_file": ("xml", "application/xml"),
+}
+
 
 class BizziApiConnector(models.AbstractModel):
     """
@@ -92,8 +106,11 @@ class BizziApiConnector(models.AbstractModel):
             })
             return False
 
-        payload = self._build_payload(staging_record, config)
+        body = self._build_upload_body(staging_record, config)
         api_url = "%s/documents/upload" % config["api_url"].rstrip("/")
+        headers = dict(
+            self._get_headers(config), **{"Content-Type": body.content_type}
+        )
 
         _logger.info(
             "Đẩy hóa đơn %s sang Bizzi: %s",
@@ -103,12 +120,15 @@ class BizziApiConnector(models.AbstractModel):
         last_error = None
         for attempt in range(1, config["max_retries"] + 1):
             try:
+                # Đọc lại body từ đầu cho mỗi lần thử
+                body.seek(0)
                 response = requests.post(
                     api_url,
-                    json=payload,
-                    headers=self._get_headers(config),
+                    data=body,
+                    headers=headers,
                     timeout=config["timeout"],
                 )
+                body.close()
                 return self._handle_response(staging_record, response, attempt)
 
             except requests.Timeout:
@@ -136,6 +156,7 @@ class BizziApiConnector(models.AbstractModel):
             if attempt < config["max_retries"]:
                 time.sleep(RETRY_DELAY * attempt)
 
+        body.close()
         # Tất cả lần thử đều thất bại
         staging_record.write({
             "bizzi_status": "failed",
@@ -155,10 +176,10 @@ class BizziApiConnector(models.AbstractModel):
     @api.model
     def _build_payload(self, staging_record, config):
         """
-        Xây dựng payload gửi đến Bizzi API.
+        Xây dựng các trường metadata gửi đến Bizzi API.
         Cấu trúc payload theo chuẩn Bizzi API Documents.
         """
-        payload = {
+        return {
             "companyCode": config.get("company_code", ""),
             "invoiceNumber": staging_record.invoice_number or "",
             "invoiceCode": staging_record.invoice_code or "",
@@ -172,34 +193,44 @@ class BizziApiConnector(models.AbstractModel):
             "amountTotal": staging_record.amount_total or 0,
             "source": staging_record.source or "manual",
             "externalId": "odoo_staging_%d" % staging_record.id,
-            "files": [],
         }
 
-        # Đính kèm file PDF
-        if staging_record.pdf_file:
-            payload["files"].append({
-                "type": "pdf",
-                "filename": staging_record.pdf_filename or (
-                    "invoice_%s.pdf" % staging_record.invoice_number
-                ),
-                "content": staging_record.pdf_file.decode("utf-8")
-                if isinstance(staging_record.pdf_file, bytes)
-                else staging_record.pdf_file,
-            })
-
-        # Đính kèm file XML nếu có
-        if staging_record.xml_file:
-            payload["files"].append({
-                "type": "xml",
-                "filename": staging_record.xml_filename or (
-                    "invoice_%s.xml" % staging_record.invoice_number
-                ),
-                "content": staging_record.xml_file.decode("utf-8")
-                if isinstance(staging_record.xml_file, bytes)
-                else staging_record.xml_file,
-            })
+    @api.model
+    def _get_file_parts(self, staging_record):
+        """
+        Tạo các phần file multipart cho PDF/XML của staging.
+        File trong filestore được đọc dần khi gửi request, không nạp
+        toàn bộ vào bộ nhớ; chỉ file lưu trong database mới được nạp.
+        """
+        attachments = self.env["ir.attachment"].sudo().search([
+            ("res_model", "=", staging_record._name),
+            ("res_id", "=", staging_record.id),
+            ("res_field", "in", list(STAGING_FILE_FIELDS)),
+        ])
+        parts = []
+        for attachment in attachments:
+            file_type, mimetype = STAGING_FILE_FIELDS[attachment.res_field]
+            filename = staging_record[attachment.res_field.replace("_file", "_filename")] or (
+                "invoice_%s.%s" % (staging_record.invoice_number, file_type)
+            )
+            if attachment.store_fname:
+                path = attachment._full_path(attachment.store_fname)
+                parts.append(FilePart.from_path(
+                    "files", filename, mimetype, path, os.path.getsize(path),
+                ))
+            elif attachment.db_datas:
+                parts.append(FilePart.from_bytes(
+                    "files", filename, mimetype, attachment.raw,
+                ))
+        return parts
 
-        return payload
+    @api.model
+    def _build_upload_body(self, staging_record, config):
+        """Body multipart/form-data (stream) của request upload lên Bizzi."""
+        return MultipartStream(
+            fields=list(self._build_payload(staging_record, config).items()),
+            files=self._get_file_parts(staging_record),
+        )
 
     # ====================================================================
     # Response Handler
@@ -231,6 +262,8 @@ class BizziApiConnector(models.AbstractModel):
                 "bizzi_status": "pushed",
                 "bizzi_document_id": str(bizzi_doc_id) if bizzi_doc_id else "",
                 "bizzi_push_date": fields.Datetime.now(),
+                "bizzi_poll_count": 0,
+                "bizzi_next_poll_date": fields.Datetime.now() + next_poll_delay(0),
                 "bizzi_response_log": json.dumps(log_entry, ensure_ascii=False),
                 "error_message": False,
             })
@@ -301,7 +334,7 @@ class BizziApiConnector(models.AbstractModel):
         return results
 
     # ====================================================================
-    # Status Polling (Optional - for async Bizzi processing)
+    # Status Polling
     # ====================================================================
     @api.model
     def poll_bizzi_status(self, staging_record):
@@ -311,31 +344,73 @@ class BizziApiConnector(models.AbstractModel):
         """
         if not staging_record.bizzi_document_id:
             return False
+        return bool(self.poll_bizzi_statuses(staging_record)["processed"])
 
-        config = self._get_bizzi_config()
-        if not config.get("api_key"):
-            return False
+    @api.model
+    def poll_bizzi_statuses(self, staging_records):
+        """
+        Kiểm tra trạng thái Bizzi của nhiều hóa đơn song song.
 
-        api_url = "%s/documents/%s/status" % (
-            config["api_url"].rstrip("/"),
-            staging_record.bizzi_document_id
+        Các request GET chạy trong POLL_CONCURRENCY luồng, dùng chung một
+        session (pool kết nối keep-alive) và không truy cập database. Kết
+        quả được ghi theo nhóm: một write() cho các hóa đơn đã xử lý, một
+        write() cho mỗi lý do lỗi, một write() cho mỗi số lần poll của các
+        hóa đơn còn chờ. Lỗi HTTP vĩnh viễn (vd. 404) và hóa đơn vẫn chưa
+        xong sau POLL_MAX_CHECKS lần kiểm tra chuyển sang 'failed'.
+
+        Returns:
+            dict: Số hóa đơn processed / failed / pending / error
+        """
+        counts = {"processed": 0, "failed": 0, "pending": 0, "error": 0}
+        records = staging_records.filtered("bizzi_document_id")
+        config = self._get_bizzi_config()
+        if not records or not config.get("api_key"):
+            return counts
+
+        base_url = config["api_url"].rstrip("/")
+        results = fetch_bizzi_statuses(
+            ["%s/documents/%s/status" % (base_url, document_id)
+             for document_id in records.mapped("bizzi_document_id")],
+            self._get_headers(config),
+            timeout=config["timeout"],
+            concurrency=POLL_CONCURRENCY,
         )
 
-        try:
-            response = requests.get(
-                api_url,
-                headers=self._get_headers(config),
-                timeout=config["timeout"],
-            )
-            if response.status_code == 200:
-                data = response.json()
-                bizzi_state = data.get("status", "").lower()
-                if bizzi_state in ("processed", "completed", "done"):
-                    staging_record.write({"bizzi_status": "processed"})
-                    return True
-        except Exception as e:
-            _logger.error(
-                "Lỗi poll Bizzi status cho hóa đơn %s: %s",
-                staging_record.invoice_number, str(e)
-            )
-        return False
+        processed = records.browse()
+        failed = {}
+        pending = {}
+        for record, result in zip(records, results):
+            poll_count = record.bizzi_poll_count + 1
+            outcome, reason = poll_outcome(result, poll_count)
+            error = result[1]
+            if error:
+                _logger.warning(
+                    "Lỗi poll Bizzi status cho hóa đơn %s: %s",
+                    record.invoice_number, error,
+                )
+            # mỗi hóa đơn được đếm một lần, request lỗi chỉ tính vào 'error'
+            counts["error" if error else OUTCOME_COUNTS[outcome]] += 1
+            if outcome == "done":
+                processed |= record
+            elif outcome == "failed":
+                failed.setdefault(reason, records.browse())
+                failed[reason] |= record
+            else:
+                pending.setdefault(poll_count, records.browse())
+                pending[poll_count] |= record
+
+        if processed:
+            processed.write({"bizzi_status": "processed", "bizzi_next_poll_date": False})
+        for reason, group in failed.items():
+            group.write({
+                "bizzi_status": "failed",
+                "bizzi_next_poll_date": False,
+                "error_message": "Kiểm tra trạng thái Bizzi: %s" % reason,
+            })
+        now = fields.Datetime.now()
+        for poll_count, group in pending.items():
+            group.write({
+                "bizzi_poll_count": poll_count,
+                "bizzi_next_poll_date": now + next_poll_delay(poll_count),
+            })
+        return counts
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Bizzi Status Polling
+====================
+Shared by the staging queue (bizzi.api.connector) and the marketplace
+invoice collector (ntp_invoice_collector) to check the processing status of
+the documents they uploaded to Bizzi:
+
+  - one process-wide pooled keep-alive ``requests.Session``
+  - parallel GET requests that do not touch the database
+  - one rule deciding what a check result means (done, failed or still
+    pending) and when to stop checking: permanent HTTP errors (e.g. 404)
+    and documents still pending after POLL_MAX_CHECKS checks are failed
+    instead of being rescheduled forever
+  - the per-document backoff between checks
+  - the depth/age metrics of a poll queue
+
+This module is a pure Python library (no Odoo dependencies).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POLL_CONCURRENCY = 8
+REQUEST_TIMEOUT = 30
+
+# Delay between two checks of a document: 5, 10, 20 minutes... up to one
+# day. After POLL_MAX_CHECKS checks (about three weeks) polling stops.
+POLL_BASE_MINUTES = 5
+POLL_MAX_MINUTES = 24 * 60
+POLL_MAX_CHECKS = 30
+
+BIZZI_DONE_STATES = ("verified", "processed", "completed", "done")
+BIZZI_FAILED_STATES = ("rejected", "invalid", "failed", "error")
+# The document does not exist (any more) or the request can never succeed
+PERMANENT_HTTP_ERRORS = (400, 404, 410)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_poll_session():
+    """Return the pooled keep-alive session used for status checks."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=2, pool_maxsize=POLL_CONCURRENCY,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def next_poll_delay(poll_count):
+    """Delay before the next status check of a document checked poll_count times."""
+    return timedelta(minutes=min(
+        POLL_MAX_MINUTES, POLL_BASE_MINUTES * (2 ** min(poll_count, 16)),
+    ))
+
+
+def fetch_bizzi_status(url, headers, timeout=REQUEST_TIMEOUT):
+    """Check the status of one document.
+
+    Returns:
+        tuple: (lower-cased Bizzi status or None, error message or None,
+        True if the error is permanent)
+    """
+    try:
+        response = get_poll_session().get(url, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        return None, str(e), False
+    if response.status_code != 200:
+        error = "HTTP %d" % response.status_code
+        return None, error, response.status_code in PERMANENT_HTTP_ERRORS
+    try:
+        result = response.json()
+    except ValueError as e:
+        return None, "Invalid JSON: %s" % e, False
+    data = result.get("data") if isinstance(result.get("data"), dict) else {}
+    status = data.get("status") or result.get("status") or ""
+    return str(status).lower(), None, False
+
+
+def fetch_bizzi_statuses(urls, headers, timeout=REQUEST_TIMEOUT,
+                         concurrency=POLL_CONCURRENCY):
+    """fetch_bizzi_status() for each URL, in parallel, in the order of urls."""
+    with ThreadPoolExecutor(
+        max_workers=max(1, concurrency), thread_name_prefix="bizzi_poll",
+    ) as executor:
+        return list(executor.map(
+            lambda url: fetch_bizzi_status(url, headers, timeout), urls,
+        ))
+
+
+def poll_outcome(result, poll_count):
+    """Decide what a status check means for a document.
+
+    Args:
+        result (tuple): fetch_bizzi_status() result.
+        poll_count (int): Checks made so far, this one included.
+
+    Returns:
+        tuple: ("done" | "failed" | "pending", reason or None)
+    """
+    status, error, permanent = result
+    if status in BIZZI_DONE_STATES:
+        return "done", None
+    if status in BIZZI_FAILED_STATES:
+        return "failed", "status %s" % status
+    if permanent:
+        return "failed", error
+    if poll_count >= POLL_MAX_CHECKS:
+        return "failed", "no final status after %d checks%s" % (
+            poll_count, " (last error: %s)" % error if error else "",
+        )
+    return "pending", error
+
+
+def poll_queue_metrics(cr, table, status):
+    """Depth and age of a poll queue: the rows of table in bizzi_status status.
+
+    Returns:
+        dict: depth, due (checks due now), oldest_age_hours and
+        avg_age_hours (since bizzi_push_date, rounded to 0.1 hour)
+    """
+    cr.execute("""
+        SELECT COUNT(*),
+               COUNT(*) FILTER (
+                   WHERE bizzi_next_poll_date IS NULL
+                      OR bizzi_next_poll_date <= (now() AT TIME ZONE 'UTC')
+               ),
+               EXTRACT(EPOCH FROM (now() AT TIME ZONE 'UTC') - MIN(bizzi_push_date)),
+               AVG(EXTRACT(EPOCH FROM (now() AT TIME ZONE 'UTC') - bizzi_push_date))
+          FROM {table}
+         WHERE bizzi_status = %s
+    """.format(table=table), (status,))
+    depth, due, oldest, average = cr.fetchone()
+    return {
+        "depth": depth,
+        "due": due,
+        "oldest_age_hours": round(float(oldest or 0.0) / 3600.0, 1),
+        "avg_age_hours": round(float(average or 0.0) / 3600.0, 1),
+    }
@@ -5,13 +5,47 @@ Bảng trung gian lưu trữ hóa đơn nhận từ Chrome Extension
 trước khi đẩy sang Bizzi.
 """
 import base64
+import json
 import logging
+import re
+from datetime import datetime
 
-from odoo import api, fields, models, _
+from psycopg2 import IntegrityError, errorcodes
+
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
+from .bizzi_polling import poll_queue_metrics
+
 _logger = logging.getLogger(__name__)
 
+# Kiểm tra Base64 rẻ (độ dài + bộ ký tự), không decode cả file. Xuống dòng và
+# khoảng trắng ASCII được bỏ qua như b64decode (VD: Base64 chia dòng 76 ký tự).
+BASE64_RE = re.compile(r"[A-Za-z0-9+/]*={0,2}\Z")
+BASE64_WHITESPACE = str.maketrans("", "", " \t\n\r\v\f")
+EXTENSION_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+
+# Chống trùng (MST + Số HĐ) bằng unique index một phần, thay cho ràng buộc
+# UNIQUE(invoice_number, seller_tax_code) cũ (không chặn được khi MST NULL).
+# MST rỗng và NULL được coi là một.
+STAGING_UNIQUE_INDEX = "invoice_staging_queue_seller_number_uniq"
+STAGING_UNIQUE_KEY = "(COALESCE(seller_tax_code, ''), invoice_number)"
+STAGING_UNIQUE_WHERE = "invoice_number IS NOT NULL AND invoice_number <> ''"
+
+# Danh sách staging cho Extension: phân trang keyset theo (create_date, id),
+# chỉ đọc các cột cần hiển thị (không đọc file PDF/XML)
+LIST_ORDER = "create_date desc, id desc"
+LIST_INDEX = "invoice_staging_queue_create_date_id_idx"
+LIST_FIELDS = [
+    "invoice_number", "invoice_code", "invoice_symbol", "invoice_date", "source",
+    "seller_tax_code", "seller_name", "amount_total", "bizzi_status",
+    "has_pdf", "has_xml", "create_date",
+]
+
+# Poll trạng thái Bizzi: số hóa đơn mỗi batch, số batch tối đa mỗi lần cron
+POLL_BATCH_SIZE = 100
+POLL_MAX_BATCHES = 10
+
 
 class InvoiceStagingQueue(models.Model):
     _name = "invoice.staging.queue"
@@ -156,6 +190,17 @@ class InvoiceStagingQueue(models.Model):
         default=0,
         readonly=True,
     )
+    bizzi_poll_count = fields.Integer(
+        string="Số lần kiểm tra trạng thái",
+        default=0,
+        readonly=True,
+    )
+    bizzi_next_poll_date = fields.Datetime(
+        string="Kiểm tra trạng thái tiếp theo",
+        readonly=True,
+        index=True,
+        help="Thời điểm poll trạng thái Bizzi tiếp theo (giãn dần sau mỗi lần)",
+    )
 
     # ====================================================================
     # Extension Sync Info
@@ -185,15 +230,48 @@ class InvoiceStagingQueue(models.Model):
     )
 
     # ====================================================================
-    # SQL Constraints - Deduplication
+    # Deduplication - unique index (MST, Số HĐ)
     # ====================================================================
-    _sql_constraints = [
-        (
-            "unique_invoice_seller",
-            "UNIQUE(invoice_number, seller_tax_code)",
-            "Hóa đơn này (Số hóa đơn + MST nhà cung cấp) đã tồn tại trong hệ thống!",
-        ),
-    ]
+    def init(self):
+        """
+        Tạo unique index một phần thay cho ràng buộc UNIQUE cũ.
+
+        Index cũng phục vụ truy vấn kiểm tra trùng của
+        _find_existing_invoices và là đảm bảo chống trùng duy nhất. Ràng buộc
+        cũ chỉ bị xóa sau khi đã có index; nếu dữ liệu cũ còn bản trùng
+        (MST NULL/rỗng) thì không tạo được index và việc nâng cấp module dừng
+        lại, cần xử lý các hóa đơn trùng rồi nâng cấp lại.
+
+        Thêm index (create_date, id) cho phân trang keyset của list_page.
+        """
+        cr = self.env.cr
+        tools.create_index(
+            cr, LIST_INDEX, self._table, ["create_date DESC", "id DESC"]
+        )
+        if not tools.index_exists(cr, STAGING_UNIQUE_INDEX):
+            try:
+                with cr.savepoint(flush=False), tools.mute_logger("odoo.sql_db"):
+                    cr.execute(
+                        "CREATE UNIQUE INDEX %s ON invoice_staging_queue %s WHERE %s"
+                        % (STAGING_UNIQUE_INDEX, STAGING_UNIQUE_KEY, STAGING_UNIQUE_WHERE)
+                    )
+            except IntegrityError as e:
+                _logger.error(
+                    "Không tạo được unique index %s, cần xử lý các hóa đơn trùng: %s",
+                    STAGING_UNIQUE_INDEX, e,
+                )
+                raise ValidationError(
+                    _(
+                        "Không tạo được unique index %s: còn hóa đơn trùng "
+                        "(Số HĐ + MST). Hãy xử lý các bản trùng rồi nâng cấp lại "
+                        "module.\n%s"
+                    )
+                    % (STAGING_UNIQUE_INDEX, e.pgerror or e)
+                ) from e
+        cr.execute(
+            "ALTER TABLE invoice_staging_queue "
+            "DROP CONSTRAINT IF EXISTS invoice_staging_queue_unique_invoice_seller"
+        )
 
     # ====================================================================
     # Computed Fields
@@ -204,28 +282,6 @@ class InvoiceStagingQueue(models.Model):
             rec.has_pdf = bool(rec.pdf_file)
             rec.has_xml = bool(rec.xml_file)
 
-    # ====================================================================
-    # Constraints
-    # ====================================================================
-    @api.constrains("invoice_number", "seller_tax_code")
-    def _check_duplicate(self):
-        for rec in self:
-            if rec.invoice_number and rec.seller_tax_code:
-                domain = [
-                    ("invoice_number", "=", rec.invoice_number),
-                    ("seller_tax_code", "=", rec.seller_tax_code),
-                    ("id", "!=", rec.id),
-                ]
-                duplicate = self.search(domain, limit=1)
-                if duplicate:
-                    raise ValidationError(
-                        _(
-                            "Hóa đơn số '%s' của nhà cung cấp MST '%s' đã tồn tại "
-                            "trong hệ thống (ID: %d)."
-                        )
-                        % (rec.invoice_number, rec.seller_tax_code, duplicate.id)
-                    )
-
     # ====================================================================
     # Business Logic Methods
     # ====================================================================
@@ -334,6 +390,129 @@ class InvoiceStagingQueue(models.Model):
             success_count, fail_count
         )
 
+    @api.model
+    def cron_poll_bizzi_status(self, batch_size=POLL_BATCH_SIZE, max_batches=POLL_MAX_BATCHES):
+        """
+        Cron job: Cập nhật trạng thái các hóa đơn 'pushed' đến hạn kiểm tra.
+
+        Mỗi hóa đơn được poll theo lịch riêng (bizzi_next_poll_date), giãn
+        dần sau mỗi lần Bizzi chưa xử lý xong.
+        """
+        connector = self.env["bizzi.api.connector"]
+        totals = {"processed": 0, "failed": 0, "pending": 0, "error": 0}
+        for _batch in range(max_batches):
+            records = self.search(self._poll_due_domain(), limit=batch_size, order="id")
+            if not records:
+                break
+            counts = connector.poll_bizzi_statuses(records)
+            if not any(counts.values()):
+                break
+            for key, value in counts.items():
+                totals[key] += value
+
+        metrics = self.get_poll_queue_metrics()
+        _logger.info(
+            "Cron poll Bizzi: processed=%d, failed=%d, còn chờ=%d, lỗi=%d. "
+            "Hàng đợi: %d hóa đơn (%d đến hạn), cũ nhất %.1f giờ",
+            totals["processed"], totals["failed"], totals["pending"], totals["error"],
+            metrics["depth"], metrics["due"], metrics["oldest_age_hours"],
+        )
+        return totals
+
+    @api.model
+    def _poll_due_domain(self):
+        return [
+            ("bizzi_status", "=", "pushed"),
+            ("bizzi_document_id", "!=", False),
+            "|",
+            ("bizzi_next_poll_date", "=", False),
+            ("bizzi_next_poll_date", "<=", fields.Datetime.now()),
+        ]
+
+    @api.model
+    def get_poll_queue_metrics(self):
+        """
+        Chỉ số hàng đợi poll: số hóa đơn đang chờ Bizzi xử lý, số đến hạn
+        kiểm tra, tuổi (giờ kể từ lúc đẩy) cũ nhất và trung bình.
+        """
+        self.flush(["bizzi_status", "bizzi_next_poll_date", "bizzi_push_date"])
+        return poll_queue_metrics(self.env.cr, self._table, "pushed")
+
+    # ====================================================================
+    # Danh sách cho Extension
+    # ====================================================================
+    @api.model
+    def list_page(self, domain=None, limit=50, cursor=None, offset=None):
+        """
+        Một trang staging, mới nhất trước, chỉ gồm các cột LIST_FIELDS.
+
+        Phân trang keyset: ``cursor`` là ``next_cursor`` của trang trước,
+        trang sau bắt đầu ngay sau bản ghi cuối theo (create_date, id) - đi
+        thẳng theo index LIST_INDEX thay vì bỏ qua ``offset`` dòng như phân
+        trang cũ. ``offset`` vẫn nhận cho Extension bản cũ (chỉ dùng khi
+        không có cursor).
+
+        So sánh trên giá trị create_date đầy đủ (cả micro giây) lấy bằng SQL;
+        ORM làm tròn về giây nên không dùng được cho cursor.
+
+        Returns:
+            tuple: (danh sách dict, next_cursor hoặc None nếu hết dữ liệu)
+        """
+        query = self._where_calc(list(domain or []))
+        self._apply_ir_rules(query, "read")
+        create_date_col = '"%s"."create_date"' % self._table
+        id_col = '"%s"."id"' % self._table
+        if cursor:
+            query.add_where(
+                "(%s, %s) < (%%s, %%s)" % (create_date_col, id_col),
+                list(self._decode_list_cursor(cursor)),
+            )
+        else:
+            query.offset = offset or None
+        query.order = "%s DESC, %s DESC" % (create_date_col, id_col)
+        query.limit = limit + 1
+        query_str, params = query.select(id_col, create_date_col)
+        self.env.cr.execute(query_str, params)
+        keys = self.env.cr.fetchall()
+
+        next_cursor = None
+        if len(keys) > limit:
+            keys = keys[:limit]
+            next_cursor = self._encode_list_cursor(*keys[-1])
+        rows = {
+            row["id"]: row
+            for row in self.search_read([("id", "in", [key[0] for key in keys])], LIST_FIELDS)
+        }
+        return [rows[key[0]] for key in keys if key[0] in rows], next_cursor
+
+    @api.model
+    def _encode_list_cursor(self, record_id, create_date):
+        value = "%s,%d" % (create_date.isoformat(), record_id)
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    @api.model
+    def _decode_list_cursor(self, cursor):
+        """Returns: (create_date, id)"""
+        try:
+            create_date, record_id = (
+                base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+            )
+            return datetime.fromisoformat(create_date), int(record_id)
+        except (ValueError, UnicodeError) as e:
+            raise ValidationError(_("Cursor không hợp lệ: %s") % cursor) from e
+
+    @api.model
+    def estimate_count(self, domain=None):
+        """
+        Ước lượng số bản ghi theo thống kê của PostgreSQL (EXPLAIN), không
+        đếm thật - rẻ kể cả khi hàng đợi có hàng chục nghìn dòng.
+        """
+        query = self._where_calc(list(domain or []))
+        self._apply_ir_rules(query, "read")
+        query_str, params = query.select("1")
+        self.env.cr.execute("EXPLAIN (FORMAT JSON) " + query_str, params)
+        return int(self.env.cr.fetchone()[0][0]["Plan"]["Plan Rows"])
+
     # ====================================================================
     # Helper Methods
     # ====================================================================
@@ -349,104 +528,254 @@ class InvoiceStagingQueue(models.Model):
         Returns:
             dict: Kết quả tạo bản ghi (success/error)
         """
-        import json
+        return self.create_batch_from_extension([invoice_data], session_id)[0]
 
-        invoice_number = invoice_data.get("invoice_number", "").strip()
-        seller_tax_code = invoice_data.get("seller_tax_code", "").strip()
-
-        if not invoice_number:
-            return {"success": False, "error": "Thiếu số hóa đơn"}
+    @api.model
+    def create_batch_from_extension(self, invoices, session_id=None):
+        """
+        Tạo hàng loạt bản ghi staging từ Extension (xử lý theo tập hợp).
 
-        # Kiểm tra trùng lặp
-        existing = self.search([
-            ("invoice_number", "=", invoice_number),
-            ("seller_tax_code", "=", seller_tax_code),
-        ], limit=1)
+        - Kiểm tra trùng (Số HĐ + MST) cho cả batch bằng một truy vấn,
+          kể cả các hóa đơn lặp lại trong cùng batch.
+        - File Base64 chỉ kiểm tra độ dài/bộ ký tự, không decode. File không
+          hợp lệ bị bỏ qua và được báo trong ``invalid_files`` của kết quả.
+        - Tạo tất cả bản ghi hợp lệ bằng một lệnh create() nhiều bản ghi;
+          nếu thất bại (VD: upload song song cùng hóa đơn) thì tạo lại
+          từng bản ghi trong savepoint.
 
-        if existing:
-            return {
-                "success": False,
-                "duplicate": True,
-                "existing_id": existing.id,
-                "error": "Hóa đơn đã tồn tại (ID: %d)" % existing.id,
-            }
+        Args:
+            invoices (list): Danh sách dict dữ liệu hóa đơn
+            session_id (str): ID phiên đồng bộ
 
-        # Xử lý file PDF Base64
-        pdf_file = None
-        pdf_filename = None
-        pdf_data = invoice_data.get("pdf_base64")
-        if pdf_data:
-            try:
-                # Validate Base64
-                base64.b64decode(pdf_data)
-                pdf_file = pdf_data
-                pdf_filename = invoice_data.get("pdf_filename") or (
-                    "invoice_%s.pdf" % invoice_number
-                )
-            except Exception as e:
-                _logger.warning("Lỗi decode PDF Base64 cho hóa đơn %s: %s", invoice_number, e)
+        Returns:
+            list: Kết quả cho từng hóa đơn, cùng thứ tự với ``invoices``
+        """
+        results = [None] * len(invoices)
+        to_create = []
+        seen = {}
+        prepared = []
+        invalid_files = {}  # vị trí -> ["pdf", "xml"]
+        for index, invoice_data in enumerate(invoices):
+            if not isinstance(invoice_data, dict):
+                results[index] = {"success": False, "error": "Dữ liệu hóa đơn không hợp lệ"}
+                continue
+            invalid_files[index] = []
+            vals = self._prepare_extension_vals(
+                invoice_data, session_id, invalid_files=invalid_files[index]
+            )
+            if not vals["invoice_number"]:
+                results[index] = {"success": False, "error": "Thiếu số hóa đơn"}
+                continue
+            prepared.append((index, vals))
 
-        # Xử lý file XML Base64
-        xml_file = None
-        xml_filename = None
-        xml_data = invoice_data.get("xml_base64")
-        if xml_data:
-            try:
-                base64.b64decode(xml_data)
-                xml_file = xml_data
-                xml_filename = invoice_data.get("xml_filename") or (
-                    "invoice_%s.xml" % invoice_number
-                )
-            except Exception as e:
-                _logger.warning("Lỗi decode XML Base64 cho hóa đơn %s: %s", invoice_number, e)
+        existing = self._find_existing_invoices(
+            [(vals["invoice_number"], vals["seller_tax_code"]) for _index, vals in prepared]
+        )
+        for index, vals in prepared:
+            key = (vals["invoice_number"], vals["seller_tax_code"] or "")
+            if key in existing:
+                results[index] = self._duplicate_result(existing[key])
+            elif key in seen:
+                results[index] = {
+                    "success": False,
+                    "duplicate": True,
+                    "error": "Hóa đơn bị lặp trong batch (vị trí %d)" % seen[key],
+                }
+            else:
+                seen[key] = index
+                to_create.append((index, vals))
+
+        for index, result in self._create_staging_records(to_create).items():
+            results[index] = result
+        for index, file_types in invalid_files.items():
+            if file_types:
+                results[index]["invalid_files"] = file_types
+        return results
 
-        # Parse ngày lập
-        invoice_date = None
-        date_str = invoice_data.get("invoice_date")
-        if date_str:
-            try:
-                from datetime import datetime
-                for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
-                    try:
-                        invoice_date = datetime.strptime(date_str, fmt).date()
-                        break
-                    except ValueError:
-                        continue
-            except Exception:
-                pass
+    @api.model
+    def _prepare_extension_vals(self, invoice_data, session_id=None, invalid_files=None):
+        """
+        Chuyển dữ liệu Extension thành giá trị create() của staging.
 
+        invalid_files: danh sách (tùy chọn) nhận loại file ("pdf", "xml") có
+        Base64 không hợp lệ, bị bỏ qua
+        """
+        invoice_number = (invoice_data.get("invoice_number") or "").strip()
         vals = {
             "invoice_number": invoice_number,
             "invoice_code": invoice_data.get("invoice_code", ""),
             "invoice_symbol": invoice_data.get("invoice_symbol", ""),
-            "invoice_date": invoice_date,
+            "invoice_date": self._parse_extension_date(invoice_data.get("invoice_date")),
             "source": invoice_data.get("source", "grab"),
-            "seller_tax_code": seller_tax_code,
+            "seller_tax_code": (invoice_data.get("seller_tax_code") or "").strip(),
             "seller_name": invoice_data.get("seller_name", ""),
             "amount_untaxed": float(invoice_data.get("amount_untaxed") or 0),
             "amount_tax": float(invoice_data.get("amount_tax") or 0),
             "amount_total": float(invoice_data.get("amount_total") or 0),
-            "pdf_file": pdf_file,
-            "pdf_filename": pdf_filename,
-            "xml_file": xml_file,
-            "xml_filename": xml_filename,
+            "pdf_file": None,
+            "pdf_filename": None,
+            "xml_file": None,
+            "xml_filename": None,
             "bizzi_status": "draft",
             "extension_sync_date": fields.Datetime.now(),
             "extension_session_id": session_id,
             "raw_data": json.dumps(invoice_data, ensure_ascii=False, default=str),
         }
+        for file_type in ("pdf", "xml"):
+            data = invoice_data.get("%s_base64" % file_type)
+            if not data:
+                continue
+            data = self._clean_base64(data)
+            if not data:
+                _logger.warning(
+                    "File %s Base64 không hợp lệ cho hóa đơn %s",
+                    file_type.upper(), invoice_number,
+                )
+                if invalid_files is not None:
+                    invalid_files.append(file_type)
+                continue
+            vals["%s_file" % file_type] = data
+            vals["%s_filename" % file_type] = invoice_data.get("%s_filename" % file_type) or (
+                "invoice_%s.%s" % (invoice_number, file_type)
+            )
+        return vals
+
+    @api.model
+    def _is_valid_base64(self, data):
+        """Kiểm tra nhanh chuỗi Base64 (độ dài bội số của 4, đúng bộ ký tự)."""
+        return isinstance(data, str) and not len(data) % 4 and bool(BASE64_RE.match(data))
+
+    @api.model
+    def _clean_base64(self, data):
+        """Chuỗi Base64 đã bỏ khoảng trắng ASCII, hoặc None nếu không hợp lệ."""
+        if not isinstance(data, str):
+            return None
+        data = data.translate(BASE64_WHITESPACE)
+        return data if data and self._is_valid_base64(data) else None
+
+    @api.model
+    def _parse_extension_date(self, date_str):
+        if not date_str or not isinstance(date_str, str):
+            return None
+        for fmt in EXTENSION_DATE_FORMATS:
+            try:
+                return datetime.strptime(date_str, fmt).date()
+            except ValueError:
+                continue
+        return None
 
+    @api.model
+    def _find_existing_invoices(self, keys):
+        """
+        Tìm các hóa đơn đã có theo cặp (Số HĐ, MST) bằng một truy vấn.
+
+        Returns:
+            dict: {(invoice_number, seller_tax_code or ""): staging id}
+        """
+        keys = {(tax_code or "", number) for number, tax_code in keys if number}
+        if not keys:
+            return {}
+        self.flush(["invoice_number", "seller_tax_code"])
+        # cùng biểu thức và điều kiện với unique index để dùng được index
+        self.env.cr.execute("""
+            SELECT invoice_number, COALESCE(seller_tax_code, ''), MIN(id)
+              FROM invoice_staging_queue
+             WHERE %s IN %%s
+               AND %s
+          GROUP BY 1, 2
+        """ % (STAGING_UNIQUE_KEY, STAGING_UNIQUE_WHERE), (tuple(keys),))
+        return {(number, tax_code): staging_id for number, tax_code, staging_id in self.env.cr.fetchall()}
+
+    @api.model
+    def _duplicate_result(self, existing_id=None):
+        if not existing_id:
+            # bản ghi của một upload song song chưa commit / chưa thấy được
+            return {
+                "success": False,
+                "duplicate": True,
+                "error": "Hóa đơn đang được tạo bởi một phiên đồng bộ khác",
+            }
+        return {
+            "success": False,
+            "duplicate": True,
+            "existing_id": existing_id,
+            "error": "Hóa đơn đã tồn tại (ID: %d)" % existing_id,
+        }
+
+    @api.model
+    def _is_duplicate_error(self, error):
+        """Lỗi vi phạm unique index (MST, Số HĐ) - tương đương ON CONFLICT."""
+        return (
+            isinstance(error, IntegrityError)
+            and error.pgcode == errorcodes.UNIQUE_VIOLATION
+            and error.diag.constraint_name == STAGING_UNIQUE_INDEX
+        )
+
+    @api.model
+    def _create_staging_records(self, indexed_vals):
+        """
+        Tạo các bản ghi staging, ưu tiên một lệnh create() cho cả batch.
+
+        Cho kết quả như INSERT ... ON CONFLICT DO NOTHING: khi một upload song
+        song vừa tạo cùng hóa đơn, unique index từ chối bản ghi đó và kết quả
+        của nó là "duplicate", các bản ghi còn lại vẫn được tạo.
+
+        Args:
+            indexed_vals (list): [(vị trí trong batch, vals)]
+
+        Returns:
+            dict: {vị trí: kết quả}
+        """
+        if not indexed_vals:
+            return {}
+        # chèn theo thứ tự khóa: hai batch song song chờ nhau thay vì deadlock
+        indexed_vals = sorted(
+            indexed_vals,
+            key=lambda item: (item[1]["seller_tax_code"] or "", item[1]["invoice_number"]),
+        )
         try:
-            record = self.create(vals)
-            _logger.info(
-                "Tạo staging thành công: ID=%d, Số HĐ=%s",
-                record.id, invoice_number
+            with self.env.cr.savepoint(), tools.mute_logger("odoo.sql_db"):
+                records = self.create([vals for _index, vals in indexed_vals])
+        except Exception as e:
+            _logger.warning(
+                "Tạo staging hàng loạt (%d hóa đơn) thất bại (%s), tạo lại từng bản ghi",
+                len(indexed_vals), e,
             )
+            self.env.clear()
+        else:
+            _logger.info("Tạo staging thành công: %d hóa đơn", len(records))
             return {
+                index: {
+                    "success": True,
+                    "staging_id": record.id,
+                    "invoice_number": record.invoice_number,
+                }
+                for (index, _vals), record in zip(indexed_vals, records)
+            }
+
+        results = {}
+        for index, vals in indexed_vals:
+            try:
+                with self.env.cr.savepoint(), tools.mute_logger("odoo.sql_db"):
+                    record = self.create(vals)
+            except Exception as e:
+                if self._is_duplicate_error(e):
+                    self.env.clear()
+                    existing = self._find_existing_invoices(
+                        [(vals["invoice_number"], vals["seller_tax_code"])]
+                    )
+                    results[index] = self._duplicate_result(
+                        list(existing.values())[0] if existing else None
+                    )
+                    continue
+                _logger.error(
+                    "Lỗi tạo staging cho hóa đơn %s: %s", vals["invoice_number"], str(e)
+                )
+                results[index] = {"success": False, "error": str(e)}
+                continue
+            results[index] = {
                 "success": True,
                 "staging_id": record.id,
-                "invoice_number": invoice_number,
+                "invoice_number": vals["invoice_number"],
             }
-        except Exception as e:
-            _logger.error("Lỗi tạo staging cho hóa đơn %s: %s", invoice_number, str(e))
-            return {"success": False, "error": str(e)}
+        return results
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Partner hooks of the resolution cache
+=====================================
+Keeps the ResolutionCache of the running imports (ntp_cne Bizzi sync,
+ntp_invoice_collector fetches) in sync with the partners created, or changing
+their tax code, in the same transaction.
+"""
+
+from odoo import api, models
+
+from .resolution_cache import ResolutionCache
+
+
+class ResPartner(models.Model):
+    _inherit = "res.partner"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partners = super().create(vals_list)
+        ResolutionCache.notify_partners_changed(
+            self.env.cr, [vals.get("vat") for vals in vals_list]
+        )
+        return partners
+
+    def write(self, vals):
+        if "vat" in vals or "is_company" in vals or "company_group" in vals:
+            ResolutionCache.notify_partners_changed(
+                self.env.cr, self.mapped("vat") + [vals.get("vat")]
+            )
+        return super().write(vals)
@@ -0,0 +1,172 @@
+"""
+Per-run resolution cache for invoice imports
+============================================
+Resolves tax codes (VAT) to res.partner / res.company and VAT rates to
+purchase account.tax for one import run, so the few hundred supplier tax
+codes and the handful of VAT rates repeating across thousands of invoices
+are searched once per run instead of once per invoice.
+
+- partners are preloaded per page with one query for all the page tax codes
+  (exact code, and branch codes "<code>-xxx" when match_sub_vat is set)
+- companies and taxes are small tables, loaded with one query on first use
+- a partner created or changing its VAT during the run drops the cached
+  entries of that tax code in the caches of the same transaction (see
+  notify_partners_changed); caches of other transactions do not see the
+  change before it is committed anyway, and are left alone
+
+The cache counts its queries, hits and misses (see stats) so the import
+can log them.
+
+This module has no Odoo import; ntp_cne and ntp_invoice_collector import it
+from here. The res.partner hook calling notify_partners_changed is in
+res_partner.py of this module, so it is installed wherever the cache is used.
+"""
+
+import threading
+import weakref
+
+_active_caches = weakref.WeakSet()
+_active_caches_lock = threading.Lock()
+
+
+def _base_vat(vat):
+    """Tax code of the head office for a branch code: "0101-001" -> "0101" """
+    return vat.split("-", 1)[0]
+
+
+class ResolutionCache:
+    """
+    Args:
+        env: Odoo environment used for the lookups.
+        partner_domain (list): Extra domain partners must match.
+        match_sub_vat (bool): When no partner has the exact tax code, fall
+            back to the branches of that tax code ("<vat>-xxx").
+    """
+
+    def __init__(self, env, partner_domain=None, match_sub_vat=False):
+        self.env = env
+        self.partner_domain = list(partner_domain or [])
+        self.match_sub_vat = match_sub_vat
+        self._partners = {}  # vat -> partner ids
+        self._sub_partners = {}  # vat -> ids of partners with vat "<vat>-xxx"
+        self._companies = None  # vat -> company ids
+        self._taxes = None  # rate -> tax id
+        self.queries = 0
+        self.hits = 0
+        self.misses = 0
+        with _active_caches_lock:
+            _active_caches.add(self)
+
+    @classmethod
+    def notify_partners_changed(cls, cr, vats):
+        """Forget the given tax codes in the live caches using cursor cr
+
+        Only the caches of the calling transaction are touched: the caches of
+        other threads are never mutated from here.
+        """
+        vats = {vat for vat in vats if vat}
+        if not vats:
+            return
+        with _active_caches_lock:
+            caches = [cache for cache in _active_caches if cache.env.cr is cr]
+        for cache in caches:
+            cache.invalidate_partners(vats)
+
+    def invalidate_partners(self, vats=None):
+        if vats is None:
+            self._partners.clear()
+            self._sub_partners.clear()
+            return
+        for vat in vats:
+            for key in (vat, _base_vat(vat)):
+                self._partners.pop(key, None)
+                self._sub_partners.pop(key, None)
+
+    @property
+    def stats(self):
+        return {"queries": self.queries, "hits": self.hits, "misses": self.misses}
+
+    # ------------------------------------------------------------------
+    # Partners
+    # ------------------------------------------------------------------
+
+    def preload_partners(self, vats):
+        """Load the partners of all the given tax codes with one query"""
+        vats = sorted(
+            {vat for vat in vats if vat and vat not in self._partners}
+        )
+        if not vats:
+            return
+        vat_domain = [("vat", "in", vats)]
+        if self.match_sub_vat:
+            for vat in vats:
+                vat_domain = ["|"] + vat_domain + [("vat", "=like", "%s-%%" % vat)]
+        rows = self.env["res.partner"].search_read(
+            self.partner_domain + vat_domain, ["vat"], order="id"
+        )
+        self.queries += 1
+        for vat in vats:
+            self._partners[vat] = []
+            if self.match_sub_vat:
+                self._sub_partners[vat] = []
+        for row in rows:
+            vat = row["vat"]
+            partner_ids = self._partners.get(vat)
+            if partner_ids is not None:
+                partner_ids.append(row["id"])
+            base = _base_vat(vat)
+            sub_partner_ids = self._sub_partners.get(base)
+            if self.match_sub_vat and base != vat and sub_partner_ids is not None:
+                sub_partner_ids.append(row["id"])
+
+    def partner_ids(self, vat):
+        """Ids of the partners with tax code vat (or its branches), in id order"""
+        if not vat:
+            return []
+        if vat in self._partners:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.preload_partners([vat])
+        return self._partners.get(vat) or self._sub_partners.get(vat, [])
+
+    def partners(self, vat):
+        return self.env["res.partner"].browse(self.partner_ids(vat))
+
+    # ------------------------------------------------------------------
+    # Companies and taxes
+    # ------------------------------------------------------------------
+
+    def companies(self, vat):
+        """Companies with tax code vat, else the branches of that tax code"""
+        if self._companies is None:
+            self._companies = {}
+            for row in self.env["res.company"].search_read(
+                [("vat", "!=", False)], ["vat"], order="id"
+            ):
+                self._companies.setdefault(row["vat"], []).append(row["id"])
+            self.queries += 1
+        else:
+            self.hits += 1
+        ids = self._companies.get(vat) or [
+            company_id
+            for company_vat, company_ids in self._companies.items()
+            if company_vat.startswith("%s-" % vat)
+            for company_id in company_ids
+        ]
+        return self.env["res.company"].browse(ids)
+
+    def purchase_tax(self, rate):
+        """First purchase tax (price excluded) with amount rate, or None"""
+        if self._taxes is None:
+            self._taxes = {}
+            for row in self.env["account.tax"].search_read(
+                [("price_include", "=", False), ("type_tax_use", "=", "purchase")],
+                ["amount"],
+            ):
+                self._taxes.setdefault(round(row["amount"], 4), row["id"])
+            self.queries += 1
+        else:
+            self.hits += 1
+        tax_id = self._taxes.get(round(float(rate), 4))
+        return self.env["account.tax"].browse(tax_id) if tax_id else None
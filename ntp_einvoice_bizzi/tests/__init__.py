@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+from . import test_staging_dedup
+from . import test_multipart_upload
+from . import test_bizzi_poll
+from . import test_staging_list
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+from ..models import bizzi_connector, bizzi_polling
+
+NO_MAIL_CONTEXT = {
+    "tracking_disable": True,
+    "mail_create_nolog": True,
+    "mail_create_nosubscribe": True,
+}
+
+
+@tagged("post_install", "-at_install")
+class TestBizziPoll(common.TransactionCase):
+
+    def setUp(self):
+        super(TestBizziPoll, self).setUp()
+        set_param = self.env["ir.config_parameter"].sudo().set_param
+        set_param("ntp_einvoice_bizzi.bizzi_api_url", "https://bizzi.example.com/v1/")
+        set_param("ntp_einvoice_bizzi.bizzi_api_key", "key")
+        self.staging_model = self.env["invoice.staging.queue"].with_context(**NO_MAIL_CONTEXT)
+
+    def _pushed(self, statuses):
+        records = self.staging_model.create([
+            {
+                "invoice_number": "PL%04d" % i,
+                "seller_tax_code": "0101234567",
+                "bizzi_status": "pushed",
+                "bizzi_document_id": document_id,
+                "bizzi_push_date": fields.Datetime.now(),
+            }
+            for i, document_id in enumerate(sorted(statuses))
+        ])
+        return records
+
+    def _fake_statuses(self, statuses):
+        def fetch(urls, headers, timeout=None, concurrency=None):
+            self.assertEqual(headers["Authorization"], "Bearer key")
+            return [statuses[url.split("/")[-2]] for url in urls]
+        return fetch
+
+    @mute_logger("odoo.addons.ntp_einvoice_bizzi.models.bizzi_connector")
+    def test_poll_writes_statuses_and_backs_off(self):
+        statuses = {"DOC-1": ("completed", None, False), "DOC-2": ("processing", None, False),
+                    "DOC-3": (None, "HTTP 502", False), "DOC-4": ("rejected", None, False)}
+        records = self._pushed(statuses)
+
+        with patch.object(bizzi_connector, "fetch_bizzi_statuses",
+                          side_effect=self._fake_statuses(statuses)) as fetch:
+            totals = self.staging_model.cron_poll_bizzi_status()
+
+        self.assertEqual(fetch.call_args[0][0][0],
+                         "https://bizzi.example.com/v1/documents/DOC-1/status")
+        self.assertEqual(totals, {"processed": 1, "failed": 1, "pending": 1, "error": 1})
+        self.assertEqual(records.mapped("bizzi_status"),
+                         ["processed", "pushed", "pushed", "failed"])
+        waiting = records[1:3]
+        self.assertEqual(waiting.mapped("bizzi_poll_count"), [1, 1])
+        self.assertTrue(all(rec.bizzi_next_poll_date > fields.Datetime.now() for rec in waiting))
+        # Not due any more: the next run checks nothing
+        with patch.object(bizzi_connector, "fetch_bizzi_statuses") as fetch:
+            self.staging_model.cron_poll_bizzi_status()
+        fetch.assert_not_called()
+
+        metrics = self.staging_model.get_poll_queue_metrics()
+        self.assertEqual((metrics["depth"], metrics["due"]), (2, 0))
+
+    @mute_logger("odoo.addons.ntp_einvoice_bizzi.models.bizzi_connector")
+    def test_poll_stops_on_permanent_error_and_check_limit(self):
+        statuses = {"DOC-1": (None, "HTTP 404", True), "DOC-2": ("processing", None, False)}
+        records = self._pushed(statuses)
+        records[1].bizzi_poll_count = bizzi_polling.POLL_MAX_CHECKS - 1
+
+        with patch.object(bizzi_connector, "fetch_bizzi_statuses",
+                          side_effect=self._fake_statuses(statuses)):
+            totals = self.staging_model.cron_poll_bizzi_status()
+
+        self.assertEqual(totals, {"processed": 0, "failed": 1, "pending": 0, "error": 1})
+        self.assertEqual(records.mapped("bizzi_status"), ["failed", "failed"])
+        self.assertFalse(any(records.mapped("bizzi_next_poll_date")))
+        self.assertIn("HTTP 404", records[0].error_message)
+        self.assertIn("%d checks" % bizzi_polling.POLL_MAX_CHECKS, records[1].error_message)
+
+    def test_poll_outcome(self):
+        outcome = bizzi_polling.poll_outcome
+        self.assertEqual(outcome(("verified", None, False), 1), ("done", None))
+        self.assertEqual(outcome(("invalid", None, False), 1)[0], "failed")
+        self.assertEqual(outcome((None, "HTTP 503", False), 1), ("pending", "HTTP 503"))
+        self.assertEqual(outcome((None, "HTTP 410", True), 1), ("failed", "HTTP 410"))
+        self.assertEqual(outcome(("processing", None, False), bizzi_polling.POLL_MAX_CHECKS)[0],
+                         "failed")
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import email
+import os
+import tempfile
+
+from odoo.tests import common, tagged
+
+from ..models.multipart_upload import FilePart, MultipartStream
+
+
+@tagged("post_install", "-at_install")
+class TestMultipartUpload(common.BaseCase):
+
+    def _parse(self, stream, data):
+        message = email.message_from_bytes(
+            b"Content-Type: " + stream.content_type.encode() + b"\r\n\r\n" + data,
+        )
+        return {
+            part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+            for part in message.get_payload()
+        }
+
+    def test_length_and_content(self):
+        content = os.urandom(300 * 1024)
+        with tempfile.NamedTemporaryFile() as fh:
+            fh.write(content)
+            fh.flush()
+            stream = MultipartStream(
+                fields=[("invoice_number", "INV/001"), ("total_amount", 12.5)],
+                files=[FilePart.from_path(
+                    "files", "invoice.pdf", "application/pdf", fh.name, len(content),
+                )],
+            )
+            data = b"".join(stream)
+        self.assertEqual(len(data), len(stream))
+        self.assertEqual(self._parse(stream, data), {
+            "invoice_number": b"INV/001",
+            "total_amount": b"12.5",
+            "files": content,
+        })
+
+    def test_small_reads_and_rewind(self):
+        stream = MultipartStream(
+            fields=[("name", "x")],
+            files=[FilePart.from_bytes("files", "a.xml", "text/xml", b"<a/>" * 5000)],
+        )
+        chunks = []
+        while True:
+            chunk = stream.read(8192)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), 8192)
+            chunks.append(chunk)
+        self.assertEqual(stream.tell(), len(stream))
+        stream.seek(0)
+        self.assertEqual(stream.tell(), 0)
+        self.assertEqual(stream.read(), b"".join(chunks))
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import base64
+import random
+import threading
+
+from odoo import SUPERUSER_ID, api, sql_db, tools
+from odoo.exceptions import ValidationError
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+from ..models import invoice_staging
+
+NO_MAIL_CONTEXT = {
+    "tracking_disable": True,
+    "mail_create_nolog": True,
+    "mail_create_nosubscribe": True,
+}
+
+
+def _invoice(number, tax_code="0101234567"):
+    return {
+        "invoice_number": number,
+        "seller_tax_code": tax_code,
+        "seller_name": "NCC Test",
+        "invoice_date": "2025-01-15",
+        "amount_total": 110000,
+    }
+
+
+@tagged("post_install", "-at_install")
+class TestStagingDedup(common.TransactionCase):
+
+    def setUp(self):
+        super(TestStagingDedup, self).setUp()
+        self.staging_model = self.env["invoice.staging.queue"].with_context(**NO_MAIL_CONTEXT)
+
+    def test_batch_maps_existing_and_repeated_invoices_to_duplicate(self):
+        existing = self.staging_model.create_from_extension(_invoice("DD0001"))
+        self.assertTrue(existing["success"])
+
+        results = self.staging_model.create_batch_from_extension([
+            _invoice("DD0001"), _invoice("DD0002"), _invoice("DD0002"), _invoice("DD0003"),
+        ])
+        self.assertEqual(
+            [bool(result.get("duplicate")) for result in results],
+            [True, False, True, False],
+        )
+        self.assertEqual(results[0]["existing_id"], existing["staging_id"])
+        self.assertEqual(
+            self.staging_model.search_count([("invoice_number", "like", "DD000")]), 3,
+        )
+
+    def test_base64_files_are_checked_without_decoding(self):
+        pdf = base64.encodebytes(b"%PDF-1.4 " + b"x" * 100).decode()  # 76 chars a line
+        self.assertIn("\n", pdf)
+        invoice_ok = dict(_invoice("DD0200"), pdf_base64=pdf, xml_base64=" PEhEb24+ \r\n")
+        invoice_bad = dict(_invoice("DD0201"), pdf_base64="not base64!", xml_base64="PEhEb24")
+
+        with mute_logger("odoo.addons.ntp_einvoice_bizzi.models.invoice_staging"):
+            results = self.staging_model.create_batch_from_extension([invoice_ok, invoice_bad])
+        self.assertTrue(all(result["success"] for result in results))
+        self.assertNotIn("invalid_files", results[0])
+        self.assertEqual(results[1]["invalid_files"], ["pdf", "xml"])
+
+        record_ok, record_bad = self.staging_model.browse(
+            [result["staging_id"] for result in results]
+        )
+        record_ok.invalidate_cache()
+        self.assertEqual(base64.b64decode(record_ok.pdf_file), base64.b64decode(pdf))
+        self.assertEqual(base64.b64decode(record_ok.xml_file), b"<HDon>")
+        self.assertEqual(record_ok.pdf_filename, "invoice_DD0200.pdf")
+        self.assertFalse(record_bad.pdf_file or record_bad.xml_file)
+
+    def test_unique_index_conflict_is_a_duplicate(self):
+        # NULL and empty tax code are the same key for the unique index
+        self.staging_model.create({"invoice_number": "DD0100", "seller_tax_code": False})
+        vals = self.staging_model._prepare_extension_vals(_invoice("DD0100", ""))
+        vals_ok = self.staging_model._prepare_extension_vals(_invoice("DD0101", ""))
+        # bypass the pre-check, as if a parallel upload had won the race
+        results = self.staging_model._create_staging_records([(0, vals), (1, vals_ok)])
+        self.assertTrue(results[0]["duplicate"])
+        self.assertTrue(results[1]["success"])
+
+    def test_old_constraint_is_kept_until_the_index_exists(self):
+        cr = self.env.cr
+        cr.execute("DROP INDEX %s" % invoice_staging.STAGING_UNIQUE_INDEX)
+        cr.execute(
+            "ALTER TABLE invoice_staging_queue ADD CONSTRAINT "
+            "invoice_staging_queue_unique_invoice_seller "
+            "UNIQUE (invoice_number, seller_tax_code)"
+        )
+        # NULL tax codes slipped through the old constraint
+        cr.execute("""
+            INSERT INTO invoice_staging_queue (invoice_number, seller_tax_code, bizzi_status)
+            VALUES ('DD0200', NULL, 'draft'), ('DD0200', NULL, 'draft')
+            RETURNING id
+        """)
+        duplicate_id = cr.fetchall()[1][0]
+
+        with mute_logger("odoo.addons.ntp_einvoice_bizzi.models.invoice_staging"), \
+                self.assertRaises(ValidationError):
+            self.staging_model.init()
+        self.assertFalse(tools.index_exists(cr, invoice_staging.STAGING_UNIQUE_INDEX))
+        self.assertTrue(self._constraint_exists("invoice_staging_queue_unique_invoice_seller"))
+
+        cr.execute("DELETE FROM invoice_staging_queue WHERE id = %s", (duplicate_id,))
+        self.staging_model.init()
+        self.assertTrue(tools.index_exists(cr, invoice_staging.STAGING_UNIQUE_INDEX))
+        self.assertFalse(self._constraint_exists("invoice_staging_queue_unique_invoice_seller"))
+
+    def _constraint_exists(self, name):
+        self.env.cr.execute("SELECT 1 FROM pg_constraint WHERE conname = %s", (name,))
+        return bool(self.env.cr.fetchone())
+
+
+@tagged("post_install", "-at_install")
+class TestStagingDedupConcurrency(common.BaseCase):
+    """Parallel uploads of the same invoices, each in its own committed transaction."""
+
+    THREADS = 4
+    INVOICES = 10
+    PREFIX = "DDPAR"
+
+    def setUp(self):
+        super(TestStagingDedupConcurrency, self).setUp()
+        self.dbname = common.get_db_name()
+        self.addCleanup(self._cleanup)
+
+    def _cleanup(self):
+        with sql_db.db_connect(self.dbname).cursor() as cr:
+            cr.execute(
+                "DELETE FROM invoice_staging_queue WHERE invoice_number LIKE %s",
+                (self.PREFIX + "%",),
+            )
+
+    def _upload(self, barrier, invoices, results):
+        with sql_db.db_connect(self.dbname).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, NO_MAIL_CONTEXT)
+            barrier.wait()
+            results.extend(env["invoice.staging.queue"].create_batch_from_extension(invoices))
+            cr.commit()
+
+    def test_parallel_uploads_create_each_invoice_once(self):
+        invoices = [_invoice("%s%04d" % (self.PREFIX, i)) for i in range(self.INVOICES)]
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+        threads = []
+        for _i in range(self.THREADS):
+            batch = list(invoices)
+            random.shuffle(batch)
+            threads.append(threading.Thread(target=self._upload, args=(barrier, batch, results)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.THREADS * self.INVOICES)
+        self.assertEqual(len([r for r in results if r.get("success")]), self.INVOICES)
+        self.assertTrue(all(r.get("success") or r.get("duplicate") for r in results))
+        with sql_db.db_connect(self.dbname).cursor() as cr:
+            cr.execute("""
+                SELECT COUNT(*), COUNT(DISTINCT invoice_number)
+                  FROM invoice_staging_queue
+                 WHERE invoice_number LIKE %s
+            """, (self.PREFIX + "%",))
+            self.assertEqual(cr.fetchone(), (self.INVOICES, self.INVOICES))
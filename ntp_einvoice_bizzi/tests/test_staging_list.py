@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import datetime
+
+from odoo.exceptions import ValidationError
+from odoo.tests import common, tagged
+
+from ..models import invoice_staging
+
+NO_MAIL_CONTEXT = {
+    "tracking_disable": True,
+    "mail_create_nolog": True,
+    "mail_create_nosubscribe": True,
+}
+DOMAIN = [("invoice_number", "like", "LS")]
+
+
+@tagged("post_install", "-at_install")
+class TestStagingList(common.TransactionCase):
+
+    def setUp(self):
+        super(TestStagingList, self).setUp()
+        self.staging_model = self.env["invoice.staging.queue"].with_context(**NO_MAIL_CONTEXT)
+        self.records = self.staging_model.create([
+            {"invoice_number": "LS%04d" % i, "seller_tax_code": "0101234567"}
+            for i in range(7)
+        ])
+        self.records.flush()
+        # records created in the same transaction share create_date: spread
+        # some over time, keep ties (with microseconds) for the others
+        dates = [
+            "2025-01-01 10:00:00.123456", "2025-01-01 10:00:00.123456",
+            "2025-01-01 10:00:00.123456", "2025-01-01 10:00:00.123457",
+            "2025-01-02 08:00:00", "2025-01-02 08:00:00", "2025-01-03 08:00:00",
+        ]
+        for record, date in zip(self.records, dates):
+            self.env.cr.execute(
+                "UPDATE invoice_staging_queue SET create_date = %s WHERE id = %s",
+                (date, record.id),
+            )
+        self.records.invalidate_cache()
+
+    def _expected_ids(self):
+        self.env.cr.execute("""
+            SELECT id FROM invoice_staging_queue
+             WHERE invoice_number LIKE 'LS%%'
+          ORDER BY create_date DESC, id DESC
+        """)
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def test_cursor_pages_walk_every_record_once(self):
+        ids, cursor, pages = [], None, 0
+        while True:
+            rows, cursor = self.staging_model.list_page(DOMAIN, limit=2, cursor=cursor)
+            pages += 1
+            self.assertLessEqual(len(rows), 2)
+            self.assertEqual(set(rows[0]), set(invoice_staging.LIST_FIELDS) | {"id"})
+            ids += [row["id"] for row in rows]
+            if not cursor:
+                break
+        self.assertEqual(pages, 4)
+        self.assertEqual(ids, self._expected_ids())
+
+    def test_offset_pages_match_cursor_pages(self):
+        rows, _cursor = self.staging_model.list_page(DOMAIN, limit=3, offset=3)
+        self.assertEqual([row["id"] for row in rows], self._expected_ids()[3:6])
+
+    def test_cursor_round_trip_keeps_microseconds(self):
+        create_date = datetime(2025, 1, 1, 10, 0, 0, 123456)
+        cursor = self.staging_model._encode_list_cursor(42, create_date)
+        self.assertEqual(self.staging_model._decode_list_cursor(cursor), (create_date, 42))
+
+    def test_bad_cursor_is_rejected(self):
+        for cursor in ("not-a-cursor", "bm90LWEtZGF0ZSw0Mg==", "%%%"):
+            with self.assertRaises(ValidationError):
+                self.staging_model.list_page(DOMAIN, cursor=cursor)
+
+
+@tagged("post_install", "-at_install")
+class TestStagingListEndpoint(common.HttpCase):
+
+    def test_bad_cursor_is_a_client_error(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "ntp_einvoice_bizzi.extension_api_token", "test-token",
+        )
+        response = self.url_open(
+            "/api/einvoice/staging/list?cursor=not-a-cursor",
+            headers={"X-Extension-Token": "test-token"},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(json.loads(response.text)["success"])
+
+        response = self.url_open(
+            "/api/einvoice/staging/list?limit=5&count=none",
+            headers={"X-Extension-Token": "test-token"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.text)["success"])
@@ -13,7 +13,7 @@
     "version": "15.0.2.1.0",
     "author": "NTP",
     "website": "",
-    "depends": ["sale", "account", "mail", "ntp_marketplace_order"],
+    "depends": ["sale", "account", "mail", "ntp_marketplace_order", "ntp_einvoice_bizzi"],
     "data": [
         "security/ir.model.access.csv",
         "views/collector_config.xml",
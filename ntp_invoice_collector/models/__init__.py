@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from . import collector_http
 from . import grab_session
 from . import spv_session
 from . import shinhan_session
@@ -6,3 +7,5 @@ from . import collector_config
 from . import collected_invoice
 from . import res_config_settings
 from . import collector_log
+from . import collector_log_stat
+from . import collector_sync_state
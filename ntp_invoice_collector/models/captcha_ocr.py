@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Local CAPTCHA OCR Engines
+==========================
+Process-wide registry of the local OCR engines used by the Grab, SPV and
+Shinhan portal sessions to solve login CAPTCHAs without a paid service.
+
+  - EasyOCR and ddddocr models are loaded once per worker process (and can
+    be preloaded at server start) instead of once per session object.
+  - Engines are shared between threads; calls into one engine are
+    serialized by a per-engine lock, image preprocessing runs unlocked.
+  - One preprocessing pipeline (threshold, 4x upscale, connected-component
+    denoise, padding) shared by all portals.
+
+Engines are tried in priority order:
+  1. EasyOCR  — deep learning OCR, best case-sensitivity for italic CAPTCHA
+  2. ddddocr  — lightweight CAPTCHA-specialized model, fast but may confuse case
+  3. Tesseract — classical OCR, fallback if above not installed
+
+Install on server:
+    pip install easyocr ddddocr==1.4.11 pillow scipy numpy
+
+This module is a pure Python library (no Odoo dependencies) so it can be
+tested and benchmarked independently.
+"""
+
+import io
+import logging
+import re
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+CAPTCHA_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+TESSERACT_CONFIG = "--psm 8 --oem 3 -c tessedit_char_whitelist=%s" % CAPTCHA_ALPHABET
+
+# Preprocessing parameters
+TEXT_CHANNEL_THRESHOLD = 180  # text pixels: R < 180 and G < 180
+UPSCALE_FACTOR = 4
+MIN_COMPONENT_SIZE = 80  # connected components smaller than this are noise
+PADDING = 20
+
+ENGINES = ("easyocr", "ddddocr", "tesseract")
+
+INSTALL_HINTS = {
+    "easyocr": "pip install easyocr",
+    "ddddocr": "pip install ddddocr==1.4.11",
+    "tesseract": "apt install tesseract-ocr && pip install pytesseract",
+}
+
+
+def _clean_text(text):
+    return re.sub(r"[^A-Za-z0-9]", "", text or "")
+
+
+class PreprocessedCaptcha:
+    """A CAPTCHA image cleaned up for OCR.
+
+    Attributes:
+        raw_bytes (bytes): Original image data.
+        gray: Padded black-on-white PIL image ("L").
+        rgb: Same image in RGB, as expected by EasyOCR.
+        png_bytes (bytes): PNG encoding of ``rgb`` (for ddddocr).
+    """
+
+    def __init__(self, raw_bytes, gray, rgb, png_bytes):
+        self.raw_bytes = raw_bytes
+        self.gray = gray
+        self.rgb = rgb
+        self.png_bytes = png_bytes
+
+
+def preprocess_captcha(image_bytes):
+    """Extract the coloured CAPTCHA text onto a clean, upscaled canvas.
+
+    Steps: keep text pixels (R and G below TEXT_CHANNEL_THRESHOLD), upscale
+    UPSCALE_FACTOR times, drop connected components smaller than
+    MIN_COMPONENT_SIZE (needs scipy, skipped otherwise) and pad the result.
+
+    Args:
+        image_bytes (bytes): Raw PNG/JPEG image data.
+
+    Returns:
+        PreprocessedCaptcha
+    """
+    import numpy as np
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    arr = np.asarray(img)
+
+    text_pixels = (
+        (arr[:, :, 0] < TEXT_CHANNEL_THRESHOLD)
+        & (arr[:, :, 1] < TEXT_CHANNEL_THRESHOLD)
+    )
+    mask_img = Image.fromarray(
+        np.where(text_pixels, 0, 255).astype(np.uint8), "L",
+    )
+
+    big = mask_img.resize(
+        (img.width * UPSCALE_FACTOR, img.height * UPSCALE_FACTOR), Image.LANCZOS,
+    )
+    big_bin = np.asarray(big) < 128
+
+    try:
+        from scipy import ndimage
+        labeled, _ = ndimage.label(big_bin)
+        too_small = np.bincount(labeled.ravel()) < MIN_COMPONENT_SIZE
+        too_small[0] = False
+        big_bin = big_bin & ~too_small[labeled]
+    except ImportError:
+        pass  # Skip denoising if scipy not available
+
+    clean = Image.fromarray(np.where(big_bin, 0, 255).astype(np.uint8), "L")
+    gray = Image.new(
+        "L", (clean.width + 2 * PADDING, clean.height + 2 * PADDING), 255,
+    )
+    gray.paste(clean, (PADDING, PADDING))
+    rgb = gray.convert("RGB")
+
+    buf = io.BytesIO()
+    rgb.save(buf, format="PNG")
+    return PreprocessedCaptcha(image_bytes, gray, rgb, buf.getvalue())
+
+
+class OcrEngineRegistry:
+    """Thread-safe, lazily loaded set of local OCR engines."""
+
+    def __init__(self):
+        self._engines = {}
+        self._missing = set()
+        self._load_lock = threading.Lock()
+        self._engine_locks = {name: threading.Lock() for name in ENGINES}
+
+    # ------------------------------------------------------------------
+    # Engine loading
+    # ------------------------------------------------------------------
+
+    def _get_engine(self, name):
+        """Return the loaded engine, or None if it is not installed."""
+        if name in self._engines:
+            return self._engines[name]
+        if name in self._missing:
+            return None
+        with self._load_lock:
+            if name not in self._engines and name not in self._missing:
+                start = time.monotonic()
+                try:
+                    self._engines[name] = self._load_engine(name)
+                except ImportError:
+                    self._missing.add(name)
+                    _logger.warning(
+                        "OCR engine %s is not installed. Run: %s",
+                        name, INSTALL_HINTS[name],
+                    )
+                    return None
+                _logger.info(
+                    "OCR engine %s loaded in %.1fs", name, time.monotonic() - start,
+                )
+        return self._engines.get(name)
+
+    def _load_engine(self, name):
+        if name == "easyocr":
+            import easyocr
+            return easyocr.Reader(["en"], gpu=False, verbose=False)
+        if name == "ddddocr":
+            import ddddocr
+            return ddddocr.DdddOcr(show_ad=False)
+        import pytesseract
+        return pytesseract
+
+    def warm_up(self, engines=("easyocr", "ddddocr")):
+        """Load the given engines now instead of on the first solve."""
+        for name in engines:
+            try:
+                self._get_engine(name)
+            except Exception as e:
+                _logger.warning("Could not preload OCR engine %s: %s", name, e)
+
+    def available_engines(self):
+        """Return the names of the engines that are installed."""
+        return [name for name in ENGINES if self._get_engine(name) is not None]
+
+    # ------------------------------------------------------------------
+    # Solving
+    # ------------------------------------------------------------------
+
+    def _run_easyocr(self, engine, captcha, label):
+        import numpy as np
+
+        image = np.asarray(captcha.rgb)
+        with self._engine_locks["easyocr"]:
+            results = engine.readtext(image, allowlist=CAPTCHA_ALPHABET, detail=1)
+        if not results:
+            return ""
+        best = max(results, key=lambda x: x[2])
+        text = _clean_text(best[1])
+        _logger.info("%s: EasyOCR answer: '%s' (conf=%.2f)", label, text, best[2])
+        return text
+
+    def _run_ddddocr(self, engine, captcha, label):
+        # Try on raw image first, fall back to the preprocessed one
+        for image_bytes, variant in (
+            (captcha.raw_bytes, ""), (captcha.png_bytes, " (preprocessed)"),
+        ):
+            with self._engine_locks["ddddocr"]:
+                text = _clean_text(engine.classification(image_bytes))
+            if text:
+                _logger.info("%s: ddddocr%s answer: '%s'", label, variant, text)
+                return text
+        return ""
+
+    def _run_tesseract(self, engine, captcha, label):
+        text = _clean_text(
+            engine.image_to_string(captcha.gray, config=TESSERACT_CONFIG).strip()
+        )
+        _logger.info("%s: Tesseract OCR answer: '%s'", label, text)
+        return text
+
+    def solve(self, image_bytes, label="OCR", engines=ENGINES):
+        """Solve an image CAPTCHA with the first engine that answers.
+
+        Args:
+            image_bytes (bytes): Raw PNG/JPEG image data.
+            label (str): Prefix for log messages (portal name).
+            engines (tuple): Engines to try, in priority order.
+
+        Returns:
+            str: The CAPTCHA text, or empty string on failure.
+        """
+        try:
+            captcha = preprocess_captcha(image_bytes)
+        except Exception as e:
+            _logger.error("%s: CAPTCHA preprocessing failed: %s", label, e)
+            return ""
+
+        tried = False
+        for name in engines:
+            engine = self._get_engine(name)
+            if engine is None:
+                continue
+            tried = True
+            try:
+                text = getattr(self, "_run_%s" % name)(engine, captcha, label)
+            except Exception as e:
+                _logger.warning("%s: %s failed: %s", label, name, e)
+                continue
+            if text:
+                return text
+
+        if not tried:
+            _logger.warning(
+                "%s: No OCR engine available. Install at least one:\n  %s",
+                label, "\n  ".join(INSTALL_HINTS[name] for name in engines),
+            )
+        return ""
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_ocr_registry():
+    """Return the process-wide OCR engine registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = OcrEngineRegistry()
+    return _registry
@@ -1,27 +1,218 @@
 # -*- coding: utf-8 -*-
 
-import base64
 import hashlib
 import hmac
-import io
 import json
 import logging
+import os
+import re
+import tempfile
 import time
 import zipfile
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
 import requests
 from urllib.parse import urljoin
 
+from psycopg2 import OperationalError
+
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY
+from odoo.tools import split_every
+
+from odoo.addons.ntp_einvoice_bizzi.models.resolution_cache import ResolutionCache
+from odoo.addons.ntp_einvoice_bizzi.models.bizzi_polling import (
+    fetch_bizzi_statuses, next_poll_delay, poll_outcome, poll_queue_metrics,
+)
+from odoo.addons.ntp_einvoice_bizzi.models.multipart_upload import (
+    FilePart, MultipartStream,
+)
+
+from .collector_config import PORTAL_LOGIN_PARAM
+from .collector_http import get_http_client, parse_retry_after
+from .portal_session import PortalDeadlineExceeded
 
 _logger = logging.getLogger(__name__)
 
 # Constants for retry logic
 MAX_RETRIES = 3
-RETRY_DELAY_SECONDS = 2
 REQUEST_TIMEOUT = 30
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Default per-config time budget (seconds) for cron fetches
+DEFAULT_FETCH_TIMEOUT = 1800
+
+# Pages fetched per config and run; the rest resumes from the sync checkpoint
+MAX_FETCH_PAGES = 100
+
+# What an e-invoice portal supplies to CollectedInvoice._do_portal_fetch():
+#   provider / label: provider selection value / name in the logs
+#   date_from: first day of the sync window of the config
+#   note_fields: (title, listing key) pairs of the invoice notes
+#   save_session(config, session): keep the cookie/token for the next run
+#   expired_label: what expires when the listing raises ValueError
+#   after_page(config, session, created): run on the new invoices of a page
+#   after_fetch(): run once new invoices were created
+PortalFetchAdapter = namedtuple("PortalFetchAdapter", [
+    "provider", "label", "date_from", "note_fields", "save_session",
+    "expired_label", "after_page", "after_fetch",
+], defaults=("Session", None, None))
+
+GRAB_NOTE_FIELDS = (
+    ("Series", "series"), ("Buyer", "buyer_name"), ("Tax", "buyer_tax_code"),
+    ("Seller", "seller_name"), ("Status", "status"),
+)
+SPV_NOTE_FIELDS = (
+    ("Series", "series"), ("Seller", "seller_name"), ("Seller Tax", "seller_tax_code"),
+    ("Buyer", "buyer_name"), ("Buyer Tax", "buyer_tax_code"), ("Status", "status"),
+)
+SHINHAN_NOTE_FIELDS = SPV_NOTE_FIELDS[:-1] + (("Type", "invoice_type"), ("Status", "status"))
+
+# Grab attachment ZIPs: spooled to disk above ZIP_SPOOL_MAX_MEMORY, members
+# read in ATTACHMENT_READ_CHUNK chunks, attachments created per batch
+ZIP_SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+ATTACHMENT_READ_CHUNK = 64 * 1024
+ATTACHMENT_MAX_FILE_SIZE = 25 * 1024 * 1024
+ATTACHMENT_BATCH_SIZE = 50
+ATTACHMENT_BATCH_BYTES = 32 * 1024 * 1024
+
+# Bizzi push queue: pending invoices are claimed PUSH_BATCH_SIZE at a time
+# and uploaded by a bounded thread pool, results committed per batch
+PUSH_BATCH_SIZE = 50
+DEFAULT_PUSH_CONCURRENCY = 4
+# Attachments uploaded to Bizzi (streamed from the filestore as multipart parts)
+BIZZI_FILE_MIMETYPES = ("application/pdf", "application/xml", "text/xml")
+BIZZI_FILE_EXTENSIONS = (".pdf", ".xml")
+
+# Bizzi verification polling: invoices due for a check are polled in
+# batches, on the per-invoice schedule of ntp_einvoice_bizzi's bizzi_polling
+POLL_BATCH_SIZE = 100
+POLL_MAX_BATCHES = 10
+# bizzi_polling.poll_outcome() result -> cron_poll_bizzi_status() total
+BIZZI_OUTCOME_TOTALS = {"done": "verified", "failed": "rejected", "pending": "pending"}
+
+# sale.order fields holding the marketplace order ID, per provider; other
+# providers are matched on any of them (first match wins)
+SALE_ORDER_REF_FIELDS = {
+    "shopee": ("x_shopee_order_id",),
+    "grab": ("x_grab_order_id",),
+}
+DEFAULT_SALE_ORDER_REF_FIELDS = ("x_shopee_order_id", "x_grab_order_id")
+MATCH_BATCH_SIZE = 1000
+
+# Shopee get_order_detail accepts up to 50 comma-separated order_sn values
+SHOPEE_DETAIL_BATCH_SIZE = 50
+SHOPEE_DETAIL_OPTIONAL_FIELDS = ",".join([
+    "buyer_user_id", "buyer_username", "estimated_shipping_fee",
+    "recipient_address", "actual_shipping_fee", "goods_to_declare",
+    "note", "note_update_time", "item_list", "pay_time",
+    "dropshipper", "dropshipper_phone", "split_up",
+    "buyer_cancel_reason", "cancel_by", "cancel_reason",
+    "actual_shipping_fee_confirmed", "buyer_cpf_id",
+    "fulfillment_flag", "pickup_done_time", "package_list",
+    "shipping_carrier", "payment_method", "total_amount",
+    "invoice_data", "checkout_shipping_carrier",
+    "reverse_shipping_fee", "order_chargeable_weight_gram",
+    "edt", "prescription_images", "prescription_check_status",
+])
+
+
+def _request_with_retries(method, url, deadline=None, **kwargs):
+    """Send a request through the shared HTTP client, retrying failures.
+
+    Retries transient statuses (RETRYABLE_STATUS_CODES), connection errors
+    and timeouts with jittered exponential backoff, honouring Retry-After.
+    A seekable ``data`` body (MultipartStream) is rewound before each retry.
+    With a ``deadline`` (``time.time()`` value), each attempt's timeout is
+    capped to the time left and no attempt or wait goes past it.
+    Does not touch the database, so it can run in worker threads.
+
+    Returns:
+        tuple: (response or None, duration of the last attempt, exception
+        raised by the last attempt if there is no response).
+    """
+    if method.lower() not in ("get", "post"):
+        raise ValueError("Unsupported HTTP method: %s" % method)
+
+    timeout = kwargs.pop("timeout", REQUEST_TIMEOUT)
+    client = get_http_client()
+    last_exception = None
+    duration = 0.0
+
+    def time_left():
+        return None if deadline is None else deadline - time.time()
+
+    for attempt in range(1, MAX_RETRIES + 1):
+        remaining = time_left()
+        if remaining is not None and remaining <= 0:
+            last_exception = requests.Timeout(
+                "Time budget spent before requesting %s" % url[:100]
+            )
+            break
+        kwargs["timeout"] = timeout if remaining is None else min(timeout, remaining)
+        body = kwargs.get("data")
+        if attempt > 1 and hasattr(body, "seek"):
+            body.seek(0)
+        start_time = time.time()
+        try:
+            response = client.request(method, url, **kwargs)
+            duration = time.time() - start_time
+
+            _logger.debug(
+                "HTTP %s %s -> %d (%.2fs, attempt %d/%d)",
+                method.upper(), url[:100], response.status_code,
+                duration, attempt, MAX_RETRIES,
+            )
+            if response.status_code in (200, 201):
+                return response, duration, None
+
+            _logger.warning(
+                "HTTP %s %s returned %d (attempt %d/%d): %s",
+                method.upper(), url[:100], response.status_code,
+                attempt, MAX_RETRIES, response.text[:200],
+            )
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < MAX_RETRIES:
+                delay = client.backoff_delay(
+                    attempt,
+                    retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                )
+                remaining = time_left()
+                if remaining is None or delay < remaining:
+                    _logger.info("Retrying in %.1fs...", delay)
+                    time.sleep(delay)
+                    continue
+            return response, duration, None
+
+        except (requests.ConnectionError, requests.Timeout) as e:
+            last_exception = e
+            duration = time.time() - start_time
+            _logger.warning(
+                "%s for %s (attempt %d/%d): %s",
+                "Timeout" if isinstance(e, requests.Timeout) else "Connection error",
+                url[:100], attempt, MAX_RETRIES, e,
+            )
+            delay = client.backoff_delay(attempt)
+            remaining = time_left()
+            if attempt < MAX_RETRIES and (remaining is None or delay < remaining):
+                time.sleep(delay)
+                continue
+            break
+
+        except requests.RequestException as e:
+            last_exception = e
+            duration = time.time() - start_time
+            _logger.error(
+                "Request error for %s (attempt %d/%d): %s",
+                url[:100], attempt, MAX_RETRIES, e,
+            )
+            break
+
+    return None, duration, last_exception or requests.RequestException(
+        "All retries failed for %s" % url
+    )
 
 
 class CollectedInvoice(models.Model):
@@ -106,6 +297,18 @@ class CollectedInvoice(models.Model):
         default="pending",
         tracking=True,
     )
+    bizzi_push_date = fields.Datetime("Uploaded to Bizzi On", readonly=True)
+    bizzi_poll_count = fields.Integer(
+        "Bizzi Status Checks",
+        readonly=True,
+        help="Number of times the Bizzi verification status was checked.",
+    )
+    bizzi_next_poll_date = fields.Datetime(
+        "Next Bizzi Status Check",
+        readonly=True,
+        index=True,
+        help="Checks are spaced out further after each unverified answer.",
+    )
 
     # ---- Workflow State ----
     state = fields.Selection(
@@ -170,6 +373,12 @@ class CollectedInvoice(models.Model):
     def _make_request(self, method, url, config=None, **kwargs):
         """Make an HTTP request with retry logic and logging.
 
+        Requests go through the shared collector HTTP client (pooled
+        keep-alive connections and per-host rate limiting). Retries use
+        jittered exponential backoff and honour Retry-After on 429. In a
+        cron fetch, attempts and waits are bounded by the config's time
+        budget (``collector_fetch_deadline``).
+
         Args:
             method (str): HTTP method ('get' or 'post').
             url (str): Request URL.
@@ -180,117 +389,68 @@ class CollectedInvoice(models.Model):
             requests.Response: The response object.
 
         Raises:
+            UserError: If the fetch time budget is spent.
             requests.RequestException: If all retries fail.
         """
-        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        response, duration, error = _request_with_retries(
+            method, url,
+            deadline=self.env.context.get("collector_fetch_deadline"),
+            **kwargs
+        )
         log_model = self.env["ntp.collector.log"]
-        last_exception = None
-
-        for attempt in range(1, MAX_RETRIES + 1):
-            start_time = time.time()
-            try:
-                if method.lower() == "get":
-                    response = requests.get(url, **kwargs)
-                elif method.lower() == "post":
-                    response = requests.post(url, **kwargs)
-                else:
-                    raise ValueError("Unsupported HTTP method: %s" % method)
-
-                duration = time.time() - start_time
-
-                _logger.debug(
-                    "HTTP %s %s -> %d (%.2fs, attempt %d/%d)",
-                    method.upper(), url[:100], response.status_code,
-                    duration, attempt, MAX_RETRIES,
-                )
-
-                # Log successful request
-                if response.status_code in (200, 201):
-                    log_model.log_operation(
-                        config=config,
-                        operation="fetch",
-                        success=True,
-                        request_url=url[:500],
-                        response_code=response.status_code,
-                        duration_seconds=duration,
-                    )
-                    return response
-
-                # Log non-success response
-                _logger.warning(
-                    "HTTP %s %s returned %d (attempt %d/%d): %s",
-                    method.upper(), url[:100], response.status_code,
-                    attempt, MAX_RETRIES, response.text[:200],
-                )
-
-                if response.status_code in (429, 500, 502, 503, 504):
-                    # Retryable status codes
-                    if attempt < MAX_RETRIES:
-                        delay = RETRY_DELAY_SECONDS * attempt
-                        _logger.info("Retrying in %ds...", delay)
-                        time.sleep(delay)
-                        continue
-
-                # Non-retryable error or last attempt
-                log_model.log_operation(
-                    config=config,
-                    operation="fetch",
-                    success=False,
-                    request_url=url[:500],
-                    response_code=response.status_code,
-                    response_summary=response.text[:500],
-                    duration_seconds=duration,
-                    error_message="HTTP %d: %s" % (
-                        response.status_code, response.text[:200],
-                    ),
-                )
-                return response
-
-            except requests.ConnectionError as e:
-                last_exception = e
-                duration = time.time() - start_time
-                _logger.warning(
-                    "Connection error for %s (attempt %d/%d): %s",
-                    url[:100], attempt, MAX_RETRIES, e,
-                )
-                if attempt < MAX_RETRIES:
-                    delay = RETRY_DELAY_SECONDS * attempt
-                    time.sleep(delay)
-                    continue
-
-            except requests.Timeout as e:
-                last_exception = e
-                duration = time.time() - start_time
-                _logger.warning(
-                    "Timeout for %s (attempt %d/%d): %s",
-                    url[:100], attempt, MAX_RETRIES, e,
-                )
-                if attempt < MAX_RETRIES:
-                    delay = RETRY_DELAY_SECONDS * attempt
-                    time.sleep(delay)
-                    continue
 
-            except requests.RequestException as e:
-                last_exception = e
-                duration = time.time() - start_time
-                _logger.error(
-                    "Request error for %s (attempt %d/%d): %s",
-                    url[:100], attempt, MAX_RETRIES, e,
-                )
-                break
+        if response is None:
+            log_model.log_operation(
+                config=config,
+                operation="fetch",
+                success=False,
+                request_url=url[:500],
+                error_message="All %d retries failed: %s" % (MAX_RETRIES, str(error)),
+                duration_seconds=duration,
+            )
+            self._check_fetch_deadline(config)
+            raise error
+
+        if response.status_code in (200, 201):
+            log_model.log_operation(
+                config=config,
+                operation="fetch",
+                success=True,
+                request_url=url[:500],
+                response_code=response.status_code,
+                duration_seconds=duration,
+                sampled=True,
+            )
+            return response
 
-        # All retries exhausted
+        # Non-retryable error or last attempt
         log_model.log_operation(
             config=config,
             operation="fetch",
             success=False,
             request_url=url[:500],
-            error_message="All %d retries failed: %s" % (MAX_RETRIES, str(last_exception)),
-            duration_seconds=duration if 'duration' in dir() else 0,
-        )
-        raise last_exception or requests.RequestException(
-            "All retries failed for %s" % url
+            response_code=response.status_code,
+            response_summary=response.text[:500],
+            duration_seconds=duration,
+            error_message="HTTP %d: %s" % (
+                response.status_code, response.text[:200],
+            ),
         )
+        return response
+
+    def _log_http_stats(self):
+        """Flush the shared HTTP client's per-host latency histograms to the log."""
+        stats = get_http_client().pop_latency_stats()
+        log_model = self.env["ntp.collector.log"]
+        for host, histogram in stats.items():
+            log_model.log_operation(
+                operation="http_stats",
+                success=not histogram["errors"],
+                records_processed=histogram["requests"],
+                request_host=host,
+                latency_histogram=histogram,
+                duration_seconds=histogram["avg_seconds"],
+            )
 
     # ====================================================================
     # Shopee HMAC Signing Helper
@@ -330,177 +490,663 @@ class CollectedInvoice(models.Model):
 
     @api.model
     def cron_fetch_invoices(self):
-        """Scheduled action: fetch invoices from all active collector configs."""
+        """Scheduled action: fetch invoices from all active collector configs.
+
+        With ``ntp_invoice_collector.fetch_concurrency`` > 1, configs are
+        fetched in a bounded thread pool, each worker with its own cursor
+        committed per config. Each config fetch stops at the next page once
+        ``ntp_invoice_collector.fetch_timeout`` seconds have elapsed.
+        Sync checkpoints are committed page by page, and collector logs are
+        buffered and created in bulk.
+        """
+        self = self.with_context(
+            collector_log_buffer=True, collector_commit_checkpoints=True,
+        )
         configs = self.env["ntp.collector.config"].search(
             [("is_active", "=", True)]
         )
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        concurrency = max(1, int(get_param(
+            "ntp_invoice_collector.fetch_concurrency", default=1,
+        ) or 1))
+        timeout = int(get_param(
+            "ntp_invoice_collector.fetch_timeout", default=DEFAULT_FETCH_TIMEOUT,
+        ) or 0)
         _logger.info(
-            "Cron fetch invoices started: %d active configs found", len(configs),
+            "Cron fetch invoices started: %d active configs found "
+            "(concurrency %d, timeout %ds)", len(configs), concurrency, timeout,
         )
-        total_fetched = 0
-        total_errors = 0
+        start_time = time.time()
 
-        for config in configs:
-            start_time = time.time()
-            try:
-                if config.provider == "shopee":
-                    count = self._fetch_shopee_invoices(config)
-                elif config.provider == "grab":
-                    # Skip if no way to authenticate automatically
-                    has_session = bool(config.grab_session_cookie)
-                    has_auto_captcha = (
-                        getattr(config, "grab_use_auto_captcha", False)
-                        and bool(getattr(config, "grab_openai_api_key", ""))
+        if concurrency > 1 and len(configs) > 1:
+            results = self._fetch_configs_concurrently(configs, concurrency, timeout)
+        else:
+            results = [
+                self.with_context(
+                    collector_fetch_deadline=time.time() + timeout if timeout else None,
+                )._fetch_config(config)
+                for config in configs
+            ]
+
+        total_fetched = sum(result for result in results if result)
+        total_errors = len([result for result in results if result is False])
+
+        self._log_http_stats()
+        self.env["ntp.collector.log"].flush_log_buffer()
+        _logger.info(
+            "Cron fetch invoices completed: %d fetched, %d errors across %d configs "
+            "(%.1fs)", total_fetched, total_errors, len(configs), time.time() - start_time,
+        )
+
+    def _fetch_configs_concurrently(self, configs, concurrency, timeout):
+        """Fetch several configs in parallel, one cursor per worker thread.
+
+        Each worker commits its own config's invoices, logs and sync date,
+        so a failing or slow config never holds back the others.
+
+        Returns:
+            list: Result of _fetch_config() for each config.
+        """
+        registry = self.pool
+        uid = self.env.uid
+        context = dict(self.env.context)
+
+        def worker(config_id):
+            deadline = time.time() + timeout if timeout else None
+            with registry.cursor() as cr:
+                env = api.Environment(
+                    cr, uid, dict(context, collector_fetch_deadline=deadline),
+                )
+                config = env["ntp.collector.config"].browse(config_id)
+                return env["ntp.collected.invoice"]._fetch_config(config)
+
+        results = []
+        with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="collector_fetch",
+        ) as executor:
+            futures = {
+                executor.submit(worker, config.id): config.name
+                for config in configs
+            }
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # _fetch_config logs its own errors; this is the cursor
+                    # itself failing (e.g. commit conflict).
+                    _logger.error(
+                        "Invoice fetch worker for '%s' failed: %s",
+                        futures[future], e, exc_info=True,
                     )
-                    if not has_session and not has_auto_captcha:
-                        _logger.warning(
-                            "Cron skipping Grab config '%s': no active session "
-                            "and auto-CAPTCHA not configured. Login manually once "
-                            "or set an OpenAI API key to enable auto-CAPTCHA.",
-                            config.name,
-                        )
-                        self.env["ntp.collector.log"].log_operation(
-                            config=config,
-                            operation="fetch",
-                            success=False,
-                            error_message=(
-                                "Cron skipped: no session cookie and auto-CAPTCHA "
-                                "not configured. Login manually once, or enable "
-                                "auto-CAPTCHA with an OpenAI API key."
-                            ),
-                        )
-                        continue
-                    count = self._fetch_grab_portal_invoices(config)
-                elif config.provider == "spv":
-                    has_session = bool(config.spv_session_cookie)
-                    has_auto_captcha = (
-                        getattr(config, "spv_use_auto_captcha", False)
-                        and bool(getattr(config, "spv_openai_api_key", ""))
+                    results.append(False)
+        return results
+
+    def _check_fetch_deadline(self, config):
+        """Abort the current fetch once the per-config cron timeout passed."""
+        deadline = self.env.context.get("collector_fetch_deadline")
+        if deadline and time.time() > deadline:
+            raise UserError(
+                "Fetch for '%s' exceeded the configured timeout; "
+                "the remaining pages will be fetched on the next run."
+                % (config.name if config else "")
+            )
+
+    def _bind_fetch_deadline(self, session):
+        """Bound the portal session's logins and requests by the cron timeout."""
+        session.deadline = self.env.context.get("collector_fetch_deadline")
+        return session
+
+    def _fetch_config(self, config):
+        """Fetch one collector config and log the outcome.
+
+        A fetch leaving its sync window unfinished (page limit, aborted
+        page) is logged as partial: it does not count as a sync and resumes
+        from its checkpoint on the next run.
+
+        Returns:
+            int | None | bool: Number of new invoices, None if the config was
+            skipped, or False if the fetch failed.
+        """
+        start_time = time.time()
+        try:
+            if config.provider == "shopee":
+                count = self._fetch_shopee_invoices(config)
+            elif config.provider == "grab":
+                # Skip if no way to authenticate automatically
+                has_session = bool(config.grab_session_cookie)
+                has_auto_captcha = (
+                    getattr(config, "grab_use_auto_captcha", False)
+                    and bool(getattr(config, "grab_openai_api_key", ""))
+                )
+                if not has_session and not has_auto_captcha:
+                    _logger.warning(
+                        "Cron skipping Grab config '%s': no active session "
+                        "and auto-CAPTCHA not configured. Login manually once "
+                        "or set an OpenAI API key to enable auto-CAPTCHA.",
+                        config.name,
                     )
-                    if not has_session and not has_auto_captcha:
-                        _logger.warning(
-                            "Cron skipping SPV config '%s': no active session "
-                            "and auto-CAPTCHA not configured.",
-                            config.name,
-                        )
-                        self.env["ntp.collector.log"].log_operation(
-                            config=config,
-                            operation="fetch",
-                            success=False,
-                            error_message=(
-                                "Cron skipped: no session cookie and auto-CAPTCHA "
-                                "not configured. Enable auto-CAPTCHA with an OpenAI API key."
-                            ),
-                        )
-                        continue
-                    count = self._fetch_spv_portal_invoices(config)
-                elif config.provider == "shinhan":
-                    has_jwt = bool(config.shinhan_jwt_token)
-                    has_auto_captcha = (
-                        getattr(config, "shinhan_use_auto_captcha", False)
-                        and bool(getattr(config, "shinhan_openai_api_key", ""))
+                    self.env["ntp.collector.log"].log_operation(
+                        config=config,
+                        operation="fetch",
+                        success=False,
+                        error_message=(
+                            "Cron skipped: no session cookie and auto-CAPTCHA "
+                            "not configured. Login manually once, or enable "
+                            "auto-CAPTCHA with an OpenAI API key."
+                        ),
                     )
-                    if not has_jwt and not has_auto_captcha:
-                        _logger.warning(
-                            "Cron skipping Shinhan config '%s': no active JWT token "
-                            "and auto-CAPTCHA not configured.",
-                            config.name,
-                        )
-                        self.env["ntp.collector.log"].log_operation(
-                            config=config,
-                            operation="fetch",
-                            success=False,
-                            error_message=(
-                                "Cron skipped: no JWT token and auto-CAPTCHA "
-                                "not configured. Enable auto-CAPTCHA with an OpenAI API key."
-                            ),
-                        )
-                        continue
-                    count = self._fetch_shinhan_portal_invoices(config)
-                else:
+                    return None
+                count = self._fetch_grab_portal_invoices(config)
+            elif config.provider == "spv":
+                has_session = bool(config.spv_session_cookie)
+                has_auto_captcha = (
+                    getattr(config, "spv_use_auto_captcha", False)
+                    and bool(getattr(config, "spv_openai_api_key", ""))
+                )
+                if not has_session and not has_auto_captcha:
                     _logger.warning(
-                        "Unknown provider '%s' for config %s, skipping",
-                        config.provider, config.name,
+                        "Cron skipping SPV config '%s': no active session "
+                        "and auto-CAPTCHA not configured.",
+                        config.name,
                     )
-                    continue
-
-                duration = time.time() - start_time
-                config.last_sync_date = fields.Datetime.now()
-                total_fetched += count
-
-                self.env["ntp.collector.log"].log_operation(
-                    config=config,
-                    operation="fetch",
-                    success=True,
-                    records_processed=count,
-                    duration_seconds=duration,
+                    self.env["ntp.collector.log"].log_operation(
+                        config=config,
+                        operation="fetch",
+                        success=False,
+                        error_message=(
+                            "Cron skipped: no session cookie and auto-CAPTCHA "
+                            "not configured. Enable auto-CAPTCHA with an OpenAI API key."
+                        ),
+                    )
+                    return None
+                count = self._fetch_spv_portal_invoices(config)
+            elif config.provider == "shinhan":
+                has_jwt = bool(config.shinhan_jwt_token)
+                has_auto_captcha = (
+                    getattr(config, "shinhan_use_auto_captcha", False)
+                    and bool(getattr(config, "shinhan_openai_api_key", ""))
+                )
+                if not has_jwt and not has_auto_captcha:
+                    _logger.warning(
+                        "Cron skipping Shinhan config '%s': no active JWT token "
+                        "and auto-CAPTCHA not configured.",
+                        config.name,
+                    )
+                    self.env["ntp.collector.log"].log_operation(
+                        config=config,
+                        operation="fetch",
+                        success=False,
+                        error_message=(
+                            "Cron skipped: no JWT token and auto-CAPTCHA "
+                            "not configured. Enable auto-CAPTCHA with an OpenAI API key."
+                        ),
+                    )
+                    return None
+                count = self._fetch_shinhan_portal_invoices(config)
+            else:
+                _logger.warning(
+                    "Unknown provider '%s' for config %s, skipping",
+                    config.provider, config.name,
                 )
+                return None
 
-                _logger.info(
-                    "Invoice fetch completed for config '%s': %d new invoices (%.1fs)",
-                    config.name, count, duration,
+            duration = time.time() - start_time
+            sync_state = self.env["ntp.collector.sync.state"]._get_for_config(config)
+            if sync_state.state == "running":
+                message = (
+                    "Partial fetch: sync window not finished, resuming at %s "
+                    "page %d on the next run." % (
+                        sync_state.slice_from, sync_state.last_page + 1,
+                    )
                 )
-            except Exception as e:
-                duration = time.time() - start_time
-                total_errors += 1
-                _logger.error(
-                    "Invoice fetch error for '%s': %s",
-                    config.name, e, exc_info=True,
+                _logger.warning(
+                    "Invoice fetch for config '%s': %d new invoices. %s",
+                    config.name, count, message,
                 )
                 self.env["ntp.collector.log"].log_operation(
                     config=config,
                     operation="fetch",
                     success=False,
-                    error_message=str(e),
+                    records_processed=count,
+                    error_message=message,
                     duration_seconds=duration,
                 )
+                return count
+
+            config.last_sync_date = fields.Datetime.now()
+
+            self.env["ntp.collector.log"].log_operation(
+                config=config,
+                operation="fetch",
+                success=True,
+                records_processed=count,
+                duration_seconds=duration,
+            )
+
+            _logger.info(
+                "Invoice fetch completed for config '%s': %d new invoices (%.1fs)",
+                config.name, count, duration,
+            )
+            return count
+        except Exception as e:
+            duration = time.time() - start_time
+            _logger.error(
+                "Invoice fetch error for '%s': %s",
+                config.name, e, exc_info=True,
+            )
+            self.env["ntp.collector.log"].log_operation(
+                config=config,
+                operation="fetch",
+                success=False,
+                error_message=str(e),
+                duration_seconds=duration,
+            )
+            return False
+
+    @api.model
+    def cron_push_to_bizzi(self):
+        """Scheduled action: push pending invoices to Bizzi.
+
+        Pending invoices are claimed PUSH_BATCH_SIZE at a time with
+        ``FOR UPDATE SKIP LOCKED``, so several cron workers can drain the
+        queue together without pushing an invoice twice. Each batch is
+        uploaded by ``ntp_invoice_collector.push_concurrency`` threads
+        sharing the pooled HTTP client, and committed before the next claim.
+
+        Returns:
+            dict: pushed, errors, duration (s) and rate (invoices/s).
+        """
+        self = self.with_context(collector_log_buffer=True)
+        log_model = self.env["ntp.collector.log"]
+        try:
+            self._get_bizzi_endpoint()
+        except UserError as e:
+            _logger.warning("Cron push to Bizzi skipped: %s", e)
+            log_model.log_operation(
+                operation="push_bizzi", success=False, error_message=str(e),
+            )
+            return {"pushed": 0, "errors": 0, "duration": 0.0, "rate": 0.0}
 
+        concurrency = max(1, int(self.env["ir.config_parameter"].sudo().get_param(
+            "ntp_invoice_collector.push_concurrency", default=DEFAULT_PUSH_CONCURRENCY,
+        ) or 1))
+        _logger.info("Cron push to Bizzi started (concurrency %d)", concurrency)
+        start_time = time.time()
+        pushed = 0
+        errors = 0
+        claimed_ids = set()
+
+        while True:
+            batch = self._claim_bizzi_batch(PUSH_BATCH_SIZE, exclude_ids=claimed_ids)
+            if not batch:
+                break
+            claimed_ids.update(batch.ids)
+            batch_pushed = batch._push_batch_to_bizzi(concurrency)
+            pushed += batch_pushed
+            errors += len(batch) - batch_pushed
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+            _logger.info(
+                "Bizzi push batch done: %d/%d uploaded (%d so far, %.1f invoices/s)",
+                batch_pushed, len(batch), pushed + errors,
+                (pushed + errors) / max(time.time() - start_time, 0.001),
+            )
+
+        duration = time.time() - start_time
+        rate = (pushed + errors) / duration if duration else 0.0
+        self._log_http_stats()
+        log_model.log_operation(
+            operation="push_bizzi",
+            success=not errors,
+            records_processed=pushed,
+            duration_seconds=duration,
+            error_message="%d invoice(s) failed" % errors if errors else "",
+        )
+        log_model.flush_log_buffer()
         _logger.info(
-            "Cron fetch invoices completed: %d fetched, %d errors across %d configs",
-            total_fetched, total_errors, len(configs),
+            "Cron push to Bizzi completed: %d pushed, %d errors "
+            "(%.1fs, %.1f invoices/s)", pushed, errors, duration, rate,
         )
+        return {"pushed": pushed, "errors": errors, "duration": duration, "rate": rate}
 
     @api.model
-    def cron_push_to_bizzi(self):
-        """Scheduled action: push pending invoices to Bizzi."""
-        pending = self.search(
+    def _claim_bizzi_batch(self, limit, exclude_ids=()):
+        """Lock and return up to ``limit`` invoices waiting for a Bizzi push.
+
+        Rows locked by another worker are skipped; the locks are held until
+        the batch is committed. A concurrent update of a row in this
+        transaction's snapshot means another worker is draining the queue,
+        so an empty batch is returned and this run stops.
+        """
+        self.flush(["bizzi_status", "state"])
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute("""
+                    SELECT id FROM ntp_collected_invoice
+                     WHERE bizzi_status = 'pending'
+                       AND state IN ('draft', 'matched')
+                       AND id != ALL(%s)
+                  ORDER BY id
+                     LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+                """, (list(exclude_ids), limit))
+                return self.browse([row[0] for row in self.env.cr.fetchall()])
+        except OperationalError as e:
+            if e.pgcode not in PG_CONCURRENCY_ERRORS_TO_RETRY:
+                raise
+            _logger.info("Bizzi push queue is being drained by another worker: %s", e)
+            return self.browse()
+
+    def _push_batch_to_bizzi(self, concurrency):
+        """Upload these invoices to Bizzi through a bounded thread pool.
+
+        Upload bodies are prepared and results written in the calling
+        thread; the worker threads only run the HTTP requests, streaming
+        the attachments from the filestore.
+
+        Returns:
+            int: Number of invoices uploaded.
+        """
+        url, headers = self._get_bizzi_endpoint()
+        bodies = {}
+        for inv in self:
+            try:
+                bodies[inv.id] = inv._prepare_bizzi_upload()
+            except Exception as e:
+                inv._set_bizzi_error(e)
+
+        uploaded = 0
+        with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="bizzi_push",
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _request_with_retries, "post", url, data=body,
+                    headers=dict(headers, **{"Content-Type": body.content_type}),
+                ): inv_id
+                for inv_id, body in bodies.items()
+            }
+            for future in as_completed(futures):
+                inv_id = futures[future]
+                bodies[inv_id].close()
+                inv = self.browse(inv_id)
+                try:
+                    if inv._apply_bizzi_response(url, *future.result()):
+                        uploaded += 1
+                except Exception as e:
+                    inv._set_bizzi_error(e)
+        return uploaded
+
+    @api.model
+    def cron_poll_bizzi_status(self):
+        """Scheduled action: check the Bizzi verification of uploaded invoices.
+
+        Each invoice is polled on its own schedule (bizzi_next_poll_date),
+        spaced out after every unverified answer. Checks run in parallel
+        over the pooled Bizzi poll session and the results are written in
+        bulk. Invoices Bizzi does not know (permanent HTTP errors) or still
+        unverified after POLL_MAX_CHECKS checks are set to error.
+
+        Returns:
+            dict: Check counts (verified, rejected, pending, errors).
+        """
+        self = self.with_context(collector_log_buffer=True)
+        log_model = self.env["ntp.collector.log"]
+        try:
+            self._get_bizzi_endpoint()
+        except UserError as e:
+            _logger.warning("Cron poll Bizzi status skipped: %s", e)
+            return {}
+
+        concurrency = max(1, int(self.env["ir.config_parameter"].sudo().get_param(
+            "ntp_invoice_collector.push_concurrency", default=DEFAULT_PUSH_CONCURRENCY,
+        ) or 1))
+        start_time = time.time()
+        totals = {"verified": 0, "rejected": 0, "pending": 0, "errors": 0}
+        for _batch in range(POLL_MAX_BATCHES):
+            due = self.search(self._bizzi_poll_due_domain(), limit=POLL_BATCH_SIZE, order="id")
+            if not due:
+                break
+            for key, count in due._poll_bizzi_statuses(concurrency).items():
+                totals[key] += count
+
+        duration = time.time() - start_time
+        metrics = self.get_bizzi_poll_metrics()
+        summary = (
+            "%(verified)d verified, %(rejected)d rejected, %(pending)d pending, "
+            "%(errors)d errors" % totals
+        )
+        queue = (
+            "Queue: %(depth)d uploaded (%(due)d due), oldest %(oldest_age_hours).1fh, "
+            "average %(avg_age_hours).1fh" % metrics
+        )
+        log_model.log_operation(
+            operation="poll_bizzi",
+            success=not totals["errors"],
+            records_processed=sum(totals.values()),
+            duration_seconds=duration,
+            response_summary="%s. %s" % (summary, queue),
+        )
+        log_model.flush_log_buffer()
+        _logger.info("Cron poll Bizzi status: %s (%.1fs). %s", summary, duration, queue)
+        return totals
+
+    @api.model
+    def _bizzi_poll_due_domain(self):
+        return [
+            ("bizzi_status", "=", "uploaded"),
+            ("bizzi_invoice_id", "!=", False),
+            "|",
+            ("bizzi_next_poll_date", "=", False),
+            ("bizzi_next_poll_date", "<=", fields.Datetime.now()),
+        ]
+
+    def _poll_bizzi_statuses(self, concurrency):
+        """Check these invoices on Bizzi in parallel and write the outcome.
+
+        One write() marks the verified invoices, one per reason the failed
+        ones, and one per new check count reschedules the others. Each
+        invoice is counted once; a failed request counts as an error.
+
+        Returns:
+            dict: Check counts (verified, rejected, pending, errors).
+        """
+        url, headers = self._get_bizzi_endpoint()
+        results = fetch_bizzi_statuses(
+            ["%s/%s" % (url, bizzi_id) for bizzi_id in self.mapped("bizzi_invoice_id")],
+            headers,
+            timeout=REQUEST_TIMEOUT,
+            concurrency=concurrency,
+        )
+
+        totals = {"verified": 0, "rejected": 0, "pending": 0, "errors": 0}
+        verified = self.browse()
+        rejected = defaultdict(self.browse)
+        rescheduled = defaultdict(self.browse)
+        for inv, result in zip(self, results):
+            poll_count = inv.bizzi_poll_count + 1
+            outcome, reason = poll_outcome(result, poll_count)
+            error = result[1]
+            if error:
+                _logger.warning("Bizzi status check for %s failed: %s", inv.name, error)
+            if outcome == "done":
+                verified |= inv
+            elif outcome == "failed":
+                rejected[reason] |= inv
+            else:
+                rescheduled[poll_count] |= inv
+            totals["errors" if error else BIZZI_OUTCOME_TOTALS[outcome]] += 1
+
+        if verified:
+            verified.write({
+                "state": "verified",
+                "bizzi_status": "verified",
+                "bizzi_next_poll_date": False,
+            })
+        now = fields.Datetime.now()
+        for reason, invoices in rejected.items():
+            invoices.write({
+                "bizzi_status": "error",
+                "bizzi_next_poll_date": False,
+                "error_message": "Bizzi verification: %s" % reason,
+                "last_error_date": now,
+            })
+        for poll_count, invoices in rescheduled.items():
+            invoices.write({
+                "bizzi_poll_count": poll_count,
+                "bizzi_next_poll_date": now + next_poll_delay(poll_count),
+            })
+        return totals
+
+    @api.model
+    def get_bizzi_poll_metrics(self):
+        """Depth and age of the queue of invoices awaiting Bizzi verification.
+
+        Returns:
+            dict: depth, due, oldest_age_hours, avg_age_hours.
+        """
+        self.flush(["bizzi_status", "bizzi_next_poll_date", "bizzi_push_date"])
+        return poll_queue_metrics(self.env.cr, self._table, "uploaded")
+
+    # ====================================================================
+    # Page Ingestion (set-based dedup + bulk create)
+    # ====================================================================
+
+    def _get_existing_external_ids(self, provider, external_ids):
+        """Return the subset of external_ids already collected for provider.
+
+        Resolves a whole page with one query instead of one search per row.
+        """
+        external_ids = [eid for eid in set(external_ids) if eid]
+        if not external_ids:
+            return set()
+        rows = self.search_read(
             [
-                ("bizzi_status", "=", "pending"),
-                ("state", "in", ["draft", "matched"]),
-            ]
+                ("provider", "=", provider),
+                ("external_order_id", "in", external_ids),
+            ],
+            ["external_order_id"],
         )
-        _logger.info(
-            "Cron push to Bizzi started: %d pending invoices", len(pending),
+        return {row["external_order_id"] for row in rows}
+
+    def _map_partners_by_vat(self, vats, cache=None):
+        """Return {vat: partner_id} for the given tax codes in one query.
+
+        With a ResolutionCache, only the tax codes not resolved yet in the
+        run are queried.
+        """
+        vats = [vat for vat in set(vats) if vat]
+        if not vats:
+            return {}
+        if cache is not None:
+            cache.preload_partners(vats)
+            partner_map = {}
+            for vat in vats:
+                partner_ids = cache.partner_ids(vat)
+                if partner_ids:
+                    partner_map[vat] = partner_ids[0]
+            return partner_map
+        partner_map = {}
+        for row in self.env["res.partner"].search_read(
+            [("vat", "in", vats)], ["vat"], order="id",
+        ):
+            partner_map.setdefault(row["vat"], row["id"])
+        return partner_map
+
+    def _create_collected_invoices(self, config, provider, vals_list, check_existing=True):
+        """Create one page of collected invoices.
+
+        Already collected (provider, external_order_id) pairs and repeats
+        inside the page are dropped, then the remaining rows are inserted
+        with a single multi-record create(). If the batch insert fails, the
+        rows are retried one by one in savepoints so that a bad row is
+        reported without aborting the rest of the page.
+
+        Args:
+            config: ntp.collector.config record.
+            provider (str): Provider code of the rows.
+            vals_list (list): Create values, each with external_order_id.
+            check_existing (bool): Skip the dedup query when the caller has
+                                   already filtered out existing IDs.
+
+        Returns:
+            tuple: (created recordset, [(external_order_id, error message)])
+        """
+        existing = set()
+        if check_existing:
+            existing = self._get_existing_external_ids(
+                provider, [vals.get("external_order_id") for vals in vals_list],
+            )
+
+        to_create = []
+        seen = set()
+        for vals in vals_list:
+            external_id = vals.get("external_order_id")
+            if not external_id or external_id in existing or external_id in seen:
+                continue
+            seen.add(external_id)
+            to_create.append(vals)
+
+        if not to_create:
+            return self.browse(), []
+
+        inv_model = self.sudo().with_context(
+            mail_create_nolog=True, mail_create_nosubscribe=True,
         )
-        pushed = 0
-        errors = 0
+        try:
+            with self.env.cr.savepoint():
+                return inv_model.create(to_create), []
+        except Exception as e:
+            _logger.warning(
+                "Bulk create of %d %s invoices failed (%s), retrying row by row",
+                len(to_create), provider, e,
+            )
+            self.env.clear()
 
-        for inv in pending:
+        created = self.browse()
+        failures = []
+        for vals in to_create:
             try:
-                inv._push_to_bizzi()
-                pushed += 1
+                with self.env.cr.savepoint():
+                    created |= inv_model.create(vals)
             except Exception as e:
-                errors += 1
-                inv.write({
-                    "bizzi_status": "error",
-                    "error_message": str(e)[:1000],
-                    "last_error_date": fields.Datetime.now(),
-                })
-                _logger.error(
-                    "Bizzi push error for %s: %s", inv.name, e, exc_info=True,
-                )
-                self.env["ntp.collector.log"].log_operation(
-                    config=inv.config_id,
-                    provider=inv.provider,
-                    operation="push_bizzi",
-                    invoice=inv,
-                    success=False,
-                    error_message=str(e),
+                failures.append((vals.get("external_order_id"), str(e)))
+                _logger.warning(
+                    "Failed to create %s invoice record for %s: %s",
+                    provider, vals.get("external_order_id"), e,
                 )
 
-        _logger.info(
-            "Cron push to Bizzi completed: %d pushed, %d errors", pushed, errors,
-        )
+        if failures:
+            self.env["ntp.collector.log"].log_operation(
+                config=config,
+                provider=provider,
+                operation="fetch",
+                success=False,
+                records_processed=len(created),
+                error_message="%d invoice(s) could not be created:\n%s" % (
+                    len(failures),
+                    "\n".join("%s: %s" % failure for failure in failures),
+                ),
+            )
+        return created, failures
+
+    def _begin_sync_window(self, config, date_from=None):
+        """Return the config's sync state with its fetch window started.
+
+        The window runs from date_from (an explicit "fetch from" date) or,
+        by default, from the high-water transaction date, the last sync
+        date or 30 days ago, up to today. A window interrupted by an
+        earlier run is resumed at its last checkpoint instead.
+        """
+        sync_state = self.env["ntp.collector.sync.state"]._get_for_config(config)
+        if not date_from:
+            if sync_state.high_water_date:
+                date_from = sync_state.high_water_date
+            elif config.last_sync_date:
+                date_from = config.last_sync_date.date()
+            else:
+                date_from = (datetime.now() - timedelta(days=30)).date()
+        return sync_state._begin_window(date_from, datetime.now().date())
 
     # ====================================================================
     # Provider Fetch Methods
@@ -509,153 +1155,178 @@ class CollectedInvoice(models.Model):
     def _fetch_shopee_invoices(self, config):
         """Fetch completed orders from Shopee Open Platform API.
 
-        Uses the Order API (v2) to get orders completed since last sync.
-        Returns the count of new invoices created.
+        Uses the Order API (v2) to get orders completed in the config's
+        sync window, checkpointing every page. Returns the count of new
+        invoices created.
         """
         count = 0
         base_url = (config.api_url or "").rstrip("/")
         if not base_url:
             raise UserError("Shopee API URL is not configured.")
 
-        # Calculate time range
         now = int(time.time())
-        if config.last_sync_date:
-            time_from = int(config.last_sync_date.timestamp())
-        else:
-            # Default: last 30 days
-            time_from = now - (30 * 24 * 3600)
-
+        sync_state = self._begin_sync_window(config)
         path = "/api/v2/order/get_order_list"
-        sign, timestamp, partner_id, shop_id = self._shopee_sign(config, path)
-
-        params = {
-            "partner_id": partner_id,
-            "timestamp": timestamp,
-            "access_token": config.access_token or "",
-            "shop_id": shop_id,
-            "sign": sign,
-            "time_range_field": "create_time",
-            "time_from": time_from,
-            "time_to": now,
-            "page_size": 50,
-            "order_status": "COMPLETED",
-            "cursor": "",
-        }
-
-        has_more = True
-        page = 0
-        while has_more:
-            page += 1
-            try:
-                url = "%s%s" % (base_url, path)
-                response = self._make_request("get", url, config=config, params=params)
-                data = response.json()
-
-                if data.get("error"):
+        url = "%s%s" % (base_url, path)
+        pages_fetched = 0
+        aborted = False
+
+        # get_order_list only accepts short time ranges, so the sync window
+        # is fetched slice by slice, resuming at the checkpointed cursor
+        for slice_from, slice_to in sync_state._iter_slices():
+            sign, timestamp, partner_id, shop_id = self._shopee_sign(config, path)
+            params = {
+                "partner_id": partner_id,
+                "timestamp": timestamp,
+                "access_token": config.access_token or "",
+                "shop_id": shop_id,
+                "sign": sign,
+                "time_range_field": "create_time",
+                "time_from": int(
+                    datetime.combine(slice_from, datetime.min.time()).timestamp()
+                ),
+                "time_to": min(now, int(
+                    datetime.combine(
+                        slice_to + timedelta(days=1), datetime.min.time(),
+                    ).timestamp()
+                ) - 1),
+                "page_size": 50,
+                "order_status": "COMPLETED",
+                "cursor": sync_state.cursor or "",
+            }
+
+            page = sync_state.last_page
+            has_more = True
+            while has_more:
+                if pages_fetched >= MAX_FETCH_PAGES:
                     _logger.warning(
-                        "Shopee API error (page %d): %s - %s",
-                        page, data.get("error"), data.get("message"),
-                    )
-                    self.env["ntp.collector.log"].log_operation(
-                        config=config,
-                        operation="fetch",
-                        success=False,
-                        error_message="Shopee API: %s - %s" % (
-                            data.get("error"), data.get("message"),
-                        ),
-                        request_url=url,
+                        "Shopee fetch: reached %d pages for this run, "
+                        "resuming from the checkpoint next run.", MAX_FETCH_PAGES,
                     )
+                    aborted = True
                     break
+                self._check_fetch_deadline(config)
+                page += 1
+                pages_fetched += 1
+                try:
+                    response = self._make_request("get", url, config=config, params=params)
+                    data = response.json()
 
-                resp = data.get("response", {})
-                order_list = resp.get("order_list", [])
+                    if data.get("error"):
+                        _logger.warning(
+                            "Shopee API error (page %d): %s - %s",
+                            page, data.get("error"), data.get("message"),
+                        )
+                        self.env["ntp.collector.log"].log_operation(
+                            config=config,
+                            operation="fetch",
+                            success=False,
+                            error_message="Shopee API: %s - %s" % (
+                                data.get("error"), data.get("message"),
+                            ),
+                            request_url=url,
+                        )
+                        aborted = True
+                        break
 
-                _logger.info(
-                    "Shopee fetch page %d: %d orders returned",
-                    page, len(order_list),
-                )
+                    resp = data.get("response", {})
+                    order_list = resp.get("order_list", [])
 
-                for order in order_list:
-                    order_sn = order.get("order_sn", "")
-                    if not order_sn:
-                        continue
+                    _logger.info(
+                        "Shopee fetch %s to %s page %d: %d orders returned",
+                        slice_from, slice_to, page, len(order_list),
+                    )
 
-                    # Skip if already collected
-                    existing = self.search([
-                        ("provider", "=", "shopee"),
-                        ("external_order_id", "=", order_sn),
-                    ], limit=1)
-                    if existing:
-                        continue
+                    existing = self._get_existing_external_ids(
+                        "shopee", [order.get("order_sn") for order in order_list],
+                    )
+                    new_orders = [
+                        order for order in order_list
+                        if order.get("order_sn") and order["order_sn"] not in existing
+                    ]
 
-                    # Fetch order detail for amount
-                    try:
-                        detail = self._shopee_get_order_detail(
-                            config, base_url, partner_id, shop_id, order_sn,
-                        )
-                    except Exception as e:
-                        _logger.warning(
-                            "Failed to get Shopee order detail for %s: %s",
-                            order_sn, e,
-                        )
-                        detail = {"total_amount": 0.0}
-
-                    # Build notes with order detail info
-                    notes_parts = []
-                    if detail.get("items_text"):
-                        notes_parts.append("Items: %s" % detail["items_text"])
-                    if detail.get("buyer_username"):
-                        notes_parts.append("Buyer: %s" % detail["buyer_username"])
-                    if detail.get("shipping_carrier"):
-                        notes_parts.append("Shipping: %s" % detail["shipping_carrier"])
-                    if detail.get("tracking_number"):
-                        notes_parts.append("Tracking: %s" % detail["tracking_number"])
-                    if detail.get("payment_method"):
-                        notes_parts.append("Payment: %s" % detail["payment_method"])
-                    if detail.get("notes"):
-                        notes_parts.append("Note: %s" % detail["notes"])
-
-                    vals = {
-                        "name": "SHOPEE-%s" % order_sn,
-                        "provider": "shopee",
-                        "config_id": config.id,
-                        "external_order_id": order_sn,
-                        "transaction_date": datetime.fromtimestamp(
-                            order.get("create_time", now)
-                        ).date(),
-                        "total_amount": detail.get("total_amount", 0.0),
-                        "state": "draft",
-                        "bizzi_status": "pending",
-                        "notes": " | ".join(notes_parts) if notes_parts else "",
-                    }
-                    try:
-                        self.sudo().create(vals)
-                        count += 1
-                    except Exception as e:
-                        _logger.warning(
-                            "Failed to create invoice for Shopee order %s: %s",
-                            order_sn, e,
+                    # Fetch order detail for the whole page in one batched call
+                    details = {}
+                    if new_orders:
+                        details = self._shopee_get_order_details(
+                            config, base_url, partner_id, shop_id,
+                            [order["order_sn"] for order in new_orders],
                         )
 
-                # Pagination
-                has_more = resp.get("more", False)
-                if has_more:
-                    params["cursor"] = resp.get("next_cursor", "")
-                    # Re-sign for next page
-                    sign, timestamp, _, _ = self._shopee_sign(config, path)
-                    params["sign"] = sign
-                    params["timestamp"] = timestamp
-                else:
-                    has_more = False
+                    vals_list = []
+                    for order in new_orders:
+                        order_sn = order["order_sn"]
+                        detail = details.get(order_sn)
+                        if detail is None:
+                            _logger.warning(
+                                "No Shopee order detail returned for %s", order_sn,
+                            )
+                            detail = self._shopee_empty_order_detail()
+
+                        # Build notes with order detail info
+                        notes_parts = []
+                        if detail.get("items_text"):
+                            notes_parts.append("Items: %s" % detail["items_text"])
+                        if detail.get("buyer_username"):
+                            notes_parts.append("Buyer: %s" % detail["buyer_username"])
+                        if detail.get("shipping_carrier"):
+                            notes_parts.append("Shipping: %s" % detail["shipping_carrier"])
+                        if detail.get("tracking_number"):
+                            notes_parts.append("Tracking: %s" % detail["tracking_number"])
+                        if detail.get("payment_method"):
+                            notes_parts.append("Payment: %s" % detail["payment_method"])
+                        if detail.get("notes"):
+                            notes_parts.append("Note: %s" % detail["notes"])
+
+                        vals_list.append({
+                            "name": "SHOPEE-%s" % order_sn,
+                            "provider": "shopee",
+                            "config_id": config.id,
+                            "external_order_id": order_sn,
+                            "transaction_date": datetime.fromtimestamp(
+                                order.get("create_time", now)
+                            ).date(),
+                            "total_amount": detail.get("total_amount", 0.0),
+                            "state": "draft",
+                            "bizzi_status": "pending",
+                            "notes": " | ".join(notes_parts) if notes_parts else "",
+                        })
 
-            except requests.RequestException as e:
-                _logger.error("Shopee API request error (page %d): %s", page, e)
-                self.env["ntp.collector.log"].log_operation(
-                    config=config,
-                    operation="fetch",
-                    success=False,
-                    error_message="Request error: %s" % str(e),
-                )
+                    created, _failures = self._create_collected_invoices(
+                        config, "shopee", vals_list, check_existing=False,
+                    )
+                    count += len(created)
+
+                    # Pagination
+                    has_more = resp.get("more", False)
+                    next_cursor = resp.get("next_cursor", "") if has_more else ""
+                    sync_state._checkpoint(
+                        page,
+                        cursor=next_cursor,
+                        dates=[
+                            datetime.fromtimestamp(order.get("create_time", now)).date()
+                            for order in order_list
+                        ],
+                    )
+                    if has_more:
+                        params["cursor"] = next_cursor
+                        # Re-sign for next page
+                        sign, timestamp, _, _ = self._shopee_sign(config, path)
+                        params["sign"] = sign
+                        params["timestamp"] = timestamp
+
+                except requests.RequestException as e:
+                    _logger.error("Shopee API request error (page %d): %s", page, e)
+                    self.env["ntp.collector.log"].log_operation(
+                        config=config,
+                        operation="fetch",
+                        success=False,
+                        error_message="Request error: %s" % str(e),
+                    )
+                    aborted = True
+                    break
+
+            if aborted:
                 break
 
         # Auto-match after fetching
@@ -671,41 +1342,9 @@ class CollectedInvoice(models.Model):
         )
         return count
 
-    def _shopee_get_order_detail(self, config, base_url, partner_id, shop_id, order_sn):
-        """Fetch single order detail from Shopee for amount and item info.
-
-        Returns dict with keys:
-            total_amount, items_text, shipping_carrier, payment_method,
-            buyer_username, tracking_number, notes
-        """
-        path = "/api/v2/order/get_order_detail"
-        sign, timestamp, _, _ = self._shopee_sign(config, path)
-
-        # Request all useful optional fields
-        optional_fields = ",".join([
-            "buyer_user_id", "buyer_username", "estimated_shipping_fee",
-            "recipient_address", "actual_shipping_fee", "goods_to_declare",
-            "note", "note_update_time", "item_list", "pay_time",
-            "dropshipper", "dropshipper_phone", "split_up",
-            "buyer_cancel_reason", "cancel_by", "cancel_reason",
-            "actual_shipping_fee_confirmed", "buyer_cpf_id",
-            "fulfillment_flag", "pickup_done_time", "package_list",
-            "shipping_carrier", "payment_method", "total_amount",
-            "invoice_data", "checkout_shipping_carrier",
-            "reverse_shipping_fee", "order_chargeable_weight_gram",
-            "edt", "prescription_images", "prescription_check_status",
-        ])
-
-        params = {
-            "partner_id": partner_id,
-            "timestamp": timestamp,
-            "access_token": config.access_token or "",
-            "shop_id": shop_id,
-            "sign": sign,
-            "order_sn_list": order_sn,
-            "response_optional_fields": optional_fields,
-        }
-        result = {
+    def _shopee_empty_order_detail(self):
+        """Return the default detail dict used when Shopee has no data."""
+        return {
             "total_amount": 0.0,
             "items_text": "",
             "shipping_carrier": "",
@@ -715,62 +1354,134 @@ class CollectedInvoice(models.Model):
             "notes": "",
         }
 
-        try:
-            url = "%s%s" % (base_url, path)
-            response = self._make_request("get", url, config=config, params=params)
-            data = response.json()
-            resp = data.get("response", {})
-            orders = resp.get("order_list", [])
-            if not orders:
-                return result
-
-            order = orders[0]
-
-            # Amount
-            order_income = order.get("order_income", {})
-            if order_income:
-                result["total_amount"] = float(
-                    order_income.get("escrow_amount", 0)
-                    or order_income.get("buyer_total_amount", 0)
-                    or order.get("total_amount", 0)
+    def _shopee_get_order_detail(self, config, base_url, partner_id, shop_id, order_sn):
+        """Fetch single order detail from Shopee for amount and item info.
+
+        Kept for callers that need one order; page fetches should use
+        _shopee_get_order_details() instead.
+
+        Returns dict with keys:
+            total_amount, items_text, shipping_carrier, payment_method,
+            buyer_username, tracking_number, notes
+        """
+        details = self._shopee_get_order_details(
+            config, base_url, partner_id, shop_id, [order_sn],
+        )
+        return details.get(order_sn) or self._shopee_empty_order_detail()
+
+    def _shopee_get_order_details(self, config, base_url, partner_id, shop_id, order_sns):
+        """Fetch order details from Shopee in batches of order_sn values.
+
+        get_order_detail accepts up to SHOPEE_DETAIL_BATCH_SIZE order numbers
+        per call, so a full get_order_list page costs a single request.
+        A failing batch is logged and skipped; its orders are simply
+        missing from the result.
+
+        Args:
+            config: Collector config record.
+            base_url (str): Shopee API base URL.
+            partner_id (int): Shopee partner ID.
+            shop_id (int): Shopee shop ID.
+            order_sns (list): Order numbers to fetch.
+
+        Returns:
+            dict: {order_sn: detail dict} (see _shopee_get_order_detail).
+        """
+        path = "/api/v2/order/get_order_detail"
+        url = "%s%s" % (base_url, path)
+        results = {}
+
+        order_sns = list(dict.fromkeys(sn for sn in order_sns if sn))
+        for i in range(0, len(order_sns), SHOPEE_DETAIL_BATCH_SIZE):
+            batch = order_sns[i:i + SHOPEE_DETAIL_BATCH_SIZE]
+            sign, timestamp, _, _ = self._shopee_sign(config, path)
+            params = {
+                "partner_id": partner_id,
+                "timestamp": timestamp,
+                "access_token": config.access_token or "",
+                "shop_id": shop_id,
+                "sign": sign,
+                "order_sn_list": ",".join(batch),
+                "response_optional_fields": SHOPEE_DETAIL_OPTIONAL_FIELDS,
+            }
+
+            try:
+                response = self._make_request("get", url, config=config, params=params)
+                data = response.json()
+                if data.get("error"):
+                    _logger.warning(
+                        "Shopee order detail error for %d orders: %s - %s",
+                        len(batch), data.get("error"), data.get("message"),
+                    )
+                    continue
+                orders = data.get("response", {}).get("order_list", [])
+            except Exception as e:
+                _logger.warning(
+                    "Could not fetch Shopee order detail for %d orders (%s...): %s",
+                    len(batch), batch[0], e,
                 )
-            else:
-                result["total_amount"] = float(order.get("total_amount", 0))
-
-            # Items
-            item_list = order.get("item_list", [])
-            if item_list:
-                items_parts = []
-                for item in item_list:
-                    item_name = item.get("item_name", "")
-                    item_qty = item.get("model_quantity_purchased", 0) or item.get("quantity", 0)
-                    item_price = float(item.get("model_discounted_price", 0) or item.get("model_original_price", 0))
-                    item_sku = item.get("item_sku", "")
-                    items_parts.append(
-                        "%s x%d @ %.0f%s" % (
-                            item_name[:80], item_qty, item_price,
-                            " [%s]" % item_sku if item_sku else "",
-                        )
+                continue
+
+            for order in orders:
+                order_sn = order.get("order_sn")
+                if not order_sn:
+                    continue
+                try:
+                    results[order_sn] = self._shopee_parse_order_detail(order)
+                except Exception as e:
+                    _logger.warning(
+                        "Could not parse Shopee order detail for %s: %s",
+                        order_sn, e,
+                    )
+
+        return results
+
+    def _shopee_parse_order_detail(self, order):
+        """Extract amount, items, shipping and buyer info from a detail entry."""
+        result = self._shopee_empty_order_detail()
+
+        # Amount
+        order_income = order.get("order_income", {})
+        if order_income:
+            result["total_amount"] = float(
+                order_income.get("escrow_amount", 0)
+                or order_income.get("buyer_total_amount", 0)
+                or order.get("total_amount", 0)
+            )
+        else:
+            result["total_amount"] = float(order.get("total_amount", 0))
+
+        # Items
+        item_list = order.get("item_list", [])
+        if item_list:
+            items_parts = []
+            for item in item_list:
+                item_name = item.get("item_name", "")
+                item_qty = item.get("model_quantity_purchased", 0) or item.get("quantity", 0)
+                item_price = float(item.get("model_discounted_price", 0) or item.get("model_original_price", 0))
+                item_sku = item.get("item_sku", "")
+                items_parts.append(
+                    "%s x%d @ %.0f%s" % (
+                        item_name[:80], item_qty, item_price,
+                        " [%s]" % item_sku if item_sku else "",
                     )
-                result["items_text"] = "; ".join(items_parts)
-
-            # Shipping
-            result["shipping_carrier"] = order.get("shipping_carrier", "")
-            package_list = order.get("package_list", [])
-            if package_list:
-                tracking_numbers = [
-                    pkg.get("logistics_status", "") or pkg.get("package_number", "")
-                    for pkg in package_list
-                ]
-                result["tracking_number"] = ", ".join(filter(None, tracking_numbers))
-
-            # Payment & buyer
-            result["payment_method"] = order.get("payment_method", "")
-            result["buyer_username"] = order.get("buyer_username", "")
-            result["notes"] = order.get("note", "")
+                )
+            result["items_text"] = "; ".join(items_parts)
+
+        # Shipping
+        result["shipping_carrier"] = order.get("shipping_carrier", "")
+        package_list = order.get("package_list", [])
+        if package_list:
+            tracking_numbers = [
+                pkg.get("logistics_status", "") or pkg.get("package_number", "")
+                for pkg in package_list
+            ]
+            result["tracking_number"] = ", ".join(filter(None, tracking_numbers))
 
-        except Exception as e:
-            _logger.warning("Could not fetch Shopee order detail for %s: %s", order_sn, e)
+        # Payment & buyer
+        result["payment_method"] = order.get("payment_method", "")
+        result["buyer_username"] = order.get("buyer_username", "")
+        result["notes"] = order.get("note", "")
 
         return result
 
@@ -833,30 +1544,18 @@ class CollectedInvoice(models.Model):
         # ----------------------------------------------------------------
         # Build or restore session
         # ----------------------------------------------------------------
-        session = GrabEInvoiceSession(
+        session = self._bind_fetch_deadline(GrabEInvoiceSession(
             username=config.api_key,
             password=config.api_secret,
             base_url=base_url,
-        )
+        ))
 
         if captcha_answer:
             # Manual CAPTCHA flow: use stored CSRF token and cookies
-            param_key = "ntp_invoice_collector.grab_csrf_%d" % config.id
-            cookie_key = "ntp_invoice_collector.grab_cookies_%d" % config.id
-            get_param = self.env["ir.config_parameter"].sudo().get_param
-
-            csrf_token = get_param(param_key, default="")
-            cookies_json = get_param(cookie_key, default="{}")
-
-            if csrf_token:
-                session._csrf_token = csrf_token
-                try:
-                    cookies_dict = json.loads(cookies_json)
-                    for name, value in cookies_dict.items():
-                        session._session.cookies.set(name, value)
-                except Exception:
-                    pass
-            else:
+            state_json = self.env["ir.config_parameter"].sudo().get_param(
+                PORTAL_LOGIN_PARAM % config.id, default=""
+            )
+            if not session.restore_state(state_json) or not session._csrf_token:
                 session.prepare_login()
                 session.get_captcha_image()
 
@@ -891,9 +1590,7 @@ class CollectedInvoice(models.Model):
                 "Restoring Grab session from stored cookie for config '%s'",
                 config.name,
             )
-            session._session.cookies.set(".ASPXAUTH", config.grab_session_cookie)
-            session._authenticated = True
-            session._auth_time = datetime.now()
+            session.restore_aspx_cookie(config.grab_session_cookie)
 
             # Verify session is still valid
             if not session.check_session_valid():
@@ -975,203 +1672,219 @@ class CollectedInvoice(models.Model):
             config: ntp.collector.config record.
             session: GrabEInvoiceSession instance (authenticated).
 
+        Returns:
+            int: Number of new invoice records created.
+        """
+        return self._do_portal_fetch(config, session, PortalFetchAdapter(
+            provider="grab",
+            label="Grab",
+            date_from=config.grab_date_from,
+            note_fields=GRAB_NOTE_FIELDS,
+            save_session=self._save_grab_session,
+            after_page=self._attach_grab_page_files,
+            after_fetch=self._auto_match_grab_orders,
+        ))
+
+    def _save_grab_session(self, config, session):
+        """Store the .ASPXAUTH cookie for future cron runs."""
+        aspx_cookie = session.get_aspx_cookie()
+        if aspx_cookie:
+            config.write({"grab_session_cookie": aspx_cookie})
+
+    def _attach_grab_page_files(self, config, session, created):
+        """Download the PDF/XML attachments of the new invoices of a page."""
+        try:
+            self._attach_grab_invoice_files(
+                session, config, [(rec.id, rec.external_order_id) for rec in created],
+            )
+        except Exception as e:
+            _logger.warning("Could not download Grab invoice attachments: %s", e)
+
+    # ====================================================================
+    # Portal Fetch Engine (Grab, SPV, Shinhan)
+    # ====================================================================
+
+    def _do_portal_fetch(self, config, session, adapter):
+        """
+        Paginated fetch shared by the e-invoice portals.
+
+        Walks the sync window of the config one date slice at a time, from the
+        page after its checkpoint. The new invoices of each page are created in
+        one batch, then the page is checkpointed, so an interrupted run resumes
+        where it stopped. A run stops after MAX_FETCH_PAGES pages, when the
+        session expires or on a fetch error; PortalDeadlineExceeded (time
+        budget spent) is raised to fail the run.
+
+        Args:
+            config: ntp.collector.config record.
+            session: PortalSession instance (authenticated).
+            adapter (PortalFetchAdapter): What is specific to the provider.
+
         Returns:
             int: Number of new invoice records created.
         """
         count = 0
+        provider, label = adapter.provider, adapter.label
 
         # ----------------------------------------------------------------
-        # Calculate date range
+        # Start or resume the sync window
         # ----------------------------------------------------------------
-        if config.grab_date_from:
-            date_from_dt = config.grab_date_from
-        elif config.last_sync_date:
-            date_from_dt = config.last_sync_date.date()
-        else:
-            date_from_dt = (datetime.now() - timedelta(days=30)).date()
-
-        date_to_dt = datetime.now().date()
-
-        # Vietnamese date format: dd/MM/yyyy
-        date_from_str = date_from_dt.strftime("%d/%m/%Y")
-        date_to_str = date_to_dt.strftime("%d/%m/%Y")
+        sync_state = self._begin_sync_window(config, adapter.date_from)
+        # buyer tax codes repeat across pages: resolve each one once per run
+        partner_cache = ResolutionCache(self.env)
 
         _logger.info(
-            "Fetching Grab invoices for config '%s': %s to %s",
-            config.name, date_from_str, date_to_str,
+            "Fetching %s invoices for config '%s': %s to %s",
+            label, config.name, sync_state.window_from, sync_state.window_to,
         )
 
         # ----------------------------------------------------------------
-        # Paginate through invoice list
+        # Paginate through invoice list, one date slice at a time
         # ----------------------------------------------------------------
-        page = 1
         page_size = 50
-        has_more = True
-        total_fetched = 0
-
-        while has_more:
-            try:
-                result = session.fetch_invoices(
-                    date_from=date_from_str,
-                    date_to=date_to_str,
-                    page=page,
-                    page_size=page_size,
-                )
-            except ValueError as e:
-                # Session expired
-                _logger.warning(
-                    "Grab session expired for config '%s': %s", config.name, e
-                )
-                config.write({"grab_login_status": "session_expired"})
-                self.env["ntp.collector.log"].log_operation(
-                    config=config,
-                    operation="fetch",
-                    success=False,
-                    error_message="Session expired: %s" % str(e),
-                )
-                break
-            except Exception as e:
-                _logger.error(
-                    "Error fetching Grab invoices (page %d): %s", page, e
-                )
-                self.env["ntp.collector.log"].log_operation(
-                    config=config,
-                    operation="fetch",
-                    success=False,
-                    error_message="Fetch error (page %d): %s" % (page, str(e)),
-                )
-                break
-
-            invoices = result.get("invoices", [])
-            has_more = result.get("has_more", False)
+        pages_fetched = 0
+        aborted = False
 
-            _logger.info(
-                "Grab portal page %d: %d invoices returned (has_more=%s)",
-                page, len(invoices), has_more,
+        for slice_from, slice_to in sync_state._iter_slices():
+            page = sync_state.last_page + 1
+            pages = session.iter_pages(
+                slice_from, slice_to, page_size=page_size, start_page=page,
             )
 
-            if not invoices:
-                break
-
-            # ----------------------------------------------------------------
-            # Process each invoice
-            # ----------------------------------------------------------------
-            new_invoice_ids = []  # For batch attachment download
-
-            for inv_data in invoices:
-                inv_id = inv_data.get("id", "")
-                inv_number = inv_data.get("invoice_number", "")
-
-                # Prefer invoice_number as external_id — more stable and meaningful
-                # than HTML row IDs (which may change between sessions).
-                external_id = str(inv_number or inv_id)
-                if not external_id:
-                    continue
-
-                # Skip if already collected
-                existing = self.search([
-                    ("provider", "=", "grab"),
-                    ("external_order_id", "=", external_id),
-                ], limit=1)
-                if existing:
-                    continue
-
-                # Parse transaction date
-                raw_date = inv_data.get("invoice_date", "")
-                parsed_date = self._parse_grab_date(raw_date)
-
-                vals = {
-                    "name": "GRAB-%s" % (inv_number or external_id),
-                    "provider": "grab",
-                    "config_id": config.id,
-                    "external_order_id": external_id,
-                    "transaction_date": parsed_date,
-                    "total_amount": float(inv_data.get("total_amount", 0) or 0),
-                    "state": "draft",
-                    "bizzi_status": "pending",
-                    "notes": (
-                        "Series: %s | Buyer: %s | Tax: %s | Seller: %s | Status: %s"
-                        % (
-                            inv_data.get("series", ""),
-                            inv_data.get("buyer_name", ""),
-                            inv_data.get("buyer_tax_code", ""),
-                            inv_data.get("seller_name", ""),
-                            inv_data.get("status", ""),
-                        )
-                    ),
-                }
-
-                # Try to match partner by tax code
-                buyer_tax = inv_data.get("buyer_tax_code", "")
-                if buyer_tax:
-                    partner = self.env["res.partner"].search(
-                        [("vat", "=", buyer_tax)], limit=1
+            while True:
+                if pages_fetched >= MAX_FETCH_PAGES:
+                    _logger.warning(
+                        "%s fetch: reached %d pages for this run, "
+                        "resuming from the checkpoint next run.", label, MAX_FETCH_PAGES,
                     )
-                    if partner:
-                        vals["partner_id"] = partner.id
-
+                    aborted = True
+                    break
+                self._check_fetch_deadline(config)
                 try:
-                    new_rec = self.sudo().create(vals)
-                    count += 1
-                    total_fetched += 1
-                    new_invoice_ids.append((new_rec.id, external_id))
-
+                    page, invoices = next(pages)
+                except StopIteration:
+                    break
+                except PortalDeadlineExceeded:
+                    # out of time budget: fail the run, resume next time
+                    raise
+                except ValueError as e:
+                    # Session expired
+                    _logger.warning(
+                        "%s %s expired for config '%s': %s",
+                        label, adapter.expired_label, config.name, e,
+                    )
+                    config.write({"%s_login_status" % provider: "session_expired"})
                     self.env["ntp.collector.log"].log_operation(
                         config=config,
-                        provider="grab",
                         operation="fetch",
-                        invoice=new_rec,
-                        success=True,
-                    )
-                    _logger.debug(
-                        "Created Grab invoice record: %s (ID: %s)",
-                        vals["name"], external_id,
+                        success=False,
+                        error_message="%s expired: %s" % (adapter.expired_label, str(e)),
                     )
-
+                    aborted = True
+                    break
                 except Exception as e:
-                    _logger.warning(
-                        "Failed to create Grab invoice record for %s: %s",
-                        external_id, e,
+                    _logger.error(
+                        "Error fetching %s invoices (page %d): %s", label, page, e
+                    )
+                    self.env["ntp.collector.log"].log_operation(
+                        config=config,
+                        operation="fetch",
+                        success=False,
+                        error_message="Fetch error (page %d): %s" % (page, str(e)),
                     )
+                    aborted = True
+                    break
 
-            # ----------------------------------------------------------------
-            # Download PDF/XML attachments for new invoices (batch)
-            # ----------------------------------------------------------------
-            if new_invoice_ids:
-                try:
-                    self._attach_grab_invoice_files(
-                        session, config, new_invoice_ids
+                pages_fetched += 1
+
+                # ------------------------------------------------------------
+                # Create the new invoices of the page
+                # ------------------------------------------------------------
+                partner_map = self._map_partners_by_vat(
+                    [inv_data.get("buyer_tax_code", "") for inv_data in invoices],
+                    partner_cache,
+                )
+                vals_list = []
+                for inv_data in invoices:
+                    vals = self._portal_invoice_vals(config, adapter, inv_data)
+                    if not vals:
+                        continue
+                    # Match partner by tax code
+                    partner_id = partner_map.get(inv_data.get("buyer_tax_code", ""))
+                    if partner_id:
+                        vals["partner_id"] = partner_id
+                    vals_list.append(vals)
+
+                created, _failures = self._create_collected_invoices(
+                    config, provider, vals_list,
+                )
+                count += len(created)
+                if created:
+                    self.env["ntp.collector.log"].log_operation(
+                        config=config,
+                        provider=provider,
+                        operation="fetch",
+                        success=True,
+                        records_processed=len(created),
                     )
-                except Exception as e:
-                    _logger.warning(
-                        "Could not download Grab invoice attachments: %s", e
+                    _logger.debug(
+                        "Created %d %s invoice records (page %d)", len(created), label, page,
                     )
+                    if adapter.after_page:
+                        adapter.after_page(config, session, created)
 
-            page += 1
-            if page > 100:  # Safety limit
-                _logger.warning("Grab fetch: reached page limit (100), stopping.")
+                sync_state._checkpoint(
+                    page, dates=[vals["transaction_date"] for vals in vals_list],
+                )
+                page += 1
+
+            if aborted:
                 break
 
-        # ----------------------------------------------------------------
-        # Auto-match after fetching
-        # ----------------------------------------------------------------
-        if count > 0:
+        _logger.debug(
+            "%s partner lookups for '%s': %s", label, config.name, partner_cache.stats,
+        )
+
+        if count > 0 and adapter.after_fetch:
             try:
-                self._auto_match_grab_orders()
+                adapter.after_fetch()
             except Exception as e:
-                _logger.error("Auto-match error after Grab fetch: %s", e)
+                _logger.error("Error after %s fetch: %s", label, e)
 
-        # Store .ASPXAUTH cookie for future cron runs
-        aspx_cookie = session._session.cookies.get(".ASPXAUTH")
-        if aspx_cookie:
-            config.write({"grab_session_cookie": aspx_cookie})
+        # Store the session (cookie, token) for future cron runs
+        adapter.save_session(config, session)
 
         _logger.info(
-            "Grab portal fetch completed for config '%s': %d new invoices",
-            config.name, count,
+            "%s portal fetch completed for config '%s': %d new invoices",
+            label, config.name, count,
         )
         return count
 
+    def _portal_invoice_vals(self, config, adapter, inv_data):
+        """
+        Create values of one invoice listed by a portal, None if it has no number.
+
+        The invoice number is preferred as external_order_id over the row id of
+        the listing, which may change between sessions.
+        """
+        external_id = str(inv_data.get("invoice_number", "") or inv_data.get("id", ""))
+        if not external_id:
+            return None
+        return {
+            "name": "%s-%s" % (adapter.provider.upper(), external_id),
+            "provider": adapter.provider,
+            "config_id": config.id,
+            "external_order_id": external_id,
+            "transaction_date": self._parse_grab_date(inv_data.get("invoice_date", "")),
+            "total_amount": float(inv_data.get("total_amount", 0) or 0),
+            "state": "draft",
+            "bizzi_status": "pending",
+            "notes": " | ".join(
+                "%s: %s" % (title, inv_data.get(key, ""))
+                for title, key in adapter.note_fields
+            ),
+        }
+
     def _parse_grab_date(self, raw_date):
         """
         Parse a date string from the Grab portal into an Odoo Date.
@@ -1212,6 +1925,10 @@ class CollectedInvoice(models.Model):
         """
         Download PDF/XML files for new Grab invoices and attach them to records.
 
+        The ZIP archive is streamed into a spooled temporary file and its
+        members are read one by one, so memory use stays bounded by one
+        attachment batch regardless of the archive size.
+
         Args:
             session (GrabEInvoiceSession): Authenticated session.
             config: ntp.collector.config record.
@@ -1220,95 +1937,179 @@ class CollectedInvoice(models.Model):
         if not invoice_id_pairs:
             return
 
-        external_ids = [pair[1] for pair in invoice_id_pairs]
-        odoo_id_map = {pair[1]: pair[0] for pair in invoice_id_pairs}
+        odoo_id_map = {ext_id: odoo_id for odoo_id, ext_id in invoice_id_pairs if ext_id}
+        external_ids = list(odoo_id_map)
 
         _logger.info(
             "Downloading attachments for %d Grab invoices...", len(external_ids)
         )
 
-        try:
-            zip_content = session.download_invoice_files(
-                invoice_ids=external_ids,
-                allow_pdf=True,
-                allow_xml=True,
-            )
-        except Exception as e:
-            _logger.warning("Failed to download Grab invoice files: %s", e)
-            return
+        with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_MEMORY) as spool:
+            try:
+                size = session.download_invoice_files_to(
+                    spool,
+                    invoice_ids=external_ids,
+                    allow_pdf=True,
+                    allow_xml=True,
+                )
+            except Exception as e:
+                _logger.warning("Failed to download Grab invoice files: %s", e)
+                return
 
-        if not zip_content:
-            _logger.info("No attachment data returned for Grab invoices.")
-            return
+            if not size:
+                _logger.info("No attachment data returned for Grab invoices.")
+                return
 
-        # Extract ZIP and attach files to corresponding records
-        try:
-            with zipfile.ZipFile(io.BytesIO(zip_content)) as zf:
-                file_list = zf.namelist()
-                _logger.info(
-                    "Grab attachment ZIP contains %d file(s): %s",
-                    len(file_list),
-                    ", ".join(file_list[:20]) + ("..." if len(file_list) > 20 else ""),
+            spool.seek(0)
+            try:
+                with zipfile.ZipFile(spool) as zf:
+                    self._import_grab_zip_members(zf, odoo_id_map)
+            except zipfile.BadZipFile:
+                _logger.warning(
+                    "Downloaded Grab file is not a valid ZIP archive "
+                    "(size=%d bytes). Skipping attachment.",
+                    size,
                 )
 
-                for filename in file_list:
-                    file_data = zf.read(filename)
-                    if not file_data:
-                        _logger.warning("Empty file in ZIP: '%s', skipping.", filename)
-                        continue
+    def _import_grab_zip_members(self, zf, odoo_id_map):
+        """Attach the members of a Grab ZIP archive to their invoices.
+
+        Each file name is matched against all external IDs in one regex
+        scan (longest ID first, so "INV-12" never wins over "INV-123").
+        Attachments are created in batches of ATTACHMENT_BATCH_SIZE files
+        or ATTACHMENT_BATCH_BYTES bytes.
+
+        Args:
+            zf (zipfile.ZipFile): Open archive.
+            odoo_id_map (dict): {external_grab_id: odoo_record_id}
+        """
+        members = [info for info in zf.infolist() if not info.is_dir()]
+        _logger.info(
+            "Grab attachment ZIP contains %d file(s): %s",
+            len(members),
+            ", ".join(info.filename for info in members[:20])
+            + ("..." if len(members) > 20 else ""),
+        )
+
+        id_pattern = re.compile("|".join(
+            re.escape(ext_id) for ext_id in sorted(odoo_id_map, key=len, reverse=True)
+        ))
+
+        batch = []
+        batch_bytes = 0
+        attached = 0
+        for info in members:
+            filename = info.filename
+            match = id_pattern.search(filename)
+            if not match:
+                # Cannot determine which invoice this file belongs to — skip.
+                # Attaching to a random record would cause incorrect data.
+                _logger.warning(
+                    "Could not match ZIP file '%s' to any invoice "
+                    "(tried %d IDs). Skipping.",
+                    filename, len(odoo_id_map),
+                )
+                continue
+
+            file_data = self._read_zip_member(zf, info)
+            if not file_data:
+                continue
+
+            lower_name = filename.lower()
+            batch.append({
+                "name": filename,
+                "raw": file_data,
+                "res_model": self._name,
+                "res_id": odoo_id_map[match.group(0)],
+                "mimetype": (
+                    "application/pdf" if lower_name.endswith(".pdf")
+                    else "application/xml" if lower_name.endswith(".xml")
+                    else "application/octet-stream"
+                ),
+            })
+            batch_bytes += len(file_data)
+            if len(batch) >= ATTACHMENT_BATCH_SIZE or batch_bytes >= ATTACHMENT_BATCH_BYTES:
+                attached += self._create_invoice_attachments(batch)
+                batch, batch_bytes = [], 0
+
+        if batch:
+            attached += self._create_invoice_attachments(batch)
+        _logger.info("Attached %d Grab invoice file(s)", attached)
 
-                    # Try to match filename to an invoice external ID
-                    matched_odoo_id = None
-                    for ext_id in external_ids:
-                        if ext_id in filename:
-                            matched_odoo_id = odoo_id_map.get(ext_id)
-                            break
+    def _read_zip_member(self, zf, info):
+        """Read one ZIP member in ATTACHMENT_READ_CHUNK chunks.
+
+        Returns:
+            bytes: File content, or None if the member is empty, too large
+                   (ATTACHMENT_MAX_FILE_SIZE) or unreadable.
+        """
+        if info.file_size > ATTACHMENT_MAX_FILE_SIZE:
+            _logger.warning(
+                "ZIP file '%s' is too large (%d bytes), skipping.",
+                info.filename, info.file_size,
+            )
+            return None
 
-                    if not matched_odoo_id:
-                        # Cannot determine which invoice this file belongs to — skip.
-                        # Attaching to a random record would cause incorrect data.
+        chunks = []
+        size = 0
+        try:
+            with zf.open(info) as member:
+                while True:
+                    chunk = member.read(ATTACHMENT_READ_CHUNK)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > ATTACHMENT_MAX_FILE_SIZE:
+                        # The header under-reported the size
                         _logger.warning(
-                            "Could not match ZIP file '%s' to any invoice "
-                            "(tried %d IDs: %s). Skipping.",
-                            filename,
-                            len(external_ids),
-                            ", ".join(external_ids[:5]) + ("..." if len(external_ids) > 5 else ""),
+                            "ZIP file '%s' exceeds %d bytes, skipping.",
+                            info.filename, ATTACHMENT_MAX_FILE_SIZE,
                         )
-                        continue
+                        return None
+                    chunks.append(chunk)
+        except (zipfile.BadZipFile, OSError) as e:
+            _logger.warning("Could not read ZIP file '%s': %s", info.filename, e)
+            return None
 
-                    if matched_odoo_id:
-                        try:
-                            attachment = self.env["ir.attachment"].sudo().create({
-                                "name": filename,
-                                "datas": base64.b64encode(file_data).decode("utf-8"),
-                                "res_model": "ntp.collected.invoice",
-                                "res_id": matched_odoo_id,
-                                "mimetype": (
-                                    "application/pdf" if filename.lower().endswith(".pdf")
-                                    else "application/xml" if filename.lower().endswith(".xml")
-                                    else "application/octet-stream"
-                                ),
-                            })
-                            # Link attachment to the invoice record
-                            invoice_rec = self.browse(matched_odoo_id)
-                            invoice_rec.sudo().write({
-                                "attachment_ids": [(4, attachment.id)],
-                            })
-                            _logger.debug(
-                                "Attached '%s' to Grab invoice record %d",
-                                filename, matched_odoo_id,
-                            )
-                        except Exception as e:
-                            _logger.warning(
-                                "Failed to create attachment '%s': %s", filename, e
-                            )
+        if not size:
+            _logger.warning("Empty file in ZIP: '%s', skipping.", info.filename)
+            return None
+        return b"".join(chunks)
 
-        except zipfile.BadZipFile:
+    def _create_invoice_attachments(self, vals_list):
+        """Create a batch of invoice attachments and link them in one query.
+
+        Args:
+            vals_list (list): ir.attachment create values with res_id set
+                              to the collected invoice.
+
+        Returns:
+            int: Number of attachments created.
+        """
+        try:
+            with self.env.cr.savepoint():
+                attachments = self.env["ir.attachment"].sudo().create(vals_list)
+        except Exception as e:
             _logger.warning(
-                "Downloaded Grab file is not a valid ZIP archive "
-                "(size=%d bytes). Skipping attachment.",
-                len(zip_content),
+                "Failed to create %d invoice attachments: %s", len(vals_list), e,
             )
+            return 0
+
+        field = self._fields["attachment_ids"]
+        rows = [(att.res_id, att.id) for att in attachments]
+        self.env.cr.execute(
+            "INSERT INTO {table} ({invoice_col}, {attachment_col}) "
+            "VALUES {values} ON CONFLICT DO NOTHING".format(
+                table=field.relation,
+                invoice_col=field.column1,
+                attachment_col=field.column2,
+                values=", ".join(["%s"] * len(rows)),
+            ),
+            rows,
+        )
+        self.invalidate_cache(["attachment_ids"], list({res_id for res_id, _att in rows}))
+        _logger.debug("Attached %d files to Grab invoices", len(rows))
+        return len(rows)
 
     # ====================================================================
     # SPV Portal Fetch Methods
@@ -1358,25 +2159,18 @@ class CollectedInvoice(models.Model):
                 "SPV Password is not configured for '%s'." % config.name
             )
 
-        session = SpvEInvoiceSession(
+        session = self._bind_fetch_deadline(SpvEInvoiceSession(
             username=config.api_key,
             password=config.api_secret,
             base_url=base_url,
-        )
+        ))
 
         if captcha_answer:
             # Manual CAPTCHA flow: restore stored session state
-            csrf_key = "ntp_invoice_collector.spv_csrf_%d" % config.id
-            nonce_key = "ntp_invoice_collector.spv_nonce_%d" % config.id
-            cookie_key = "ntp_invoice_collector.spv_cookies_%d" % config.id
-            get_param = self.env["ir.config_parameter"].sudo().get_param
-
-            session._csrf_token = get_param(csrf_key, default="")
-            session._nonce = get_param(nonce_key, default="")
-            cookies_json = get_param(cookie_key, default="{}")
-            session.restore_session(cookies_json)
-
-            if not session._csrf_token:
+            state_json = self.env["ir.config_parameter"].sudo().get_param(
+                PORTAL_LOGIN_PARAM % config.id, default=""
+            )
+            if not session.restore_state(state_json) or not session._csrf_token:
                 session.prepare_login()
                 session.get_captcha_image_b64()
 
@@ -1439,196 +2233,61 @@ class CollectedInvoice(models.Model):
             # No session — try auto-login
             use_auto = getattr(config, "spv_use_auto_captcha", True)
             if use_auto:
-                _logger.info(
-                    "No stored SPV session for '%s', trying auto-login...",
-                    config.name,
-                )
-                openai_key = getattr(config, "spv_openai_api_key", None) or None
-                login_ok = session.auto_login(openai_api_key=openai_key)
-                if login_ok:
-                    config.write({"spv_login_status": "logged_in"})
-                    cookie_val = session.get_session_cookie()
-                    if cookie_val:
-                        config.write({"spv_session_cookie": cookie_val})
-                else:
-                    error_detail = session.last_error or "Unknown error"
-                    config.write({"spv_login_status": "error"})
-                    self.env["ntp.collector.log"].log_operation(
-                        config=config,
-                        operation="fetch",
-                        success=False,
-                        error_message="SPV auto-login failed. Detail: %s" % error_detail,
-                    )
-                    return 0
-            else:
-                _logger.warning(
-                    "SPV config '%s' has no active session and auto-CAPTCHA is disabled.",
-                    config.name,
-                )
-                return 0
-
-        return self._do_spv_fetch(config, session)
-
-    def _do_spv_fetch(self, config, session):
-        """
-        Core SPV invoice fetch logic.
-
-        Args:
-            config: ntp.collector.config record.
-            session: SpvEInvoiceSession instance (authenticated).
-
-        Returns:
-            int: Number of new invoice records created.
-        """
-        count = 0
-
-        # Calculate date range
-        if config.spv_date_from:
-            date_from_dt = config.spv_date_from
-        elif config.last_sync_date:
-            date_from_dt = config.last_sync_date.date()
-        else:
-            date_from_dt = (datetime.now() - timedelta(days=30)).date()
-
-        date_to_dt = datetime.now().date()
-        date_from_str = date_from_dt.strftime("%d/%m/%Y")
-        date_to_str = date_to_dt.strftime("%d/%m/%Y")
-
-        _logger.info(
-            "Fetching SPV invoices for config '%s': %s to %s",
-            config.name, date_from_str, date_to_str,
-        )
-
-        page = 1
-        page_size = 50
-        has_more = True
-
-        while has_more:
-            try:
-                result = session.fetch_invoices(
-                    date_from=date_from_str,
-                    date_to=date_to_str,
-                    page=page,
-                    page_size=page_size,
-                )
-            except ValueError as e:
-                _logger.warning(
-                    "SPV session expired for config '%s': %s", config.name, e
-                )
-                config.write({"spv_login_status": "session_expired"})
-                self.env["ntp.collector.log"].log_operation(
-                    config=config,
-                    operation="fetch",
-                    success=False,
-                    error_message="Session expired: %s" % str(e),
-                )
-                break
-            except Exception as e:
-                _logger.error(
-                    "Error fetching SPV invoices (page %d): %s", page, e
-                )
-                self.env["ntp.collector.log"].log_operation(
-                    config=config,
-                    operation="fetch",
-                    success=False,
-                    error_message="Fetch error (page %d): %s" % (page, str(e)),
-                )
-                break
-
-            invoices = result.get("invoices", [])
-            has_more = result.get("has_more", False)
-
-            _logger.info(
-                "SPV portal page %d: %d invoices returned (has_more=%s)",
-                page, len(invoices), has_more,
-            )
-
-            if not invoices:
-                break
-
-            for inv_data in invoices:
-                inv_number = str(inv_data.get("invoice_number", "") or inv_data.get("id", ""))
-                if not inv_number:
-                    continue
-
-                # Skip if already collected
-                existing = self.search([
-                    ("provider", "=", "spv"),
-                    ("external_order_id", "=", inv_number),
-                ], limit=1)
-                if existing:
-                    continue
-
-                raw_date = inv_data.get("invoice_date", "")
-                parsed_date = self._parse_grab_date(raw_date)  # Reuse date parser
-
-                vals = {
-                    "name": "SPV-%s" % inv_number,
-                    "provider": "spv",
-                    "config_id": config.id,
-                    "external_order_id": inv_number,
-                    "transaction_date": parsed_date,
-                    "total_amount": float(inv_data.get("total_amount", 0) or 0),
-                    "state": "draft",
-                    "bizzi_status": "pending",
-                    "notes": (
-                        "Series: %s | Seller: %s | Seller Tax: %s | "
-                        "Buyer: %s | Buyer Tax: %s | Status: %s"
-                        % (
-                            inv_data.get("series", ""),
-                            inv_data.get("seller_name", ""),
-                            inv_data.get("seller_tax_code", ""),
-                            inv_data.get("buyer_name", ""),
-                            inv_data.get("buyer_tax_code", ""),
-                            inv_data.get("status", ""),
-                        )
-                    ),
-                }
-
-                # Try to match partner by tax code
-                buyer_tax = inv_data.get("buyer_tax_code", "")
-                if buyer_tax:
-                    partner = self.env["res.partner"].search(
-                        [("vat", "=", buyer_tax)], limit=1
-                    )
-                    if partner:
-                        vals["partner_id"] = partner.id
-
-                try:
-                    new_rec = self.sudo().create(vals)
-                    count += 1
+                _logger.info(
+                    "No stored SPV session for '%s', trying auto-login...",
+                    config.name,
+                )
+                openai_key = getattr(config, "spv_openai_api_key", None) or None
+                login_ok = session.auto_login(openai_api_key=openai_key)
+                if login_ok:
+                    config.write({"spv_login_status": "logged_in"})
+                    cookie_val = session.get_session_cookie()
+                    if cookie_val:
+                        config.write({"spv_session_cookie": cookie_val})
+                else:
+                    error_detail = session.last_error or "Unknown error"
+                    config.write({"spv_login_status": "error"})
                     self.env["ntp.collector.log"].log_operation(
                         config=config,
-                        provider="spv",
                         operation="fetch",
-                        invoice=new_rec,
-                        success=True,
-                    )
-                    _logger.debug(
-                        "Created SPV invoice record: %s", vals["name"]
-                    )
-                except Exception as e:
-                    _logger.warning(
-                        "Failed to create SPV invoice record for %s: %s",
-                        inv_number, e,
+                        success=False,
+                        error_message="SPV auto-login failed. Detail: %s" % error_detail,
                     )
+                    return 0
+            else:
+                _logger.warning(
+                    "SPV config '%s' has no active session and auto-CAPTCHA is disabled.",
+                    config.name,
+                )
+                return 0
 
-            page += 1
-            if page > 100:
-                _logger.warning("SPV fetch: reached page limit (100), stopping.")
-                break
+        return self._do_spv_fetch(config, session)
+
+    def _do_spv_fetch(self, config, session):
+        """
+        Core SPV invoice fetch logic.
+
+        Args:
+            config: ntp.collector.config record.
+            session: SpvEInvoiceSession instance (authenticated).
 
-        # Store session cookie for future cron runs
+        Returns:
+            int: Number of new invoice records created.
+        """
+        return self._do_portal_fetch(config, session, PortalFetchAdapter(
+            provider="spv",
+            label="SPV",
+            date_from=config.spv_date_from,
+            note_fields=SPV_NOTE_FIELDS,
+            save_session=self._save_spv_session,
+        ))
+
+    def _save_spv_session(self, config, session):
+        """Store the session cookie for future cron runs."""
         cookie_val = session.get_session_cookie()
         if cookie_val:
             config.write({"spv_session_cookie": cookie_val})
 
-        _logger.info(
-            "SPV portal fetch completed for config '%s': %d new invoices",
-            config.name, count,
-        )
-        return count
-
     # ====================================================================
     # Shinhan Portal Fetch Methods
     # ====================================================================
@@ -1677,20 +2336,18 @@ class CollectedInvoice(models.Model):
                 "Shinhan Password is not configured for '%s'." % config.name
             )
 
-        session = ShinhanEInvoiceSession(
+        session = self._bind_fetch_deadline(ShinhanEInvoiceSession(
             username=config.api_key,
             password=config.api_secret,
             base_url=base_url,
-        )
+        ))
 
         if captcha_answer:
-            # Manual CAPTCHA flow
-            captcha_key = "ntp_invoice_collector.shinhan_captcha_text_%d" % config.id
-            server_captcha = self.env["ir.config_parameter"].sudo().get_param(
-                captcha_key, default=""
-            )
-            if server_captcha:
-                session._captcha_text = server_captcha
+            # Manual CAPTCHA flow: the CAPTCHA is bound to the cookies of
+            # the session that loaded it
+            session.restore_state(self.env["ir.config_parameter"].sudo().get_param(
+                PORTAL_LOGIN_PARAM % config.id, default=""
+            ))
 
             _logger.info(
                 "Attempting Shinhan portal login for config '%s' (manual CAPTCHA)...",
@@ -1814,292 +2471,158 @@ class CollectedInvoice(models.Model):
         Returns:
             int: Number of new invoice records created.
         """
-        count = 0
-
-        # Calculate date range
-        if config.shinhan_date_from:
-            date_from_dt = config.shinhan_date_from
-        elif config.last_sync_date:
-            date_from_dt = config.last_sync_date.date()
-        else:
-            date_from_dt = (datetime.now() - timedelta(days=30)).date()
-
-        date_to_dt = datetime.now().date()
-        date_from_str = date_from_dt.strftime("%Y-%m-%d")
-        date_to_str = date_to_dt.strftime("%Y-%m-%d")
-
-        _logger.info(
-            "Fetching Shinhan invoices for config '%s': %s to %s",
-            config.name, date_from_str, date_to_str,
-        )
-
-        page = 1
-        page_size = 50
-        has_more = True
-
-        while has_more:
-            try:
-                result = session.fetch_invoices(
-                    date_from=date_from_str,
-                    date_to=date_to_str,
-                    page=page,
-                    page_size=page_size,
-                )
-            except ValueError as e:
-                _logger.warning(
-                    "Shinhan JWT expired for config '%s': %s", config.name, e
-                )
-                config.write({"shinhan_login_status": "session_expired"})
-                self.env["ntp.collector.log"].log_operation(
-                    config=config,
-                    operation="fetch",
-                    success=False,
-                    error_message="JWT expired: %s" % str(e),
-                )
-                break
-            except Exception as e:
-                _logger.error(
-                    "Error fetching Shinhan invoices (page %d): %s", page, e
-                )
-                self.env["ntp.collector.log"].log_operation(
-                    config=config,
-                    operation="fetch",
-                    success=False,
-                    error_message="Fetch error (page %d): %s" % (page, str(e)),
-                )
-                break
-
-            invoices = result.get("invoices", [])
-            has_more = result.get("has_more", False)
-
-            _logger.info(
-                "Shinhan portal page %d: %d invoices returned (has_more=%s)",
-                page, len(invoices), has_more,
-            )
-
-            if not invoices:
-                break
-
-            for inv_data in invoices:
-                inv_number = str(inv_data.get("invoice_number", "") or inv_data.get("id", ""))
-                if not inv_number:
-                    continue
-
-                # Skip if already collected
-                existing = self.search([
-                    ("provider", "=", "shinhan"),
-                    ("external_order_id", "=", inv_number),
-                ], limit=1)
-                if existing:
-                    continue
-
-                raw_date = inv_data.get("invoice_date", "")
-                parsed_date = self._parse_grab_date(raw_date)  # Reuse date parser
-
-                vals = {
-                    "name": "SHINHAN-%s" % inv_number,
-                    "provider": "shinhan",
-                    "config_id": config.id,
-                    "external_order_id": inv_number,
-                    "transaction_date": parsed_date,
-                    "total_amount": float(inv_data.get("total_amount", 0) or 0),
-                    "state": "draft",
-                    "bizzi_status": "pending",
-                    "notes": (
-                        "Series: %s | Seller: %s | Seller Tax: %s | "
-                        "Buyer: %s | Buyer Tax: %s | Type: %s | Status: %s"
-                        % (
-                            inv_data.get("series", ""),
-                            inv_data.get("seller_name", ""),
-                            inv_data.get("seller_tax_code", ""),
-                            inv_data.get("buyer_name", ""),
-                            inv_data.get("buyer_tax_code", ""),
-                            inv_data.get("invoice_type", ""),
-                            inv_data.get("status", ""),
-                        )
-                    ),
-                }
-
-                # Try to match partner by tax code
-                buyer_tax = inv_data.get("buyer_tax_code", "")
-                if buyer_tax:
-                    partner = self.env["res.partner"].search(
-                        [("vat", "=", buyer_tax)], limit=1
-                    )
-                    if partner:
-                        vals["partner_id"] = partner.id
-
-                try:
-                    new_rec = self.sudo().create(vals)
-                    count += 1
-                    self.env["ntp.collector.log"].log_operation(
-                        config=config,
-                        provider="shinhan",
-                        operation="fetch",
-                        invoice=new_rec,
-                        success=True,
-                    )
-                    _logger.debug(
-                        "Created Shinhan invoice record: %s", vals["name"]
-                    )
-                except Exception as e:
-                    _logger.warning(
-                        "Failed to create Shinhan invoice record for %s: %s",
-                        inv_number, e,
-                    )
-
-            page += 1
-            if page > 100:
-                _logger.warning("Shinhan fetch: reached page limit (100), stopping.")
-                break
-
-        # Update stored JWT token
+        return self._do_portal_fetch(config, session, PortalFetchAdapter(
+            provider="shinhan",
+            label="Shinhan",
+            date_from=config.shinhan_date_from,
+            note_fields=SHINHAN_NOTE_FIELDS,
+            save_session=self._save_shinhan_session,
+            expired_label="JWT",
+        ))
+
+    def _save_shinhan_session(self, config, session):
+        """Update the stored JWT token."""
         jwt_token = session.get_jwt_token()
         if jwt_token:
             config.write({"shinhan_jwt_token": jwt_token})
 
-        _logger.info(
-            "Shinhan portal fetch completed for config '%s': %d new invoices",
-            config.name, count,
-        )
-        return count
-
     # ====================================================================
     # Auto-Matching
     # ====================================================================
 
-    def _auto_match_shopee_orders(self):
-        """Auto-match collected Shopee invoices with existing sale orders."""
-        unmatched = self.search([
-            ("provider", "=", "shopee"),
-            ("sale_order_id", "=", False),
-            ("external_order_id", "!=", False),
-            ("state", "=", "draft"),
-        ])
-        matched_count = 0
-        for inv in unmatched:
-            try:
-                so = self.env["sale.order"].search([
-                    ("x_shopee_order_id", "=", inv.external_order_id),
-                ], limit=1)
-                if so:
-                    inv.write({
-                        "sale_order_id": so.id,
-                        "partner_id": so.partner_id.id,
-                        "state": "matched",
-                    })
-                    matched_count += 1
-                    self.env["ntp.collector.log"].log_operation(
-                        config=inv.config_id,
-                        provider="shopee",
-                        operation="match",
-                        invoice=inv,
-                        success=True,
-                    )
-            except Exception as e:
-                _logger.warning(
-                    "Auto-match error for invoice %s: %s", inv.name, e,
+    def _find_sale_orders(self):
+        """Resolve the sale order of each invoice in self by external_order_id.
+
+        All external IDs of a provider are looked up together, in one
+        sale.order query per reference field and MATCH_BATCH_SIZE IDs
+        (served by the unique indexes on x_shopee_order_id/x_grab_order_id).
+
+        Returns:
+            dict: {invoice id: sale.order record}
+        """
+        invoices_by_fields = defaultdict(list)
+        for inv in self:
+            if inv.external_order_id:
+                ref_fields = SALE_ORDER_REF_FIELDS.get(
+                    inv.provider, DEFAULT_SALE_ORDER_REF_FIELDS,
                 )
+                invoices_by_fields[ref_fields].append(inv)
+
+        matches = {}
+        for ref_fields, invoices in invoices_by_fields.items():
+            external_ids = list({inv.external_order_id for inv in invoices})
+            orders = {}
+            # The first reference field wins when several match
+            for ref_field in reversed(ref_fields):
+                for ids_chunk in split_every(MATCH_BATCH_SIZE, external_ids):
+                    for so in self.env["sale.order"].search([(ref_field, "in", ids_chunk)]):
+                        orders[so[ref_field]] = so
+            for inv in invoices:
+                so = orders.get(inv.external_order_id)
+                if so:
+                    matches[inv.id] = so
+        return matches
 
-        if matched_count:
-            _logger.info(
-                "Auto-matched %d Shopee invoices with sale orders", matched_count,
+    def _match_sale_orders(self):
+        """Match the invoices in self with their sale orders.
+
+        Matches are written with one write per sale order.
+
+        Returns:
+            dict: {invoice id: sale.order record} of the matched invoices
+        """
+        matches = self._find_sale_orders()
+        invoice_ids_by_so = defaultdict(list)
+        for inv_id, so in matches.items():
+            invoice_ids_by_so[so].append(inv_id)
+        for so, inv_ids in invoice_ids_by_so.items():
+            self.browse(inv_ids).write({
+                "sale_order_id": so.id,
+                "partner_id": so.partner_id.id,
+                "state": "matched",
+            })
+        return matches
+
+    def _log_match_summary(self, matched, unmatched=None):
+        """Log one match record per config: matched (and unmatched) counts."""
+        unmatched = unmatched or self.browse()
+        for config in (matched | unmatched).config_id:
+            config_matched = matched.filtered(lambda inv: inv.config_id == config)
+            config_unmatched = unmatched.filtered(lambda inv: inv.config_id == config)
+            self.env["ntp.collector.log"].log_operation(
+                config=config,
+                operation="match",
+                success=bool(config_matched) or not config_unmatched,
+                records_processed=len(config_matched),
+                error_message=(
+                    "No matching SO found for %d invoice(s): %s" % (
+                        len(config_unmatched),
+                        ", ".join(config_unmatched[:20].mapped("external_order_id")),
+                    ) if config_unmatched else ""
+                ),
             )
 
-    def _auto_match_grab_orders(self):
-        """Auto-match collected Grab invoices with existing sale orders."""
+    def _auto_match_orders(self, provider):
+        """Auto-match unmatched draft invoices of a provider with sale orders."""
         unmatched = self.search([
-            ("provider", "=", "grab"),
+            ("provider", "=", provider),
             ("sale_order_id", "=", False),
             ("external_order_id", "!=", False),
             ("state", "=", "draft"),
         ])
-        matched_count = 0
-        for inv in unmatched:
-            try:
-                so = self.env["sale.order"].search([
-                    ("x_grab_order_id", "=", inv.external_order_id),
-                ], limit=1)
-                if so:
-                    inv.write({
-                        "sale_order_id": so.id,
-                        "partner_id": so.partner_id.id,
-                        "state": "matched",
-                    })
-                    matched_count += 1
-                    self.env["ntp.collector.log"].log_operation(
-                        config=inv.config_id,
-                        provider="grab",
-                        operation="match",
-                        invoice=inv,
-                        success=True,
-                    )
-            except Exception as e:
-                _logger.warning(
-                    "Auto-match error for invoice %s: %s", inv.name, e,
-                )
+        if not unmatched:
+            return
+        try:
+            matches = unmatched._match_sale_orders()
+        except Exception as e:
+            _logger.warning("Auto-match error for %s invoices: %s", provider, e)
+            return
 
-        if matched_count:
+        if matches:
+            self._log_match_summary(self.browse(list(matches)))
             _logger.info(
-                "Auto-matched %d Grab invoices with sale orders", matched_count,
+                "Auto-matched %d %s invoices with sale orders",
+                len(matches), provider.capitalize(),
             )
 
+    def _auto_match_shopee_orders(self):
+        """Auto-match collected Shopee invoices with existing sale orders."""
+        self._auto_match_orders("shopee")
+
+    def _auto_match_grab_orders(self):
+        """Auto-match collected Grab invoices with existing sale orders."""
+        self._auto_match_orders("grab")
+
     def action_match_sale_order(self):
         """Manual button: try to match with sale order via external_order_id."""
-        for rec in self:
-            if not rec.external_order_id:
-                rec.message_post(body="No external order ID to match.")
-                continue
+        without_id = self.filtered(lambda rec: not rec.external_order_id)
+        for rec in without_id:
+            rec.message_post(body="No external order ID to match.")
 
-            try:
-                if rec.provider == "shopee":
-                    domain = [("x_shopee_order_id", "=", rec.external_order_id)]
-                elif rec.provider == "grab":
-                    domain = [("x_grab_order_id", "=", rec.external_order_id)]
-                else:
-                    domain = [
-                        "|",
-                        ("x_shopee_order_id", "=", rec.external_order_id),
-                        ("x_grab_order_id", "=", rec.external_order_id),
-                    ]
+        candidates = self - without_id
+        if not candidates:
+            return
+        try:
+            with self.env.cr.savepoint():
+                matches = candidates._match_sale_orders()
+        except Exception as e:
+            _logger.error("Manual match error: %s", e, exc_info=True)
+            for rec in candidates:
+                rec.message_post(body="Match error: %s" % str(e))
+            return
 
-                so = self.env["sale.order"].search(domain, limit=1)
-                if so:
-                    rec.write({
-                        "sale_order_id": so.id,
-                        "partner_id": so.partner_id.id,
-                        "state": "matched",
-                    })
-                    rec.message_post(
-                        body="Matched with Sale Order: %s" % so.name,
-                    )
-                    self.env["ntp.collector.log"].log_operation(
-                        config=rec.config_id,
-                        provider=rec.provider,
-                        operation="match",
-                        invoice=rec,
-                        success=True,
-                    )
-                else:
-                    rec.message_post(
-                        body="No matching Sale Order found for ID: %s"
-                        % rec.external_order_id,
-                    )
-                    self.env["ntp.collector.log"].log_operation(
-                        config=rec.config_id,
-                        provider=rec.provider,
-                        operation="match",
-                        invoice=rec,
-                        success=False,
-                        error_message="No matching SO found",
-                    )
-            except Exception as e:
-                _logger.error(
-                    "Manual match error for %s: %s", rec.name, e, exc_info=True,
-                )
-                rec.message_post(
-                    body="Match error: %s" % str(e),
-                )
+        matched = self.browse(list(matches))
+        for rec in matched:
+            rec.message_post(
+                body="Matched with Sale Order: %s" % matches[rec.id].name,
+            )
+        unmatched = candidates - matched
+        for rec in unmatched:
+            rec.message_post(
+                body="No matching Sale Order found for ID: %s"
+                % rec.external_order_id,
+            )
+        self._log_match_summary(matched, unmatched)
 
     # ====================================================================
     # Bizzi Integration (Reuses ntp_cne Bizzi config)
@@ -2111,31 +2634,35 @@ class CollectedInvoice(models.Model):
             try:
                 rec._push_to_bizzi()
             except Exception as e:
-                rec.write({
-                    "bizzi_status": "error",
-                    "error_message": str(e)[:1000],
-                    "last_error_date": fields.Datetime.now(),
-                })
-                _logger.error(
-                    "Bizzi push error for %s: %s", rec.name, e, exc_info=True,
-                )
-                self.env["ntp.collector.log"].log_operation(
-                    config=rec.config_id,
-                    provider=rec.provider,
-                    operation="push_bizzi",
-                    invoice=rec,
-                    success=False,
-                    error_message=str(e),
-                )
+                rec._set_bizzi_error(e)
 
-    def _push_to_bizzi(self):
-        """Upload a single invoice record to Bizzi for VAT verification.
+    def _set_bizzi_error(self, error):
+        """Flag a failed push (exception raised before or while uploading)."""
+        self.ensure_one()
+        self.write({
+            "bizzi_status": "error",
+            "error_message": str(error)[:1000],
+            "last_error_date": fields.Datetime.now(),
+        })
+        _logger.error(
+            "Bizzi push error for %s: %s", self.name, error, exc_info=True,
+        )
+        self.env["ntp.collector.log"].log_operation(
+            config=self.config_id,
+            provider=self.provider,
+            operation="push_bizzi",
+            invoice=self,
+            success=False,
+            error_message=str(error),
+        )
+
+    def _get_bizzi_endpoint(self):
+        """Return the Bizzi upload URL and request headers.
 
         Reuses the Bizzi API URL and API Key stored in ir.config_parameter
         by the ntp_cne module (keys: tax_invoice.tax_invoice_bizzi_api_url,
         tax_invoice.tax_invoice_bizzi_api_key).
         """
-        self.ensure_one()
         get_param = self.env["ir.config_parameter"].sudo().get_param
         api_url = get_param("tax_invoice.tax_invoice_bizzi_api_url")
         api_key = get_param("tax_invoice.tax_invoice_bizzi_api_key")
@@ -2149,12 +2676,14 @@ class CollectedInvoice(models.Model):
 
         headers = {
             "accept": "application/json",
-            "Content-Type": "application/json",
             "X-API-KEY": api_key,
         }
+        return urljoin(api_url, "v1/invoices"), headers
 
-        # Build invoice payload for Bizzi
-        payload = {
+    def _prepare_bizzi_payload(self):
+        """Return the form fields of the Bizzi upload of one invoice."""
+        self.ensure_one()
+        return {
             "invoice_number": self.name,
             "invoice_date": self.transaction_date.isoformat() if self.transaction_date else "",
             "total_amount": self.total_amount,
@@ -2165,73 +2694,63 @@ class CollectedInvoice(models.Model):
             "partner_vat": self.partner_id.vat if self.partner_id else "",
         }
 
-        # Include attachment data if available
-        if self.attachment_ids:
-            attachment = self.attachment_ids[0]
-            payload["attachment_name"] = attachment.name
-            payload["attachment_data"] = attachment.datas.decode("utf-8") if attachment.datas else ""
+    def _bizzi_file_parts(self):
+        """Return a multipart file part for each PDF/XML attachment.
 
-        url = urljoin(api_url, "v1/invoices")
-        start_time = time.time()
+        Filestore attachments are read from disk while the request is sent;
+        only attachments stored in the database are loaded in memory.
+        """
+        self.ensure_one()
+        parts = []
+        for attachment in self.attachment_ids.sudo():
+            name = attachment.name or ""
+            if (attachment.mimetype not in BIZZI_FILE_MIMETYPES
+                    and not name.lower().endswith(BIZZI_FILE_EXTENSIONS)):
+                continue
+            if attachment.store_fname:
+                path = attachment._full_path(attachment.store_fname)
+                parts.append(FilePart.from_path(
+                    "files", name, attachment.mimetype, path, os.path.getsize(path),
+                ))
+            elif attachment.db_datas:
+                parts.append(FilePart.from_bytes(
+                    "files", name, attachment.mimetype, attachment.raw,
+                ))
+        return parts
+
+    def _prepare_bizzi_upload(self):
+        """Return the streaming multipart body of the Bizzi upload."""
+        self.ensure_one()
+        return MultipartStream(
+            fields=list(self._prepare_bizzi_payload().items()),
+            files=self._bizzi_file_parts(),
+        )
 
+    def _push_to_bizzi(self):
+        """Upload a single invoice record to Bizzi for VAT verification."""
+        self.ensure_one()
+        url, headers = self._get_bizzi_endpoint()
+        body = self._prepare_bizzi_upload()
         try:
-            response = self._make_request(
-                "post", url, config=self.config_id,
-                json=payload, headers=headers,
+            response, duration, error = _request_with_retries(
+                "post", url, data=body,
+                headers=dict(headers, **{"Content-Type": body.content_type}),
             )
-            duration = time.time() - start_time
+        finally:
+            body.close()
+        return self._apply_bizzi_response(url, response, duration, error)
 
-            if response.status_code in (200, 201):
-                result = response.json()
-                bizzi_id = result.get("data", {}).get(
-                    "invoice_id", result.get("id", "")
-                )
-                self.write({
-                    "bizzi_invoice_id": str(bizzi_id) if bizzi_id else "",
-                    "bizzi_status": "uploaded",
-                    "state": "pushed",
-                    "error_message": False,
-                })
-                self.message_post(
-                    body="Invoice successfully uploaded to Bizzi. "
-                    "Bizzi ID: %s" % bizzi_id,
-                )
-                self.env["ntp.collector.log"].log_operation(
-                    config=self.config_id,
-                    provider=self.provider,
-                    operation="push_bizzi",
-                    invoice=self,
-                    success=True,
-                    request_url=url,
-                    response_code=response.status_code,
-                    duration_seconds=duration,
-                )
-            else:
-                error_text = response.text[:500]
-                self.write({
-                    "bizzi_status": "error",
-                    "error_message": "HTTP %d: %s" % (
-                        response.status_code, error_text,
-                    ),
-                    "last_error_date": fields.Datetime.now(),
-                })
-                self.message_post(
-                    body="Bizzi upload failed (HTTP %d): %s"
-                    % (response.status_code, error_text),
-                )
-                self.env["ntp.collector.log"].log_operation(
-                    config=self.config_id,
-                    provider=self.provider,
-                    operation="push_bizzi",
-                    invoice=self,
-                    success=False,
-                    request_url=url,
-                    response_code=response.status_code,
-                    response_summary=error_text,
-                    error_message="HTTP %d" % response.status_code,
-                    duration_seconds=duration,
-                )
-        except requests.RequestException as e:
+    def _apply_bizzi_response(self, url, response, duration, error=None):
+        """Record the outcome of a Bizzi upload on the invoice.
+
+        Returns:
+            bool: True if Bizzi accepted the invoice.
+
+        Raises:
+            UserError: If the request itself failed (no response).
+        """
+        self.ensure_one()
+        if response is None:
             self.env["ntp.collector.log"].log_operation(
                 config=self.config_id,
                 provider=self.provider,
@@ -2239,9 +2758,67 @@ class CollectedInvoice(models.Model):
                 invoice=self,
                 success=False,
                 request_url=url,
-                error_message=str(e),
+                error_message=str(error),
+                duration_seconds=duration,
+            )
+            raise UserError("Bizzi API request failed: %s" % str(error))
+
+        if response.status_code in (200, 201):
+            result = response.json()
+            bizzi_id = result.get("data", {}).get(
+                "invoice_id", result.get("id", "")
             )
-            raise UserError("Bizzi API request failed: %s" % str(e))
+            now = fields.Datetime.now()
+            self.write({
+                "bizzi_invoice_id": str(bizzi_id) if bizzi_id else "",
+                "bizzi_status": "uploaded",
+                "state": "pushed",
+                "error_message": False,
+                "bizzi_push_date": now,
+                "bizzi_poll_count": 0,
+                "bizzi_next_poll_date": now + next_poll_delay(0),
+            })
+            self.message_post(
+                body="Invoice successfully uploaded to Bizzi. "
+                "Bizzi ID: %s" % bizzi_id,
+            )
+            self.env["ntp.collector.log"].log_operation(
+                config=self.config_id,
+                provider=self.provider,
+                operation="push_bizzi",
+                invoice=self,
+                success=True,
+                request_url=url,
+                response_code=response.status_code,
+                duration_seconds=duration,
+            )
+            return True
+
+        error_text = response.text[:500]
+        self.write({
+            "bizzi_status": "error",
+            "error_message": "HTTP %d: %s" % (
+                response.status_code, error_text,
+            ),
+            "last_error_date": fields.Datetime.now(),
+        })
+        self.message_post(
+            body="Bizzi upload failed (HTTP %d): %s"
+            % (response.status_code, error_text),
+        )
+        self.env["ntp.collector.log"].log_operation(
+            config=self.config_id,
+            provider=self.provider,
+            operation="push_bizzi",
+            invoice=self,
+            success=False,
+            request_url=url,
+            response_code=response.status_code,
+            response_summary=error_text,
+            error_message="HTTP %d" % response.status_code,
+            duration_seconds=duration,
+        )
+        return False
 
     # ====================================================================
     # State Actions
@@ -2252,6 +2829,7 @@ class CollectedInvoice(models.Model):
         self.write({
             "state": "verified",
             "bizzi_status": "verified",
+            "bizzi_next_poll_date": False,
         })
         _logger.info(
             "Invoices marked as verified: %s",
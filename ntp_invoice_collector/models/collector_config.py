@@ -11,10 +11,10 @@ Supported providers:
   - Shinhan: Shinhan Bank e-Invoice portal (einvoice.shinhan.com.vn) — Angular SPA / JWT
 """
 
-import json
 import logging
 import hashlib
 import hmac
+import threading
 import time
 from datetime import timedelta
 
@@ -23,8 +23,13 @@ import requests
 from odoo import models, fields, api
 from odoo.exceptions import UserError
 
+from .captcha_ocr import get_ocr_registry
+
 _logger = logging.getLogger(__name__)
 
+# Portal session state kept between "Load CAPTCHA" and "Login & Fetch"
+PORTAL_LOGIN_PARAM = "ntp_invoice_collector.portal_login_%d"
+
 
 class CollectorConfig(models.Model):
     _name = "ntp.collector.config"
@@ -319,6 +324,11 @@ class CollectorConfig(models.Model):
         "Sync Interval (hours)",
         default=24,
     )
+    sync_state_ids = fields.One2many(
+        "ntp.collector.sync.state", "config_id",
+        string="Sync Checkpoint",
+        readonly=True,
+    )
     notes = fields.Text("Notes")
 
     # ---- Computed fields ----
@@ -403,6 +413,23 @@ class CollectorConfig(models.Model):
             else:
                 rec.shinhan_session_active = False
 
+    def _register_hook(self):
+        """Preload the local OCR models when the registry loads.
+
+        Enabled by ``ntp_invoice_collector.ocr_preload``; the models load in
+        a background thread so the worker starts serving immediately.
+        """
+        super()._register_hook()
+        preload = self.env["ir.config_parameter"].sudo().get_param(
+            "ntp_invoice_collector.ocr_preload",
+        )
+        if preload:
+            threading.Thread(
+                target=get_ocr_registry().warm_up,
+                name="collector_ocr_preload",
+                daemon=True,
+            ).start()
+
     # ====================================================================
     # Smart Button Actions
     # ====================================================================
@@ -637,7 +664,7 @@ class CollectorConfig(models.Model):
                 )
 
             # Store session cookie
-            aspx_cookie = session._session.cookies.get(".ASPXAUTH")
+            aspx_cookie = session.get_aspx_cookie()
             self.write({
                 "grab_login_status": "logged_in",
                 "grab_session_cookie": aspx_cookie or "",
@@ -722,14 +749,8 @@ class CollectorConfig(models.Model):
                 )
 
             # Store session state temporarily
-            param_key = "ntp_invoice_collector.grab_csrf_%d" % self.id
-            self.env["ir.config_parameter"].sudo().set_param(
-                param_key, session._csrf_token or ""
-            )
-            cookies_dict = {c.name: c.value for c in session._session.cookies}
-            cookie_key = "ntp_invoice_collector.grab_cookies_%d" % self.id
             self.env["ir.config_parameter"].sudo().set_param(
-                cookie_key, json.dumps(cookies_dict)
+                PORTAL_LOGIN_PARAM % self.id, session.export_state()
             )
 
             self.write({
@@ -1108,18 +1129,8 @@ class CollectorConfig(models.Model):
                 )
 
             # Store session state temporarily
-            param_key = "ntp_invoice_collector.spv_csrf_%d" % self.id
-            self.env["ir.config_parameter"].sudo().set_param(
-                param_key, session._csrf_token or ""
-            )
-            nonce_key = "ntp_invoice_collector.spv_nonce_%d" % self.id
-            self.env["ir.config_parameter"].sudo().set_param(
-                nonce_key, session._nonce or ""
-            )
-            cookies_dict = {c.name: c.value for c in session._session.cookies}
-            cookie_key = "ntp_invoice_collector.spv_cookies_%d" % self.id
             self.env["ir.config_parameter"].sudo().set_param(
-                cookie_key, json.dumps(cookies_dict)
+                PORTAL_LOGIN_PARAM % self.id, session.export_state()
             )
 
             self.write({
@@ -1365,9 +1376,8 @@ class CollectorConfig(models.Model):
                 )
 
             # Store session state temporarily
-            captcha_key = "ntp_invoice_collector.shinhan_captcha_text_%d" % self.id
             self.env["ir.config_parameter"].sudo().set_param(
-                captcha_key, session._captcha_text or ""
+                PORTAL_LOGIN_PARAM % self.id, session.export_state()
             )
 
             self.write({
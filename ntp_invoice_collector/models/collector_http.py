@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Collector HTTP Client
+======================
+Process-wide HTTP client shared by all collector configs.
+
+  - One pooled keep-alive ``requests.Session`` per provider host, so TCP/TLS
+    connections are reused across pages and across configs.
+  - A token-bucket rate limiter per host. HTTP 429 responses pause the
+    bucket for the ``Retry-After`` delay announced by the server.
+  - Jittered exponential backoff for retries.
+  - Per-host latency histograms, flushed to ``ntp.collector.log``.
+
+The portal sessions (Grab/SPV/Shinhan) keep their own cookie-bearing
+sessions; this client is for stateless API calls (Shopee, Bizzi, CAPTCHA
+solvers). Portal requests still report to the latency histograms.
+"""
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+RETRY_AFTER_MAX_SECONDS = 300.0
+
+# (requests per second, burst size) per host
+DEFAULT_RATE_LIMIT = (5.0, 5)
+HOST_RATE_LIMITS = {
+    "partner.shopeemobile.com": (10.0, 10),
+    "partner.test-stable.shopeemobile.com": (10.0, 10),
+}
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket
+# collects everything slower.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing/invalid.
+    """
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return None
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX_SECONDS)
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate to one host."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                else:
+                    delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Stop handing out tokens for the given number of seconds."""
+        with self._lock:
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + seconds,
+            )
+            self._tokens = 0.0
+
+
+class LatencyHistogram:
+    """Request latency histogram for one host."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, duration, status_code=0):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.requests += 1
+        self.total_seconds += duration
+        self.max_seconds = max(self.max_seconds, duration)
+        if status_code == 429:
+            self.throttled += 1
+        elif not status_code or status_code >= 400:
+            self.errors += 1
+
+    def to_dict(self):
+        labels = ["<=%gs" % bound for bound in LATENCY_BUCKETS]
+        labels.append(">%gs" % LATENCY_BUCKETS[-1])
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "avg_seconds": round(self.total_seconds / self.requests, 4) if self.requests else 0.0,
+            "max_seconds": round(self.max_seconds, 4),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class CollectorHttpClient:
+    """Pooled, rate-limited HTTP client keyed by host."""
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._sessions = {}
+        self._buckets = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        return (urlparse(url).hostname or "").lower()
+
+    def session_for(self, url):
+        """Return the shared keep-alive session for the URL's host."""
+        host = self.host_of(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self._pool_connections,
+                    pool_maxsize=self._pool_maxsize,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                # Shared across configs: never carry cookies between callers
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                self._sessions[host] = session
+            return session
+
+    def bucket_for(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, capacity = HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+                bucket = self._buckets[host] = TokenBucket(rate, capacity)
+            return bucket
+
+    def observe(self, host, duration, status_code):
+        """Record one request in the host's latency histogram."""
+        with self._lock:
+            histogram = self._histograms.get(host)
+            if histogram is None:
+                histogram = self._histograms[host] = LatencyHistogram()
+            histogram.observe(duration, status_code)
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the host's pool, honouring its rate limit.
+
+        A 429 response pauses the host's bucket for the Retry-After delay
+        (or one backoff step when the header is absent). The response is
+        returned as-is; retrying is left to the caller.
+        """
+        host = self.host_of(url)
+        bucket = self.bucket_for(host)
+        waited = bucket.acquire()
+        if waited > 1.0:
+            _logger.debug("Rate limiter delayed %s by %.1fs", host, waited)
+
+        start = time.monotonic()
+        try:
+            response = self.session_for(url).request(method.upper(), url, **kwargs)
+        except requests.RequestException:
+            self.observe(host, time.monotonic() - start, 0)
+            raise
+        self.observe(host, time.monotonic() - start, response.status_code)
+
+        if response.status_code == 429:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            pause = retry_after if retry_after is not None else BACKOFF_BASE_SECONDS
+            _logger.warning("%s returned 429, pausing requests for %.1fs", host, pause)
+            bucket.pause(pause)
+        return response
+
+    @staticmethod
+    def backoff_delay(attempt, retry_after=None):
+        """Jittered exponential backoff delay for the given attempt (1-based).
+
+        A server-provided Retry-After takes precedence over the computed delay.
+        """
+        if retry_after is not None:
+            return retry_after
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+        return random.uniform(delay / 2.0, delay)
+
+    def pop_latency_stats(self):
+        """Return and reset the per-host latency histograms.
+
+        Returns:
+            dict: {host: histogram dict}
+        """
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+        return {host: hist.to_dict() for host, hist in histograms.items()}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the process-wide collector HTTP client."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = CollectorHttpClient()
+    return _client
@@ -4,14 +4,30 @@ Invoice Collector Log History
 ==============================
 Tracks all invoice collection operations, API calls, and errors
 for auditing and troubleshooting purposes.
+
+Cron runs log in *buffered* mode (``collector_log_buffer`` in the context):
+entries are kept in memory on the cursor and created in bulk batches, at
+the latest right before the transaction commits. Request-level success
+entries can be sampled (``ntp_invoice_collector.log_request_sample_rate``).
+Entries older than ``ntp_invoice_collector.log_retention_days`` are rolled
+into daily ntp.collector.log.stat rows and deleted.
 """
 
+import json
 import logging
+import random
+from datetime import timedelta
 
 from odoo import models, fields, api
 
 _logger = logging.getLogger(__name__)
 
+# Key of the pending entries in cr.precommit.data
+LOG_BUFFER_KEY = "ntp_invoice_collector.log_buffer"
+LOG_BUFFER_SIZE = 500
+
+DEFAULT_LOG_RETENTION_DAYS = 30
+
 
 class CollectorLog(models.Model):
     _name = "ntp.collector.log"
@@ -31,6 +47,8 @@ class CollectorLog(models.Model):
         [
             ("shopee", "Shopee"),
             ("grab", "Grab"),
+            ("spv", "SPV Tracuuhoadon"),
+            ("shinhan", "Shinhan Bank eInvoice"),
         ],
         string="Provider",
         index=True,
@@ -42,6 +60,8 @@ class CollectorLog(models.Model):
             ("push_bizzi", "Push to Bizzi"),
             ("test_connection", "Test Connection"),
             ("retry", "Retry"),
+            ("http_stats", "HTTP Statistics"),
+            ("poll_bizzi", "Poll Bizzi Status"),
         ],
         string="Operation",
         required=True,
@@ -58,6 +78,7 @@ class CollectorLog(models.Model):
     )
     error_message = fields.Text("Error Details")
     request_url = fields.Char("Request URL")
+    request_host = fields.Char("Request Host", index=True)
     response_code = fields.Integer("HTTP Response Code")
     response_summary = fields.Text(
         "Response Summary",
@@ -68,6 +89,10 @@ class CollectorLog(models.Model):
         digits=(10, 2),
         help="Time taken for the operation in seconds.",
     )
+    latency_histogram = fields.Text(
+        "Latency Histogram",
+        help="JSON request latency histogram of one host (HTTP Statistics entries).",
+    )
     user_id = fields.Many2one(
         "res.users", "User",
         default=lambda self: self.env.uid,
@@ -77,13 +102,21 @@ class CollectorLog(models.Model):
     def log_operation(self, config=None, provider="", operation="fetch",
                       invoice=None, success=True, records_processed=0,
                       error_message="", request_url="", response_code=0,
-                      response_summary="", duration_seconds=0.0):
+                      response_summary="", duration_seconds=0.0,
+                      request_host="", latency_histogram=None, sampled=False):
         """Create a log entry for a collector operation.
 
+        With ``collector_log_buffer`` in the context the entry is only
+        queued (see _buffer_log) and True is returned instead of a record.
+        ``sampled`` entries (routine request successes) are kept with the
+        configured request sample rate.
+
         This method is designed to never raise exceptions - it logs
         errors internally and returns False on failure.
         """
         try:
+            if sampled and random.random() >= self._request_sample_rate():
+                return False
             vals = {
                 "config_id": config.id if config else False,
                 "config_name": config.name if config else "",
@@ -97,7 +130,14 @@ class CollectorLog(models.Model):
                 "response_code": response_code,
                 "response_summary": (response_summary or "")[:1000] if response_summary else False,
                 "duration_seconds": duration_seconds,
+                "request_host": request_host or False,
+                "latency_histogram": (
+                    json.dumps(latency_histogram, indent=2)
+                    if latency_histogram else False
+                ),
             }
+            if self.env.context.get("collector_log_buffer"):
+                return self._buffer_log(vals)
             record = self.sudo().create(vals)
             _logger.debug(
                 "Collector log created: config=%s, op=%s, success=%s, records=%d",
@@ -109,3 +149,121 @@ class CollectorLog(models.Model):
                 "Failed to create collector log: %s", e, exc_info=True,
             )
             return False
+
+    @api.model
+    def _request_sample_rate(self):
+        rate = self.env["ir.config_parameter"].sudo().get_param(
+            "ntp_invoice_collector.log_request_sample_rate", default=1.0,
+        )
+        try:
+            return min(1.0, max(0.0, float(rate)))
+        except (TypeError, ValueError):
+            return 1.0
+
+    # ------------------------------------------------------------------
+    # Buffered logging
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _buffer_log(self, vals):
+        """Queue log values on the cursor, flushing every LOG_BUFFER_SIZE.
+
+        The buffer lives in ``cr.precommit.data``, so it is per cursor (one
+        per cron worker thread) and is flushed by a precommit hook: no entry
+        is lost on the sync checkpoints' intermediate commits.
+        """
+        data = self.env.cr.precommit.data
+        buffer = data.get(LOG_BUFFER_KEY)
+        if buffer is None:
+            buffer = data[LOG_BUFFER_KEY] = []
+            self.env.cr.precommit.add(self.flush_log_buffer)
+        buffer.append(vals)
+        if len(buffer) >= LOG_BUFFER_SIZE:
+            self.flush_log_buffer()
+        return True
+
+    @api.model
+    def flush_log_buffer(self):
+        """Create the queued log entries of this cursor in bulk.
+
+        Returns:
+            int: Number of entries created.
+        """
+        buffer = self.env.cr.precommit.data.get(LOG_BUFFER_KEY)
+        if not buffer:
+            return 0
+        vals_list = buffer[:]
+        del buffer[:]
+        try:
+            self.sudo().create(vals_list)
+        except Exception as e:
+            _logger.error(
+                "Failed to create %d buffered collector logs: %s",
+                len(vals_list), e, exc_info=True,
+            )
+            return 0
+        _logger.debug("Flushed %d buffered collector logs", len(vals_list))
+        return len(vals_list)
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    @api.model
+    def cron_aggregate_logs(self):
+        """Scheduled action: roll old log entries into daily statistics.
+
+        Entries of every full day older than the retention period are
+        aggregated per day, provider and operation into ntp.collector.log.stat
+        (count, errors, p50/p95 duration) and then deleted.
+
+        Returns:
+            int: Number of log entries deleted.
+        """
+        retention_days = int(self.env["ir.config_parameter"].sudo().get_param(
+            "ntp_invoice_collector.log_retention_days",
+            default=DEFAULT_LOG_RETENTION_DAYS,
+        ) or 0)
+        if retention_days <= 0:
+            return 0
+        cutoff = fields.Date.today() - timedelta(days=retention_days)
+
+        self.flush()
+        self.env.cr.execute("""
+            SELECT create_date::date, provider, operation,
+                   COUNT(*),
+                   COUNT(*) FILTER (WHERE NOT COALESCE(success, FALSE)),
+                   COALESCE(SUM(records_processed), 0),
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_seconds),
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_seconds)
+              FROM ntp_collector_log
+             WHERE create_date < %s
+          GROUP BY 1, 2, 3
+        """, (cutoff,))
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return 0
+
+        self.env["ntp.collector.log.stat"].sudo()._merge_daily_stats([
+            {
+                "date": row[0],
+                "provider": row[1] or False,
+                "operation": row[2],
+                "count": row[3],
+                "error_count": row[4],
+                "records_processed": row[5],
+                "duration_p50": row[6] or 0.0,
+                "duration_p95": row[7] or 0.0,
+            }
+            for row in rows
+        ])
+        self.env.cr.execute(
+            "DELETE FROM ntp_collector_log WHERE create_date < %s", (cutoff,),
+        )
+        deleted = self.env.cr.rowcount
+        self.invalidate_cache()
+        _logger.info(
+            "Collector logs before %s rolled into %d daily statistics (%d deleted)",
+            cutoff, len(rows), deleted,
+        )
+        return deleted
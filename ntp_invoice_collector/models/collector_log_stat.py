@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Invoice Collector Log Statistics
+=================================
+Daily per-provider, per-operation roll-up of expired ntp.collector.log
+entries (see CollectorLog.cron_aggregate_logs).
+"""
+
+import logging
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+class CollectorLogStat(models.Model):
+    _name = "ntp.collector.log.stat"
+    _description = "Invoice Collector Daily Log Statistics"
+    _order = "date desc, provider, operation"
+
+    date = fields.Date("Date", required=True, index=True)
+    provider = fields.Selection(
+        [
+            ("shopee", "Shopee"),
+            ("grab", "Grab"),
+            ("spv", "SPV Tracuuhoadon"),
+            ("shinhan", "Shinhan Bank eInvoice"),
+        ],
+        string="Provider",
+        index=True,
+    )
+    operation = fields.Selection(
+        [
+            ("fetch", "Fetch Invoices"),
+            ("match", "Match Sale Order"),
+            ("push_bizzi", "Push to Bizzi"),
+            ("test_connection", "Test Connection"),
+            ("retry", "Retry"),
+            ("http_stats", "HTTP Statistics"),
+            ("poll_bizzi", "Poll Bizzi Status"),
+        ],
+        string="Operation",
+        required=True,
+        index=True,
+    )
+    count = fields.Integer("Entries")
+    error_count = fields.Integer("Errors")
+    error_rate = fields.Float(
+        "Error Rate (%)",
+        digits=(5, 2),
+        compute="_compute_error_rate",
+        store=True,
+        group_operator="avg",
+    )
+    records_processed = fields.Integer("Records Processed")
+    duration_p50 = fields.Float(
+        "Duration p50 (s)", digits=(10, 2), group_operator="avg",
+    )
+    duration_p95 = fields.Float(
+        "Duration p95 (s)", digits=(10, 2), group_operator="max",
+    )
+
+    _sql_constraints = [
+        (
+            "day_provider_operation_uniq",
+            "UNIQUE(date, provider, operation)",
+            "Only one statistics row per day, provider and operation!",
+        ),
+    ]
+
+    @api.depends("count", "error_count")
+    def _compute_error_rate(self):
+        for rec in self:
+            rec.error_rate = 100.0 * rec.error_count / rec.count if rec.count else 0.0
+
+    @api.model
+    def _merge_daily_stats(self, vals_list):
+        """Create the daily rows, adding to rows that already exist.
+
+        A day is normally rolled up once. If late entries of an already
+        aggregated day show up, counts are added and the percentiles are
+        combined as count-weighted averages (an approximation).
+        """
+        existing = {
+            (stat.date, stat.provider or False, stat.operation): stat
+            for stat in self.search([
+                ("date", "in", list({vals["date"] for vals in vals_list})),
+            ])
+        }
+        to_create = []
+        for vals in vals_list:
+            stat = existing.get((vals["date"], vals["provider"], vals["operation"]))
+            if not stat:
+                to_create.append(vals)
+                continue
+            total = stat.count + vals["count"]
+            stat.write({
+                "count": total,
+                "error_count": stat.error_count + vals["error_count"],
+                "records_processed": stat.records_processed + vals["records_processed"],
+                "duration_p50": (
+                    stat.duration_p50 * stat.count + vals["duration_p50"] * vals["count"]
+                ) / total,
+                "duration_p95": (
+                    stat.duration_p95 * stat.count + vals["duration_p95"] * vals["count"]
+                ) / total,
+            })
+        return self.create(to_create)
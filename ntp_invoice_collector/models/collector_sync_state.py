@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Invoice Collector Sync State
+=============================
+Persistent, checkpointed sync cursor of one collector config.
+
+A fetch works through a *window* (date_from .. date_to) split into
+date-sliced sub-windows, so large backfills never run into the provider
+page limits. Every fetched page records a checkpoint (slice, last page or
+cursor, high-water transaction date); an interrupted run resumes from the
+last completed page instead of starting the window again.
+
+Checkpoints are committed only in the cron fetch (``collector_commit_checkpoints``
+in the context); a fetch started from a button stays one transaction.
+"""
+
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_SLICE_DAYS = 7
+
+
+class CollectorSyncState(models.Model):
+    _name = "ntp.collector.sync.state"
+    _description = "Invoice Collector Sync State"
+    _rec_name = "config_id"
+
+    config_id = fields.Many2one(
+        "ntp.collector.config", "Configuration",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    provider = fields.Selection(
+        related="config_id.provider",
+        store=True,
+    )
+    state = fields.Selection(
+        [
+            ("idle", "Idle"),
+            ("running", "In Progress"),
+        ],
+        string="Status",
+        default="idle",
+        required=True,
+    )
+    window_from = fields.Date(
+        "Window From",
+        help="Start of the window being synced (in-flight runs only).",
+    )
+    window_to = fields.Date(
+        "Window To",
+        help="End of the window being synced (in-flight runs only).",
+    )
+    slice_from = fields.Date(
+        "Current Slice From",
+        help="Start of the date-sliced sub-window currently being fetched.",
+    )
+    last_page = fields.Integer(
+        "Last Completed Page",
+        help="Last page of the current slice that was fully processed.",
+    )
+    cursor = fields.Char(
+        "Next Page Cursor",
+        help="Provider pagination cursor of the next page (Shopee).",
+    )
+    high_water_date = fields.Date(
+        "High-Water Date",
+        help="Latest transaction date collected so far. The next window "
+             "starts from this date.",
+    )
+    last_checkpoint = fields.Datetime("Last Checkpoint", readonly=True)
+
+    _sql_constraints = [
+        (
+            "config_uniq",
+            "UNIQUE(config_id)",
+            "A collector config can only have one sync state!",
+        ),
+    ]
+
+    @api.model
+    def _get_for_config(self, config):
+        """Return the sync state of config, creating it on first use."""
+        sync_state = self.sudo().search([("config_id", "=", config.id)], limit=1)
+        if not sync_state:
+            sync_state = self.sudo().create({"config_id": config.id})
+        return sync_state
+
+    def _begin_window(self, date_from, date_to):
+        """Start a new sync window, or resume the one left in flight.
+
+        An interrupted window is resumed at its checkpoint and stretched
+        to date_to, so nothing between the two runs is skipped.
+        """
+        self.ensure_one()
+        if self.state == "running" and self.slice_from:
+            if date_to and (not self.window_to or date_to > self.window_to):
+                self.window_to = date_to
+            _logger.info(
+                "Resuming sync of '%s' at %s page %d (window %s to %s)",
+                self.config_id.name, self.slice_from, self.last_page + 1,
+                self.window_from, self.window_to,
+            )
+            return self
+
+        self.write({
+            "state": "running",
+            "window_from": date_from,
+            "window_to": date_to,
+            "slice_from": date_from,
+            "last_page": 0,
+            "cursor": False,
+        })
+        self._commit_checkpoint()
+        return self
+
+    def _iter_slices(self, slice_days=None):
+        """Yield the remaining (slice_from, slice_to) sub-windows.
+
+        The state moves on to the next slice only when the caller finished
+        the previous one, i.e. came back to the generator without breaking
+        out of its loop. Exhausting the generator closes the window.
+        """
+        self.ensure_one()
+        if slice_days is None:
+            slice_days = int(self.env["ir.config_parameter"].sudo().get_param(
+                "ntp_invoice_collector.sync_slice_days", default=DEFAULT_SLICE_DAYS,
+            ) or DEFAULT_SLICE_DAYS)
+        slice_days = max(1, slice_days)
+
+        while self.slice_from and self.slice_from <= self.window_to:
+            slice_to = min(
+                self.slice_from + timedelta(days=slice_days - 1), self.window_to,
+            )
+            yield self.slice_from, slice_to
+            self.write({
+                "slice_from": slice_to + timedelta(days=1),
+                "last_page": 0,
+                "cursor": False,
+            })
+            self._commit_checkpoint()
+
+        self.write({
+            "state": "idle",
+            "window_from": False,
+            "window_to": False,
+            "slice_from": False,
+            "last_page": 0,
+            "cursor": False,
+        })
+        self._commit_checkpoint()
+
+    def _checkpoint(self, page, cursor=None, dates=None):
+        """Record a completed page and commit it with the page's invoices.
+
+        Args:
+            page (int): Page of the current slice that was processed.
+            cursor (str): Provider cursor of the next page, if any.
+            dates (list): Transaction dates seen on the page.
+        """
+        self.ensure_one()
+        vals = {
+            "last_page": page,
+            "cursor": cursor or False,
+        }
+        dates = [date for date in (dates or []) if date]
+        if dates:
+            page_max = max(dates)
+            if not self.high_water_date or page_max > self.high_water_date:
+                vals["high_water_date"] = page_max
+        self.write(vals)
+        self._commit_checkpoint()
+
+    def _commit_checkpoint(self):
+        """Persist the checkpoint, together with everything fetched so far.
+
+        Commits only in the cron fetch; elsewhere the checkpoint is saved
+        with the rest of the request's transaction.
+        """
+        self.last_checkpoint = fields.Datetime.now()
+        if self.env.context.get("collector_commit_checkpoints") \
+                and not self.env.registry.in_test_mode():
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def action_reset(self):
+        """Drop the in-flight window and high-water date (full resync)."""
+        self.write({
+            "state": "idle",
+            "window_from": False,
+            "window_to": False,
+            "slice_from": False,
+            "last_page": 0,
+            "cursor": False,
+            "high_water_date": False,
+        })
@@ -17,6 +17,9 @@ Invoice retrieval:
   - Strategy 2: GET  /hoa-don/danh-sach        → HTML table parsing (paginated)
   - Download:   POST /Invoice/DowloadData       → ZIP of PDF/XML files
 
+Login, CAPTCHA solving, retries and pagination come from
+portal_session.PortalSession; this module is the Grab adapter.
+
 This module is a pure Python library (no Odoo dependencies) so it can be
 tested independently.
 """
@@ -25,13 +28,14 @@ import base64
 import csv
 import io
 import logging
-import os
 import re
 import time
 from datetime import datetime, timedelta
 
 import requests
 
+from .portal_session import PortalSession
+
 _logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -49,31 +53,19 @@ INVOICE_REPORT_PATH = "/Invoice/DowloadReportData"
 # ---------------------------------------------------------------------------
 REQUEST_TIMEOUT = 30
 DOWNLOAD_TIMEOUT = 120
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 MAX_AUTO_LOGIN_ATTEMPTS = 5  # increased from 3 → 5 for better CAPTCHA success rate
 
-# ---------------------------------------------------------------------------
-# Browser-like headers
-# ---------------------------------------------------------------------------
-DEFAULT_HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/121.0.0.0 Safari/537.36"
-    ),
-    "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
-}
-
 
-class GrabEInvoiceSession:
+class GrabEInvoiceSession(PortalSession):
     """
     Manages a single authenticated session with the Grab e-invoice portal.
 
     Usage (auto-login)::
 
         session = GrabEInvoiceSession("user", "pass")
-        if session.auto_login(gemini_api_key="AIza..."):
-            result = session.fetch_invoices("01/01/2025", "31/01/2025")
-            for inv in result["invoices"]:
+        if session.auto_login(captcha_api_key="..."):
+            for inv in session.iter_invoices("01/01/2025", "31/01/2025"):
                 print(inv)
 
     Usage (manual CAPTCHA)::
@@ -86,467 +78,33 @@ class GrabEInvoiceSession:
             result = session.fetch_invoices()
     """
 
-    def __init__(self, username, password, base_url=None):
-        self.username = username
-        self.password = password
-        self.base_url = (base_url or "https://vn.einvoice.grab.com").rstrip("/")
-
-        self._session = requests.Session()
-        self._session.headers.update(DEFAULT_HEADERS)
+    label = "Grab"
+    default_base_url = "https://vn.einvoice.grab.com"
+    max_login_attempts = MAX_AUTO_LOGIN_ATTEMPTS
+    date_format = "%d/%m/%Y"
+    persisted_attrs = ("_csrf_token", "_captcha_url")
 
+    def __init__(self, username, password, base_url=None):
+        super().__init__(username, password, base_url=base_url)
         self._csrf_token = None
         self._captcha_url = None   # extracted from login page HTML at runtime
-        self._authenticated = False
-        self._auth_time = None
-        self._last_error = ""
-        self._account_locked = False
-
-    # ------------------------------------------------------------------
-    # Internal helpers
-    # ------------------------------------------------------------------
-
-    def _url(self, path):
-        return "%s%s" % (self.base_url, path)
-
-    @property
-    def last_error(self):
-        return self._last_error
-
-    @property
-    def is_account_locked(self):
-        return self._account_locked
 
     # ------------------------------------------------------------------
-    # Strategy 1: Auto-Login (CAPTCHA solved by AI)
+    # Strategy 1: Auto-Login hooks (see PortalSession.auto_login)
     # ------------------------------------------------------------------
 
-    def auto_login(
-        self,
-        captcha_api_key=None,
-        solver_type="2captcha",
-        gemini_api_key=None,
-        openai_api_key=None,
-        max_attempts=None,
-    ):
-        """
-        Fully automated login: load page → fetch CAPTCHA → solve → submit.
-
-        Args:
-            captcha_api_key (str): API key for the selected solver service.
-            solver_type (str): CAPTCHA solver to use. One of:
-                - '2captcha'  : 2captcha.com paid service (default)
-                - 'capsolver' : CapSolver.com paid service
-                - 'local'     : Local Tesseract OCR (free, no API key needed)
-            gemini_api_key (str): Deprecated. Use captcha_api_key instead.
-            openai_api_key (str): Deprecated. Use captcha_api_key instead.
-            max_attempts (int): Maximum number of CAPTCHA-solve-and-login attempts.
-
-        Returns:
-            bool: True if login succeeded.
-        """
-        if max_attempts is None:
-            max_attempts = MAX_AUTO_LOGIN_ATTEMPTS
-        solver_type = (solver_type or "2captcha").lower().strip()
-        api_key = (
-            captcha_api_key
-            or gemini_api_key
-            or openai_api_key
-            or os.environ.get("CAPTCHA_API_KEY", "")
-            or os.environ.get("TWOCAPTCHA_API_KEY", "")
-            or os.environ.get("CAPSOLVER_API_KEY", "")
-        )
-        if solver_type != "local" and not api_key:
-            self._last_error = (
-                "No API key provided for solver '%s'. "
-                "Set the API key field or use solver_type='local' for Tesseract OCR."
-                % solver_type
-            )
-            _logger.error(self._last_error)
+    def _prepare_auto_login(self, attempt):
+        # Load login page (fresh session each attempt)
+        if not self.prepare_login():
             return False
+        # Brief pause to let the server register the session before
+        # requesting the CAPTCHA — portals often return HTML if the
+        # CAPTCHA is requested too quickly after the login page load.
+        time.sleep(1.0 + attempt * 0.5)
+        return True
 
-        _logger.info(
-            "Grab: Starting auto-login for user: %s (solver=%s, max %d attempts)",
-            self.username, solver_type, max_attempts,
-        )
-
-        for attempt in range(1, max_attempts + 1):
-            try:
-                # Step 1: Load login page (fresh session each attempt)
-                if not self.prepare_login():
-                    _logger.warning(
-                        "Attempt %d: Failed to prepare login page", attempt,
-                    )
-                    continue
-
-                # Brief pause to let the server register the session before
-                # requesting the CAPTCHA — portals often return HTML if the
-                # CAPTCHA is requested too quickly after the login page load.
-                time.sleep(1.0 + attempt * 0.5)
-
-                # Step 2: Fetch CAPTCHA image
-                captcha_bytes = self.get_captcha_image()
-                if not captcha_bytes:
-                    _logger.warning(
-                        "Attempt %d: Failed to fetch CAPTCHA image. Last error: %s",
-                        attempt, self._last_error,
-                    )
-                    continue
-
-                # Step 3: Solve CAPTCHA via selected solver
-                if solver_type == "capsolver":
-                    captcha_answer = self._solve_captcha_with_capsolver(
-                        captcha_bytes, api_key
-                    )
-                elif solver_type == "local":
-                    captcha_answer = self._solve_captcha_local(captcha_bytes)
-                else:  # default: 2captcha
-                    captcha_answer = self._solve_captcha_with_2captcha(
-                        captcha_bytes, api_key
-                    )
-
-                if not captcha_answer:
-                    _logger.warning(
-                        "Attempt %d: Solver '%s' returned empty answer",
-                        attempt, solver_type,
-                    )
-                    continue
-
-                _logger.info(
-                    "Attempt %d: CAPTCHA solved by '%s' as '%s'",
-                    attempt, solver_type, captcha_answer,
-                )
-
-                # Step 4: Submit login
-                login_result = self.login(captcha_answer)
-                if login_result:
-                    _logger.info(
-                        "Grab: Auto-login successful on attempt %d for user: %s",
-                        attempt, self.username,
-                    )
-                    return True
-
-                # Check if account is locked — no point retrying
-                if self._account_locked:
-                    _logger.error(
-                        "Grab: Account is LOCKED. Stopping auto-login. Error: %s",
-                        self._last_error,
-                    )
-                    return False
-
-                _logger.warning(
-                    "Grab: Login attempt %d failed: %s", attempt, self._last_error,
-                )
-
-            except Exception as e:
-                self._last_error = "Login error (attempt %d): %s" % (attempt, str(e))
-                _logger.error(self._last_error, exc_info=True)
-
-            # Wait before retry (increasing delay to avoid rate-limiting)
-            if attempt < max_attempts:
-                delay = 5 * attempt
-                _logger.info("Waiting %ds before retry...", delay)
-                time.sleep(delay)
-
-        self._last_error = (
-            "Auto-login failed after %d attempts for user: %s. Last error: %s"
-            % (max_attempts, self.username, self._last_error or "Unknown")
-        )
-        _logger.error(self._last_error)
-        return False
-
-    def _solve_captcha_with_2captcha(self, image_bytes, api_key):
-        """
-        Solve image CAPTCHA using 2captcha.com paid service.
-        Uses only the built-in `requests` library — no extra SDK needed.
-
-        Flow:
-          1. POST image to 2captcha /in.php  → get task ID
-          2. Poll 2captcha /res.php every 5s → get answer text
-
-        Args:
-            image_bytes (bytes): Raw PNG/JPEG image data.
-            api_key (str): 2captcha.com API key.
-
-        Returns:
-            str: The CAPTCHA text, or empty string on failure.
-        """
-        try:
-            import base64 as _b64
-            import time as _time
-
-            img_b64 = _b64.b64encode(image_bytes).decode("utf-8")
-
-            # Step 1: Submit CAPTCHA image
-            submit_resp = requests.post(
-                "https://2captcha.com/in.php",
-                data={
-                    "key": api_key,
-                    "method": "base64",
-                    "body": img_b64,
-                    "json": 1,
-                },
-                timeout=30,
-            )
-            submit_data = submit_resp.json()
-            if submit_data.get("status") != 1:
-                _logger.warning(
-                    "Grab: 2captcha submit failed: %s", submit_data.get("request")
-                )
-                return ""
-
-            task_id = submit_data["request"]
-            _logger.info("Grab: 2captcha task submitted, id=%s", task_id)
-
-            # Step 2: Poll for result (max 60s)
-            for _ in range(12):
-                _time.sleep(5)
-                result_resp = requests.get(
-                    "https://2captcha.com/res.php",
-                    params={"key": api_key, "action": "get", "id": task_id, "json": 1},
-                    timeout=30,
-                )
-                result_data = result_resp.json()
-                if result_data.get("status") == 1:
-                    answer = result_data["request"].strip()
-                    answer = re.sub(r"[^A-Za-z0-9]", "", answer)
-                    _logger.info("Grab: 2captcha answer: '%s'", answer)
-                    return answer
-                if result_data.get("request") != "CAPCHA_NOT_READY":
-                    _logger.warning(
-                        "Grab: 2captcha error: %s", result_data.get("request")
-                    )
-                    return ""
-
-            _logger.warning("Grab: 2captcha timed out waiting for answer")
-            return ""
-
-        except Exception as e:
-            _logger.error("Grab: 2captcha CAPTCHA solving error: %s", e)
-            return ""
-
-    def _solve_captcha_with_capsolver(self, image_bytes, api_key):
-        """
-        Solve image CAPTCHA using CapSolver.com paid service.
-        Uses only the built-in `requests` library — no extra SDK needed.
-
-        Flow:
-          1. POST createTask to https://api.capsolver.com/createTask
-          2. Poll getTaskResult every 3s until solved (max 60s)
-
-        Args:
-            image_bytes (bytes): Raw PNG/JPEG image data.
-            api_key (str): CapSolver.com API key.
-
-        Returns:
-            str: The CAPTCHA text, or empty string on failure.
-        """
-        try:
-            import base64 as _b64
-            import time as _time
-
-            img_b64 = _b64.b64encode(image_bytes).decode("utf-8")
-
-            # Step 1: Create task
-            create_resp = requests.post(
-                "https://api.capsolver.com/createTask",
-                json={
-                    "clientKey": api_key,
-                    "task": {
-                        "type": "ImageToTextTask",
-                        "body": img_b64,
-                        "module": "common",
-                        "score": 0.8,
-                        "case": True,
-                    },
-                },
-                timeout=30,
-            )
-            create_data = create_resp.json()
-            if create_data.get("errorId", 0) != 0:
-                _logger.warning(
-                    "Grab: CapSolver createTask failed: %s - %s",
-                    create_data.get("errorCode"),
-                    create_data.get("errorDescription"),
-                )
-                return ""
-
-            task_id = create_data.get("taskId")
-            _logger.info("Grab: CapSolver task created, id=%s", task_id)
-
-            # Step 2: Poll for result (max 60s)
-            for _ in range(20):
-                _time.sleep(3)
-                result_resp = requests.post(
-                    "https://api.capsolver.com/getTaskResult",
-                    json={"clientKey": api_key, "taskId": task_id},
-                    timeout=30,
-                )
-                result_data = result_resp.json()
-                if result_data.get("errorId", 0) != 0:
-                    _logger.warning(
-                        "Grab: CapSolver getTaskResult error: %s",
-                        result_data.get("errorDescription"),
-                    )
-                    return ""
-                status = result_data.get("status")
-                if status == "ready":
-                    answer = result_data.get("solution", {}).get("text", "").strip()
-                    answer = re.sub(r"[^A-Za-z0-9]", "", answer)
-                    _logger.info("Grab: CapSolver answer: '%s'", answer)
-                    return answer
-                if status == "failed":
-                    _logger.warning("Grab: CapSolver task failed")
-                    return ""
-
-            _logger.warning("Grab: CapSolver timed out waiting for answer")
-            return ""
-
-        except Exception as e:
-            _logger.error("Grab: CapSolver CAPTCHA solving error: %s", e)
-            return ""
-
-    def _solve_captcha_local(self, image_bytes):
-        """
-        Solve image CAPTCHA locally using multiple OCR engines in priority order:
-          1. EasyOCR  — deep learning OCR, best case-sensitivity for italic CAPTCHA
-          2. ddddocr  — lightweight CAPTCHA-specialized model, fast but may confuse case
-          3. Tesseract — classical OCR, fallback if above not installed
-
-        No API key or internet connection required after initial install.
-
-        Install on server:
-            pip install easyocr ddddocr==1.4.11 pillow scipy numpy
-
-        Args:
-            image_bytes (bytes): Raw PNG/JPEG image data.
-
-        Returns:
-            str: The CAPTCHA text, or empty string on failure.
-        """
-        try:
-            import io as _io
-            import numpy as _np
-            from PIL import Image
-
-            img = Image.open(_io.BytesIO(image_bytes)).convert("RGB")
-            arr = _np.array(img)
-
-            # --- Preprocessing: extract colored text on white background ---
-            # Detect non-white pixels (text): R<180 AND G<180
-            text_pixels = (arr[:, :, 0] < 180) & (arr[:, :, 1] < 180)
-            mask = _np.where(text_pixels, 0, 255).astype(_np.uint8)
-            mask_img = Image.fromarray(mask, "L")
-
-            # Upscale 4x for better recognition
-            big = mask_img.resize((img.width * 4, img.height * 4), Image.LANCZOS)
-            big_arr = _np.array(big)
-            big_bin = (big_arr < 128).astype(_np.uint8)
-
-            # Remove small noise dots using connected component filtering
-            try:
-                from scipy import ndimage as _ndimage
-                labeled, _ = _ndimage.label(big_bin)
-                comp_sizes = _np.bincount(labeled.ravel())
-                too_small = comp_sizes < 80
-                too_small[0] = False
-                big_bin[too_small[labeled]] = 0
-            except ImportError:
-                pass  # Skip denoising if scipy not available
-
-            # Convert to clean black-on-white image with padding
-            clean_arr = _np.where(big_bin, 0, 255).astype(_np.uint8)
-            clean = Image.fromarray(clean_arr, "L")
-            padded = Image.new("L", (clean.width + 40, clean.height + 40), 255)
-            padded.paste(clean, (20, 20))
-            padded_rgb = padded.convert("RGB")
-
-            # Encode preprocessed image to bytes for ddddocr
-            buf = _io.BytesIO()
-            padded_rgb.save(buf, format="PNG")
-            preprocessed_bytes = buf.getvalue()
-
-            # --- Priority 1: EasyOCR (best case accuracy for italic CAPTCHA) ---
-            try:
-                import easyocr
-                if not hasattr(self, "_easyocr_reader"):
-                    _logger.info("Grab: Initializing EasyOCR reader (first run may take ~10s)...")
-                    self._easyocr_reader = easyocr.Reader(["en"], gpu=False, verbose=False)
-                results = self._easyocr_reader.readtext(
-                    _np.array(padded_rgb),
-                    allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789",
-                    detail=1,
-                )
-                if results:
-                    best = max(results, key=lambda x: x[2])
-                    text = re.sub(r"[^A-Za-z0-9]", "", best[1])
-                    _logger.info("Grab: EasyOCR answer: '%s' (conf=%.2f)", text, best[2])
-                    if text:
-                        return text
-            except ImportError:
-                _logger.warning(
-                    "Grab: easyocr not installed. Run: pip install easyocr\n"
-                    "Trying ddddocr next."
-                )
-            except Exception as e:
-                _logger.warning("Grab: EasyOCR failed: %s. Trying ddddocr.", e)
-
-            # --- Priority 2: ddddocr (fast, may confuse case) ---
-            try:
-                import ddddocr
-                if not hasattr(self, "_ddddocr_instance"):
-                    _logger.info("Grab: Initializing ddddocr...")
-                    self._ddddocr_instance = ddddocr.DdddOcr(show_ad=False)
-                # Try on raw image first
-                text = self._ddddocr_instance.classification(image_bytes)
-                text = re.sub(r"[^A-Za-z0-9]", "", text)
-                if text:
-                    _logger.info("Grab: ddddocr answer: '%s'", text)
-                    return text
-                # Fallback to preprocessed if raw returns empty
-                text = self._ddddocr_instance.classification(preprocessed_bytes)
-                text = re.sub(r"[^A-Za-z0-9]", "", text)
-                if text:
-                    _logger.info("Grab: ddddocr (preprocessed) answer: '%s'", text)
-                    return text
-            except ImportError:
-                _logger.warning(
-                    "Grab: ddddocr not installed. Run: pip install ddddocr==1.4.11\n"
-                    "Trying Tesseract next."
-                )
-            except Exception as e:
-                _logger.warning("Grab: ddddocr failed: %s. Trying Tesseract.", e)
-
-            # --- Priority 3: Tesseract OCR (classical fallback) ---
-            try:
-                import pytesseract
-                config = (
-                    "--psm 8 --oem 3 "
-                    "-c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
-                )
-                text = pytesseract.image_to_string(padded, config=config).strip()
-                text = re.sub(r"[^A-Za-z0-9]", "", text)
-                _logger.info("Grab: Tesseract OCR answer: '%s'", text)
-                return text
-            except ImportError:
-                _logger.warning(
-                    "Grab: No OCR engine available. Install at least one:\n"
-                    "  pip install easyocr   (recommended)\n"
-                    "  pip install ddddocr==1.4.11\n"
-                    "  apt install tesseract-ocr && pip install pytesseract"
-                )
-                return ""
-
-        except Exception as e:
-            _logger.error("Grab: Local OCR CAPTCHA solving error: %s", e)
-            return ""
-
-    def _solve_captcha_with_gemini(self, image_bytes, api_key):
-        """Deprecated: Use _solve_captcha_with_2captcha() instead."""
-        return self._solve_captcha_with_2captcha(image_bytes, api_key)
-
-    def _solve_captcha_with_openai(self, image_bytes, api_key):
-        """Deprecated: Use _solve_captcha_with_2captcha() instead."""
-        return self._solve_captcha_with_2captcha(image_bytes, api_key)
+    def _fetch_login_captcha(self):
+        return self.get_captcha_image(), None
 
     # ------------------------------------------------------------------
     # Strategy 2: Cookie Restore
@@ -556,19 +114,16 @@ class GrabEInvoiceSession:
         """Restore session from a previously saved cookie dictionary."""
         if not cookie_dict:
             return
-        for name, value in cookie_dict.items():
-            self._session.cookies.set(name, value)
+        self._load_cookies(cookie_dict)
         if ".ASPXAUTH" in cookie_dict:
-            self._authenticated = True
-            self._auth_time = datetime.now()
+            self._mark_authenticated()
             _logger.info("Session restored from stored cookies")
 
     def restore_aspx_cookie(self, aspx_auth_value):
         """Restore session from just the .ASPXAUTH cookie value."""
         if aspx_auth_value:
             self._session.cookies.set(".ASPXAUTH", aspx_auth_value)
-            self._authenticated = True
-            self._auth_time = datetime.now()
+            self._mark_authenticated()
             _logger.info("Session restored from .ASPXAUTH cookie")
 
     # ------------------------------------------------------------------
@@ -584,14 +139,15 @@ class GrabEInvoiceSession:
         """
         _logger.info("Preparing Grab e-invoice login session...")
         try:
-            response = self._session.get(
+            response = self._request(
+                "GET",
                 self._url(LOGIN_PATH),
                 timeout=REQUEST_TIMEOUT,
             )
             response.raise_for_status()
         except requests.RequestException as e:
-            self._last_error = "Failed to load login page: %s" % str(e)
-            _logger.error(self._last_error)
+            self.last_error = "Failed to load login page: %s" % str(e)
+            _logger.error(self.last_error)
             return False
 
         # Extract CSRF token from hidden input
@@ -638,8 +194,8 @@ class GrabEInvoiceSession:
 
             return True
 
-        self._last_error = "Could not extract CSRF token from login page"
-        _logger.warning(self._last_error)
+        self.last_error = "Could not extract CSRF token from login page"
+        _logger.warning(self.last_error)
         return False
 
     def get_captcha_image(self):
@@ -654,7 +210,8 @@ class GrabEInvoiceSession:
         captcha_url = self._captcha_url or self._url(CAPTCHA_PATH)
         _logger.info("Fetching CAPTCHA image from: %s", captcha_url)
         try:
-            response = self._session.get(
+            response = self._request(
+                "GET",
                 captcha_url,
                 params={"t": int(time.time() * 1000)},  # cache-bust: prevents 304/cached HTML
                 timeout=REQUEST_TIMEOUT,
@@ -670,8 +227,8 @@ class GrabEInvoiceSession:
                 },
             )
         except requests.RequestException as e:
-            self._last_error = "Failed to fetch CAPTCHA: %s" % str(e)
-            _logger.error(self._last_error)
+            self.last_error = "Failed to fetch CAPTCHA: %s" % str(e)
+            _logger.error(self.last_error)
             return None
 
         content_type = response.headers.get("content-type", "")
@@ -735,7 +292,8 @@ class GrabEInvoiceSession:
                     if not alt_path.startswith("http"):
                         alt_path = self._url(alt_path if alt_path.startswith("/") else "/" + alt_path)
                     try:
-                        alt_resp = self._session.get(
+                        alt_resp = self._request(
+                            "GET",
                             alt_path,
                             params={"t": int(time.time() * 1000)},
                             timeout=REQUEST_TIMEOUT,
@@ -747,7 +305,7 @@ class GrabEInvoiceSession:
                     except Exception as e:
                         _logger.warning("Alternative CAPTCHA fetch failed: %s", e)
 
-                self._last_error = "CAPTCHA endpoint returned HTML instead of image"
+                self.last_error = "CAPTCHA endpoint returned HTML instead of image"
                 return None
 
             # Small response that might still be an image
@@ -758,11 +316,11 @@ class GrabEInvoiceSession:
                 )
                 return response.content
 
-        self._last_error = (
+        self.last_error = (
             "Unexpected CAPTCHA response: HTTP %d, type: %s, size: %d"
             % (response.status_code, content_type, len(response.content))
         )
-        _logger.warning(self._last_error)
+        _logger.warning(self.last_error)
         return None
 
     def get_captcha_image_b64(self):
@@ -783,8 +341,8 @@ class GrabEInvoiceSession:
             bool: True if login was successful.
         """
         if not self._csrf_token:
-            self._last_error = "CSRF token not available. Call prepare_login() first."
-            raise ValueError(self._last_error)
+            self.last_error = "CSRF token not available. Call prepare_login() first."
+            raise ValueError(self.last_error)
 
         _logger.info(
             "Attempting Grab login for user: %s (captcha: %s)",
@@ -799,10 +357,11 @@ class GrabEInvoiceSession:
         }
 
         try:
-            response = self._session.post(
+            response = self._request(
+                "POST",
                 self._url(LOGIN_PATH),
+                retries=1,
                 data=payload,
-                timeout=REQUEST_TIMEOUT,
                 headers={
                     "Content-Type": "application/x-www-form-urlencoded",
                     "Referer": self._url(LOGIN_PATH),
@@ -811,8 +370,8 @@ class GrabEInvoiceSession:
                 allow_redirects=True,
             )
         except requests.RequestException as e:
-            self._last_error = "Login request failed: %s" % str(e)
-            _logger.error(self._last_error)
+            self.last_error = "Login request failed: %s" % str(e)
+            _logger.error(self.last_error)
             return False
 
         final_url = response.url
@@ -839,12 +398,12 @@ class GrabEInvoiceSession:
 
         for pattern, msg in error_patterns.items():
             if pattern.lower() in response_text.lower():
-                self._last_error = "Login failed: %s" % msg
-                _logger.warning(self._last_error)
+                self.last_error = "Login failed: %s" % msg
+                _logger.warning(self.last_error)
 
                 # Detect account locked
                 if any(kw in pattern.lower() for kw in ["khóa", "locked", "quá số lần"]):
-                    self._account_locked = True
+                    self.is_account_locked = True
                     _logger.error("ACCOUNT LOCKED detected for user: %s", self.username)
 
                 return False
@@ -855,8 +414,7 @@ class GrabEInvoiceSession:
         # 1. .ASPXAUTH cookie is set
         aspx_cookie = self._session.cookies.get(".ASPXAUTH")
         if aspx_cookie:
-            self._authenticated = True
-            self._auth_time = datetime.now()
+            self._mark_authenticated()
             _logger.info(
                 "Login successful! .ASPXAUTH cookie obtained. Final URL: %s",
                 final_url,
@@ -865,8 +423,7 @@ class GrabEInvoiceSession:
 
         # 2. Redirected away from login page
         if "dang-nhap" not in final_url.lower() and response.status_code == 200:
-            self._authenticated = True
-            self._auth_time = datetime.now()
+            self._mark_authenticated()
             _logger.info(
                 "Login appears successful (redirected to: %s)", final_url,
             )
@@ -874,32 +431,21 @@ class GrabEInvoiceSession:
 
         # 3. No login form in response
         if "UserName" not in response_text and "Đăng nhập" not in response_text:
-            self._authenticated = True
-            self._auth_time = datetime.now()
+            self._mark_authenticated()
             _logger.info("Login appears successful (no login form in response)")
             return True
 
-        self._last_error = (
+        self.last_error = (
             "Login failed: no .ASPXAUTH cookie and still on login page. "
             "This usually means wrong CAPTCHA. Final URL: %s" % final_url
         )
-        _logger.warning(self._last_error)
+        _logger.warning(self.last_error)
         return False
 
     # ------------------------------------------------------------------
     # Session Management
     # ------------------------------------------------------------------
 
-    def is_authenticated(self):
-        """Check if the session appears to be authenticated."""
-        if not self._authenticated or not self._auth_time:
-            return False
-        elapsed = datetime.now() - self._auth_time
-        if elapsed > timedelta(minutes=25):
-            _logger.info("Session may have expired (age: %s)", elapsed)
-            return False
-        return True
-
     def check_session_valid(self):
         """
         Actively verify if the session is still valid by making a test request.
@@ -908,7 +454,8 @@ class GrabEInvoiceSession:
             bool: True if session is still valid.
         """
         try:
-            response = self._session.get(
+            response = self._request(
+                "GET",
                 self._url(INVOICE_LIST_PATH),
                 timeout=REQUEST_TIMEOUT,
                 allow_redirects=False,
@@ -928,8 +475,7 @@ class GrabEInvoiceSession:
                     _logger.info("Session expired (login form shown)")
                     self._authenticated = False
                     return False
-                self._authenticated = True
-                self._auth_time = datetime.now()
+                self._mark_authenticated()
                 return True
 
         except Exception as e:
@@ -938,10 +484,6 @@ class GrabEInvoiceSession:
         self._authenticated = False
         return False
 
-    def get_all_cookies(self):
-        """Export all session cookies as a dictionary for persistence."""
-        return {c.name: c.value for c in self._session.cookies}
-
     def get_aspx_cookie(self):
         """Get the .ASPXAUTH cookie value for persistence."""
         return self._session.cookies.get(".ASPXAUTH", "")
@@ -1004,7 +546,8 @@ class GrabEInvoiceSession:
 
         # Visit the invoice list page first (may set required tokens)
         try:
-            list_resp = self._session.get(
+            list_resp = self._request(
+                "GET",
                 self._url(INVOICE_LIST_PATH),
                 params={"dateFrom": date_from, "dateTo": date_to},
                 timeout=REQUEST_TIMEOUT,
@@ -1020,7 +563,8 @@ class GrabEInvoiceSession:
         # Download the report
         try:
             payload = {"dateFrom": date_from, "dateTo": date_to}
-            response = self._session.post(
+            response = self._request(
+                "POST",
                 self._url(INVOICE_REPORT_PATH),
                 data=payload,
                 timeout=DOWNLOAD_TIMEOUT,
@@ -1166,7 +710,8 @@ class GrabEInvoiceSession:
         }
 
         try:
-            response = self._session.get(
+            response = self._request(
+                "GET",
                 self._url(INVOICE_LIST_PATH),
                 params=params,
                 timeout=REQUEST_TIMEOUT,
@@ -1442,11 +987,32 @@ class GrabEInvoiceSession:
     # ------------------------------------------------------------------
 
     def download_invoice_files(self, invoice_ids, allow_pdf=True, allow_xml=True):
-        """Download invoice files (PDF/XML) as a ZIP archive."""
+        """Download invoice files (PDF/XML) as a ZIP archive (in memory)."""
+        buf = io.BytesIO()
+        if not self.download_invoice_files_to(buf, invoice_ids, allow_pdf, allow_xml):
+            return None
+        return buf.getvalue()
+
+    def download_invoice_files_to(self, fileobj, invoice_ids, allow_pdf=True, allow_xml=True):
+        """
+        Stream the ZIP archive of invoice files (PDF/XML) into a file object.
+
+        The response body is copied in DOWNLOAD_CHUNK_SIZE chunks, so the
+        archive is never held in memory as a whole.
+
+        Args:
+            fileobj: Writable binary file object (e.g. a temporary file).
+            invoice_ids (list): Portal invoice IDs.
+            allow_pdf (bool): Include PDF files.
+            allow_xml (bool): Include XML files.
+
+        Returns:
+            int: Bytes written, or 0 if the portal returned no archive.
+        """
         if not self._authenticated:
             raise ValueError("Not authenticated.")
         if not invoice_ids:
-            return None
+            return 0
 
         _logger.info(
             "Downloading files for %d invoices (PDF=%s, XML=%s)",
@@ -1460,10 +1026,12 @@ class GrabEInvoiceSession:
         }
 
         try:
-            response = self._session.post(
+            response = self._request(
+                "POST",
                 self._url(INVOICE_DOWNLOAD_PATH),
                 json=payload,
                 timeout=DOWNLOAD_TIMEOUT,
+                stream=True,
                 headers={
                     "Accept": "application/zip, application/octet-stream, */*",
                     "X-Requested-With": "XMLHttpRequest",
@@ -1471,24 +1039,29 @@ class GrabEInvoiceSession:
                     "Referer": self._url(INVOICE_LIST_PATH),
                 },
             )
-
-            if response.status_code == 200 and len(response.content) > 100:
-                _logger.info(
-                    "Downloaded %d bytes for %d invoices",
-                    len(response.content), len(invoice_ids),
-                )
-                return response.content
-
-            _logger.warning(
-                "Download response: HTTP %d, size: %d bytes",
-                response.status_code, len(response.content),
-            )
-            return None
-
         except requests.RequestException as e:
             _logger.error("Download request failed: %s", e)
             raise
 
+        with response:
+            if response.status_code != 200:
+                _logger.warning("Download response: HTTP %d", response.status_code)
+                return 0
+            start = fileobj.tell()
+            size = 0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                fileobj.write(chunk)
+                size += len(chunk)
+
+        if size <= 100:
+            _logger.warning("Download response too small: %d bytes", size)
+            fileobj.seek(start)
+            fileobj.truncate()
+            return 0
+
+        _logger.info("Downloaded %d bytes for %d invoices", size, len(invoice_ids))
+        return size
+
     def download_report_data(self, date_from, date_to):
         """Download invoice report data (Excel/CSV) for a date range."""
         if not self._authenticated:
@@ -1499,7 +1072,8 @@ class GrabEInvoiceSession:
         payload = {"dateFrom": date_from, "dateTo": date_to}
 
         try:
-            response = self._session.post(
+            response = self._request(
+                "POST",
                 self._url(INVOICE_REPORT_PATH),
                 data=payload,
                 timeout=DOWNLOAD_TIMEOUT,
@@ -1531,7 +1105,7 @@ class GrabEInvoiceSession:
     def logout(self):
         """Log out from the portal and clear session."""
         try:
-            self._session.get(self._url(LOGOUT_PATH), timeout=REQUEST_TIMEOUT)
+            self._request("GET", self._url(LOGOUT_PATH), retries=1)
         except Exception:
             pass
         finally:
@@ -0,0 +1,662 @@
+# -*- coding: utf-8 -*-
+"""
+E-Invoice Portal Session Base
+==============================
+Common engine of the CAPTCHA-protected e-invoice portal sessions
+(Grab, SPV, Shinhan). A provider adapter subclasses ``PortalSession`` and
+only implements what is specific to its portal:
+
+  - ``prepare_login()`` / ``login(captcha_answer)``
+  - ``_fetch_login_captcha()``  → (image bytes, answer known from the server)
+  - ``fetch_invoices(date_from, date_to, page, page_size)``
+  - optionally ``_prepare_auto_login(attempt)`` and ``persisted_attrs``
+
+The base class provides:
+
+  - ``auto_login()`` with the CAPTCHA solvers (2captcha, CapSolver, local OCR)
+  - ``_request()``: retries with jittered backoff on connection errors and
+    HTTP 429/502/503/504, honouring Retry-After, with per-host latency
+    recorded in the shared collector HTTP client histograms
+  - ``deadline``: an optional time budget (``time.time()`` value) capping
+    every request timeout, backoff wait and auto-login attempt; once spent,
+    ``PortalDeadlineExceeded`` is raised
+  - ``export_state()`` / ``restore_state()``: cookies + login tokens (CSRF,
+    nonce, JWT ...) as one JSON document
+  - ``iter_pages()`` / ``iter_invoices()``: lazy pagination over
+    ``fetch_invoices()`` yielding normalized invoice dicts
+
+This module is a pure Python library (no Odoo dependencies) so it can be
+tested independently.
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+import time
+from datetime import date, datetime, timedelta
+
+import requests
+
+from .captcha_ocr import get_ocr_registry
+from .collector_http import get_http_client, parse_retry_after
+
+_logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = 30
+MAX_LOGIN_ATTEMPTS = 5
+REQUEST_RETRIES = 3
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# Seconds to wait after a CAPTCHA could not be fetched or solved; a rejected
+# login waits 5s x attempt instead.
+CAPTCHA_RETRY_DELAY = 2
+
+TWOCAPTCHA_SUBMIT_URL = "https://2captcha.com/in.php"
+TWOCAPTCHA_RESULT_URL = "https://2captcha.com/res.php"
+CAPSOLVER_CREATE_URL = "https://api.capsolver.com/createTask"
+CAPSOLVER_RESULT_URL = "https://api.capsolver.com/getTaskResult"
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/121.0.0.0 Safari/537.36"
+    ),
+    "Accept-Language": "vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+
+def _clean_answer(text):
+    return re.sub(r"[^A-Za-z0-9]", "", (text or "").strip())
+
+
+class PortalDeadlineExceeded(requests.Timeout):
+    """The time budget of the session (``PortalSession.deadline``) is spent."""
+
+
+class PortalSession:
+    """
+    Base class of a login session with a CAPTCHA-protected e-invoice portal.
+
+    Usage (auto-login)::
+
+        session = GrabEInvoiceSession("user", "pass")
+        if session.auto_login(captcha_api_key="..."):
+            for invoice in session.iter_invoices(date_from, date_to):
+                print(invoice)
+
+    Usage (manual CAPTCHA, across two requests)::
+
+        session.prepare_login()
+        captcha_b64 = session.get_captcha_image_b64()
+        state = session.export_state()
+        # ... show the image to the user, get the answer ...
+        session = GrabEInvoiceSession("user", "pass")
+        session.restore_state(state)
+        if session.login("AB12"):
+            ...
+    """
+
+    label = "Portal"
+    default_base_url = ""
+    default_headers = DEFAULT_HEADERS
+    max_login_attempts = MAX_LOGIN_ATTEMPTS
+    request_timeout = REQUEST_TIMEOUT
+    session_timeout_minutes = 25
+    # strftime format of the dates passed to fetch_invoices()
+    date_format = "%d/%m/%Y"
+    # Instance attributes kept by export_state() besides the cookies
+    persisted_attrs = ()
+
+    def __init__(self, username, password, base_url=None):
+        self.username = username
+        self.password = password
+        self.base_url = (base_url or self.default_base_url).rstrip("/")
+
+        self._session = requests.Session()
+        self._session.headers.update(self.default_headers)
+
+        self._authenticated = False
+        self._auth_time = None
+
+        self.last_error = ""
+        self.is_account_locked = False
+        # time.time() after which no request is sent (cron fetch budget)
+        self.deadline = None
+
+    # ------------------------------------------------------------------
+    # Provider hooks
+    # ------------------------------------------------------------------
+
+    def prepare_login(self):
+        """Load the login page (tokens, session cookies). Optional."""
+        return True
+
+    def login(self, captcha_answer):
+        raise NotImplementedError()
+
+    def fetch_invoices(self, date_from=None, date_to=None, page=1, page_size=50):
+        """Return one page as {'invoices': list, 'total': int, 'has_more': bool}."""
+        raise NotImplementedError()
+
+    def _prepare_auto_login(self, attempt):
+        """Reset the login state before an auto-login attempt.
+
+        Returns:
+            bool: False if the attempt cannot go on.
+        """
+        return bool(self.prepare_login())
+
+    def _fetch_login_captcha(self):
+        """Fetch the login CAPTCHA.
+
+        Returns:
+            tuple: (image bytes or None, answer provided by the server or None)
+        """
+        raise NotImplementedError()
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    def _url(self, path):
+        return "%s%s" % (self.base_url, path)
+
+    def _time_left(self):
+        """Seconds left before the deadline, or None without deadline."""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.time()
+
+    def _check_deadline(self):
+        """Raise PortalDeadlineExceeded once the deadline has passed."""
+        time_left = self._time_left()
+        if time_left is not None and time_left <= 0:
+            raise PortalDeadlineExceeded(
+                "%s: the time budget of this fetch is spent" % self.label
+            )
+
+    def _budget_timeout(self, timeout):
+        """Return timeout capped to the time left before the deadline."""
+        self._check_deadline()
+        time_left = self._time_left()
+        return timeout if time_left is None else min(timeout, time_left)
+
+    def _can_wait(self, delay):
+        """Whether waiting delay seconds still leaves time for a request."""
+        time_left = self._time_left()
+        return time_left is None or delay < time_left
+
+    def _request(self, method, url, retries=REQUEST_RETRIES, **kwargs):
+        """Send a request on the portal session, retrying transient failures.
+
+        Connection errors, timeouts and HTTP 429/502/503/504 are retried up
+        to ``retries`` attempts in total with jittered exponential backoff
+        (or the server's Retry-After). Use ``retries=1`` for requests that
+        must not be replayed, such as a login POST. With a ``deadline``, the
+        timeout of each attempt is capped to the time left and no retry is
+        made that would wait past it.
+
+        Returns:
+            requests.Response: The last response received.
+
+        Raises:
+            PortalDeadlineExceeded: If the deadline passed before an attempt.
+            requests.RequestException: If the last attempt failed to connect.
+        """
+        client = get_http_client()
+        host = client.host_of(url)
+        timeout = kwargs.pop("timeout", self.request_timeout)
+        retries = max(1, retries)
+
+        for attempt in range(1, retries + 1):
+            kwargs["timeout"] = self._budget_timeout(timeout)
+            start = time.monotonic()
+            try:
+                response = self._session.request(method.upper(), url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                client.observe(host, time.monotonic() - start, 0)
+                delay = client.backoff_delay(attempt)
+                if attempt >= retries or not self._can_wait(delay):
+                    raise
+                _logger.warning(
+                    "%s: %s %s failed (%s), retrying in %.1fs",
+                    self.label, method.upper(), url, e, delay,
+                )
+                time.sleep(delay)
+                continue
+
+            client.observe(host, time.monotonic() - start, response.status_code)
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                return response
+
+            delay = client.backoff_delay(
+                attempt, parse_retry_after(response.headers.get("Retry-After")),
+            )
+            if not self._can_wait(delay):
+                return response
+            _logger.warning(
+                "%s: %s %s returned HTTP %d, retrying in %.1fs",
+                self.label, method.upper(), url, response.status_code, delay,
+            )
+            time.sleep(delay)
+
+    # ------------------------------------------------------------------
+    # Auto-Login (CAPTCHA solved by a solver service or local OCR)
+    # ------------------------------------------------------------------
+
+    def auto_login(
+        self,
+        captcha_api_key=None,
+        solver_type="2captcha",
+        gemini_api_key=None,
+        openai_api_key=None,
+        max_attempts=None,
+    ):
+        """
+        Fully automated login: load page → fetch CAPTCHA → solve → submit.
+
+        Args:
+            captcha_api_key (str): API key for the selected solver service.
+            solver_type (str): CAPTCHA solver to use. One of:
+                - '2captcha'  : 2captcha.com paid service (default)
+                - 'capsolver' : CapSolver.com paid service
+                - 'local'     : Local OCR (free, no API key needed)
+            gemini_api_key (str): Deprecated. Use captcha_api_key instead.
+            openai_api_key (str): Deprecated. Use captcha_api_key instead.
+            max_attempts (int): Maximum number of CAPTCHA-solve-and-login attempts.
+
+        Returns:
+            bool: True if login succeeded.
+
+        Raises:
+            PortalDeadlineExceeded: If the deadline passes between attempts.
+        """
+        max_attempts = max_attempts or self.max_login_attempts
+        solver_type = (solver_type or "2captcha").lower().strip()
+        api_key = (
+            captcha_api_key
+            or gemini_api_key
+            or openai_api_key
+            or os.environ.get("CAPTCHA_API_KEY", "")
+            or os.environ.get("TWOCAPTCHA_API_KEY", "")
+            or os.environ.get("CAPSOLVER_API_KEY", "")
+        )
+        if solver_type != "local" and not api_key:
+            self.last_error = (
+                "No API key provided for solver '%s'. "
+                "Set the API key field or use solver_type='local' for local OCR."
+                % solver_type
+            )
+            _logger.error("%s: %s", self.label, self.last_error)
+            return False
+
+        _logger.info(
+            "%s: Starting auto-login for user: %s (solver=%s, max %d attempts)",
+            self.label, self.username, solver_type, max_attempts,
+        )
+
+        for attempt in range(1, max_attempts + 1):
+            self._check_deadline()
+            delay = 5 * attempt
+            try:
+                if not self._prepare_auto_login(attempt):
+                    _logger.warning(
+                        "%s: Attempt %d: failed to prepare login: %s",
+                        self.label, attempt, self.last_error,
+                    )
+                    continue
+
+                image_bytes, captcha_answer = self._fetch_login_captcha()
+                if captcha_answer:
+                    _logger.info(
+                        "%s: Attempt %d: using server-provided CAPTCHA text",
+                        self.label, attempt,
+                    )
+                elif not image_bytes:
+                    _logger.warning(
+                        "%s: Attempt %d: failed to fetch CAPTCHA image: %s",
+                        self.label, attempt, self.last_error,
+                    )
+                    delay = CAPTCHA_RETRY_DELAY
+                    continue
+                else:
+                    captcha_answer = self.solve_captcha(image_bytes, solver_type, api_key)
+                    if not captcha_answer:
+                        _logger.warning(
+                            "%s: Attempt %d: solver '%s' returned empty answer",
+                            self.label, attempt, solver_type,
+                        )
+                        delay = CAPTCHA_RETRY_DELAY
+                        continue
+                    _logger.info(
+                        "%s: Attempt %d: CAPTCHA solved by '%s' as '%s'",
+                        self.label, attempt, solver_type, captcha_answer,
+                    )
+
+                if self.login(captcha_answer):
+                    _logger.info(
+                        "%s: Auto-login successful on attempt %d for user: %s",
+                        self.label, attempt, self.username,
+                    )
+                    return True
+
+                # Account locked — no point retrying
+                if self.is_account_locked:
+                    _logger.error(
+                        "%s: Account is LOCKED. Stopping auto-login. Error: %s",
+                        self.label, self.last_error,
+                    )
+                    return False
+
+                _logger.warning(
+                    "%s: Login attempt %d failed: %s",
+                    self.label, attempt, self.last_error,
+                )
+
+            except PortalDeadlineExceeded:
+                raise
+
+            except Exception as e:
+                self.last_error = "Login error (attempt %d): %s" % (attempt, e)
+                _logger.error("%s: %s", self.label, self.last_error, exc_info=True)
+
+            finally:
+                # Wait before retry (increasing delay to avoid rate-limiting)
+                if attempt < max_attempts and not self._authenticated \
+                        and not self.is_account_locked and self._can_wait(delay):
+                    _logger.info("%s: Waiting %ds before retry...", self.label, delay)
+                    time.sleep(delay)
+
+        self.last_error = (
+            "Auto-login failed after %d attempts for user: %s. Last error: %s"
+            % (max_attempts, self.username, self.last_error or "Unknown")
+        )
+        _logger.error("%s: %s", self.label, self.last_error)
+        return False
+
+    # ------------------------------------------------------------------
+    # CAPTCHA solvers
+    # ------------------------------------------------------------------
+
+    def solve_captcha(self, image_bytes, solver_type="2captcha", api_key=None):
+        """Solve a CAPTCHA image with the given solver.
+
+        Returns:
+            str: The CAPTCHA text, or empty string on failure.
+        """
+        if solver_type == "capsolver":
+            return self._solve_captcha_with_capsolver(image_bytes, api_key)
+        if solver_type == "local":
+            return self._solve_captcha_local(image_bytes)
+        return self._solve_captcha_with_2captcha(image_bytes, api_key)
+
+    def _solve_captcha_with_2captcha(self, image_bytes, api_key):
+        """
+        Solve image CAPTCHA using 2captcha.com paid service.
+
+        Flow:
+          1. POST image to 2captcha /in.php  → get task ID
+          2. Poll 2captcha /res.php every 5s → get answer text
+
+        Args:
+            image_bytes (bytes): Raw PNG/JPEG image data.
+            api_key (str): 2captcha.com API key.
+
+        Returns:
+            str: The CAPTCHA text, or empty string on failure.
+        """
+        client = get_http_client()
+        try:
+            submit_resp = client.request(
+                "POST", TWOCAPTCHA_SUBMIT_URL,
+                data={
+                    "key": api_key,
+                    "method": "base64",
+                    "body": base64.b64encode(image_bytes).decode("utf-8"),
+                    "json": 1,
+                },
+                timeout=self._budget_timeout(30),
+            )
+            submit_data = submit_resp.json()
+            if submit_data.get("status") != 1:
+                _logger.warning(
+                    "%s: 2captcha submit failed: %s",
+                    self.label, submit_data.get("request"),
+                )
+                return ""
+
+            task_id = submit_data["request"]
+            _logger.info("%s: 2captcha task submitted, id=%s", self.label, task_id)
+
+            # Poll for result (max 60s)
+            for _ in range(12):
+                if not self._can_wait(5):
+                    break
+                time.sleep(5)
+                result_data = client.request(
+                    "GET", TWOCAPTCHA_RESULT_URL,
+                    params={"key": api_key, "action": "get", "id": task_id, "json": 1},
+                    timeout=self._budget_timeout(30),
+                ).json()
+                if result_data.get("status") == 1:
+                    answer = _clean_answer(result_data["request"])
+                    _logger.info("%s: 2captcha answer: '%s'", self.label, answer)
+                    return answer
+                if result_data.get("request") != "CAPCHA_NOT_READY":
+                    _logger.warning(
+                        "%s: 2captcha error: %s", self.label, result_data.get("request"),
+                    )
+                    return ""
+
+            _logger.warning("%s: 2captcha timed out waiting for answer", self.label)
+            return ""
+
+        except Exception as e:
+            _logger.error("%s: 2captcha CAPTCHA solving error: %s", self.label, e)
+            return ""
+
+    def _solve_captcha_with_capsolver(self, image_bytes, api_key):
+        """
+        Solve image CAPTCHA using CapSolver.com paid service.
+
+        Flow:
+          1. POST createTask to https://api.capsolver.com/createTask
+          2. Poll getTaskResult every 3s until solved (max 60s)
+
+        Args:
+            image_bytes (bytes): Raw PNG/JPEG image data.
+            api_key (str): CapSolver.com API key.
+
+        Returns:
+            str: The CAPTCHA text, or empty string on failure.
+        """
+        client = get_http_client()
+        try:
+            create_data = client.request(
+                "POST", CAPSOLVER_CREATE_URL,
+                json={
+                    "clientKey": api_key,
+                    "task": {
+                        "type": "ImageToTextTask",
+                        "body": base64.b64encode(image_bytes).decode("utf-8"),
+                        "module": "common",
+                        "score": 0.8,
+                        "case": True,
+                    },
+                },
+                timeout=self._budget_timeout(30),
+            ).json()
+            if create_data.get("errorId", 0) != 0:
+                _logger.warning(
+                    "%s: CapSolver createTask failed: %s - %s",
+                    self.label,
+                    create_data.get("errorCode"),
+                    create_data.get("errorDescription"),
+                )
+                return ""
+
+            task_id = create_data.get("taskId")
+            _logger.info("%s: CapSolver task created, id=%s", self.label, task_id)
+
+            # Poll for result (max 60s)
+            for _ in range(20):
+                if not self._can_wait(3):
+                    break
+                time.sleep(3)
+                result_data = client.request(
+                    "POST", CAPSOLVER_RESULT_URL,
+                    json={"clientKey": api_key, "taskId": task_id},
+                    timeout=self._budget_timeout(30),
+                ).json()
+                if result_data.get("errorId", 0) != 0:
+                    _logger.warning(
+                        "%s: CapSolver getTaskResult error: %s",
+                        self.label, result_data.get("errorDescription"),
+                    )
+                    return ""
+                status = result_data.get("status")
+                if status == "ready":
+                    answer = _clean_answer(result_data.get("solution", {}).get("text", ""))
+                    _logger.info("%s: CapSolver answer: '%s'", self.label, answer)
+                    return answer
+                if status == "failed":
+                    _logger.warning("%s: CapSolver task failed", self.label)
+                    return ""
+
+            _logger.warning("%s: CapSolver timed out waiting for answer", self.label)
+            return ""
+
+        except Exception as e:
+            _logger.error("%s: CapSolver CAPTCHA solving error: %s", self.label, e)
+            return ""
+
+    def _solve_captcha_local(self, image_bytes):
+        """
+        Solve image CAPTCHA locally with the shared OCR engines
+        (EasyOCR, then ddddocr, then Tesseract; see captcha_ocr).
+
+        Args:
+            image_bytes (bytes): Raw PNG/JPEG image data.
+
+        Returns:
+            str: The CAPTCHA text, or empty string on failure.
+        """
+        return get_ocr_registry().solve(image_bytes, label=self.label)
+
+    def _solve_captcha_with_gemini(self, image_bytes, api_key):
+        """Deprecated: Use _solve_captcha_with_2captcha() instead."""
+        return self._solve_captcha_with_2captcha(image_bytes, api_key)
+
+    def _solve_captcha_with_openai(self, image_bytes, api_key):
+        """Deprecated: Use _solve_captcha_with_2captcha() instead."""
+        return self._solve_captcha_with_2captcha(image_bytes, api_key)
+
+    # ------------------------------------------------------------------
+    # Session state
+    # ------------------------------------------------------------------
+
+    def _mark_authenticated(self):
+        self._authenticated = True
+        self._auth_time = datetime.now()
+
+    def is_authenticated(self):
+        """Check if the session appears to be authenticated."""
+        if not self._authenticated or not self._auth_time:
+            return False
+        elapsed = datetime.now() - self._auth_time
+        if elapsed > timedelta(minutes=self.session_timeout_minutes):
+            _logger.info("%s: Session may have expired (age: %s)", self.label, elapsed)
+            return False
+        return True
+
+    def get_all_cookies(self):
+        """Export all session cookies as a dictionary for persistence."""
+        return {c.name: c.value for c in self._session.cookies}
+
+    def _load_cookies(self, cookie_dict):
+        """Load cookies into the session (does not mark it authenticated)."""
+        for name, value in (cookie_dict or {}).items():
+            self._session.cookies.set(name, value)
+
+    def export_state(self):
+        """Serialize cookies and login tokens, e.g. between the two steps
+        of a manual CAPTCHA login.
+
+        Returns:
+            str: JSON document for restore_state().
+        """
+        return json.dumps({
+            "cookies": self.get_all_cookies(),
+            "attrs": {name: getattr(self, name, None) for name in self.persisted_attrs},
+        })
+
+    def restore_state(self, state_json):
+        """Restore a state saved by export_state().
+
+        Returns:
+            bool: True if a state was restored.
+        """
+        try:
+            state = json.loads(state_json or "{}")
+        except ValueError as e:
+            _logger.warning("%s: Invalid stored session state: %s", self.label, e)
+            return False
+        if not state:
+            return False
+        self._load_cookies(state.get("cookies"))
+        for name, value in (state.get("attrs") or {}).items():
+            if name in self.persisted_attrs:
+                setattr(self, name, value)
+        return True
+
+    # ------------------------------------------------------------------
+    # Invoice iteration
+    # ------------------------------------------------------------------
+
+    def _format_date(self, value):
+        if isinstance(value, (date, datetime)):
+            return value.strftime(self.date_format)
+        return value
+
+    def iter_pages(self, date_from=None, date_to=None, page_size=50, start_page=1):
+        """Lazily fetch invoice pages, one request per page pulled.
+
+        Stops after an empty page or a page without ``has_more``. Errors of
+        fetch_invoices() (ValueError on session expiry, requests errors)
+        propagate to the caller.
+
+        Args:
+            date_from (date|str): Start date (dates are formatted for the portal).
+            date_to (date|str): End date.
+            page_size (int): Records per page.
+            start_page (int): First page to fetch (resuming a checkpoint).
+
+        Yields:
+            tuple: (page number, list of normalized invoice dicts)
+        """
+        date_from = self._format_date(date_from)
+        date_to = self._format_date(date_to)
+        page = start_page
+        while True:
+            result = self.fetch_invoices(
+                date_from=date_from, date_to=date_to, page=page, page_size=page_size,
+            )
+            invoices = [inv for inv in result.get("invoices", []) if inv]
+            _logger.info(
+                "%s portal page %d: %d invoices returned (has_more=%s)",
+                self.label, page, len(invoices), result.get("has_more", False),
+            )
+            if not invoices:
+                return
+            yield page, invoices
+            if not result.get("has_more"):
+                return
+            page += 1
+
+    def iter_invoices(self, date_from=None, date_to=None, page_size=50):
+        """Lazily yield the normalized invoice dicts of a date range."""
+        for _page, invoices in self.iter_pages(date_from, date_to, page_size):
+            yield from invoices
@@ -6,6 +6,57 @@ from odoo import models, fields
 class ResConfigSettings(models.TransientModel):
     _inherit = "res.config.settings"
 
+    collector_fetch_concurrency = fields.Integer(
+        "Parallel Collector Fetches",
+        config_parameter="ntp_invoice_collector.fetch_concurrency",
+        default=1,
+        help="Number of collector configs fetched in parallel by the cron job. "
+             "1 fetches them one after another.",
+    )
+    collector_fetch_timeout = fields.Integer(
+        "Fetch Timeout per Config (s)",
+        config_parameter="ntp_invoice_collector.fetch_timeout",
+        default=1800,
+        help="The cron job stops fetching a config after this many seconds "
+             "and continues on the next run. 0 disables the limit.",
+    )
+    collector_sync_slice_days = fields.Integer(
+        "Sync Slice (days)",
+        config_parameter="ntp_invoice_collector.sync_slice_days",
+        default=7,
+        help="Fetch windows are split into date slices of this many days, "
+             "so long backfills never hit the provider page limits.",
+    )
+
+    collector_push_concurrency = fields.Integer(
+        "Parallel Bizzi Uploads",
+        config_parameter="ntp_invoice_collector.push_concurrency",
+        default=4,
+        help="Number of invoices uploaded to Bizzi at the same time by the "
+             "push cron job.",
+    )
+    collector_log_request_sample_rate = fields.Float(
+        "Request Log Sample Rate",
+        config_parameter="ntp_invoice_collector.log_request_sample_rate",
+        default=1.0,
+        help="Share (0-1) of successful HTTP requests written to the collector "
+             "log. Failed requests and operation summaries are always logged.",
+    )
+    collector_log_retention_days = fields.Integer(
+        "Log Retention (days)",
+        config_parameter="ntp_invoice_collector.log_retention_days",
+        default=30,
+        help="Collector logs older than this are rolled into daily statistics "
+             "and deleted. 0 keeps all logs.",
+    )
+
+    collector_ocr_preload = fields.Boolean(
+        "Preload CAPTCHA OCR Models",
+        config_parameter="ntp_invoice_collector.ocr_preload",
+        help="Load the local OCR models (EasyOCR, ddddocr) when each worker "
+             "starts instead of on the first local CAPTCHA solve.",
+    )
+
     def action_open_collector_configs(self):
         """Open the collector configuration list view."""
         return {
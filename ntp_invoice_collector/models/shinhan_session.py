@@ -21,7 +21,8 @@ CAPTCHA solving:
   - Manual: caller provides the text answer
   - Auto:   uses Google Gemini Vision API to read the CAPTCHA image
 
-This module mirrors the design of grab_session.py for consistency.
+Login, CAPTCHA solving, retries and pagination come from
+portal_session.PortalSession; this module is the Shinhan adapter.
 """
 
 import base64
@@ -29,11 +30,12 @@ import io
 import json
 import logging
 import re
-import time
 from datetime import datetime, timedelta
 
 import requests
 
+from .portal_session import PortalSession
+
 _logger = logging.getLogger(__name__)
 
 # ---- Constants ---------------------------------------------------------------
@@ -63,7 +65,7 @@ HEADERS_BASE = {
 }
 
 
-class ShinhanEInvoiceSession:
+class ShinhanEInvoiceSession(PortalSession):
     """
     Manages a JWT-authenticated session with the Shinhan Bank e-invoice portal.
 
@@ -82,13 +84,16 @@ class ShinhanEInvoiceSession:
             result = session.fetch_invoices(...)
     """
 
-    def __init__(self, username, password, base_url=None):
-        self.username = username
-        self.password = password
-        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+    label = "Shinhan"
+    default_base_url = DEFAULT_BASE_URL
+    default_headers = HEADERS_BASE
+    max_login_attempts = MAX_LOGIN_ATTEMPTS
+    session_timeout_minutes = SESSION_TIMEOUT_MINUTES
+    date_format = "%Y-%m-%d"
+    persisted_attrs = ("_captcha_text",)
 
-        self._session = requests.Session()
-        self._session.headers.update(HEADERS_BASE)
+    def __init__(self, username, password, base_url=None):
+        super().__init__(username, password, base_url=base_url)
         self._session.headers["Origin"] = self.base_url
         self._session.headers["Referer"] = "%s/#/Login" % self.base_url
 
@@ -96,11 +101,6 @@ class ShinhanEInvoiceSession:
         self._token_expiry = None
         self._captcha_text = None      # Server-side captcha text (if provided)
         self._captcha_image_bytes = None
-        self._authenticated = False
-        self._auth_time = None
-
-        self.last_error = None
-        self.is_account_locked = False
 
     # =========================================================================
     # Public API
@@ -120,7 +120,7 @@ class ShinhanEInvoiceSession:
         _logger.info("Shinhan: Fetching CAPTCHA from %s", url)
 
         try:
-            resp = self._session.get(url, timeout=REQUEST_TIMEOUT)
+            resp = self._request("GET", url, timeout=REQUEST_TIMEOUT)
 
             if resp.status_code == 200:
                 content_type = resp.headers.get("Content-Type", "")
@@ -217,8 +217,10 @@ class ShinhanEInvoiceSession:
         }
 
         try:
-            resp = self._session.post(
+            resp = self._request(
+                "POST",
                 url,
+                retries=1,
                 json=payload,
                 headers=headers,
                 timeout=REQUEST_TIMEOUT,
@@ -268,8 +270,7 @@ class ShinhanEInvoiceSession:
 
         if jwt_token:
             self._jwt_token = jwt_token
-            self._authenticated = True
-            self._auth_time = datetime.now()
+            self._mark_authenticated()
 
             # Parse token expiry
             self._token_expiry = self._parse_jwt_expiry(jwt_token)
@@ -292,129 +293,19 @@ class ShinhanEInvoiceSession:
         _logger.warning("Shinhan: %s", self.last_error)
         return False
 
-    def auto_login(
-        self,
-        captcha_api_key=None,
-        solver_type="2captcha",
-        gemini_api_key=None,
-        openai_api_key=None,
-        max_attempts=None,
-    ):
-        """
-        Attempt fully automatic login by solving CAPTCHA.
-
-        Args:
-            captcha_api_key (str): API key for the selected solver service.
-            solver_type (str): CAPTCHA solver to use. One of:
-                - '2captcha'  : 2captcha.com paid service (default)
-                - 'capsolver' : CapSolver.com paid service
-                - 'local'     : Local Tesseract OCR (free, no API key needed)
-            gemini_api_key (str): Deprecated. Use captcha_api_key instead.
-            openai_api_key (str): Deprecated. Use captcha_api_key instead.
-            max_attempts (int): Maximum number of CAPTCHA attempts.
-
-        Returns:
-            bool: True if login succeeded within max_attempts.
-        """
-        import os
-        max_attempts = max_attempts or MAX_LOGIN_ATTEMPTS
-        solver_type = (solver_type or "2captcha").lower().strip()
-        api_key = (
-            captcha_api_key
-            or gemini_api_key
-            or openai_api_key
-            or os.environ.get("CAPTCHA_API_KEY", "")
-            or os.environ.get("TWOCAPTCHA_API_KEY", "")
-            or os.environ.get("CAPSOLVER_API_KEY", "")
-        )
-
-        if solver_type != "local" and not api_key:
-            self.last_error = (
-                "API key not provided for solver '%s'. "
-                "Set the API key field or use solver_type='local' for Tesseract OCR."
-                % solver_type
-            )
-            _logger.error("Shinhan: %s", self.last_error)
-            return False
-
-        _logger.info("Shinhan: Using CAPTCHA solver: '%s'", solver_type)
-
-        for attempt in range(1, max_attempts + 1):
-            _logger.info(
-                "Shinhan: Auto-login attempt %d/%d for user '%s' (solver=%s)",
-                attempt, max_attempts, self.username, solver_type,
-            )
-
-            try:
-                # Reset captcha text for each attempt
-                self._captcha_text = None
-                captcha_b64 = self.get_captcha_image_b64()
-
-                # If server provided captcha text directly, use it
-                if self._captcha_text:
-                    _logger.info(
-                        "Shinhan: Using server-provided captcha text: '%s'",
-                        self._captcha_text,
-                    )
-                    captcha_answer = self._captcha_text
-                elif captcha_b64:
-                    # Dispatch to the selected solver
-                    if solver_type == "capsolver":
-                        captcha_answer = self._solve_captcha_with_capsolver(captcha_b64, api_key)
-                    elif solver_type == "local":
-                        captcha_answer = self._solve_captcha_local(captcha_b64)
-                    else:  # default: 2captcha
-                        captcha_answer = self._solve_captcha_with_2captcha(captcha_b64, api_key)
-
-                    if not captcha_answer:
-                        _logger.warning(
-                            "Shinhan: Solver '%s' returned empty answer (attempt %d)",
-                            solver_type, attempt,
-                        )
-                        time.sleep(1)
-                        continue
-                    _logger.info(
-                        "Shinhan: CAPTCHA answer from '%s': '%s' (attempt %d)",
-                        solver_type, captcha_answer, attempt,
-                    )
-                else:
-                    _logger.warning(
-                        "Shinhan: Could not fetch CAPTCHA image (attempt %d)", attempt
-                    )
-                    time.sleep(2)
-                    continue
-
-                if self.login(captcha_answer):
-                    _logger.info(
-                        "Shinhan: Auto-login succeeded on attempt %d/%d",
-                        attempt, max_attempts,
-                    )
-                    return True
-
-                if self.is_account_locked:
-                    _logger.error("Shinhan: Account locked, stopping auto-login.")
-                    return False
-
-                _logger.warning(
-                    "Shinhan: Login attempt %d failed: %s", attempt, self.last_error
-                )
-                # Increase delay between retries to avoid rate-limiting
-                delay = 5 * attempt
-                _logger.info("Shinhan: Waiting %ds before next attempt...", delay)
-                time.sleep(delay)
-
-            except Exception as e:
-                _logger.warning(
-                    "Shinhan: Exception on auto-login attempt %d: %s", attempt, e
-                )
-                self.last_error = str(e)
-                time.sleep(5)
+    def _prepare_auto_login(self, attempt):
+        # No login page to load; only reset the captcha text of the last attempt
+        self._captcha_text = None
+        return True
 
-        _logger.error(
-            "Shinhan: All %d auto-login attempts failed for user '%s'",
-            max_attempts, self.username,
-        )
-        return False
+    def _fetch_login_captcha(self):
+        captcha_b64 = self.get_captcha_image_b64()
+        # If server provided captcha text directly, use it
+        if self._captcha_text:
+            return None, self._captcha_text
+        if not captcha_b64:
+            return None, None
+        return self._captcha_image_bytes, None
 
     def check_session_valid(self):
         """
@@ -434,7 +325,7 @@ class ShinhanEInvoiceSession:
         # Try a lightweight API call to verify
         url = "%s/api/session/check" % self.base_url
         try:
-            resp = self._session.get(url, timeout=10)
+            resp = self._request("GET", url, retries=1, timeout=10)
             if resp.status_code in (200, 204):
                 return True
             if resp.status_code == 401:
@@ -498,7 +389,8 @@ class ShinhanEInvoiceSession:
         }
 
         try:
-            resp = self._session.post(
+            resp = self._request(
+                "POST",
                 url,
                 json=payload,
                 headers=headers,
@@ -545,8 +437,7 @@ class ShinhanEInvoiceSession:
         self._jwt_token = jwt_token
         self._token_expiry = self._parse_jwt_expiry(jwt_token)
         self._session.headers["Authorization"] = "Bearer %s" % jwt_token
-        self._authenticated = True
-        self._auth_time = datetime.now()
+        self._mark_authenticated()
         _logger.debug("Shinhan: JWT token restored (expires=%s)", self._token_expiry)
 
     # =========================================================================
@@ -565,7 +456,7 @@ class ShinhanEInvoiceSession:
         _logger.debug("Shinhan: Trying to get CAPTCHA from main page: %s", url)
 
         try:
-            resp = self._session.get(url, timeout=REQUEST_TIMEOUT)
+            resp = self._request("GET", url, timeout=REQUEST_TIMEOUT)
             resp.raise_for_status()
 
             # Look for CAPTCHA API endpoint in page source
@@ -583,7 +474,7 @@ class ShinhanEInvoiceSession:
                         captcha_url = "%s%s" % (self.base_url, captcha_url)
                     _logger.debug("Shinhan: Found captcha URL in page: %s", captcha_url)
                     try:
-                        img_resp = self._session.get(captcha_url, timeout=REQUEST_TIMEOUT)
+                        img_resp = self._request("GET", captcha_url, timeout=REQUEST_TIMEOUT)
                         if img_resp.status_code == 200:
                             self._captcha_image_bytes = img_resp.content
                             return base64.b64encode(img_resp.content).decode("utf-8")
@@ -595,298 +486,6 @@ class ShinhanEInvoiceSession:
 
         return None
 
-    def _solve_captcha_with_2captcha(self, captcha_b64, api_key):
-        """
-        Solve image CAPTCHA using 2captcha.com paid service.
-        Uses only the built-in `requests` library — no extra SDK needed.
-
-        Flow:
-          1. POST image to 2captcha /in.php  → get task ID
-          2. Poll 2captcha /res.php every 5s → get answer text
-
-        Args:
-            captcha_b64 (str): Base64-encoded CAPTCHA image.
-            api_key (str): 2captcha.com API key.
-
-        Returns:
-            str: Recognized CAPTCHA text, or empty string on failure.
-        """
-        try:
-            import time as _time
-
-            # Step 1: Submit CAPTCHA image
-            submit_resp = requests.post(
-                "https://2captcha.com/in.php",
-                data={
-                    "key": api_key,
-                    "method": "base64",
-                    "body": captcha_b64,
-                    "json": 1,
-                },
-                timeout=30,
-            )
-            submit_data = submit_resp.json()
-            if submit_data.get("status") != 1:
-                _logger.warning(
-                    "Shinhan: 2captcha submit failed: %s", submit_data.get("request")
-                )
-                return ""
-
-            task_id = submit_data["request"]
-            _logger.info("Shinhan: 2captcha task submitted, id=%s", task_id)
-
-            # Step 2: Poll for result (max 60s)
-            for _ in range(12):
-                _time.sleep(5)
-                result_resp = requests.get(
-                    "https://2captcha.com/res.php",
-                    params={"key": api_key, "action": "get", "id": task_id, "json": 1},
-                    timeout=30,
-                )
-                result_data = result_resp.json()
-                if result_data.get("status") == 1:
-                    answer = result_data["request"].strip()
-                    answer = re.sub(r"[\s\.\,\!\?\-\_]", "", answer)
-                    _logger.info("Shinhan: 2captcha answer: '%s'", answer)
-                    return answer
-                if result_data.get("request") != "CAPCHA_NOT_READY":
-                    _logger.warning(
-                        "Shinhan: 2captcha error: %s", result_data.get("request")
-                    )
-                    return ""
-
-            _logger.warning("Shinhan: 2captcha timed out waiting for answer")
-            return ""
-
-        except Exception as e:
-            _logger.warning("Shinhan: 2captcha CAPTCHA solving failed: %s", e)
-            return ""
-
-    def _solve_captcha_with_capsolver(self, captcha_b64, api_key):
-        """
-        Solve image CAPTCHA using CapSolver.com paid service.
-        Uses only the built-in `requests` library — no extra SDK needed.
-
-        Flow:
-          1. POST createTask to https://api.capsolver.com/createTask
-          2. Poll getTaskResult every 3s until solved (max 60s)
-
-        Args:
-            captcha_b64 (str): Base64-encoded CAPTCHA image.
-            api_key (str): CapSolver.com API key.
-
-        Returns:
-            str: Recognized CAPTCHA text, or empty string on failure.
-        """
-        try:
-            import time as _time
-
-            # Step 1: Create task
-            create_resp = requests.post(
-                "https://api.capsolver.com/createTask",
-                json={
-                    "clientKey": api_key,
-                    "task": {
-                        "type": "ImageToTextTask",
-                        "body": captcha_b64,
-                        "module": "common",
-                        "score": 0.8,
-                        "case": True,
-                    },
-                },
-                timeout=30,
-            )
-            create_data = create_resp.json()
-            if create_data.get("errorId", 0) != 0:
-                _logger.warning(
-                    "Shinhan: CapSolver createTask failed: %s - %s",
-                    create_data.get("errorCode"),
-                    create_data.get("errorDescription"),
-                )
-                return ""
-
-            task_id = create_data.get("taskId")
-            _logger.info("Shinhan: CapSolver task created, id=%s", task_id)
-
-            # Step 2: Poll for result (max 60s)
-            for _ in range(20):
-                _time.sleep(3)
-                result_resp = requests.post(
-                    "https://api.capsolver.com/getTaskResult",
-                    json={"clientKey": api_key, "taskId": task_id},
-                    timeout=30,
-                )
-                result_data = result_resp.json()
-                if result_data.get("errorId", 0) != 0:
-                    _logger.warning(
-                        "Shinhan: CapSolver getTaskResult error: %s",
-                        result_data.get("errorDescription"),
-                    )
-                    return ""
-                status = result_data.get("status")
-                if status == "ready":
-                    answer = result_data.get("solution", {}).get("text", "").strip()
-                    answer = re.sub(r"[\s\.\,\!\?\-\_]", "", answer)
-                    _logger.info("Shinhan: CapSolver answer: '%s'", answer)
-                    return answer
-                if status == "failed":
-                    _logger.warning("Shinhan: CapSolver task failed")
-                    return ""
-
-            _logger.warning("Shinhan: CapSolver timed out waiting for answer")
-            return ""
-
-        except Exception as e:
-            _logger.warning("Shinhan: CapSolver CAPTCHA solving failed: %s", e)
-            return ""
-
-    def _solve_captcha_local(self, captcha_b64):
-        """
-        Solve image CAPTCHA locally using multiple OCR engines in priority order:
-          1. EasyOCR  — deep learning OCR, best case-sensitivity for italic CAPTCHA
-          2. ddddocr  — lightweight CAPTCHA-specialized model, fast but may confuse case
-          3. Tesseract — classical OCR, fallback if above not installed
-
-        No API key or internet connection required after initial install.
-
-        Install on server:
-            pip install easyocr ddddocr==1.4.11 pillow scipy numpy
-
-        Args:
-            captcha_b64 (str): Base64-encoded CAPTCHA image.
-
-        Returns:
-            str: Recognized CAPTCHA text, or empty string on failure.
-        """
-        try:
-            import io as _io
-            import numpy as _np
-            from PIL import Image
-
-            # Decode base64 image
-            img_bytes = base64.b64decode(captcha_b64)
-            img = Image.open(_io.BytesIO(img_bytes)).convert("RGB")
-            arr = _np.array(img)
-
-            # --- Preprocessing: extract colored text on white background ---
-            # Detect non-white pixels (text): R<180 AND G<180
-            text_pixels = (arr[:, :, 0] < 180) & (arr[:, :, 1] < 180)
-            mask = _np.where(text_pixels, 0, 255).astype(_np.uint8)
-            mask_img = Image.fromarray(mask, "L")
-
-            # Upscale 4x for better recognition
-            big = mask_img.resize((img.width * 4, img.height * 4), Image.LANCZOS)
-            big_arr = _np.array(big)
-            big_bin = (big_arr < 128).astype(_np.uint8)
-
-            # Remove small noise dots using connected component filtering
-            try:
-                from scipy import ndimage as _ndimage
-                labeled, _ = _ndimage.label(big_bin)
-                comp_sizes = _np.bincount(labeled.ravel())
-                too_small = comp_sizes < 80
-                too_small[0] = False
-                big_bin[too_small[labeled]] = 0
-            except ImportError:
-                pass  # Skip denoising if scipy not available
-
-            # Convert to clean black-on-white image with padding
-            clean_arr = _np.where(big_bin, 0, 255).astype(_np.uint8)
-            clean = Image.fromarray(clean_arr, "L")
-            padded = Image.new("L", (clean.width + 40, clean.height + 40), 255)
-            padded.paste(clean, (20, 20))
-            padded_rgb = padded.convert("RGB")
-
-            # Encode preprocessed image to bytes for ddddocr
-            buf = _io.BytesIO()
-            padded_rgb.save(buf, format="PNG")
-            preprocessed_bytes = buf.getvalue()
-
-            # --- Priority 1: EasyOCR (best case accuracy for italic CAPTCHA) ---
-            try:
-                import easyocr
-                if not hasattr(self, "_easyocr_reader"):
-                    _logger.info("Shinhan: Initializing EasyOCR reader (first run may take ~10s)...")
-                    self._easyocr_reader = easyocr.Reader(["en"], gpu=False, verbose=False)
-                results = self._easyocr_reader.readtext(
-                    _np.array(padded_rgb),
-                    allowlist="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789",
-                    detail=1,
-                )
-                if results:
-                    best = max(results, key=lambda x: x[2])
-                    text = re.sub(r"[^A-Za-z0-9]", "", best[1])
-                    _logger.info(
-                        "Shinhan: EasyOCR answer: '%s' (conf=%.2f)", text, best[2]
-                    )
-                    if text:
-                        return text
-            except ImportError:
-                _logger.warning(
-                    "Shinhan: easyocr not installed. Run: pip install easyocr\n"
-                    "Trying ddddocr next."
-                )
-            except Exception as e:
-                _logger.warning("Shinhan: EasyOCR failed: %s. Trying ddddocr.", e)
-
-            # --- Priority 2: ddddocr (fast, may confuse case) ---
-            try:
-                import ddddocr
-                if not hasattr(self, "_ddddocr_instance"):
-                    _logger.info("Shinhan: Initializing ddddocr...")
-                    self._ddddocr_instance = ddddocr.DdddOcr(show_ad=False)
-                # Try on raw image first
-                text = self._ddddocr_instance.classification(img_bytes)
-                text = re.sub(r"[^A-Za-z0-9]", "", text)
-                if text:
-                    _logger.info("Shinhan: ddddocr answer: '%s'", text)
-                    return text
-                # Fallback to preprocessed if raw returns empty
-                text = self._ddddocr_instance.classification(preprocessed_bytes)
-                text = re.sub(r"[^A-Za-z0-9]", "", text)
-                if text:
-                    _logger.info("Shinhan: ddddocr (preprocessed) answer: '%s'", text)
-                    return text
-            except ImportError:
-                _logger.warning(
-                    "Shinhan: ddddocr not installed. Run: pip install ddddocr==1.4.11\n"
-                    "Trying Tesseract next."
-                )
-            except Exception as e:
-                _logger.warning("Shinhan: ddddocr failed: %s. Trying Tesseract.", e)
-
-            # --- Priority 3: Tesseract OCR (classical fallback) ---
-            try:
-                import pytesseract
-                config = (
-                    "--psm 8 --oem 3 "
-                    "-c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
-                )
-                text = pytesseract.image_to_string(padded, config=config).strip()
-                text = re.sub(r"[^A-Za-z0-9]", "", text)
-                _logger.info("Shinhan: Tesseract OCR answer: '%s'", text)
-                return text
-            except ImportError:
-                _logger.warning(
-                    "Shinhan: No OCR engine available. Install at least one:\n"
-                    "  pip install easyocr   (recommended)\n"
-                    "  pip install ddddocr==1.4.11\n"
-                    "  apt install tesseract-ocr && pip install pytesseract"
-                )
-                return ""
-
-        except Exception as e:
-            _logger.warning("Shinhan: Local OCR CAPTCHA solving failed: %s", e)
-            return ""
-
-    def _solve_captcha_with_gemini(self, captcha_b64, api_key):
-        """Deprecated: Use _solve_captcha_with_2captcha() instead."""
-        return self._solve_captcha_with_2captcha(captcha_b64, api_key)
-
-    def _solve_captcha_with_openai(self, captcha_b64, api_key):
-        """Deprecated: Use _solve_captcha_with_2captcha() instead."""
-        return self._solve_captcha_with_2captcha(captcha_b64, api_key)
-
     def _parse_jwt_expiry(self, jwt_token):
         """
         Parse the expiry time from a JWT token payload.
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Bizzi attachment upload (inline base64 JSON vs streaming multipart)
+===============================================================================
+Uploads one invoice file of 1-20 MB to a local HTTP server that discards
+the request body, once as the former JSON payload (file base64-encoded into
+``attachment_data``) and once as the ``MultipartStream`` body of
+``ntp_einvoice_bizzi/models/multipart_upload.py`` read from disk. Reports latency and the peak
+RSS of the uploading process.
+
+Each case runs in a fresh subprocess, so the peak RSS (ru_maxrss) of one
+case is not inflated by the previous one. multipart_upload.py has no Odoo
+dependency, so no database is needed.
+
+Usage:
+    BENCH_SIZES_MB=1,5,10,20 BENCH_ROUNDS=3 python3 bench_bizzi_upload.py
+"""
+
+import base64
+import importlib.util
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+SIZES_MB = [int(size) for size in os.environ.get("BENCH_SIZES_MB", "1,5,10,20").split(",")]
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", "3"))
+MODES = ("json", "multipart")
+
+
+def _load_multipart_upload():
+    path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+        "ntp_einvoice_bizzi", "models", "multipart_upload.py",
+    )
+    spec = importlib.util.spec_from_file_location("multipart_upload", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _DiscardHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1024 * 1024)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b'{"id": "bench"}')
+
+    def log_message(self, *args):
+        pass
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _upload(mode, path, url):
+    """Upload ``path`` once; returns the request latency in seconds."""
+    fields = {"invoice_number": "BENCH/0001", "source": "grab"}
+    start = time.time()
+    if mode == "json":
+        with open(path, "rb") as fh:
+            fields["attachment_name"] = "invoice.pdf"
+            fields["attachment_data"] = base64.b64encode(fh.read()).decode("utf-8")
+        response = requests.post(url, json=fields, timeout=120)
+    else:
+        multipart_upload = _load_multipart_upload()
+        body = multipart_upload.MultipartStream(
+            fields=list(fields.items()),
+            files=[multipart_upload.FilePart.from_path(
+                "files", "invoice.pdf", "application/pdf", path, os.path.getsize(path),
+            )],
+        )
+        response = requests.post(
+            url, data=body, headers={"Content-Type": body.content_type}, timeout=120,
+        )
+        body.close()
+    response.raise_for_status()
+    return time.time() - start
+
+
+def run_case(mode, path, url):
+    """Subprocess entry point: print "<latency> <peak rss MB> <baseline MB>"."""
+    baseline = _peak_rss_mb()
+    durations = [_upload(mode, path, url) for _round in range(ROUNDS)]
+    print("%f %f %f" % (sorted(durations)[len(durations) // 2], _peak_rss_mb(), baseline))
+
+
+def run():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DiscardHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:%d/v1/invoices" % server.server_address[1]
+
+    print("Bizzi upload benchmark: %d round(s) per case, median latency" % ROUNDS)
+    print("  %6s  %-9s  %10s  %12s  %12s" % (
+        "size", "mode", "latency", "peak RSS", "RSS growth"))
+    try:
+        for size_mb in SIZES_MB:
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as fh:
+                fh.write(os.urandom(size_mb * 1024 * 1024))
+                fh.flush()
+                for mode in MODES:
+                    output = subprocess.check_output([
+                        sys.executable, os.path.abspath(__file__), mode, fh.name, url,
+                    ])
+                    latency, peak, baseline = (float(v) for v in output.split())
+                    print("  %4d MB  %-9s  %7.0f ms  %9.1f MB  %9.1f MB" % (
+                        size_mb, mode, 1000.0 * latency, peak, peak - baseline))
+    finally:
+        server.shutdown()
+
+
+if len(sys.argv) == 4:
+    run_case(*sys.argv[1:])
+else:
+    run()
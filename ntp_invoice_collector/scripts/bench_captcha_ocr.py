@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: local CAPTCHA OCR (latency and accuracy)
+====================================================
+Solves a fixture set of saved CAPTCHA images with each local OCR engine
+of ``models/captcha_ocr.py`` and reports model load time, solve latency
+(mean / p50 / p95) and accuracy (exact and case-insensitive). The same
+images are then solved from several threads at once through the shared
+registry to exercise concurrent use.
+
+The expected answer is taken from the file name: ``<answer>.png`` or
+``<answer>_<anything>.png`` (png/jpg/jpeg/gif).
+
+captcha_ocr.py has no Odoo dependency, so no database is needed.
+
+Usage:
+    BENCH_FIXTURES=/path/to/captchas BENCH_THREADS=4 \\
+        python3 bench_captcha_ocr.py
+"""
+
+import glob
+import importlib.util
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+FIXTURE_DIR = os.environ.get("BENCH_FIXTURES", "")
+THREADS = int(os.environ.get("BENCH_THREADS", "4"))
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.gif")
+
+
+def _load_captcha_ocr():
+    path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), os.pardir, "models", "captcha_ocr.py",
+    )
+    spec = importlib.util.spec_from_file_location("captcha_ocr", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _load_fixtures():
+    """Return [(expected answer, image bytes)] from the fixture dir."""
+    fixtures = []
+    for pattern in IMAGE_PATTERNS:
+        for path in glob.glob(os.path.join(FIXTURE_DIR, pattern)):
+            answer = os.path.splitext(os.path.basename(path))[0].split("_")[0]
+            with open(path, "rb") as fh:
+                fixtures.append((answer, fh.read()))
+    return sorted(fixtures)
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def _report(label, answers, durations):
+    total = len(answers)
+    exact = sum(1 for expected, text in answers if text == expected)
+    nocase = sum(1 for expected, text in answers if text.lower() == expected.lower())
+    print("  %-10s mean %6.0f ms  p50 %6.0f ms  p95 %6.0f ms  "
+          "exact %5.1f%%  nocase %5.1f%%" % (
+              label,
+              1000.0 * sum(durations) / total,
+              1000.0 * _percentile(durations, 50),
+              1000.0 * _percentile(durations, 95),
+              100.0 * exact / total,
+              100.0 * nocase / total,
+          ))
+
+
+def run():
+    if not FIXTURE_DIR:
+        sys.exit("Set BENCH_FIXTURES to a directory of saved CAPTCHA images.")
+    fixtures = _load_fixtures()
+    if not fixtures:
+        sys.exit("No CAPTCHA images found in %s" % FIXTURE_DIR)
+
+    captcha_ocr = _load_captcha_ocr()
+    registry = captcha_ocr.OcrEngineRegistry()
+
+    print("CAPTCHA OCR benchmark: %d images from %s" % (len(fixtures), FIXTURE_DIR))
+    start = time.time()
+    engines = registry.available_engines()
+    print("  engines %s loaded in %.1f s" % (", ".join(engines) or "(none)",
+                                              time.time() - start))
+
+    durations = []
+    for _answer, image in fixtures:
+        start = time.time()
+        captcha_ocr.preprocess_captcha(image)
+        durations.append(time.time() - start)
+    print("  %-10s mean %6.0f ms" % ("preprocess", 1000.0 * sum(durations) / len(durations)))
+
+    for name in engines:
+        answers, durations = [], []
+        for expected, image in fixtures:
+            start = time.time()
+            text = registry.solve(image, label="bench", engines=(name,))
+            durations.append(time.time() - start)
+            answers.append((expected, text))
+        _report(name, answers, durations)
+
+    # Full fallback chain, solved concurrently through the shared registry
+    def solve(fixture):
+        start = time.time()
+        text = registry.solve(fixture[1], label="bench")
+        return (fixture[0], text), time.time() - start
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        results = list(executor.map(solve, fixtures))
+    wall = time.time() - start
+    _report("chain x%d" % THREADS, [r[0] for r in results], [r[1] for r in results])
+    print("  %-10s %.2f s wall, %.1f solves/s" % ("", wall, len(fixtures) / wall))
+
+
+run()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Shopee order detail fetching (per-order vs batched)
+===============================================================
+Replays recorded Shopee API pages against ``_shopee_get_order_detail``
+(one request per order) and ``_shopee_get_order_details`` (one request
+per 50 orders) and reports request count and wall time for each path.
+
+No network and no database writes: ``_make_request`` is replaced by a
+replay function that serves the fixtures, optionally sleeping to
+simulate round-trip latency.
+
+Fixture directory layout (raw Shopee JSON responses):
+    order_list_*.json    get_order_list responses, one file per page
+    order_detail_*.json  get_order_detail responses containing the orders
+
+Without ``BENCH_FIXTURES`` a synthetic set of pages is generated.
+
+Usage (inside an Odoo shell):
+    BENCH_FIXTURES=/path/to/fixtures BENCH_LATENCY_MS=80 \\
+        odoo-bin shell -d <db> < bench_shopee_order_detail.py
+"""
+
+import glob
+import json
+import os
+import time
+from unittest.mock import patch
+
+FIXTURE_DIR = os.environ.get("BENCH_FIXTURES", "")
+LATENCY = float(os.environ.get("BENCH_LATENCY_MS", "50")) / 1000.0
+SYNTHETIC_PAGES = int(os.environ.get("BENCH_PAGES", "4"))
+
+
+def _load_fixtures():
+    """Return (pages, details_by_sn) from the fixture dir or synthetic data."""
+    pages = []
+    details = {}
+    if FIXTURE_DIR:
+        for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "order_list_*.json"))):
+            with open(path) as fh:
+                pages.append(json.load(fh).get("response", {}).get("order_list", []))
+        for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "order_detail_*.json"))):
+            with open(path) as fh:
+                for order in json.load(fh).get("response", {}).get("order_list", []):
+                    details[order["order_sn"]] = order
+        return pages, details
+
+    for page in range(SYNTHETIC_PAGES):
+        orders = []
+        for i in range(50):
+            order_sn = "2601%02d%04dBENCH" % (page, i)
+            orders.append({"order_sn": order_sn, "create_time": 1767225600})
+            details[order_sn] = {
+                "order_sn": order_sn,
+                "total_amount": 150000 + i,
+                "buyer_username": "buyer_%d" % i,
+                "shipping_carrier": "SPX Express",
+                "payment_method": "COD",
+                "item_list": [{
+                    "item_name": "Item %d" % i,
+                    "model_quantity_purchased": 1,
+                    "model_discounted_price": 150000 + i,
+                    "item_sku": "SKU-%d" % i,
+                }],
+            }
+        pages.append(orders)
+    return pages, details
+
+
+class _ReplayResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+def run(env):
+    pages, details = _load_fixtures()
+    inv_model = env["ntp.collected.invoice"]
+    config = env["ntp.collector.config"].new({
+        "name": "Shopee benchmark",
+        "provider": "shopee",
+        "api_url": "https://partner.shopeemobile.com",
+        "api_key": "1000001",
+        "api_secret": "bench-secret",
+        "shop_id": "2000002",
+        "access_token": "bench-token",
+    })
+    base_url = config.api_url
+    partner_id, shop_id = int(config.api_key), int(config.shop_id)
+    stats = {"requests": 0}
+
+    def replay(self, method, url, config=None, **kwargs):
+        stats["requests"] += 1
+        if LATENCY:
+            time.sleep(LATENCY)
+        order_sns = kwargs.get("params", {}).get("order_sn_list", "").split(",")
+        return _ReplayResponse({
+            "response": {"order_list": [details[sn] for sn in order_sns if sn in details]},
+        })
+
+    results = {}
+    with patch.object(type(inv_model), "_make_request", replay):
+        stats["requests"] = 0
+        start = time.time()
+        single = {}
+        for orders in pages:
+            for order in orders:
+                sn = order["order_sn"]
+                single[sn] = inv_model._shopee_get_order_detail(
+                    config, base_url, partner_id, shop_id, sn,
+                )
+        results["per-order"] = (stats["requests"], time.time() - start)
+
+        stats["requests"] = 0
+        start = time.time()
+        batched = {}
+        for orders in pages:
+            batched.update(inv_model._shopee_get_order_details(
+                config, base_url, partner_id, shop_id,
+                [order["order_sn"] for order in orders],
+            ))
+        results["batched"] = (stats["requests"], time.time() - start)
+
+    total = sum(len(orders) for orders in pages)
+    print("Shopee order detail benchmark: %d pages, %d orders, latency %.0f ms"
+          % (len(pages), total, LATENCY * 1000))
+    for label, (requests_made, elapsed) in results.items():
+        print("  %-10s %5d requests  %8.2f s" % (label, requests_made, elapsed))
+    print("  identical results: %s" % (single == batched))
+
+
+run(env)  # noqa: F821 - provided by odoo-bin shell
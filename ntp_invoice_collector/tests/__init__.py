@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+from . import test_collected_invoice_ingest
+from . import test_collector_sync_state
+from . import test_captcha_ocr
+from . import test_portal_session
+from . import test_collector_log
+from . import test_bizzi_push
+from . import test_resolution_cache
+from . import test_portal_fetch
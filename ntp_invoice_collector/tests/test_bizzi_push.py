@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import re
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+from odoo.addons.ntp_einvoice_bizzi.models import bizzi_polling
+
+from ..models import collected_invoice
+
+
+class _FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data or {}
+        self.text = "error" if status_code >= 400 else ""
+
+    def json(self):
+        return self.data
+
+
+@tagged("post_install", "-at_install")
+class TestBizziPush(common.TransactionCase):
+
+    def setUp(self):
+        super(TestBizziPush, self).setUp()
+        set_param = self.env["ir.config_parameter"].sudo().set_param
+        set_param("tax_invoice.tax_invoice_bizzi_api_url", "https://bizzi.example.com/")
+        set_param("tax_invoice.tax_invoice_bizzi_api_key", "key")
+        self.inv_model = self.env["ntp.collected.invoice"]
+        self.config = self.env["ntp.collector.config"].create({
+            "name": "Test Grab",
+            "provider": "grab",
+        })
+        self.invoices = self.inv_model.create([
+            {
+                "name": "GRAB-P%04d" % i,
+                "provider": "grab",
+                "config_id": self.config.id,
+                "external_order_id": "P%04d" % i,
+            }
+            for i in range(5)
+        ])
+
+    def _fake_post(self, method, url, data=None, headers=None):
+        self.assertTrue(headers["Content-Type"].startswith("multipart/form-data"))
+        order_id = re.search(
+            rb'name="external_order_id"\r\n\r\n(\w+)', data.read(),
+        ).group(1).decode()
+        if order_id == "P0003":
+            return _FakeResponse(500), 0.1, None
+        return _FakeResponse(200, {"id": "BZ-" + order_id}), 0.1, None
+
+    @mute_logger("odoo.addons.ntp_invoice_collector.models.collected_invoice")
+    def test_cron_pushes_all_pending_in_batches(self):
+        with patch.object(collected_invoice, "PUSH_BATCH_SIZE", 2), \
+                patch.object(collected_invoice, "_request_with_retries",
+                             side_effect=self._fake_post) as post:
+            stats = self.inv_model.cron_push_to_bizzi()
+
+        self.assertEqual(post.call_count, 5)
+        self.assertEqual((stats["pushed"], stats["errors"]), (4, 1))
+        failed = self.invoices.filtered(lambda inv: inv.external_order_id == "P0003")
+        self.assertEqual(failed.bizzi_status, "error")
+        pushed = self.invoices - failed
+        self.assertEqual(set(pushed.mapped("state")), {"pushed"})
+        self.assertEqual(pushed[0].bizzi_invoice_id, "BZ-P0000")
+
+    def test_claim_skips_handled_and_excluded_invoices(self):
+        self.invoices[0].bizzi_status = "uploaded"
+        batch = self.inv_model._claim_bizzi_batch(10, exclude_ids={self.invoices[1].id})
+        self.assertEqual(batch, self.invoices[2:])
+
+    def test_upload_streams_all_invoice_files(self):
+        invoice = self.invoices[0]
+        invoice.attachment_ids = self.env["ir.attachment"].create([
+            {"name": name, "raw": content}
+            for name, content in (
+                ("invoice.pdf", b"%PDF-1.4 invoice"),
+                ("invoice.xml", b"<HDon/>"),
+                ("notes.txt", b"not sent"),
+            )
+        ])
+        body = invoice._prepare_bizzi_upload()
+        data = body.read()
+        self.assertEqual(len(data), len(body))
+        self.assertIn(b'filename="invoice.pdf"', data)
+        self.assertIn(b"%PDF-1.4 invoice", data)
+        self.assertIn(b'filename="invoice.xml"', data)
+        self.assertNotIn(b"notes.txt", data)
+        # Rewound for a retry, the body is sent again from the start
+        body.seek(0)
+        self.assertEqual(body.read(), data)
+
+    def _fake_statuses(self, statuses):
+        def fetch(urls, headers, timeout=None, concurrency=None):
+            return [statuses[url.rsplit("/", 1)[1]] for url in urls]
+        return fetch
+
+    def test_poll_writes_statuses_and_backs_off(self):
+        statuses = {"BZ-1": ("verified", None, False), "BZ-2": ("processing", None, False),
+                    "BZ-3": (None, "HTTP 502", False), "BZ-4": ("rejected", None, False)}
+        polled = self.invoices[:4]
+        for inv, bizzi_id in zip(polled, sorted(statuses)):
+            inv.write({"bizzi_status": "uploaded", "state": "pushed",
+                       "bizzi_invoice_id": bizzi_id, "bizzi_push_date": fields.Datetime.now()})
+
+        with patch.object(collected_invoice, "fetch_bizzi_statuses",
+                          side_effect=self._fake_statuses(statuses)):
+            totals = self.inv_model.cron_poll_bizzi_status()
+
+        self.assertEqual(totals, {"verified": 1, "rejected": 1, "pending": 1, "errors": 1})
+        self.assertEqual(polled[0].state, "verified")
+        self.assertEqual(polled[3].bizzi_status, "error")
+        waiting = polled[1:3]
+        self.assertEqual(waiting.mapped("bizzi_poll_count"), [1, 1])
+        self.assertTrue(all(inv.bizzi_next_poll_date > fields.Datetime.now() for inv in waiting))
+        # Not due any more: the next run checks nothing
+        with patch.object(collected_invoice, "fetch_bizzi_statuses") as fetch:
+            self.inv_model.cron_poll_bizzi_status()
+        fetch.assert_not_called()
+
+        metrics = self.inv_model.get_bizzi_poll_metrics()
+        self.assertEqual((metrics["depth"], metrics["due"]), (2, 0))
+
+    @mute_logger("odoo.addons.ntp_invoice_collector.models.collected_invoice")
+    def test_poll_stops_on_permanent_error_and_check_limit(self):
+        statuses = {"BZ-1": (None, "HTTP 404", True), "BZ-2": ("processing", None, False)}
+        polled = self.invoices[:2]
+        for inv, bizzi_id in zip(polled, sorted(statuses)):
+            inv.write({"bizzi_status": "uploaded", "state": "pushed",
+                       "bizzi_invoice_id": bizzi_id, "bizzi_push_date": fields.Datetime.now()})
+        polled[1].bizzi_poll_count = bizzi_polling.POLL_MAX_CHECKS - 1
+
+        with patch.object(collected_invoice, "fetch_bizzi_statuses",
+                          side_effect=self._fake_statuses(statuses)):
+            totals = self.inv_model.cron_poll_bizzi_status()
+
+        self.assertEqual(totals, {"verified": 0, "rejected": 1, "pending": 0, "errors": 1})
+        self.assertEqual(polled.mapped("bizzi_status"), ["error", "error"])
+        self.assertFalse(any(polled.mapped("bizzi_next_poll_date")))
+        self.assertIn("HTTP 404", polled[0].error_message)
+        self.assertIn("%d checks" % bizzi_polling.POLL_MAX_CHECKS, polled[1].error_message)
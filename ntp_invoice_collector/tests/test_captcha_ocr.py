@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import io
+import unittest
+
+from odoo.tests import common, tagged
+
+from ..models import captcha_ocr
+
+try:
+    import numpy  # noqa: F401 - needed by preprocess_captcha
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+
+class _FakeDdddOcr:
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def classification(self, image_bytes):
+        self.calls += 1
+        return self.answers.pop(0)
+
+
+@tagged("post_install", "-at_install")
+@unittest.skipIf(Image is None, "numpy/Pillow are not installed")
+class TestCaptchaOcr(common.BaseCase):
+
+    def _captcha_png(self):
+        img = Image.new("RGB", (80, 30), "white")
+        ImageDraw.Draw(img).text((10, 8), "aB3x", fill=(20, 40, 255))
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+    def _registry(self, **engines):
+        registry = captcha_ocr.OcrEngineRegistry()
+        registry._engines.update(engines)
+        registry._missing.update(set(captcha_ocr.ENGINES) - set(engines))
+        return registry
+
+    def test_preprocess_upscales_and_pads(self):
+        captcha = captcha_ocr.preprocess_captcha(self._captcha_png())
+        self.assertEqual(captcha.gray.size, (80 * 4 + 40, 30 * 4 + 40))
+        self.assertTrue(captcha.png_bytes.startswith(b"\x89PNG"))
+
+    def test_ddddocr_falls_back_to_preprocessed_image(self):
+        engine = _FakeDdddOcr(["", "aB3x!"])
+        registry = self._registry(ddddocr=engine)
+        self.assertEqual(registry.solve(self._captcha_png()), "aB3x")
+        self.assertEqual(engine.calls, 2)
+
+    def test_engines_are_shared_not_reloaded(self):
+        registry = self._registry(ddddocr=_FakeDdddOcr(["ab12", "cd34"]))
+        engine = registry._get_engine("ddddocr")
+        self.assertEqual(registry.solve(self._captcha_png()), "ab12")
+        self.assertEqual(registry.solve(self._captcha_png()), "cd34")
+        self.assertIs(registry._get_engine("ddddocr"), engine)
+
+    def test_no_engine_available(self):
+        registry = self._registry()
+        self.assertEqual(registry.solve(self._captcha_png()), "")
+        self.assertEqual(registry.available_engines(), [])
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import io
+import zipfile
+
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+
+@tagged("post_install", "-at_install")
+class TestCollectedInvoiceIngest(common.TransactionCase):
+
+    def setUp(self):
+        super(TestCollectedInvoiceIngest, self).setUp()
+        self.inv_model = self.env["ntp.collected.invoice"]
+        self.config = self.env["ntp.collector.config"].create({
+            "name": "Test Grab",
+            "provider": "grab",
+        })
+
+    def _vals_list(self, prefix, size):
+        return [
+            {
+                "name": "GRAB-%s%04d" % (prefix, i),
+                "provider": "grab",
+                "config_id": self.config.id,
+                "external_order_id": "%s%04d" % (prefix, i),
+                "total_amount": 1000.0 + i,
+            }
+            for i in range(size)
+        ]
+
+    def _count_queries(self, func, *args, **kwargs):
+        self.inv_model.flush()
+        before = self.cr.sql_log_count
+        result = func(*args, **kwargs)
+        self.inv_model.flush()
+        return result, self.cr.sql_log_count - before
+
+    def test_create_page_skips_existing_and_repeated_ids(self):
+        self.inv_model._create_collected_invoices(
+            self.config, "grab", self._vals_list("A", 3),
+        )
+        vals_list = self._vals_list("A", 5) + self._vals_list("A", 5)
+        created, failures = self.inv_model._create_collected_invoices(
+            self.config, "grab", vals_list,
+        )
+        self.assertEqual(
+            sorted(created.mapped("external_order_id")), ["A0003", "A0004"],
+        )
+        self.assertFalse(failures)
+
+    @mute_logger("odoo.sql_db", "odoo.addons.ntp_invoice_collector.models.collected_invoice")
+    def test_create_page_reports_failed_rows(self):
+        vals_list = self._vals_list("B", 4)
+        vals_list[2]["name"] = False  # violates NOT NULL on name
+        created, failures = self.inv_model._create_collected_invoices(
+            self.config, "grab", vals_list,
+        )
+        self.assertEqual(len(created), 3)
+        self.assertEqual([failure[0] for failure in failures], ["B0002"])
+
+    def test_dedup_query_count_is_constant_per_page(self):
+        self.inv_model._create_collected_invoices(
+            self.config, "grab", self._vals_list("C", 50),
+        )
+        _, small = self._count_queries(
+            self.inv_model._create_collected_invoices,
+            self.config, "grab", self._vals_list("C", 5),
+        )
+        _, large = self._count_queries(
+            self.inv_model._create_collected_invoices,
+            self.config, "grab", self._vals_list("C", 50),
+        )
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 2)
+
+    def test_create_query_count_per_row(self):
+        _, q10 = self._count_queries(
+            self.inv_model._create_collected_invoices,
+            self.config, "grab", self._vals_list("D", 10),
+        )
+        _, q50 = self._count_queries(
+            self.inv_model._create_collected_invoices,
+            self.config, "grab", self._vals_list("E", 50),
+        )
+        # One search + one INSERT per row at most (the old loop also ran a
+        # per-row search and a per-row log insert).
+        self.assertLessEqual((q50 - q10) / 40.0, 2)
+
+    def test_import_grab_zip_members(self):
+        created, _failures = self.inv_model._create_collected_invoices(
+            self.config, "grab", [
+                dict(self._vals_list("F", 1)[0], external_order_id="INV-12"),
+                dict(self._vals_list("F", 2)[1], external_order_id="INV-123"),
+            ],
+        )
+        inv_12 = created.filtered(lambda inv: inv.external_order_id == "INV-12")
+        inv_123 = created - inv_12
+
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            zf.writestr("INV-12.pdf", b"%PDF-12")
+            zf.writestr("INV-123.pdf", b"%PDF-123")
+            zf.writestr("INV-123.xml", b"<xml/>")
+            zf.writestr("unknown.pdf", b"%PDF-x")
+            zf.writestr("INV-12-empty.pdf", b"")
+        buf.seek(0)
+        with zipfile.ZipFile(buf) as zf:
+            self.inv_model._import_grab_zip_members(
+                zf, {"INV-12": inv_12.id, "INV-123": inv_123.id},
+            )
+
+        self.assertEqual(inv_12.attachment_ids.mapped("name"), ["INV-12.pdf"])
+        self.assertEqual(
+            sorted(inv_123.attachment_ids.mapped("name")), ["INV-123.pdf", "INV-123.xml"],
+        )
+        self.assertEqual(
+            inv_123.attachment_ids.filtered(lambda a: a.name.endswith(".xml")).mimetype,
+            "application/xml",
+        )
+
+    def test_match_sale_orders_in_bulk(self):
+        partner = self.env["res.partner"].create({"name": "Grab Buyer"})
+        order = self.env["sale.order"].create({
+            "partner_id": partner.id,
+            "x_order_source": "grab",
+            "x_grab_order_id": "M0001",
+        })
+        created, _failures = self.inv_model._create_collected_invoices(
+            self.config, "grab", self._vals_list("M", 40),
+        )
+
+        _, queries = self._count_queries(self.inv_model._auto_match_grab_orders)
+        matched = created.filtered(lambda inv: inv.state == "matched")
+        # Only one row shares the order's ID, the rest stay unmatched
+        self.assertEqual(matched.external_order_id, "M0001")
+        self.assertEqual(matched.sale_order_id, order)
+        self.assertEqual(matched.partner_id, partner)
+        # One sale order lookup for the whole batch, not one per invoice
+        self.assertLess(queries, 40)
+
+        logs = self.env["ntp.collector.log"].search([
+            ("config_id", "=", self.config.id), ("operation", "=", "match"),
+        ])
+        self.assertEqual(len(logs), 1)
+        self.assertEqual(logs.records_processed, 1)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import common, tagged
+
+from ..models import collector_log
+
+
+@tagged("post_install", "-at_install")
+class TestCollectorLog(common.TransactionCase):
+
+    def setUp(self):
+        super(TestCollectorLog, self).setUp()
+        self.log_model = self.env["ntp.collector.log"]
+        self.config = self.env["ntp.collector.config"].create({
+            "name": "Test Grab",
+            "provider": "grab",
+        })
+
+    def _config_logs(self):
+        return self.log_model.search([("config_id", "=", self.config.id)])
+
+    def test_buffered_logs_are_created_in_batches(self):
+        buffered = self.log_model.with_context(collector_log_buffer=True)
+        with patch.object(collector_log, "LOG_BUFFER_SIZE", 3):
+            for _i in range(4):
+                self.assertTrue(buffered.log_operation(config=self.config))
+            # The first three were flushed when the buffer filled up
+            self.assertEqual(len(self._config_logs()), 3)
+            self.assertEqual(buffered.flush_log_buffer(), 1)
+        self.assertEqual(len(self._config_logs()), 4)
+        self.assertEqual(buffered.flush_log_buffer(), 0)
+
+    def test_buffer_is_flushed_before_commit(self):
+        buffered = self.log_model.with_context(collector_log_buffer=True)
+        buffered.log_operation(config=self.config, operation="match")
+        self.assertFalse(self._config_logs())
+        self.env.cr.flush()  # runs the precommit hooks, as commit() does
+        self.assertEqual(self._config_logs().operation, "match")
+
+    def test_request_logs_are_sampled(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "ntp_invoice_collector.log_request_sample_rate", "0",
+        )
+        self.assertFalse(self.log_model.log_operation(config=self.config, sampled=True))
+        self.assertTrue(self.log_model.log_operation(config=self.config, success=False))
+        self.assertEqual(len(self._config_logs()), 1)
+
+    def test_old_logs_are_rolled_into_daily_stats(self):
+        old_day = fields.Datetime.now() - timedelta(days=40)
+        logs = self.log_model.create([
+            {"provider": "grab", "operation": "fetch", "success": success,
+             "duration_seconds": duration}
+            for success, duration in ((True, 1.0), (True, 2.0), (False, 10.0))
+        ])
+        recent = self.log_model.create({"provider": "grab", "operation": "fetch"})
+        logs.flush()
+        self.env.cr.execute(
+            "UPDATE ntp_collector_log SET create_date = %s WHERE id IN %s",
+            (old_day, tuple(logs.ids)),
+        )
+
+        self.assertEqual(self.log_model.cron_aggregate_logs(), 3)
+        self.assertFalse(logs.exists())
+        self.assertTrue(recent.exists())
+        stat = self.env["ntp.collector.log.stat"].search([
+            ("date", "=", old_day.date()), ("provider", "=", "grab"),
+        ])
+        self.assertEqual((stat.count, stat.error_count), (3, 1))
+        self.assertAlmostEqual(stat.error_rate, 100.0 / 3, places=2)
+        self.assertAlmostEqual(stat.duration_p50, 2.0)
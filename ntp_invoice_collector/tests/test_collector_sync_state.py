@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from unittest.mock import patch
+
+from odoo.tests import common, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestCollectorSyncState(common.TransactionCase):
+
+    def setUp(self):
+        super(TestCollectorSyncState, self).setUp()
+        self.config = self.env["ntp.collector.config"].create({
+            "name": "Test SPV",
+            "provider": "spv",
+        })
+        self.sync_state = self.env["ntp.collector.sync.state"]._get_for_config(
+            self.config,
+        )
+
+    def test_window_is_split_into_slices(self):
+        self.sync_state._begin_window(date(2024, 1, 1), date(2024, 1, 20))
+        slices = list(self.sync_state._iter_slices(slice_days=7))
+        self.assertEqual(slices, [
+            (date(2024, 1, 1), date(2024, 1, 7)),
+            (date(2024, 1, 8), date(2024, 1, 14)),
+            (date(2024, 1, 15), date(2024, 1, 20)),
+        ])
+        self.assertEqual(self.sync_state.state, "idle")
+        self.assertFalse(self.sync_state.window_from)
+
+    def test_interrupted_window_resumes_at_checkpoint(self):
+        self.sync_state._begin_window(date(2024, 1, 1), date(2024, 1, 20))
+        for slice_from, _slice_to in self.sync_state._iter_slices(slice_days=7):
+            if slice_from == date(2024, 1, 8):
+                self.sync_state._checkpoint(
+                    3, dates=[date(2024, 1, 9), date(2024, 1, 10)],
+                )
+                break  # simulated crash on the next page
+
+        self.assertEqual(self.sync_state.state, "running")
+        self.assertEqual(self.sync_state.slice_from, date(2024, 1, 8))
+        self.assertEqual(self.sync_state.last_page, 3)
+        self.assertEqual(self.sync_state.high_water_date, date(2024, 1, 10))
+
+        # The next run keeps the window and its checkpoint, extended to today
+        self.sync_state._begin_window(date(2024, 1, 18), date(2024, 1, 25))
+        self.assertEqual(self.sync_state.window_from, date(2024, 1, 1))
+        self.assertEqual(self.sync_state.window_to, date(2024, 1, 25))
+        self.assertEqual(self.sync_state.last_page, 3)
+        slices = list(self.sync_state._iter_slices(slice_days=7))
+        self.assertEqual(slices[0], (date(2024, 1, 8), date(2024, 1, 14)))
+        self.assertEqual(slices[-1], (date(2024, 1, 22), date(2024, 1, 25)))
+
+    def test_next_window_starts_from_high_water_date(self):
+        self.sync_state.high_water_date = date(2024, 3, 5)
+        sync_state = self.env["ntp.collected.invoice"]._begin_sync_window(self.config)
+        self.assertEqual(sync_state, self.sync_state)
+        self.assertEqual(sync_state.window_from, date(2024, 3, 5))
+
+        sync_state.action_reset()
+        self.assertFalse(sync_state.high_water_date)
+        self.assertEqual(sync_state.state, "idle")
+
+    def test_checkpoint_commits_only_in_cron_context(self):
+        self.sync_state._begin_window(date(2024, 1, 1), date(2024, 1, 20))
+        with patch.object(type(self.env.registry), "in_test_mode", return_value=False), \
+                patch.object(self.env.cr, "commit") as commit:
+            self.sync_state._checkpoint(1)
+            commit.assert_not_called()
+            self.sync_state.with_context(collector_commit_checkpoints=True)._checkpoint(2)
+            commit.assert_called_once_with()
+
+    def test_fetch_stopped_at_page_limit_is_partial(self):
+        self.config.provider = "shopee"
+        inv_model = self.env["ntp.collected.invoice"]
+
+        def fetch_first_page(config):
+            sync_state = inv_model._begin_sync_window(config, date(2024, 1, 1))
+            next(sync_state._iter_slices(slice_days=7))
+            sync_state._checkpoint(1, cursor="next")
+            return 3
+
+        with patch.object(type(inv_model), "_fetch_shopee_invoices",
+                          side_effect=fetch_first_page):
+            self.assertEqual(inv_model._fetch_config(self.config), 3)
+
+        self.assertFalse(self.config.last_sync_date)
+        log = self.env["ntp.collector.log"].search(
+            [("config_id", "=", self.config.id)], order="id desc", limit=1,
+        )
+        self.assertFalse(log.success)
+        self.assertEqual(log.records_processed, 3)
+        self.assertIn("Partial fetch", log.error_message)
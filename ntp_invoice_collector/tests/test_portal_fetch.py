@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+from odoo.tests import common, tagged
+from odoo.tools import mute_logger
+
+
+class _FakePortalSession:
+    """Lists the given pages, then fails like an expired session."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.start_pages = []
+
+    def iter_pages(self, date_from=None, date_to=None, page_size=50, start_page=1):
+        self.start_pages.append(start_page)
+        for page, invoices in enumerate(self.pages, start=start_page):
+            yield page, invoices
+        raise ValueError("login page returned")
+
+    def get_session_cookie(self):
+        return "spv-cookie"
+
+    def get_jwt_token(self):
+        return "shinhan-jwt"
+
+
+def _invoice(number, **extra):
+    invoice = {
+        "id": "row-%s" % number,
+        "invoice_number": number,
+        "invoice_date": "15/01/2024",
+        "total_amount": "110000",
+        "series": "C24TAA",
+        "seller_name": "Seller",
+        "seller_tax_code": "0101234567",
+        "buyer_name": "Buyer",
+        "buyer_tax_code": "PF0001",
+        "status": "Issued",
+    }
+    invoice.update(extra)
+    return invoice
+
+
+@tagged("post_install", "-at_install")
+class TestPortalFetch(common.TransactionCase):
+
+    def setUp(self):
+        super(TestPortalFetch, self).setUp()
+        self.inv_model = self.env["ntp.collected.invoice"]
+        self.buyer = self.env["res.partner"].create({
+            "name": "Portal Buyer", "vat": "PF0001", "is_company": True,
+        })
+
+    def _config(self, provider):
+        return self.env["ntp.collector.config"].create({
+            "name": "Test %s" % provider,
+            "provider": provider,
+            "%s_date_from" % provider: date.today(),
+        })
+
+    def _pages(self, **extra):
+        return [
+            [_invoice("0000001", **extra), _invoice("0000002", **extra)],
+            # a row without number or id is skipped, a repeat is not created twice
+            [_invoice("", id="", **extra), _invoice("0000002", **extra),
+             _invoice("0000003", buyer_tax_code="UNKNOWN", **extra)],
+        ]
+
+    @mute_logger("odoo.addons.ntp_invoice_collector.models.collected_invoice")
+    def test_providers_share_the_paginated_fetch(self):
+        for provider, fetch, extra, stored in (
+            ("spv", self.inv_model._do_spv_fetch, {},
+             ("spv_session_cookie", "spv-cookie")),
+            ("shinhan", self.inv_model._do_shinhan_fetch, {"invoice_type": "01GTKT"},
+             ("shinhan_jwt_token", "shinhan-jwt")),
+        ):
+            config = self._config(provider)
+            session = _FakePortalSession(self._pages(**extra))
+            self.assertEqual(fetch(config, session), 3)
+
+            invoices = self.inv_model.search([("config_id", "=", config.id)], order="id")
+            self.assertEqual(
+                invoices.mapped("name"),
+                ["%s-%s" % (provider.upper(), number)
+                 for number in ("0000001", "0000002", "0000003")],
+            )
+            self.assertEqual(invoices.mapped("transaction_date"), [date(2024, 1, 15)] * 3)
+            self.assertEqual(invoices[0].total_amount, 110000)
+            self.assertEqual(invoices[:2].mapped("partner_id"), self.buyer)
+            self.assertFalse(invoices[2].partner_id)
+            self.assertEqual(
+                "Type: 01GTKT" in invoices[0].notes, provider == "shinhan",
+            )
+
+            # the expired session stops the run after the checkpointed pages
+            self.assertEqual(config["%s_login_status" % provider], "session_expired")
+            sync_state = self.env["ntp.collector.sync.state"]._get_for_config(config)
+            self.assertEqual(sync_state.last_page, 2)
+            self.assertEqual(config[stored[0]], stored[1])
+
+            # the next run resumes after the last checkpointed page
+            session = _FakePortalSession([])
+            fetch(config, session)
+            self.assertEqual(session.start_pages, [3])
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import time
+from datetime import date
+from unittest.mock import patch
+
+from odoo.tests import common, tagged
+
+from ..models import portal_session
+from ..models.grab_session import GrabEInvoiceSession
+from ..models.shinhan_session import ShinhanEInvoiceSession
+
+
+class _FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class _PagedSession(portal_session.PortalSession):
+    label = "Test"
+    default_base_url = "https://portal.example.com"
+
+    def __init__(self, pages):
+        super().__init__("user", "pass")
+        self.pages = pages
+        self.calls = []
+
+    def fetch_invoices(self, date_from=None, date_to=None, page=1, page_size=50):
+        self.calls.append((date_from, date_to, page))
+        invoices, has_more = self.pages.get(page, ([], False))
+        return {"invoices": invoices, "total": len(invoices), "has_more": has_more}
+
+
+@tagged("post_install", "-at_install")
+class TestPortalSession(common.BaseCase):
+
+    def test_iter_pages_is_lazy_and_stops(self):
+        session = _PagedSession({
+            1: ([{"id": "1"}, {"id": "2"}], True),
+            2: ([{"id": "3"}], False),
+        })
+        pages = session.iter_pages(date(2025, 1, 1), date(2025, 1, 7))
+        self.assertEqual(session.calls, [])
+
+        self.assertEqual(next(pages), (1, [{"id": "1"}, {"id": "2"}]))
+        self.assertEqual(session.calls, [("01/01/2025", "07/01/2025", 1)])
+        self.assertEqual(list(pages), [(2, [{"id": "3"}])])
+        # has_more=False on page 2: no request for page 3
+        self.assertEqual(len(session.calls), 2)
+
+    def test_iter_invoices_resumes_and_stops_on_empty_page(self):
+        session = _PagedSession({
+            2: ([{"id": "3"}], True),
+        })
+        self.assertEqual(
+            list(session.iter_pages("a", "b", start_page=2)), [(2, [{"id": "3"}])],
+        )
+        # Page 3 came back empty
+        self.assertEqual([call[2] for call in session.calls], [2, 3])
+        self.assertEqual(list(_PagedSession({}).iter_invoices()), [])
+
+    def test_shinhan_dates_use_iso_format(self):
+        session = ShinhanEInvoiceSession("user", "pass")
+        self.assertEqual(session._format_date(date(2025, 3, 9)), "2025-03-09")
+        self.assertEqual(session._format_date("2025-03-09"), "2025-03-09")
+
+    def test_state_round_trip(self):
+        session = GrabEInvoiceSession("user", "pass")
+        session._csrf_token = "csrf"
+        session._session.cookies.set("ASP.NET_SessionId", "abc")
+        state = session.export_state()
+
+        restored = GrabEInvoiceSession("user", "pass")
+        self.assertTrue(restored.restore_state(state))
+        self.assertEqual(restored._csrf_token, "csrf")
+        self.assertEqual(restored.get_all_cookies(), {"ASP.NET_SessionId": "abc"})
+        # Loading the pre-login state does not authenticate the session
+        self.assertFalse(restored.is_authenticated())
+        self.assertFalse(GrabEInvoiceSession("user", "pass").restore_state(""))
+
+    def test_request_retries_transient_status(self):
+        session = _PagedSession({})
+        responses = [_FakeResponse(503, {"Retry-After": "0"}), _FakeResponse(200)]
+        with patch.object(session._session, "request", side_effect=responses) as request, \
+                patch.object(portal_session.time, "sleep") as sleep:
+            response = session._request("GET", session._url("/list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(request.call_count, 2)
+        sleep.assert_called_once_with(0.0)
+
+    def test_request_single_attempt(self):
+        session = _PagedSession({})
+        with patch.object(session._session, "request",
+                          return_value=_FakeResponse(502)) as request:
+            response = session._request("POST", session._url("/login"), retries=1)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(request.call_count, 1)
+
+    def test_auto_login_uses_server_answer(self):
+        session = ShinhanEInvoiceSession("user", "pass")
+        with patch.object(session, "get_captcha_image_b64",
+                          side_effect=lambda: setattr(session, "_captcha_text", "Xy12")), \
+                patch.object(session, "login", return_value=True) as login:
+            self.assertTrue(session.auto_login(solver_type="local"))
+        login.assert_called_once_with("Xy12")
+
+    def test_deadline_caps_request_timeout(self):
+        session = _PagedSession({})
+        session.deadline = time.time() + 5
+        with patch.object(session._session, "request",
+                          return_value=_FakeResponse(200)) as request:
+            session._request("GET", session._url("/list"))
+        self.assertLessEqual(request.call_args[1]["timeout"], 5)
+
+        session.deadline = time.time() - 1
+        with patch.object(session._session, "request") as request:
+            with self.assertRaises(portal_session.PortalDeadlineExceeded):
+                session._request("GET", session._url("/list"))
+        request.assert_not_called()
+
+    def test_auto_login_stops_at_deadline(self):
+        session = ShinhanEInvoiceSession("user", "pass")
+        attempts = []
+
+        def failed_login(answer):
+            attempts.append(answer)
+            session.deadline = time.time() - 1  # the attempt used up the budget
+            return False
+
+        with patch.object(session, "get_captcha_image_b64",
+                          side_effect=lambda: setattr(session, "_captcha_text", "Xy12")), \
+                patch.object(session, "login", side_effect=failed_login), \
+                patch.object(portal_session.time, "sleep") as sleep:
+            with self.assertRaises(portal_session.PortalDeadlineExceeded):
+                session.auto_login(solver_type="local", max_attempts=5)
+        self.assertEqual(attempts, ["Xy12"])
+        sleep.assert_not_called()
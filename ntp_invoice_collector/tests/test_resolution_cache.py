@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import Mock
+
+from odoo.tests import common, tagged
+
+from odoo.addons.ntp_einvoice_bizzi.models.resolution_cache import ResolutionCache
+
+
+@tagged("post_install", "-at_install")
+class TestResolutionCache(common.TransactionCase):
+
+    def setUp(self):
+        super(TestResolutionCache, self).setUp()
+        self.inv_model = self.env["ntp.collected.invoice"]
+        self.partners = self.env["res.partner"].create([
+            {"name": "Buyer %d" % i, "vat": "RC%04d" % i, "is_company": True}
+            for i in range(20)
+        ])
+
+    def _count_queries(self, func, *args):
+        self.env["res.partner"].flush()
+        before = self.cr.sql_log_count
+        result = func(*args)
+        return result, self.cr.sql_log_count - before
+
+    def test_repeated_tax_codes_are_resolved_once_per_run(self):
+        cache = ResolutionCache(self.env)
+        vats = ["RC%04d" % i for i in range(20)] + ["UNKNOWN"]
+        partner_map, queries = self._count_queries(
+            self.inv_model._map_partners_by_vat, vats, cache,
+        )
+        self.assertEqual(partner_map, {
+            partner.vat: partner.id for partner in self.partners
+        })
+        self.assertEqual(queries, 1)
+
+        # Next pages repeat the same buyers: no query at all
+        partner_map, queries = self._count_queries(
+            self.inv_model._map_partners_by_vat, vats[:5] + ["UNKNOWN"], cache,
+        )
+        self.assertEqual(len(partner_map), 5)
+        self.assertEqual(queries, 0)
+        self.assertEqual(cache.stats["queries"], 1)
+        self.assertEqual(cache.stats["misses"], 0)
+
+    def test_partner_created_mid_run_is_found(self):
+        cache = ResolutionCache(self.env)
+        self.assertEqual(self.inv_model._map_partners_by_vat(["RCNEW"], cache), {})
+        partner = self.env["res.partner"].create({"name": "New Buyer", "vat": "RCNEW"})
+        self.assertEqual(
+            self.inv_model._map_partners_by_vat(["RCNEW"], cache),
+            {"RCNEW": partner.id},
+        )
+
+    def test_branch_tax_codes(self):
+        branch = self.env["res.partner"].create({
+            "name": "Buyer 1 branch", "vat": "RC0001-001", "is_company": True,
+        })
+        cache = ResolutionCache(self.env, match_sub_vat=True)
+        cache.preload_partners(["RC0001", "RC0001-001", "RCNONE"])
+        self.assertEqual(cache.partners("RC0001"), self.partners[1])
+        self.assertEqual(cache.partners("RC0001-001"), branch)
+        self.assertFalse(cache.partners("RCNONE"))
+        self.assertEqual(cache.stats["queries"], 1)
+
+    def test_only_caches_of_the_same_transaction_are_invalidated(self):
+        cache = ResolutionCache(self.env)
+        self.assertEqual(cache.partner_ids("RCLATER"), [])
+        # a cache of a run in another transaction (another cursor)
+        other_cache = ResolutionCache(Mock(cr=Mock()))
+        other_cache._partners["RCLATER"] = []
+
+        partner = self.env["res.partner"].create({"name": "Later", "vat": "RCLATER"})
+        self.assertEqual(other_cache._partners, {"RCLATER": []})
+        self.assertNotIn("RCLATER", cache._partners)
+        self.assertEqual(cache.partner_ids("RCLATER"), [partner.id])